@@ -23,13 +23,16 @@ from .routes import preview_live
 from .routes import admin_url_extractor
 from .routes import admin_api_gallery_editor
 from .routes import admin_bulk_indexer
+from .routes import jobs
 from .routes import admin_database
 from .routes import api_gallery_public
 from .routes import email
 from .telemetry.otel import init_otel
+from .services.admission import AdmissionRejected, get_admission_controller
 from .observability.refresh import refresh_materialized_views, periodic_refresh_task
 from .observability.pricing_sync import sync_model_pricing_from_models_json
 from .observability.bootstrap import ensure_observability_schema
+from .observability.llm_wrapper import prompt_cache_stats
 
 
 def get_allowed_origins() -> list[str]:
@@ -89,10 +92,21 @@ app.include_router(admin_database.router)
 app.include_router(api_gallery_public.router)
 app.include_router(launcher_chat.router)
 app.include_router(packs.router)
+app.include_router(jobs.router)
 app.include_router(launcher_project.router)
 app.include_router(email.router)
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    # Backpressure from the LLM admission controller
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.get("/")
 async def root():
     return {"service": "backend-lite-v2", "status": "ok"}
@@ -103,7 +117,8 @@ async def health():
     """Health check endpoint with model cache status for deployment monitoring"""
     try:
         from .services.embedder_cache import get_cache_stats
-        from .services.vector_storage import VectorStorageService
+        from .services.vector_storage import get_vector_storage_service
+        from .services.lancedb_registry import get_registry_stats
         
         # Check basic health
         health_data = {
@@ -120,12 +135,25 @@ async def health():
         
         # Add vector storage status  
         try:
-            vector_service = VectorStorageService()
+            vector_service = get_vector_storage_service()
             vector_health = vector_service.health_check()
+            vector_health["registry"] = get_registry_stats()
             health_data["vector_storage"] = vector_health
         except Exception as e:
             health_data["vector_storage"] = {"error": str(e)}
             
+        # LLM admission control: queue depth and queue times per priority class
+        try:
+            health_data["llm_admission"] = get_admission_controller().get_stats()
+        except Exception as e:
+            health_data["llm_admission"] = {"error": str(e)}
+
+        # Prompt-cache effectiveness: stable-prefix and provider-cached token share per agent
+        try:
+            health_data["llm_prompt_cache"] = prompt_cache_stats()
+        except Exception as e:
+            health_data["llm_prompt_cache"] = {"error": str(e)}
+
         # Add deployment info
         health_data["deployment"] = {
             "image_optimized": True,
@@ -178,6 +206,31 @@ def _seed_models_catalog_if_missing():
         pass
 
 
+@app.on_event("startup")
+async def _on_startup_job_workers():
+    # Durable job queue workers (pack processing, bulk indexing)
+    try:
+        from .services.job_queue import start_job_workers
+        start_job_workers("app.services.job_handlers")
+    except Exception as e:
+        print(f"[JOBS] failed to start workers: {e}")
+
+
+@app.on_event("shutdown")
+async def _on_shutdown_job_workers():
+    try:
+        from .services.job_queue import stop_job_workers
+        await stop_job_workers()
+    except Exception:
+        pass
+    # Pooled doc fetcher clients, after the workers that use them have stopped
+    try:
+        from .services.doc_fetcher import close_fetchers
+        await close_fetchers()
+    except Exception:
+        pass
+
+
 @app.on_event("startup")
 async def _on_startup_seed_models():
     # Seed catalog entries when only non-provider ids exist
@@ -60,6 +60,7 @@ class KiffPack(Base):
     tags = Column(JSON, default=list)  # Searchable tags
     processing_status = Column(String, default="pending")  # pending, processing, ready, failed
     processing_error = Column(Text, nullable=True)  # Error message if processing failed
+    processing_stats = Column(JSON, default=dict)  # Per-stage timings/status of the last processing run
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -110,7 +111,8 @@ class KiffPack(Base):
             "api_structure": self.api_structure,
             "code_examples": self.code_examples,
             "integration_patterns": self.integration_patterns,
-            "processing_error": self.processing_error
+            "processing_error": self.processing_error,
+            "processing_stats": self.processing_stats
         })
         return base_dict
 
@@ -34,9 +34,9 @@ class UsageEvent(BaseObs):
     retries = Column(Integer, nullable=False, default=0)
     latency_ms = Column(Integer, nullable=False, default=0)
     cost_usd = Column(Numeric(12, 6), nullable=False, default=0)
-    status = Column(String, nullable=False, default="ok")  # ok | error
+    status = Column(String, nullable=False, default="ok")  # ok | error | cancelled | timeout
     error_code = Column(Text, nullable=True)
-    source = Column(String, nullable=False, default="provider")  # provider | estimated
+    source = Column(String, nullable=False, default="provider")  # provider | estimated | cache
     redaction_applied = Column(Boolean, nullable=False, default=False)
     prompt_digest = Column(Text, nullable=True)
     completion_digest = Column(Text, nullable=True)
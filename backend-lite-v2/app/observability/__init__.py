@@ -1,2 +1,3 @@
-from .llm_wrapper import SessionContext, call_llm_and_track
+from .llm_wrapper import SessionContext, call_llm_and_track, record_cache_hit, record_partial_usage, prompt_cache_stats, usage_from_run
 from .pricing import get_latest_model_price, compute_cost_usd
+from .resilient import call_llm_resilient, CircuitOpenError, ResilientCall
@@ -1,4 +1,7 @@
 from __future__ import annotations
+import asyncio
+import contextvars
+import threading
 import time
 import uuid
 from dataclasses import dataclass
@@ -13,39 +16,126 @@ from .pricing import get_latest_model_price, compute_cost_usd
 from ..models.observability import UsageEvent
 from ..telemetry.otel import get_tracer
 from ..services.budget_guard import evaluate_budget, send_budget_alert
-
-try:
-    import tiktoken  # type: ignore
-except Exception:
-    tiktoken = None  # optional
+from ..services.tokenizers import count_tokens
+from ..services.admission import admission_slot
 
 FALLBACK_TENANT_ID = "4485db48-71b7-47b0-8128-c6dca5be352d"
 
+# Attempt record of the resilient call driving this call_llm_and_track (if any).
+# The caller sets record["status"] = "timeout" before cancelling an attempt at
+# its deadline, so the usage_event can tell a deadline miss from a lost hedge.
+attempt_record: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("kiff_llm_attempt", default=None)
+
+
+def _observe_latency(model: str, latency_ms: int, ok: bool) -> None:
+    """Feed the model router's rolling stats; never fails the call"""
+    try:
+        from ..services.model_router import get_model_router
+
+        get_model_router().observe(model, latency_ms, ok)
+    except Exception:
+        pass
+
 
 def _estimate_tokens(messages: Iterable[Dict[str, Any]], model: str) -> int:
-    """Rough token estimator. Prefer provider counts when available.
-    Uses tiktoken if present; otherwise fallback to a naive char/4 heuristic.
+    """Token estimator for prompts. Prefer provider counts when available.
+    Uses the shared tokenizer for the model's family (loaded once per process).
     """
     try:
         text = "\n".join([str(m.get("content") or "") for m in messages])
-        if tiktoken is not None:
-            enc = tiktoken.get_encoding("cl100k_base")
-            return len(enc.encode(text))
-        # naive fallback
-        return max(1, len(text) // 4)
+        return max(1, count_tokens(text, model))
     except Exception:
         return 0
 
 
+def _prefix_tokens(messages: Iterable[Dict[str, Any]], model: str) -> int:
+    """Tokens of the leading system messages: the stable prompt prefix that
+    builders keep identical across calls so providers can cache it"""
+    prefix = []
+    for m in messages:
+        if m.get("role") != "system":
+            break
+        prefix.append(str(m.get("content") or ""))
+    try:
+        return count_tokens("\n".join(prefix), model) if prefix else 0
+    except Exception:
+        return 0
+
+
+def _cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    """Prompt tokens the provider served from its prefix cache (OpenAI-style
+    prompt_tokens_details.cached_tokens, or a flat cached_tokens)"""
+    details = usage.get("prompt_tokens_details") or {}
+    cached = usage.get("cached_tokens") or (details.get("cached_tokens") if isinstance(details, dict) else 0)
+    try:
+        return max(0, int(cached or 0))
+    except Exception:
+        return 0
+
+
+def usage_from_run(run: Any) -> Optional[Dict[str, int]]:
+    """Provider usage of an AGNO run (summed over its model calls) in the
+    shape call_llm_and_track reads from result["usage"]; None when the run
+    carries no token metrics"""
+    metrics = getattr(run, "metrics", None)
+    if not metrics:
+        return None
+
+    def _get(*names: str) -> int:
+        for name in names:
+            v = metrics.get(name) if isinstance(metrics, dict) else getattr(metrics, name, None)
+            if isinstance(v, list):
+                v = sum(x for x in v if isinstance(x, (int, float)))
+            if isinstance(v, (int, float)) and v:
+                return int(v)
+        return 0
+
+    prompt_tokens = _get("input_tokens", "prompt_tokens")
+    if not prompt_tokens:
+        return None
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _get("output_tokens", "completion_tokens"),
+        "cached_tokens": _get("cached_tokens", "cache_read_tokens"),
+    }
+
+
+# Prompt-cache effectiveness per agent since process start (GET /health)
+_prompt_cache_totals: Dict[str, Dict[str, float]] = {}
+_prompt_cache_lock = threading.Lock()
+
+
+def _observe_prompt_cache(agent: Optional[str], prompt_tokens: int, prefix_tokens: int, cached_tokens: int, discount_usd: Decimal) -> None:
+    with _prompt_cache_lock:
+        t = _prompt_cache_totals.setdefault(agent or "unknown", {
+            "calls": 0, "prompt_tokens": 0, "prefix_tokens": 0, "cached_tokens": 0, "cache_discount_usd": 0.0,
+        })
+        t["calls"] += 1
+        t["prompt_tokens"] += prompt_tokens
+        t["prefix_tokens"] += prefix_tokens
+        t["cached_tokens"] += cached_tokens
+        t["cache_discount_usd"] += float(discount_usd)
+
+
+def prompt_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per agent: prefix_share (stable prefix / prompt tokens, what the layout
+    makes cacheable) and cached_share (tokens the provider reported cached)"""
+    with _prompt_cache_lock:
+        items = {agent: dict(t) for agent, t in _prompt_cache_totals.items()}
+    for t in items.values():
+        total = t["prompt_tokens"] or 1
+        t["prefix_share"] = round(t["prefix_tokens"] / total, 4)
+        t["cached_share"] = round(t["cached_tokens"] / total, 4)
+        t["cache_discount_usd"] = round(t["cache_discount_usd"], 6)
+    return items
+
+
 def _estimate_tokens_text(text: str, model: str) -> int:
     """Estimate tokens for raw text payloads (embeddings).
-    Prefer provider counts when available; otherwise char/4 fallback.
+    Prefer provider counts when available; otherwise the shared tokenizer.
     """
     try:
-        if tiktoken is not None:
-            enc = tiktoken.get_encoding("cl100k_base")
-            return len(enc.encode(text))
-        return max(1, len(text) // 4)
+        return max(1, count_tokens(text, model))
     except Exception:
         return 0
 
@@ -72,7 +162,7 @@ def record_usage_event(
     model_version: Optional[str],
     prompt_tokens: int,
     completion_tokens: int,
-    token_breakdown: Optional[Dict[str, int]] = None,
+    token_breakdown: Optional[Dict[str, Any]] = None,
     cache_hit: bool = False,
     retries: int = 0,
     latency_ms: int = 0,
@@ -118,6 +208,107 @@ def record_usage_event(
     return ev.id
 
 
+def record_cache_hit(
+    *,
+    tenant_id: Optional[str],
+    provider: str,
+    model: str,
+    agent_name: Optional[str] = None,
+    saved_prompt_tokens: int = 0,
+    saved_completion_tokens: int = 0,
+    latency_ms: int = 0,
+    session_ctx: Optional[SessionContext] = None,
+) -> str:
+    """Persist a usage_event for a response served from the LLM response cache.
+
+    No provider tokens were spent: prompt/completion tokens and cost are 0 and
+    the tokens the hit saved are kept in token_breakdown.
+    """
+    run_id = str(uuid.uuid4())
+    ctx = session_ctx or SessionContext(
+        tenant_id=tenant_id,
+        user_id=None,
+        workspace_id=None,
+        session_id=f"llm-cache:{agent_name or 'default'}",
+        run_id=run_id,
+        step_id=run_id,
+        agent_name=agent_name,
+    )
+    tracer = get_tracer("llm_wrapper")
+    with tracer.start_as_current_span("llm.cache_hit") as span:
+        span.set_attribute("provider", provider)
+        span.set_attribute("model", model)
+        span.set_attribute("tenant_id", ctx.tenant_id or FALLBACK_TENANT_ID)
+        span.set_attribute("cache.hit", True)
+        span.set_attribute("cost.usd", 0.0)
+        with SessionLocal() as db:
+            return record_usage_event(
+                db,
+                ctx=ctx,
+                provider=provider,
+                model=model,
+                model_version=None,
+                prompt_tokens=0,
+                completion_tokens=0,
+                token_breakdown={"saved_prompt": saved_prompt_tokens, "saved_completion": saved_completion_tokens},
+                cache_hit=True,
+                latency_ms=latency_ms,
+                cost_usd=Decimal("0"),
+                status="ok",
+                source="cache",
+            )
+
+
+def record_partial_usage(
+    *,
+    session_ctx: SessionContext,
+    provider: str,
+    model: str,
+    messages: Iterable[Dict[str, Any]],
+    completion_text: str = "",
+    latency_ms: int = 0,
+    reason: str = "cancelled",
+) -> str:
+    """Persist a usage_event for a streamed call that was stopped before it
+    finished (client gone, stop requested).
+
+    The provider never reported usage: prompt tokens are estimated from the
+    messages and completion tokens from the text streamed so far; status is
+    "cancelled" with the reason as error_code.
+    """
+    messages = list(messages)
+    prompt_tokens = _estimate_tokens(messages, model)
+    completion_tokens = _estimate_tokens_text(completion_text, model) if completion_text else 0
+    tracer = get_tracer("llm_wrapper")
+    with tracer.start_as_current_span("llm.partial") as span:
+        with SessionLocal() as db:
+            price = get_latest_model_price(db, provider=provider, model=model)
+            cost = compute_cost_usd(price, prompt_tokens, completion_tokens) if price else Decimal("0")
+            span.set_attribute("provider", provider)
+            span.set_attribute("model", model)
+            span.set_attribute("tenant_id", session_ctx.tenant_id or FALLBACK_TENANT_ID)
+            span.set_attribute("tokens.prompt", prompt_tokens)
+            span.set_attribute("tokens.completion", completion_tokens)
+            span.set_attribute("cost.usd", float(cost))
+            span.set_attribute("status", "cancelled")
+            span.set_attribute("error_code", reason)
+            return record_usage_event(
+                db,
+                ctx=session_ctx,
+                provider=provider,
+                model=model,
+                model_version=None,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                token_breakdown={"prefix": _prefix_tokens(messages, model), "partial": True},
+                latency_ms=latency_ms,
+                cost_usd=cost,
+                status="cancelled",
+                error_code=reason,
+                source="estimated",
+            )
+
+
 async def call_llm_and_track(
     *,
     provider: str,
@@ -132,10 +323,42 @@ async def call_llm_and_track(
     llm_callable=None,  # async function to call: await llm_callable(messages, stream=...)
 ) -> Any:
     """Generic async wrapper for an LLM call with full accounting.
+    - Waits for an admission slot for the tenant (app/services/admission.py);
+      raises AdmissionRejected when the tenant's queue overflows.
     - Expects llm_callable that performs the provider call.
     - Emits OTel span with token/cost attributes.
     - Persists one usage_event row per logical call.
     """
+    async with admission_slot(session_ctx.tenant_id or FALLBACK_TENANT_ID) as ticket:
+        return await _tracked_llm_call(
+            provider=provider,
+            model=model,
+            model_version=model_version,
+            messages=messages,
+            session_ctx=session_ctx,
+            tool_name=tool_name,
+            stream=stream,
+            attempt_n=attempt_n,
+            cache_hit=cache_hit,
+            llm_callable=llm_callable,
+            queued_ms=ticket.queued_ms if ticket is not None else 0,
+        )
+
+
+async def _tracked_llm_call(
+    *,
+    provider: str,
+    model: str,
+    model_version: Optional[str],
+    messages: list[Dict[str, Any]],
+    session_ctx: SessionContext,
+    tool_name: Optional[str],
+    stream: bool,
+    attempt_n: int,
+    cache_hit: bool,
+    llm_callable,
+    queued_ms: int,
+) -> Any:
     tracer = get_tracer("llm_wrapper")
     start = time.perf_counter()
 
@@ -145,8 +368,10 @@ async def call_llm_and_track(
 
     # Defaults until provider reports
     prompt_tokens = _estimate_tokens(messages, model)
+    prefix_tokens = _prefix_tokens(messages, model)
     completion_tokens = 0
     reasoning_tokens = 0
+    cached_tokens = 0
     source = "estimated"
 
     provider_error: Optional[str] = None
@@ -165,6 +390,7 @@ async def call_llm_and_track(
             span.set_attribute("agent_name", session_ctx.agent_name)
         if tool_name:
             span.set_attribute("tool_name", tool_name)
+        span.set_attribute("admission.queued_ms", queued_ms)
 
         try:
             if not llm_callable:
@@ -200,6 +426,7 @@ async def call_llm_and_track(
                         if (prompt_tokens + completion_tokens) != total:
                             completion_tokens = max(0, total - prompt_tokens)
                     source = "provider"
+                    cached_tokens = min(_cached_prompt_tokens(usage), prompt_tokens)
             except Exception:
                 pass
 
@@ -207,12 +434,26 @@ async def call_llm_and_track(
             latency_ms = int((time.perf_counter() - start) * 1000)
             with SessionLocal() as db:
                 price = get_latest_model_price(db, provider=provider, model=model)
-                cost = compute_cost_usd(price, prompt_tokens, completion_tokens, reasoning_tokens, cache_hit) if price else Decimal("0")
+                cost = compute_cost_usd(price, prompt_tokens, completion_tokens, reasoning_tokens, cache_hit, cached_tokens) if price else Decimal("0")
+                # What the provider's prompt cache saved on this call
+                discount = Decimal("0")
+                if price and cached_tokens and not cache_hit:
+                    discount = compute_cost_usd(price, prompt_tokens, completion_tokens, reasoning_tokens) - cost
+                breakdown: Dict[str, Any] = {"reasoning": reasoning_tokens} if reasoning_tokens else {}
+                if prefix_tokens:
+                    breakdown["prefix"] = prefix_tokens
+                if cached_tokens:
+                    breakdown["cached_prompt"] = cached_tokens
+                    breakdown["cache_discount_usd"] = float(discount)
 
                 span.set_attribute("tokens.prompt", prompt_tokens)
                 span.set_attribute("tokens.completion", completion_tokens)
                 span.set_attribute("tokens.total", prompt_tokens + completion_tokens)
+                span.set_attribute("tokens.prompt_prefix", prefix_tokens)
+                span.set_attribute("tokens.prompt_cached", cached_tokens)
+                span.set_attribute("prompt.cached_share", round(cached_tokens / max(1, prompt_tokens), 4))
                 span.set_attribute("cost.usd", float(cost))
+                span.set_attribute("cost.cache_discount_usd", float(discount))
                 span.set_attribute("cache.hit", cache_hit)
                 span.set_attribute("retries", max(0, attempt_n - 1))
                 span.set_attribute("status", "ok")
@@ -225,7 +466,7 @@ async def call_llm_and_track(
                     model_version=model_version,
                     prompt_tokens=prompt_tokens,
                     completion_tokens=completion_tokens,
-                    token_breakdown={"reasoning": reasoning_tokens} if reasoning_tokens else None,
+                    token_breakdown=breakdown or None,
                     cache_hit=cache_hit,
                     retries=max(0, attempt_n - 1),
                     latency_ms=latency_ms,
@@ -237,13 +478,25 @@ async def call_llm_and_track(
                     completion_digest=None,
                     redaction_applied=red_applied,
                 )
+            _observe_latency(model, latency_ms, True)
+            _observe_prompt_cache(session_ctx.agent_name, prompt_tokens, prefix_tokens, cached_tokens, discount)
             return result
+        except asyncio.CancelledError:
+            # Cancelled by the caller (deadline, losing hedge, client gone): the
+            # provider may still bill the request, so it gets its own usage_event.
+            # A deadline miss is a timeout and counts in the model's error stats
+            record = attempt_record.get()
+            provider_error = "Timeout" if record is not None and record.get("status") == "timeout" else "Cancelled"
+            raise
         except Exception as e:
             provider_error = type(e).__name__
             raise
         finally:
             if provider_error is not None:
                 latency_ms = int((time.perf_counter() - start) * 1000)
+                status = {"Cancelled": "cancelled", "Timeout": "timeout"}.get(provider_error, "error")
+                if status == "error":
+                    _observe_latency(model, latency_ms, False)
                 with SessionLocal() as db:
                     price = get_latest_model_price(db, provider=provider, model=model)
                     cost = compute_cost_usd(price, prompt_tokens, completion_tokens, reasoning_tokens, cache_hit) if price else Decimal("0")
@@ -254,7 +507,7 @@ async def call_llm_and_track(
                     span.set_attribute("cost.usd", float(cost))
                     span.set_attribute("cache.hit", cache_hit)
                     span.set_attribute("retries", max(0, attempt_n - 1))
-                    span.set_attribute("status", "error")
+                    span.set_attribute("status", status)
                     span.set_attribute("error_code", provider_error)
 
                     record_usage_event(
@@ -270,7 +523,7 @@ async def call_llm_and_track(
                         retries=max(0, attempt_n - 1),
                         latency_ms=latency_ms,
                         cost_usd=cost,
-                        status="error",
+                        status=status,
                         error_code=provider_error,
                         source=source,
                         prompt_digest=prompt_digest,
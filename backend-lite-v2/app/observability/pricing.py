@@ -45,7 +45,11 @@ def compute_cost_usd(
     completion_tokens: int,
     reasoning_tokens: int = 0,
     cache_hit: bool = False,
+    cached_prompt_tokens: int = 0,
 ) -> Decimal:
+    """Cost of one call. cache_hit discounts the whole input; otherwise
+    cached_prompt_tokens (the prompt prefix the provider served from its
+    prompt cache) are discounted"""
     input_cost = (Decimal(prompt_tokens) / Decimal(1000)) * price.input_per_1k
     output_cost = (Decimal(completion_tokens) / Decimal(1000)) * price.output_per_1k
     reasoning_cost = Decimal(0)
@@ -63,6 +67,12 @@ def compute_cost_usd(
         except Exception:
             # If discount malformed, ignore gracefully
             pass
+    elif cached_prompt_tokens > 0 and price.cache_discount is not None:
+        try:
+            cached = min(cached_prompt_tokens, prompt_tokens)
+            total -= (Decimal(cached) / Decimal(1000)) * price.input_per_1k * price.cache_discount
+        except Exception:
+            pass
 
     return total.quantize(Decimal("0.000001"), rounding=ROUND_HALF_UP)
 
@@ -0,0 +1,318 @@
+"""
+Resilient LLM Calls
+===================
+
+call_llm_resilient() wraps call_llm_and_track so that one slow or failing
+provider call does not stall a chat turn or a pack stage:
+
+- deadline: the whole call (every attempt) finishes within deadline_s;
+  attempts still running at the deadline are cancelled
+- failover: on an error, a 429 or an open circuit the next model in the
+  chain (primary first, then fallback_models) is tried; an admission
+  rejection (tenant backpressure) is raised as is, and so is any error
+  should_failover(model, exc) declines (e.g. an agent attempt that already
+  ran tools, whose side effects a second attempt would repeat)
+- hedging (opt-in): if the primary has not answered after its observed p95
+  latency (model_router stats; KIFF_LLM_HEDGE_DELAY_MS until it has enough
+  samples) a second request goes to the next model, or to the same model
+  when there is no fallback; the first success wins and the loser is
+  cancelled
+- circuit breaker per model: after KIFF_LLM_BREAKER_FAILURES consecutive
+  failures the model is skipped for KIFF_LLM_BREAKER_OPEN_SEC, then a
+  single probe call decides whether it closes again
+
+Every attempt goes through call_llm_and_track, so each one is a usage event
+and its cost stays visible: a cancelled hedge loser has status "cancelled",
+an attempt cut off by the deadline has status "timeout" (and counts as an
+error in the model router's statistics). Attempts after the first are
+recorded as child steps of the caller's step.
+
+Providers are injected: llm_callable_for(model) returns the async callable
+for that model, so a local fake provider can stand in for Groq
+(scripts/check_resilient_llm.py checks failover, hedging and the deadline
+that way).
+
+Env:
+- KIFF_LLM_DEADLINE_SEC (default 120)
+- KIFF_LLM_HEDGE: "false" (default) | "true"
+- KIFF_LLM_HEDGE_DELAY_MS: hedge delay before a model has a p95 (default 8000)
+- KIFF_LLM_HEDGE_MIN_DELAY_MS (default 500)
+- KIFF_LLM_BREAKER_FAILURES (default 5)
+- KIFF_LLM_BREAKER_OPEN_SEC (default 30)
+"""
+
+from __future__ import annotations
+import asyncio
+import dataclasses
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .llm_wrapper import SessionContext, attempt_record, call_llm_and_track
+from ..services.admission import AdmissionRejected
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def hedging_enabled(override: Optional[bool] = None) -> bool:
+    if override is not None:
+        return override
+    return os.getenv("KIFF_LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = str(exc).lower()
+    return "429" in text or "rate limit" in text
+
+
+class CircuitOpenError(RuntimeError):
+    """Every model in the chain has an open circuit"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one probe) -> closed"""
+
+    def __init__(self, failure_threshold: int, open_sec: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_sec = open_sec
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go out now (takes the probe slot when half-open)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.open_sec:
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """A cancelled call says nothing about the model; free the probe slot"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(
+                _env_int("KIFF_LLM_BREAKER_FAILURES", 5),
+                _env_int("KIFF_LLM_BREAKER_OPEN_SEC", 30),
+            )
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        items = list(_breakers.items())
+    return {model: b.snapshot() for model, b in items}
+
+
+def hedge_delay_s(model: str) -> float:
+    """Observed p95 of the model, or the configured default without enough samples"""
+    delay_ms = _env_int("KIFF_LLM_HEDGE_DELAY_MS", 8000)
+    try:
+        from ..services.model_router import get_model_router
+
+        router = get_model_router()
+        stats = router.stats(model)
+        if stats.samples >= router.min_samples and stats.p95_ms > 0:
+            delay_ms = stats.p95_ms
+    except Exception:
+        pass
+    return max(delay_ms, _env_int("KIFF_LLM_HEDGE_MIN_DELAY_MS", 500)) / 1000.0
+
+
+@dataclass
+class ResilientCall:
+    result: Any
+    model: str
+    attempts: List[Dict[str, Any]] = field(default_factory=list)
+
+
+async def call_llm_resilient(
+    *,
+    provider: str,
+    model: str,
+    messages: list[Dict[str, Any]],
+    session_ctx: SessionContext,
+    llm_callable_for: Callable[[str], Any],
+    fallback_models: Optional[List[str]] = None,
+    deadline_s: Optional[float] = None,
+    hedge: Optional[bool] = None,
+    model_version: Optional[str] = None,
+    tool_name: Optional[str] = None,
+    stream: bool = False,
+    provider_for: Optional[Callable[[str], str]] = None,
+    should_failover: Optional[Callable[[str, BaseException], bool]] = None,
+) -> ResilientCall:
+    """Tracked LLM call with deadline, failover, optional hedging and per-model
+    circuit breakers. Returns the winning result, the model that produced it
+    and one record per attempt; raises the last error when every attempt
+    failed, asyncio.TimeoutError at the deadline, or CircuitOpenError."""
+    hedge = hedging_enabled(hedge)
+    deadline_s = deadline_s or _env_int("KIFF_LLM_DEADLINE_SEC", 120)
+    deadline = time.monotonic() + deadline_s
+    chain: List[str] = []
+    for m in [model, *(fallback_models or [])]:
+        if m and m not in chain:
+            chain.append(m)
+    remaining_chain = list(chain)
+    attempts: List[Dict[str, Any]] = []
+    pending: Dict[asyncio.Task, Dict[str, Any]] = {}
+
+    def _next_model() -> Optional[str]:
+        while remaining_chain:
+            m = remaining_chain.pop(0)
+            if get_breaker(m).allow():
+                return m
+            attempts.append({"model": m, "status": "circuit_open"})
+        return None
+
+    async def _attempt(record: Dict[str, Any]) -> Any:
+        m = record["model"]
+        ctx = session_ctx
+        if record["attempt"] > 1:
+            ctx = dataclasses.replace(
+                session_ctx,
+                step_id=f"{session_ctx.step_id}.{record['attempt']}",
+                parent_step_id=session_ctx.step_id,
+            )
+        t0 = time.perf_counter()
+        # Task-local (each attempt is its own task); lets the usage_event see a deadline miss
+        attempt_record.set(record)
+        try:
+            result = await call_llm_and_track(
+                provider=provider_for(m) if provider_for else provider,
+                model=m,
+                model_version=model_version if m == model else None,
+                messages=messages,
+                session_ctx=ctx,
+                tool_name=tool_name,
+                stream=stream,
+                attempt_n=record["attempt"],
+                llm_callable=llm_callable_for(m),
+            )
+        except asyncio.CancelledError:
+            get_breaker(m).record_cancelled()
+            record.setdefault("status", "cancelled")
+            raise
+        except AdmissionRejected:
+            # Tenant backpressure, not a model failure: no failover either
+            get_breaker(m).record_cancelled()
+            record["status"] = "rejected"
+            raise
+        except Exception as e:
+            get_breaker(m).record_failure()
+            record["status"] = "rate_limited" if is_rate_limited(e) else "error"
+            record["error"] = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            record["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+        get_breaker(m).record_success()
+        record["status"] = "ok"
+        return result
+
+    def _launch(m: str, hedged: bool = False) -> None:
+        record = {"model": m, "attempt": sum(1 for a in attempts if "attempt" in a) + 1, "hedge": hedged}
+        attempts.append(record)
+        pending[asyncio.create_task(_attempt(record))] = record
+
+    first = _next_model()
+    if first is None:
+        raise CircuitOpenError(f"Circuit open for every model: {', '.join(chain)}")
+    _launch(first)
+    hedged = not hedge
+    last_exc: Optional[BaseException] = None
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = remaining if hedged else min(remaining, hedge_delay_s(first))
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedged:
+                    break  # deadline
+                hedged = True
+                backup = _next_model()
+                if backup is None and get_breaker(first).state == "closed":
+                    backup = first
+                if backup is not None:
+                    _launch(backup, hedged=True)
+                continue
+            for task in done:
+                record = pending.pop(task)
+                if task.exception() is None:
+                    return ResilientCall(result=task.result(), model=record["model"], attempts=attempts)
+                last_exc = task.exception()
+                if isinstance(last_exc, AdmissionRejected):
+                    raise last_exc
+                if should_failover is not None and not should_failover(record["model"], last_exc):
+                    raise last_exc
+            if not pending:
+                nxt = _next_model()
+                if nxt is not None:
+                    _launch(nxt)
+    finally:
+        timed_out = time.monotonic() >= deadline
+        for task, record in pending.items():
+            if timed_out:
+                record["status"] = "timeout"
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            if timed_out:
+                # A deadline miss counts against the model, unlike a lost hedge
+                from ..services.model_router import get_model_router
+
+                for record in pending.values():
+                    get_breaker(record["model"]).record_failure()
+                    get_model_router().observe(record["model"], record.get("latency_ms", 0), False)
+
+    if pending or last_exc is None:
+        raise asyncio.TimeoutError(f"LLM call exceeded its {deadline_s:g}s deadline ({', '.join(chain)})")
+    raise last_exc
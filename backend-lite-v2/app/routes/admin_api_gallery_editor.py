@@ -6,9 +6,9 @@ from ..util.admin_guard import require_admin
 from ..util.gallery_store import (
     list_providers, upsert_provider, delete_provider,
     list_api_services, upsert_api_service, delete_api_service,
-    list_categories, save_categories, bulk_upsert_doc_urls,
+    list_categories, save_categories, bulk_upsert_doc_urls, list_doc_urls,
 )
-from .admin_url_extractor import _discover_sitemaps, _parse_sitemap, _filter_urls, DEFAULT_PREFIXES
+from .admin_url_extractor import _discover_sitemaps, _parse_sitemap, _parse_sitemap_entries, _filter_urls, DEFAULT_PREFIXES
 from ..util.agentic_url_discovery import discover_api_urls
 from ..util.seed_data import SEED_PROVIDERS
 
@@ -139,18 +139,21 @@ async def reindex_api(req: Request, api_id: str):
         
         # Parse all sitemaps and collect URLs
         all_urls: List[str] = []
+        lastmods: Dict[str, Optional[str]] = {}
         sitemap_results = []
         
         for sm in sitemaps:
             try:
-                urls = await _parse_sitemap(sm)
+                entries = await _parse_sitemap_entries(sm)
                 sitemap_results.append({
                     "sitemap_url": sm,
-                    "url_count": len(urls) if urls else 0,
+                    "url_count": len(entries) if entries else 0,
                     "status": "success"
                 })
-                if urls:
-                    all_urls.extend(urls)
+                for url, lastmod in entries:
+                    all_urls.append(url)
+                    if lastmod:
+                        lastmods[url] = lastmod
             except Exception as e:
                 sitemap_results.append({
                     "sitemap_url": sm,
@@ -224,9 +227,16 @@ async def reindex_api(req: Request, api_id: str):
         # Filter URLs to documentation paths
         filtered = _filter_urls(all_urls, base, DEFAULT_PREFIXES)
         
-        # Store the URLs for future reference
+        # Pages whose sitemap lastmod moved since the last run (or that are new)
+        previous = {d.get("url"): d.get("lastmod") for d in list_doc_urls() if d.get("api_service_id") == api_id}
+        changed_urls = [
+            u for u in filtered
+            if u not in previous or not lastmods.get(u) or lastmods.get(u) != previous.get(u)
+        ]
+        
+        # Store the URLs (with sitemap lastmod) for future reference
         try:
-            bulk_upsert_doc_urls(api_id, [(url, None, None) for url in filtered])
+            bulk_upsert_doc_urls(api_id, [(url, lastmods.get(url), None) for url in filtered])
         except Exception as e:
             print(f"Warning: Failed to store URLs for {api_name}: {e}")
         
@@ -250,6 +260,8 @@ async def reindex_api(req: Request, api_id: str):
             "sitemap_results": sitemap_results,
             "total_urls_found": len(all_urls),
             "filtered_urls_count": len(filtered),
+            "changed_urls_count": len(changed_urls),
+            "unchanged_urls_count": len(filtered) - len(changed_urls),
             "filtered_urls": filtered[:20],  # First 20 for preview
             "full_urls_stored": True
         }
@@ -437,11 +449,12 @@ class IndexFullBody(_BaseModel):
     strategy: str = "semantic"  # fixed | semantic | agentic | recursive | document
     mode: str = "fast"          # fast | agentic
     embedder: str = "sentence-transformers"
-    chunk_size: int = 4400
-    chunk_overlap: int = 300
+    chunk_size: int = 1100  # tokens
+    chunk_overlap: int = 75
     budget_cap_usd: Optional[float] = None
     create_kb_if_missing: bool = True
     kb_name: Optional[str] = None  # default: f"API:{api_name}"
+    skip_unchanged: bool = True  # re-runs on an existing KB skip pages unchanged since the last crawl
 
 
 @router.post("/api/{api_id}/index_full")
@@ -490,6 +503,8 @@ async def index_full(req: Request, api_id: str, body: IndexFullBody):
         except Exception:
             pass
 
+        kb_existed = kb_id is not None
+
         # Create if missing
         if not kb_id and body.create_kb_if_missing:
             r_create = await client.post(
@@ -518,6 +533,8 @@ async def index_full(req: Request, api_id: str, body: IndexFullBody):
             "embedder": body.embedder,
             "chunk_size": body.chunk_size,
             "chunk_overlap": body.chunk_overlap,
+            # A fresh KB has none of the cached pages yet, so everything must be indexed
+            "skip_unchanged": body.skip_unchanged and kb_existed,
         }
         # If no budget cap specified, use a very high cap to effectively disable it
         payload["budget_cap_usd"] = body.budget_cap_usd if body.budget_cap_usd is not None else 9999.0
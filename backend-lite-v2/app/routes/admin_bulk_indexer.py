@@ -1,5 +1,5 @@
 from __future__ import annotations
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Request, HTTPException
 from typing import List, Dict, Any, Optional
 import asyncio
 from datetime import datetime
@@ -13,18 +13,25 @@ from ..util.gallery_store import (
     mark_api_indexed,
 )
 from .admin_url_extractor import _discover_sitemaps, _parse_sitemap, _filter_urls, DEFAULT_PREFIXES
+from ..services.job_queue import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobContext, enqueue_job, get_job_queue
 
 router = APIRouter(prefix="/admin/bulk_indexer", tags=["admin:bulk_indexer"])
 
-# Global state for tracking bulk indexing progress
-_indexing_state = {
-    "status": "idle",  # "idle", "running", "completed", "failed"
-    "progress": {"current": 0, "total": 0, "processed": []},
-    "started_at": None,
-    "completed_at": None,
-    "results": {"success": 0, "failed": 0, "skipped": 0},
-    "errors": []
-}
+JOB_KIND = "admin.bulk_index"
+
+# Job status -> status reported by this API
+_STATUS = {QUEUED: "queued", RUNNING: "running", SUCCEEDED: "completed", FAILED: "failed", CANCELLED: "stopped"}
+
+
+def _new_state() -> Dict[str, Any]:
+    return {
+        "status": "idle",  # "idle", "queued", "running", "completed", "failed", "stopped"
+        "progress": {"current": 0, "total": 0, "processed": []},
+        "started_at": None,
+        "completed_at": None,
+        "results": {"success": 0, "failed": 0, "skipped": 0},
+        "errors": []
+    }
 
 class BulkIndexRequest(BaseModel):
     force_reindex: bool = False
@@ -139,70 +146,94 @@ async def _index_single_api(api: Dict[str, Any], force: bool = False) -> IndexRe
             error=error_msg
         )
 
-async def _bulk_index_worker(apis: List[Dict[str, Any]], force: bool, max_concurrent: int):
-    """Background worker for bulk indexing APIs."""
-    global _indexing_state
-    
-    _indexing_state["status"] = "running"
-    _indexing_state["started_at"] = datetime.utcnow().isoformat() + "Z"
-    _indexing_state["progress"]["total"] = len(apis)
-    _indexing_state["results"] = {"success": 0, "failed": 0, "skipped": 0}
-    _indexing_state["errors"] = []
-    
-    try:
-        # Process APIs with concurrency limit
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def _process_with_semaphore(api):
-            async with semaphore:
-                result = await _index_single_api(api, force)
-                
-                # Update progress
-                _indexing_state["progress"]["current"] += 1
-                _indexing_state["progress"]["processed"].append({
+async def run_bulk_index(
+    apis: List[Dict[str, Any]],
+    force: bool,
+    max_concurrent: int,
+    ctx: Optional[JobContext] = None,
+) -> Dict[str, Any]:
+    """Bulk index APIs; runs as the admin.bulk_index job and reports state as job progress."""
+    state = _new_state()
+    state["status"] = "running"
+    state["started_at"] = datetime.utcnow().isoformat() + "Z"
+    state["progress"]["total"] = len(apis)
+
+    def _publish(force_write: bool = False) -> None:
+        if ctx is not None:
+            ctx.progress(_force=force_write, **state)
+
+    _publish(True)
+
+    # Process APIs with concurrency limit
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def _process_with_semaphore(api):
+        async with semaphore:
+            result = await _index_single_api(api, force)
+
+            # Update progress
+            state["progress"]["current"] += 1
+            state["progress"]["processed"].append({
+                "api_name": result.api_name,
+                "status": result.status,
+                "url_count": result.url_count,
+                "error": result.error
+            })
+
+            # Update results
+            state["results"][result.status] += 1
+            if result.error:
+                state["errors"].append({
                     "api_name": result.api_name,
-                    "status": result.status,
-                    "url_count": result.url_count,
                     "error": result.error
                 })
-                
-                # Update results
-                _indexing_state["results"][result.status] += 1
-                if result.error:
-                    _indexing_state["errors"].append({
-                        "api_name": result.api_name,
-                        "error": result.error
-                    })
-                
-                print(f"✅ Indexed {result.api_name}: {result.status} ({result.url_count} URLs)")
-                return result
-        
-        # Execute all tasks
-        tasks = [_process_with_semaphore(api) for api in apis]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        _indexing_state["status"] = "completed"
-        _indexing_state["completed_at"] = datetime.utcnow().isoformat() + "Z"
-        
-        total_success = _indexing_state["results"]["success"]
-        total_apis = len(apis)
-        print(f"🎉 Bulk indexing completed: {total_success}/{total_apis} APIs successfully indexed")
-        
-    except Exception as e:
-        _indexing_state["status"] = "failed"
-        _indexing_state["errors"].append({"general": str(e)})
-        print(f"❌ Bulk indexing failed: {e}")
+            _publish()
+
+            print(f"✅ Indexed {result.api_name}: {result.status} ({result.url_count} URLs)")
+            return result
+
+    # Execute all tasks; cancellation (POST /stop) propagates through gather
+    await asyncio.gather(*[_process_with_semaphore(api) for api in apis])
+
+    state["status"] = "completed"
+    state["completed_at"] = datetime.utcnow().isoformat() + "Z"
+    _publish(True)
+
+    total_success = state["results"]["success"]
+    print(f"🎉 Bulk indexing completed: {total_success}/{len(apis)} APIs successfully indexed")
+    return {"total": len(apis), "results": state["results"]}
+
+
+def _latest_job():
+    jobs = get_job_queue().list(kind=JOB_KIND, limit=1)
+    return jobs[0] if jobs else None
+
+
+def _job_state(job) -> Dict[str, Any]:
+    """Last progress snapshot of a bulk index job, with the job's own status"""
+    state = _new_state()
+    if job is None:
+        return state
+    state.update(job.progress or {})
+    state["status"] = _STATUS.get(job.status, job.status)
+    state["job_id"] = job.id
+    if job.finished_at and not state.get("completed_at"):
+        state["completed_at"] = datetime.utcfromtimestamp(job.finished_at).isoformat() + "Z"
+    if job.status == FAILED and job.error:
+        state["errors"] = list(state.get("errors") or []) + [{"general": job.error}]
+    return state
+
 
 @router.post("/start")
 async def start_bulk_indexing(
     request: Request, 
     body: BulkIndexRequest,
-    background_tasks: BackgroundTasks
 ):
     """Start bulk indexing of all API documentation."""
     require_admin(request)
     
-    if _indexing_state["status"] == "running":
+    active = await asyncio.to_thread(get_job_queue().list, kind=JOB_KIND, statuses=(QUEUED, RUNNING), limit=1)
+    if active:
         raise HTTPException(status_code=409, detail="Bulk indexing already in progress")
     
     # Get APIs to index
@@ -218,56 +249,54 @@ async def start_bulk_indexing(
     if not filtered_apis:
         raise HTTPException(status_code=400, detail="No APIs found to index")
     
-    # Reset state
-    _indexing_state["progress"]["current"] = 0
-    _indexing_state["progress"]["processed"] = []
-    
-    # Start background task
-    background_tasks.add_task(
-        _bulk_index_worker, 
-        filtered_apis, 
-        body.force_reindex, 
-        body.max_concurrent
+    # Partial failures are reported per API; retrying the whole run is not useful
+    job = await enqueue_job(
+        JOB_KIND,
+        {"apis": filtered_apis, "force": body.force_reindex, "max_concurrent": body.max_concurrent},
+        max_attempts=1,
+        dedupe_key=JOB_KIND,
     )
     
     return {
         "message": "Bulk indexing started",
         "total_apis": len(filtered_apis),
-        "status": "running"
+        "status": _STATUS.get(job.status, job.status),
+        "job_id": job.id,
     }
 
 @router.get("/status")
 async def get_indexing_status(request: Request):
     """Get current bulk indexing status and progress."""
     require_admin(request)
-    return _indexing_state
+    return _job_state(await asyncio.to_thread(_latest_job))
 
 @router.post("/stop")
 async def stop_bulk_indexing(request: Request):
     """Stop current bulk indexing process."""
     require_admin(request)
     
-    if _indexing_state["status"] != "running":
+    job = await asyncio.to_thread(_latest_job)
+    if job is None or job.status not in (QUEUED, RUNNING):
         raise HTTPException(status_code=400, detail="No bulk indexing in progress")
     
-    # Note: This is a simple implementation - in production you'd want proper cancellation
-    _indexing_state["status"] = "stopped"
-    _indexing_state["completed_at"] = datetime.utcnow().isoformat() + "Z"
+    # Queued jobs are cancelled at once; a running job stops within one worker heartbeat
+    await asyncio.to_thread(get_job_queue().cancel, job.id)
     
-    return {"message": "Bulk indexing stopped"}
+    return {"message": "Bulk indexing stopped", "job_id": job.id}
 
 @router.get("/results")
 async def get_indexing_results(request: Request):
     """Get detailed results from the last bulk indexing run."""
     require_admin(request)
     
+    state = _job_state(await asyncio.to_thread(_latest_job))
     return {
-        "status": _indexing_state["status"],
-        "results": _indexing_state["results"],
-        "processed": _indexing_state["progress"]["processed"][-20:],  # Last 20 results
-        "errors": _indexing_state["errors"][-10:],  # Last 10 errors
+        "status": state["status"],
+        "results": state["results"],
+        "processed": state["progress"]["processed"][-20:],  # Last 20 results
+        "errors": state["errors"][-10:],  # Last 10 errors
         "timing": {
-            "started_at": _indexing_state["started_at"],
-            "completed_at": _indexing_state["completed_at"]
+            "started_at": state["started_at"],
+            "completed_at": state["completed_at"]
         }
-    }
\ No newline at end of file
+    }
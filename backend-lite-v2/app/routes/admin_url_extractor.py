@@ -1,12 +1,12 @@
 from __future__ import annotations
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import httpx
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
 import xml.etree.ElementTree as ET
-import gzip
-import io
 import re
+from ..services.doc_fetcher import get_fetcher
+from ..services.crawl_cache import get_crawl_cache
 from ..util.admin_guard import require_admin
 from ..util.gallery_store import (
     bulk_upsert_doc_urls,
@@ -39,18 +39,11 @@ class ExtractResp(BaseModel):
     meta: Optional[Dict[str, Any]] = None
 
 
-def _is_gz(url: str) -> bool:
-    return url.endswith(".gz")
-
-
 async def _fetch_text(url: str) -> str:
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        if _is_gz(url):
-            data = gzip.decompress(r.content)
-            return data.decode("utf-8", errors="ignore")
-        return r.text
+    # Sitemaps are revalidated through the crawl cache (304s skip the download);
+    # the shared fetcher transparently decompresses *.gz sitemaps
+    page = await get_crawl_cache().fetch(url, timeout=10)
+    return page.text
 
 
 def _xml_ns(root) -> str:
@@ -73,14 +66,13 @@ async def _discover_sitemaps(base_url: str) -> List[str]:
     # Include robots.txt discovery
     robots = f"{base}/robots.txt"
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            rr = await client.get(robots)
-            if rr.status_code == 200:
-                for line in rr.text.splitlines():
-                    if line.lower().startswith("sitemap:"):
-                        sm = line.split(":", 1)[1].strip()
-                        if sm:
-                            candidates.append(sm)
+        rr = await get_fetcher().fetch(robots, timeout=5, retries=0, raise_for_status=False)
+        if rr.status_code == 200:
+            for line in rr.text.splitlines():
+                if line.lower().startswith("sitemap:"):
+                    sm = line.split(":", 1)[1].strip()
+                    if sm:
+                        candidates.append(sm)
     except Exception:
         pass
     # Dedup while preserving order
@@ -130,7 +122,8 @@ def _filter_urls(urls: List[str], base_url: str, prefixes: List[str]) -> List[st
     return dedup
 
 
-async def _parse_sitemap(url: str) -> List[str]:
+async def _parse_sitemap_entries(url: str) -> List[Tuple[str, Optional[str]]]:
+    """Return (loc, lastmod) pairs from a sitemap or sitemap index"""
     text = await _fetch_text(url)
     try:
         root = ET.fromstring(text)
@@ -139,15 +132,27 @@ async def _parse_sitemap(url: str) -> List[str]:
     ns = _xml_ns(root)
     # sitemap index
     if root.tag.endswith("sitemapindex") or root.tag.endswith("sitemapindex}"):
-        urls = []
+        entries: List[Tuple[str, Optional[str]]] = []
         children = [loc.text.strip() for loc in root.findall(f".{ns}sitemap/{ns}loc") if getattr(loc, "text", None)]
-        # Soft limit to keep under SLA
-        for child in children[:25]:
-            urls.extend(await _parse_sitemap(child))
-        return urls
+        # Soft limit to keep under SLA; child sitemaps are fetched concurrently
+        results = await asyncio.gather(*(_parse_sitemap_entries(child) for child in children[:25]), return_exceptions=True)
+        for child_entries in results:
+            if not isinstance(child_entries, BaseException):
+                entries.extend(child_entries)
+        return entries
     # urlset
-    urls = [loc.text.strip() for loc in root.findall(f".{ns}url/{ns}loc") if getattr(loc, "text", None)]
-    return urls
+    entries = []
+    for node in root.findall(f".{ns}url"):
+        loc = node.find(f"{ns}loc")
+        if loc is None or not loc.text or not loc.text.strip():
+            continue
+        lastmod = node.find(f"{ns}lastmod")
+        entries.append((loc.text.strip(), lastmod.text.strip() if lastmod is not None and lastmod.text else None))
+    return entries
+
+
+async def _parse_sitemap(url: str) -> List[str]:
+    return [loc for loc, _lastmod in await _parse_sitemap_entries(url)]
 
 
 @router.post("/extract", response_model=ExtractResp)
@@ -159,13 +164,10 @@ async def extract(req: Request, body: ExtractBody):
     # Try all discovered sitemaps; return first usable list
     sitemaps = await _discover_sitemaps(base)
     all_urls: List[str] = []
-    for sm in sitemaps:
-        try:
-            urls = await _parse_sitemap(sm)
-            if urls:
-                all_urls.extend(urls)
-        except Exception:
-            continue
+    results = await asyncio.gather(*(_parse_sitemap(sm) for sm in sitemaps), return_exceptions=True)
+    for urls in results:
+        if not isinstance(urls, BaseException) and urls:
+            all_urls.extend(urls)
     if not all_urls:
         # No sitemaps produced results
         return ExtractResp(base_url=base, total_urls=0, urls=[], meta={"note": "no-sitemap"})
@@ -3,9 +3,10 @@ from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional, Literal, Any, Dict
 import os, json, uuid
 from datetime import datetime
-import httpx
 import xml.etree.ElementTree as ET
 
+from ..services.doc_fetcher import get_fetcher
+
 router = APIRouter(prefix="/api/apis", tags=["apis"])  # API catalog CRUD
 
 # Storage path (JSON file for MVP)
@@ -171,10 +172,7 @@ async def get_api_sitemap(api_id: str, limit: int = 20):
         return SitemapResponse(api_id=api_id, sitemap_url=None, total_urls=0, selected_urls=[])
 
     filters = api.get("url_filters") or []
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(sitemap_url)
-        r.raise_for_status()
-        text = r.text
+    text = await get_fetcher().fetch_text(sitemap_url)
     try:
         root = ET.fromstring(text)
     except ET.ParseError:
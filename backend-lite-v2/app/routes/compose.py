@@ -71,9 +71,10 @@ def _resolve_model_id(model_id: str) -> str:
     return mid
 
 
-from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form, Request
 from fastapi import Depends
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import time
@@ -82,7 +83,9 @@ import asyncio
 from sqlalchemy.orm import Session
 from app.db_core import SessionLocal
 from app.models_kiffs import Kiff as KiffModel, ConversationMessage as MessageModel
-from app.observability import SessionContext, call_llm_and_track
+from app.observability import SessionContext, call_llm_and_track, record_partial_usage, usage_from_run
+from app.services.admission import acquire_ticket, release_after, release_ticket
+from app.services.turn_cancel import cancellable_stream, start_turn, stop_turns
 from app.services.budget_guard import evaluate_budget, send_budget_alert
 from app.observability.pricing import get_latest_model_price, compute_cost_usd
 
@@ -502,7 +505,8 @@ async def compose_message(payload: ComposeMessageRequest, x_tenant_id: str = Hea
                 result = agent.run(prompt)  # type: ignore
                 content_val = getattr(result, "content", None)
                 txt = content_val if isinstance(content_val, str) else str(result)
-                return {"content": txt}
+                # Provider usage (incl. prompt-cache hits on the session preamble) for accounting
+                return {"content": txt, "usage": usage_from_run(result)}
 
             try:
                 result = await call_llm_and_track(
@@ -677,7 +681,7 @@ async def attach_knowledge(
 
 
 @router.get("/stream")
-async def compose_stream(session_id: str, prompt: str, x_tenant_id: str = Header(None)):
+async def compose_stream(session_id: str, prompt: str, request: Request, x_tenant_id: str = Header(None)):
     _require_tenant(x_tenant_id)
     sess = SESSIONS.get(session_id)
     if not sess:
@@ -693,9 +697,17 @@ async def compose_stream(session_id: str, prompt: str, x_tenant_id: str = Header
                 yield f"data: [AGNO error: could not initialize agent for model '{sess['model_id']}']\n\n"
                 yield "data: [DONE]\n\n"
                 return
+            started = time.perf_counter()
+            parts: List[str] = []
+            response_stream = None
             try:
-                response_stream = agent.run(prompt, stream=True)  # type: ignore
-                for ev in response_stream:
+                # Async streaming keeps the event loop free between provider chunks
+                # (and lets a cancel land while waiting); depending on the agno
+                # version arun returns the async iterator or a coroutine for it
+                response_stream = agent.arun(prompt, stream=True)  # type: ignore
+                if not hasattr(response_stream, "__aiter__"):
+                    response_stream = await response_stream
+                async for ev in response_stream:
                     # Extract only human-readable text. Skip event reprs.
                     text = None
                     # Most token events expose `.delta`
@@ -713,10 +725,39 @@ async def compose_stream(session_id: str, prompt: str, x_tenant_id: str = Header
                             text = c
                     # Only emit if we found text; otherwise, ignore control/meta events
                     if text:
+                        parts.append(text)
                         yield f"data: {text}\n\n"
-                    await asyncio.sleep(0)
                 yield "data: [DONE]\n\n"
                 return
+            except asyncio.CancelledError:
+                # Client left or /stop: close the provider stream and record what it used
+                aclose = getattr(response_stream, "aclose", None)
+                if aclose is not None:
+                    try:
+                        await aclose()
+                    except Exception:
+                        pass
+                try:
+                    record_partial_usage(
+                        session_ctx=SessionContext(
+                            tenant_id=x_tenant_id,
+                            user_id=None,
+                            workspace_id=None,
+                            session_id=session_id,
+                            run_id=turn.turn_id,
+                            step_id=f"step_{uuid.uuid4().hex[:12]}",
+                            agent_name="Kiff Compose",
+                        ),
+                        provider="groq",
+                        model=sess["model_id"],
+                        messages=[{"role": "user", "content": prompt}],
+                        completion_text="".join(parts),
+                        latency_ms=int((time.perf_counter() - started) * 1000),
+                        reason=turn.reason or "cancelled",
+                    )
+                except Exception as _e:
+                    print(f"[COMPOSE] partial usage not recorded: {_e}")
+                raise
             except Exception as e:
                 # Fallback to non-streaming text echo on errors
                 text = f"[AGNO error: {e}] {prompt}"
@@ -728,4 +769,18 @@ async def compose_stream(session_id: str, prompt: str, x_tenant_id: str = Header
             await asyncio.sleep(0.005)
         yield "data: [DONE]\n\n"
 
-    return StreamingResponse(event_gen(), media_type="text/event-stream")
+    ticket = await acquire_ticket(x_tenant_id)
+    # A disconnect or /stop aborts the agent run; the client sees a plain [DONE]
+    turn = start_turn("compose", x_tenant_id, session_id)
+    return StreamingResponse(
+        release_after(cancellable_stream(event_gen(), request, turn, lambda _reason: "data: [DONE]\n\n"), ticket),
+        media_type="text/event-stream",
+        background=BackgroundTask(release_ticket, ticket),
+    )
+
+
+@router.post("/stop")
+async def compose_stop(session_id: str, x_tenant_id: str = Header(None)):
+    """Stop the session's running /stream turn(s)."""
+    _require_tenant(x_tenant_id)
+    return {"session_id": session_id, "cancelled": stop_turns(x_tenant_id, session_id, kind="compose")}
@@ -1,15 +1,24 @@
 from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal, Tuple
 import re
-import httpx
-from bs4 import BeautifulSoup
-import math
+import asyncio
 import os
 import json
 import xml.etree.ElementTree as ET
 from time import monotonic
 
+from ..services.doc_fetcher import get_fetcher
+from ..services.crawl_cache import CachedPage, get_crawl_cache
+from ..services import html_extractor
+from ..services.tokenizers import count_tokens, get_tokenizer, iter_token_chunks
+from ..services.semantic_chunker import semantic_chunk
+from ..services.dedup import ChunkDeduper, dedup_enabled
+from ..services import llm_cache
+from ..services.model_router import route_model
+from ..services.admission import AdmissionRejected, admission_slot
+
 # --- Optional AGNO + Groq support ---
 try:
     from agno.models.groq import Groq as GroqLLM  # type: ignore
@@ -68,9 +77,9 @@ class ExtractPreviewRequest(BaseModel):
         "mistral",
     ]] = "sentence-transformers"
 
-    # Chunking parameters (tokens approx)
-    chunk_size: int = 5000
-    chunk_overlap: int = 300
+    # Chunking parameters (tokens of the shared tokenizer; see services/tokenizers.py)
+    chunk_size: int = 1250
+    chunk_overlap: int = 75
 
     # Options
     include_metadata: bool = True
@@ -80,12 +89,27 @@ class ExtractPreviewRequest(BaseModel):
     semantic_params: Optional[Dict[str, Any]] = None
     recursive_params: Optional[Dict[str, Any]] = None
 
+    # Response shaping
+    stream: bool = False  # NDJSON: one record per URL as it completes, then a summary record
+    max_chunk_chars: Optional[int] = None  # truncate returned chunk text (token estimates use full text)
+    max_chunks_per_url: Optional[int] = None  # cap chunks returned per URL (counts still cover all)
+    offset: int = 0  # URL pagination over the resolved list
+    limit: Optional[int] = None
+
+    # Drop near-duplicate chunks across the previewed URLs (None follows KIFF_DEDUP)
+    dedup: Optional[bool] = None
+    dedup_threshold: Optional[float] = None
+
+    # Reuse agentic chunking results for identical text/model/params (None follows KIFF_LLM_CACHE)
+    llm_cache: Optional[bool] = None
+
 
 class Chunk(BaseModel):
     text: str
     url: str
     index: int
     tokens_est: int
+    truncated: bool = False
     metadata: Dict[str, Any] | None = None
 
 
@@ -125,40 +149,46 @@ class RecommendResponse(BaseModel):
     diagnostics: Dict[str, Any]
 
 
+# Cached extractions are keyed on this; it changes with the parser backend and
+# the extraction algorithm version so stale text is recomputed
+_TEXT_EXTRACTOR = html_extractor.extractor_key()
+
+
+def html_to_text(html: str) -> str:
+    """Main documentation content of a page (site navigation, scripts etc. removed)"""
+    return html_extractor.extract_main_content(html)
+
+
+async def html_to_text_async(html: str) -> str:
+    return await html_extractor.extract_async(html)
+
+
+async def fetch_page(url: str, lastmod: Optional[str] = None) -> CachedPage:
+    """Fetch a documentation page through the crawl cache.
+
+    page.extracted holds the page text; page.changed is False when the body is
+    identical to the previous crawl (304, same hash, or same sitemap lastmod).
+    """
+    return await get_crawl_cache().fetch_extracted(url, html_to_text_async, _TEXT_EXTRACTOR, lastmod=lastmod)
+
+
 async def fetch_text(url: str) -> str:
-    async with httpx.AsyncClient(timeout=30, headers={
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-    }) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        html = r.text
-    soup = BeautifulSoup(html, "html.parser")
-    # Remove scripts/styles
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    text = soup.get_text("\n", strip=True)
-    return text
+    return (await fetch_page(url)).extracted or ""
 
 
 def simple_token_estimate(s: str) -> int:
-    # quick heuristic: ~4 chars per token
-    return max(1, math.ceil(len(s) / 4))
+    # Exact count with the shared tokenizer (tiktoken when installed, else ~4 chars/token)
+    return max(1, count_tokens(s))
+
+
+# agno's recursive and agentic chunkers size chunks in characters; chunk_size
+# and chunk_overlap are tokens, so they are scaled by about 4 chars per token
+_CHARS_PER_TOKEN = 4
 
 
 def fixed_chunk(text: str, size: int, overlap: int) -> List[str]:
-    # operate on characters as an approximation to tokens
-    if size <= 0:
-        return [text]
-    res = []
-    start = 0
-    step = max(1, size - max(0, overlap))
-    while start < len(text):
-        end = min(len(text), start + size)
-        res.append(text[start:end])
-        start += step
-    return res
+    # size/overlap are tokens of the shared tokenizer, not characters
+    return [c.text for c in iter_token_chunks(text, size, overlap, get_tokenizer())]
 
 
 # --- Groq / LLM helpers ---
@@ -382,6 +412,14 @@ def _model_for_mode(mode: str) -> str:
     return os.getenv("KIFF_MODEL_AGENTIC", agentic_default)
 
 
+def _chunking_model(mode: str, tenant_id: Optional[str]) -> str:
+    # "fast" pins a small model; otherwise route among the configured chunking
+    # models, sticky per tenant so the preview config echoes the model used
+    if mode == "fast":
+        return _model_for_mode(mode)
+    return route_model("chunking", f"extract:{tenant_id}" if tenant_id else None, tenant_id=tenant_id)
+
+
 # --- AGNO chunking wrappers (best-effort) ---
 
 def _normalize_chunks(parts: Any) -> List[str]:
@@ -414,7 +452,54 @@ def _normalize_chunks(parts: Any) -> List[str]:
         return [str(getattr(parts, "content", parts))]
     except Exception:
         return [str(parts)]
+
+
+def _semantic_encoder(embedder_name: Optional[str], logs: List[str]):
+    """(model_key, batched encode fn) for the native semantic chunker, or None"""
+    choice = (embedder_name or "sentence-transformers").lower()
+    if choice == "sentence-transformers":
+        from ..services.embedder_cache import get_model_key, get_raw_model
+
+        model = get_raw_model()
+        if model is None:
+            logs.append("semantic chunking: sentence-transformers model unavailable")
+            return None
+        return get_model_key(), lambda texts: model.encode(texts, batch_size=64, convert_to_numpy=True)
+    emb = _build_embedder(choice, logs)
+    if emb is None:
+        return None
+    return choice, lambda texts: [emb.get_embedding(t) for t in texts]
+
+
 def _chunk_semantic(text: str, size: int, overlap: int, model_id: str, logs: List[str], embedder_name: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Semantic chunking: one batched embedding call per document through the
+    shared sentence-embedding cache, numpy breakpoints, token-bounded chunks.
+
+    params: threshold (or similarity_threshold), breakpoint_percentile, min_chunk_tokens.
+    Falls back to agno's SemanticChunking when no encoder is available.
+    """
+    given = dict(params or {})
+    encoder = _semantic_encoder(embedder_name, logs)
+    if encoder is not None:
+        model_key, encode = encoder
+        threshold = given.get("threshold", given.get("similarity_threshold"))
+        try:
+            chunks = semantic_chunk(
+                text,
+                encode,
+                model_key,
+                max_tokens=size,
+                threshold=float(threshold) if threshold is not None else None,
+                percentile=given.get("breakpoint_percentile"),
+                min_tokens=int(given.get("min_chunk_tokens") or 0),
+            )
+            return [c.text for c in chunks]
+        except Exception as e:
+            logs.append(f"semantic chunking error: {e}; trying agno SemanticChunking")
+    return _chunk_semantic_agno(text, size, overlap, model_id, logs, embedder_name, params)
+
+
+def _chunk_semantic_agno(text: str, size: int, overlap: int, model_id: str, logs: List[str], embedder_name: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> List[str]:
     # Try dynamic import if not available at module import time
     local_SemanticChunking = SemanticChunking
     if local_SemanticChunking is None:
@@ -484,21 +569,54 @@ def _chunk_semantic(text: str, size: int, overlap: int, model_id: str, logs: Lis
         return fixed_chunk(text, size, overlap)
 
 
-def _chunk_agentic(text: str, size: int, overlap: int, model_id: str, logs: List[str], embedder_name: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> List[str]:
+def _chunk_agentic(
+    text: str,
+    size: int,
+    overlap: int,
+    model_id: str,
+    logs: List[str],
+    embedder_name: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    tenant_id: Optional[str] = None,
+    use_cache: Optional[bool] = None,
+) -> List[str]:
+    # agno runs the LLM calls inside the chunker, so the cache holds the resulting
+    # chunk list, keyed by everything the chunker's prompts depend on
+    use_cache = bool(tenant_id) and llm_cache.llm_cache_enabled(use_cache) and AgenticChunking is not None
+    cache_args = (
+        "extract.agentic_chunking",
+        model_id,
+        [{"role": "user", "content": text}],
+        {"size": size, "embedder": embedder_name, "params": params or {}},
+    )
+    if use_cache:
+        cached = llm_cache.lookup(tenant_id, *cache_args, agent_name="extract.agentic_chunking")
+        if cached is not None:
+            logs.append("agentic chunking: served from LLM response cache")
+            return json.loads(cached)
+    parts, used_llm = _chunk_agentic_uncached(text, size, overlap, model_id, logs, embedder_name, params)
+    # Fixed-size fallbacks are not agentic results; only cache real chunker output
+    if use_cache and used_llm:
+        llm_cache.store(tenant_id, *cache_args[:3], json.dumps(parts), cache_args[3])
+    return parts
+
+
+def _chunk_agentic_uncached(text: str, size: int, overlap: int, model_id: str, logs: List[str], embedder_name: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Tuple[List[str], bool]:
+    """Chunks and whether the LLM chunker produced them (False for the fixed-size fallback)"""
     if AgenticChunking is None:
         logs.append("agentic chunking unavailable; falling back to fixed")
-        return fixed_chunk(text, size, overlap)
+        return fixed_chunk(text, size, overlap), False
     llm = _build_groq(model_id)
     if llm is None:
         logs.append("agentic chunking: no LLM available; falling back to fixed")
-        return fixed_chunk(text, size, overlap)
+        return fixed_chunk(text, size, overlap), False
     emb = _build_embedder(embedder_name, logs)
     try:
         # Allowlist of supported kwargs (version tolerant)
         allowed = {"max_chunk_size", "boundary_sensitivity", "allow_titles"}
         extra = {k: v for k, v in (params or {}).items() if k in allowed and v is not None}
         # Map our generic size to max_chunk_size if not provided
-        extra.setdefault("max_chunk_size", size)
+        extra.setdefault("max_chunk_size", size * _CHARS_PER_TOKEN)
         # Try most permissive signature first (with embedder if available)
         try:
             if emb is not None:
@@ -529,11 +647,11 @@ def _chunk_agentic(text: str, size: int, overlap: int, model_id: str, logs: List
                         parts = method([{"content": text}])
                     except Exception:
                         logs.append(f"agentic chunking error: {e}; falling back to fixed")
-                        return fixed_chunk(text, size, overlap)
-        return _normalize_chunks(parts)
+                        return fixed_chunk(text, size, overlap), False
+        return _normalize_chunks(parts), True
     except Exception as e:
         logs.append(f"agentic chunking error: {e}; falling back to fixed")
-        return fixed_chunk(text, size, overlap)
+        return fixed_chunk(text, size, overlap), False
 
 
 def _chunk_recursive(text: str, size: int, overlap: int, logs: List[str], params: Optional[Dict[str, Any]] = None) -> List[str]:
@@ -545,13 +663,13 @@ def _chunk_recursive(text: str, size: int, overlap: int, logs: List[str], params
         allowed = {"base_strategy", "levels", "min_chunk_size"}
         extra = {k: v for k, v in (params or {}).items() if k in allowed and v is not None}
         try:
-            chunker = RecursiveChunking(chunk_size=size, chunk_overlap=overlap, **extra)  # type: ignore
+            chunker = RecursiveChunking(chunk_size=size * _CHARS_PER_TOKEN, chunk_overlap=overlap * _CHARS_PER_TOKEN, **extra)  # type: ignore
         except TypeError:
             # Some versions may not accept chunk_overlap or extras
             try:
-                chunker = RecursiveChunking(chunk_size=size, **extra)  # type: ignore
+                chunker = RecursiveChunking(chunk_size=size * _CHARS_PER_TOKEN, **extra)  # type: ignore
             except TypeError:
-                chunker = RecursiveChunking(chunk_size=size)  # type: ignore
+                chunker = RecursiveChunking(chunk_size=size * _CHARS_PER_TOKEN)  # type: ignore
         method = getattr(chunker, "split", None) or getattr(chunker, "chunk", None)
         if not callable(method):
             raise AttributeError("RecursiveChunking has no split/chunk method")
@@ -615,10 +733,7 @@ async def _resolve_urls_from_api(api: Dict[str, Any], limit: int = 20) -> List[s
     if not sitemap_url:
         return []
     filters = api.get("url_filters") or []
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(sitemap_url)
-        r.raise_for_status()
-        text = r.text
+    text = await get_fetcher().fetch_text(sitemap_url)
     root = ET.fromstring(text)
     ns = ""
     if root.tag.startswith("{"):
@@ -630,13 +745,109 @@ async def _resolve_urls_from_api(api: Dict[str, Any], limit: int = 20) -> List[s
     return urls[: min(limit, len(urls))]
 
 
+async def _chunk_for_preview_async(text: str, req: ExtractPreviewRequest, size: int, overlap: int, logs: List[str], tenant_id: Optional[str] = None) -> List[str]:
+    # Chunkers may block (semantic/agentic), so they run off the event loop.
+    # Agentic chunking makes LLM calls inside agno, so it takes an admission slot
+    if req.strategy == "agentic":
+        async with admission_slot(tenant_id or "default"):
+            return await asyncio.to_thread(_chunk_for_preview, text, req, size, overlap, logs, tenant_id)
+    return await asyncio.to_thread(_chunk_for_preview, text, req, size, overlap, logs, tenant_id)
+
+
+def _chunk_for_preview(text: str, req: ExtractPreviewRequest, size: int, overlap: int, logs: List[str], tenant_id: Optional[str] = None) -> List[str]:
+    strategy = req.strategy
+    if strategy == "fixed":
+        return fixed_chunk(text, size, overlap)
+    if strategy == "document":
+        return _chunk_document(text, logs)
+    if strategy == "semantic":
+        return _chunk_semantic(text, size, overlap, _model_for_mode(req.mode), logs, req.embedder, params=req.semantic_params)
+    if strategy == "agentic":
+        return _chunk_agentic(
+            text, size, overlap, _chunking_model(req.mode, tenant_id), logs, req.embedder,
+            params=req.agentic_params, tenant_id=tenant_id, use_cache=req.llm_cache,
+        )
+    if strategy == "recursive":
+        return _chunk_recursive(text, size, overlap, logs, params=req.recursive_params)
+    logs.append(f"unknown strategy {strategy}; using fixed")
+    return fixed_chunk(text, size, overlap)
+
+
+def _preview_chunks(url: str, pieces: List[str], req: ExtractPreviewRequest) -> List[Chunk]:
+    """Build Chunk models for one URL, applying per-URL chunk limit and text truncation"""
+    if req.max_chunks_per_url is not None:
+        pieces = pieces[: max(0, req.max_chunks_per_url)]
+    limit = req.max_chunk_chars
+    out: List[Chunk] = []
+    for i, piece in enumerate(pieces):
+        # Token estimates always reflect the full chunk, even when its text is truncated
+        truncated = limit is not None and len(piece) > limit
+        out.append(Chunk(
+            text=piece[: max(0, limit)] if truncated else piece,
+            url=url,
+            index=i,
+            tokens_est=simple_token_estimate(piece),
+            truncated=truncated,
+            metadata={
+                "strategy": req.strategy,
+                "approx": not get_tokenizer().exact,
+            } if req.include_metadata else None,
+        ))
+    return out
+
+
+def _dedup_pieces(deduper: Optional[ChunkDeduper], url: str, pieces: List[str]) -> tuple:
+    """(kept pieces, per-URL duplicate stats) for one URL's chunks"""
+    if deduper is None:
+        return pieces, {}
+    result = deduper.filter(pieces, url)
+    return result.kept, {
+        "duplicates": len(result.dropped),
+        "duplicate_tokens_est": sum(simple_token_estimate(p) for p, _ in result.dropped),
+    }
+
+
+def _preview_config(req: ExtractPreviewRequest, size: int, overlap: int, tenant_id: str) -> Dict[str, Any]:
+    # Echo chosen strategy params for UI reproducibility
+    strategy_params = None
+    if req.strategy == "agentic":
+        strategy_params = req.agentic_params or {}
+    elif req.strategy == "semantic":
+        strategy_params = req.semantic_params or {}
+    elif req.strategy == "recursive":
+        strategy_params = req.recursive_params or {}
+
+    return {
+        "mode": req.mode,
+        "model": _chunking_model(req.mode, tenant_id) if req.strategy == "agentic" else _model_for_mode(req.mode),
+        "strategy": req.strategy,
+        "effective_strategy": req.strategy,
+        "chunk_size": size,
+        "chunk_overlap": overlap,
+        "tokenizer": get_tokenizer().name,
+        "include_metadata": req.include_metadata,
+        "embedder": req.embedder,
+        "source": "urls" if req.urls else f"api:{req.api_id}",
+        "strategy_params": strategy_params,
+        "tenant_id": tenant_id,
+        "max_chunk_chars": req.max_chunk_chars,
+        "max_chunks_per_url": req.max_chunks_per_url,
+        "dedup": dedup_enabled(req.dedup),
+        "llm_cache": llm_cache.llm_cache_enabled(req.llm_cache) if req.strategy == "agentic" else False,
+    }
+
+
 @router.post("/preview", response_model=ExtractPreviewResponse)
-async def preview(req: ExtractPreviewRequest, x_tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID")):
+async def preview(
+    req: ExtractPreviewRequest,
+    x_tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID"),
+    accept: Optional[str] = Header(None),
+):
     t0 = monotonic()
 
     # Enforce defaults and bounds
-    size = max(1, min(req.chunk_size or 5000, 12000))
-    overlap = max(0, min(req.chunk_overlap or 300, 500))
+    size = max(1, min(req.chunk_size or 1250, 3000))
+    overlap = max(0, min(req.chunk_overlap or 75, 125))
 
     logs: List[str] = []
     # Tenant handling (recurring issue): use provided header or safe fallback
@@ -660,101 +871,154 @@ async def preview(req: ExtractPreviewRequest, x_tenant_id: Optional[str] = Heade
     else:
         raise HTTPException(status_code=400, detail="must provide urls or api_id")
 
-    # For MVP: non-fixed/document strategies fall back to fixed, but we record it.
-    effective_strategy = req.strategy
+    # Pagination over URLs: process one page of the resolved list per request
+    total_urls = len(urls)
+    offset = max(0, req.offset)
+    end = total_urls if req.limit is None else min(total_urls, offset + max(0, req.limit))
+    urls = urls[offset:end]
+    pagination = {
+        "offset": offset,
+        "limit": req.limit,
+        "total_urls": total_urls,
+        "returned_urls": len(urls),
+        "next_offset": end if end < total_urls else None,
+    }
+
+    if req.stream or "application/x-ndjson" in (accept or ""):
+        return StreamingResponse(
+            _stream_preview(req, urls, size, overlap, tenant_id, logs, pagination, t0),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     all_chunks: List[Chunk] = []
     per_url: Dict[str, Any] = {}
-
-    for url in urls:
-        try:
-            text = await fetch_text(url)
-            logs.append(f"fetched {len(text)} chars from {url}")
-        except Exception as e:
-            per_url[url] = {"error": str(e)}
-            logs.append(f"error fetching {url}: {e}")
+    totals_tokens = 0
+    deduper = ChunkDeduper(req.dedup_threshold) if dedup_enabled(req.dedup) else None
+
+    # Fetch concurrently (bounded by the shared fetcher), then chunk in order
+    fetched = await asyncio.gather(*(fetch_text(u) for u in urls), return_exceptions=True)
+    for url, text in zip(urls, fetched):
+        if isinstance(text, BaseException):
+            per_url[url] = {"error": str(text)}
+            logs.append(f"error fetching {url}: {text}")
             continue
+        logs.append(f"fetched {len(text)} chars from {url}")
 
-        pieces: List[str]
-        if effective_strategy == "fixed":
-            pieces = fixed_chunk(text, size, overlap)
-        elif effective_strategy == "document":
-            pieces = _chunk_document(text, logs)
-        elif effective_strategy == "semantic":
-            pieces = _chunk_semantic(text, size, overlap, _model_for_mode(req.mode), logs, req.embedder, params=req.semantic_params)
-        elif effective_strategy == "agentic":
-            pieces = _chunk_agentic(text, size, overlap, _model_for_mode(req.mode), logs, req.embedder, params=req.agentic_params)
-        elif effective_strategy == "recursive":
-            pieces = _chunk_recursive(text, size, overlap, logs, params=req.recursive_params)
-        else:
-            logs.append(f"unknown strategy {effective_strategy}; using fixed")
-            pieces = fixed_chunk(text, size, overlap)
-
-        url_chunks: List[Chunk] = []
-        for i, piece in enumerate(pieces):
-            ch = Chunk(
-                text=piece,
-                url=url,
-                index=i,
-                tokens_est=simple_token_estimate(piece),
-                metadata={
-                    "strategy": effective_strategy,
-                    "approx": True,
-                } if req.include_metadata else None,
-            )
-            url_chunks.append(ch)
-            all_chunks.append(ch)
+        pieces = await _chunk_for_preview_async(text, req, size, overlap, logs, tenant_id)
+        pieces, dup_stats = _dedup_pieces(deduper, url, pieces)
+        url_tokens = sum(simple_token_estimate(p) for p in pieces)
+        all_chunks.extend(_preview_chunks(url, pieces, req))
+        totals_tokens += url_tokens
 
         per_url[url] = {
-            "chunks": len(url_chunks),
-            "tokens_est": sum(c.tokens_est for c in url_chunks),
+            "chunks": len(pieces),
+            "tokens_est": url_tokens,
+            **dup_stats,
         }
 
-    totals_tokens = sum(c.tokens_est for c in all_chunks)
     totals = {
-        "chunks": len(all_chunks),
+        "chunks": sum(v.get("chunks", 0) for v in per_url.values()),
         "tokens_est": totals_tokens,
+        "duplicates": sum(v.get("duplicates", 0) for v in per_url.values()),
+        "duplicate_tokens_est": sum(v.get("duplicate_tokens_est", 0) for v in per_url.values()),
         "duration_ms": int((monotonic() - t0) * 1000),
+        "pagination": pagination,
     }
 
     # Cost estimate via model pricing
-    model_id = _model_for_mode(req.mode)
+    model_id = _chunking_model(req.mode, tenant_id) if req.strategy == "agentic" else _model_for_mode(req.mode)
     logs.append(f"model={model_id} embedder={req.embedder}")
     costs = _estimate_cost(tokens=totals_tokens, embed_tokens=0, model_id=model_id)
 
-    # Echo chosen strategy params for UI reproducibility
-    strategy_params = None
-    if req.strategy == "agentic":
-        strategy_params = req.agentic_params or {}
-    elif req.strategy == "semantic":
-        strategy_params = req.semantic_params or {}
-    elif req.strategy == "recursive":
-        strategy_params = req.recursive_params or {}
-
-    config = {
-        "mode": req.mode,
-        "model": model_id,
-        "strategy": req.strategy,
-        "effective_strategy": effective_strategy,
-        "chunk_size": size,
-        "chunk_overlap": overlap,
-        "include_metadata": req.include_metadata,
-        "embedder": req.embedder,
-        "source": "urls" if req.urls else f"api:{req.api_id}",
-        "strategy_params": strategy_params,
-        "tenant_id": tenant_id,
-    }
-
     return ExtractPreviewResponse(
         chunks=all_chunks,
         totals=totals,
         per_url=per_url,
-        config=config,
+        config=_preview_config(req, size, overlap, tenant_id),
         logs=logs,
         costs=costs,
     )
 
 
+async def _stream_preview(
+    req: ExtractPreviewRequest,
+    urls: List[str],
+    size: int,
+    overlap: int,
+    tenant_id: str,
+    logs: List[str],
+    pagination: Dict[str, Any],
+    t0: float,
+):
+    """NDJSON stream: one {"type": "url"} record per URL as soon as it is chunked
+    (completion order), then one {"type": "summary"} record."""
+    per_url: Dict[str, Any] = {}
+    totals_tokens = 0
+    first_ms: Optional[int] = None
+    # URLs complete out of order, so which copy of a duplicate is kept follows completion order
+    deduper = ChunkDeduper(req.dedup_threshold) if dedup_enabled(req.dedup) else None
+
+    async def _one(position: int, url: str):
+        try:
+            text = await fetch_text(url)
+        except Exception as e:
+            return position, url, None, e
+        url_logs: List[str] = [f"fetched {len(text)} chars from {url}"]
+        try:
+            pieces = await _chunk_for_preview_async(text, req, size, overlap, url_logs, tenant_id)
+        except AdmissionRejected as e:
+            return position, url, None, e
+        return position, url, pieces, url_logs
+
+    tasks = [asyncio.ensure_future(_one(i, u)) for i, u in enumerate(urls)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            position, url, pieces, extra = await fut
+            record: Dict[str, Any] = {"type": "url", "url": url, "position": pagination["offset"] + position}
+            if pieces is None:
+                per_url[url] = {"error": str(extra)}
+                logs.append(f"error fetching {url}: {extra}")
+                record["error"] = str(extra)
+            else:
+                logs.extend(extra)
+                pieces, dup_stats = _dedup_pieces(deduper, url, pieces)
+                url_tokens = sum(simple_token_estimate(p) for p in pieces)
+                totals_tokens += url_tokens
+                per_url[url] = {"chunks": len(pieces), "tokens_est": url_tokens, **dup_stats}
+                record.update(per_url[url])
+                record["chunks_returned"] = min(len(pieces), req.max_chunks_per_url) if req.max_chunks_per_url is not None else len(pieces)
+                record["items"] = [c.model_dump() for c in _preview_chunks(url, pieces, req)]
+            if first_ms is None:
+                first_ms = int((monotonic() - t0) * 1000)
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    finally:
+        # Client went away or the stream errored: stop outstanding fetches
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+    model_id = _chunking_model(req.mode, tenant_id) if req.strategy == "agentic" else _model_for_mode(req.mode)
+    logs.append(f"model={model_id} embedder={req.embedder}")
+    summary = {
+        "type": "summary",
+        "totals": {
+            "chunks": sum(v.get("chunks", 0) for v in per_url.values()),
+            "tokens_est": totals_tokens,
+            "duplicates": sum(v.get("duplicates", 0) for v in per_url.values()),
+            "duplicate_tokens_est": sum(v.get("duplicate_tokens_est", 0) for v in per_url.values()),
+            "duration_ms": int((monotonic() - t0) * 1000),
+            "first_record_ms": first_ms,
+            "pagination": pagination,
+        },
+        "per_url": per_url,
+        "config": _preview_config(req, size, overlap, tenant_id),
+        "logs": logs,
+        "costs": _estimate_cost(tokens=totals_tokens, embed_tokens=0, model_id=model_id),
+    }
+    yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+
 # ---- Recommendation endpoint ----
 def _analyze_text_features(text: str) -> Dict[str, Any]:
     lines = [ln.strip() for ln in text.split("\n") if ln.strip()]
@@ -782,8 +1046,8 @@ def _recommend_from_features(features: List[Dict[str, Any]], optimize_for: Optio
             "mode": "agentic",
             "strategy": "semantic",
             "embedder": "sentence-transformers",
-            "chunk_size": 1200,
-            "chunk_overlap": 150,
+            "chunk_size": 300,
+            "chunk_overlap": 40,
             "semantic_params": {"threshold": 0.55},
             "reasons": ["No sample available; using robust defaults"],
             "confidence": 0.6,
@@ -802,24 +1066,24 @@ def _recommend_from_features(features: List[Dict[str, Any]], optimize_for: Optio
         if optimize_for == "quality":
             mode = "agentic"
         reasons.append("Detected code/requests or frequent headings; semantic preserves coherence")
-        chunk_size = 1200
-        overlap = 150
+        chunk_size = 300
+        overlap = 40
         semantic_params = {"threshold": 0.55}
         confidence = 0.8
     elif avg_len < 220:
         strategy = "fixed"
         mode = "fast" if optimize_for != "quality" else "agentic"
         reasons.append("Short uniform paragraphs; fixed size is predictable and cheap")
-        chunk_size = 1000
-        overlap = 120
+        chunk_size = 250
+        overlap = 30
         semantic_params = None
         confidence = 0.7
     else:
         strategy = "semantic"
         mode = "agentic" if optimize_for == "quality" else "fast"
         reasons.append("Mixed paragraph lengths; semantic boundaries reduce fragmentation")
-        chunk_size = 1200
-        overlap = 150
+        chunk_size = 300
+        overlap = 40
         semantic_params = {"threshold": 0.55}
         confidence = 0.75
 
@@ -858,10 +1122,9 @@ async def recommend(req: RecommendRequest, x_tenant_id: Optional[str] = Header(N
     # Fetch and analyze
     features: List[Dict[str, Any]] = []
     tokens_total = 0
-    for u in sample_urls:
-        try:
-            text = await fetch_text(u)
-        except Exception:
+    fetched = await asyncio.gather(*(fetch_text(u) for u in sample_urls), return_exceptions=True)
+    for text in fetched:
+        if isinstance(text, BaseException):
             text = ""
         f = _analyze_text_features(text)
         features.append(f)
@@ -876,8 +1139,8 @@ async def recommend(req: RecommendRequest, x_tenant_id: Optional[str] = Header(N
         mode="fast",
         strategy="fixed",
         embedder="sentence-transformers",
-        chunk_size=1000,
-        chunk_overlap=120,
+        chunk_size=250,
+        chunk_overlap=30,
         semantic_params=None,
         reasons=["Predictable cost, no LLM chunking"],
         confidence=0.65,
@@ -887,8 +1150,8 @@ async def recommend(req: RecommendRequest, x_tenant_id: Optional[str] = Header(N
         mode="agentic",
         strategy="agentic",
         embedder="sentence-transformers",
-        chunk_size=1200,
-        chunk_overlap=150,
+        chunk_size=300,
+        chunk_overlap=40,
         semantic_params=None,
         reasons=["Code/tables/mixed content benefit from agentic boundaries"],
         confidence=0.72,
@@ -0,0 +1,62 @@
+"""
+Jobs API Routes
+===============
+
+Status, progress and cancellation of background jobs (pack processing, ...)
+queued for the current tenant. See app/services/job_queue.py.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from app.services.job_queue import ACTIVE_STATUSES, get_job_queue
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+def _require_tenant(x_tenant_id: Optional[str]):
+    if not x_tenant_id:
+        raise HTTPException(status_code=400, detail="Tenant not specified")
+    return x_tenant_id
+
+
+async def _tenant_job(job_id: str, tenant_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None or job.tenant_id != tenant_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/")
+async def list_jobs(
+    kind: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    limit: int = Query(50, ge=1, le=200),
+    x_tenant_id: str = Header(None),
+):
+    """Recent jobs of the tenant, newest first"""
+    tenant_id = _require_tenant(x_tenant_id)
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+    jobs = await asyncio.to_thread(
+        get_job_queue().list, tenant_id=tenant_id, kind=kind, statuses=statuses, limit=limit
+    )
+    return {"jobs": [j.to_dict() for j in jobs]}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, x_tenant_id: str = Header(None)):
+    """Status, attempts, progress, result and last error of a job"""
+    job = await _tenant_job(job_id, _require_tenant(x_tenant_id))
+    return job.to_dict()
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str, x_tenant_id: str = Header(None)):
+    """Cancel a queued job, or ask the worker to stop a running one"""
+    job = await _tenant_job(job_id, _require_tenant(x_tenant_id))
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    job = await asyncio.to_thread(get_job_queue().cancel, job_id)
+    return job.to_dict()
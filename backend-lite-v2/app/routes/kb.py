@@ -1,6 +1,8 @@
 import os
 import uuid
+import asyncio
 import hashlib
+import json
 import time
 from typing import Any, Dict, List, Optional, Literal
 from fastapi import APIRouter, HTTPException, Header
@@ -9,6 +11,11 @@ from sqlalchemy.orm import Session
 
 from ..db_core import SessionLocal
 from ..models_kiffs import KnowledgePack as KnowledgePackModel
+from ..services import lancedb_registry
+from ..services.incremental_index import text_hash
+from ..services.admission import admission_slot, priority_scope
+from ..services.dedup import ChunkDeduper, dedup_enabled
+from ..services.kb_indexer import KBIndexer, get_progress, reserve_progress, start_progress
 
 router = APIRouter(prefix="/api/kb", tags=["kb"]) 
 
@@ -27,6 +34,17 @@ except Exception:  # pragma: no cover
 # Legacy in-memory registry (will be phased out)
 _KB_META: Dict[str, Dict[str, Any]] = {}
 
+# Seed row that fixes the KB table schema; removed right after creation
+_KB_SEED_ROW = {
+    "id": "__init__",
+    "text": "__init__",
+    "url": "",
+    "content_hash": "",
+    "page_hash": "",
+    "chunk_index": 0,
+    "metadata_json": "{}",
+}
+
 
 def _require_tenant(x_tenant_id: Optional[str]) -> str:
     if not x_tenant_id:
@@ -72,13 +90,10 @@ async def create_kb(req: CreateKBRequest, x_tenant_id: Optional[str] = Header(No
     table_name = f"kb_{kb_id.replace('-', '_')}"
 
     if _HAS_LANCEDB:
-        os.makedirs(LANCEDB_DIR, exist_ok=True)
-        db: DB = lancedb.connect(LANCEDB_DIR)
-        if table_name not in [t.name for t in db.table_names()]:
-            db.create_table(table_name, data=[{"text": "__init__", "url": None, "metadata": {"init": True}}])
+        if not lancedb_registry.table_exists(LANCEDB_DIR, table_name):
+            tbl = lancedb_registry.create_table(LANCEDB_DIR, table_name, data=[_KB_SEED_ROW])
             # remove seed row right away
-            tbl = db.open_table(table_name)
-            tbl.delete("text == '__init__'")
+            tbl.delete("id == '__init__'")
 
     # Save to database instead of in-memory
     db_session: Session = SessionLocal()
@@ -186,28 +201,26 @@ async def ingest(kb_id: str, req: IngestRequest, x_tenant_id: Optional[str] = He
     if not _HAS_LANCEDB:
         raise HTTPException(status_code=400, detail="lancedb not installed on server")
 
-    db: DB = lancedb.connect(LANCEDB_DIR)
-    tbl = db.open_table(kb.table_name)  # type: ignore
-
-    rows = []
+    rows: Dict[str, Dict[str, Any]] = {}
     for it in req.items:
         cid = hashlib.sha1((it.url or "") .encode("utf-8") + b"|" + it.text.encode("utf-8")).hexdigest()
-        rows.append({
+        rows[cid] = {
             "id": cid,
             "text": it.text,
-            "url": it.url,
-            "metadata": it.metadata or {},
-        })
-    if rows:
-        # delete duplicates by id then add
-        for r in rows:
-            try:
-                tbl.delete(f"id == '{r['id']}'")
-            except Exception:
-                pass
-        tbl.add(rows)
+            "url": it.url or "",
+            "content_hash": text_hash(it.text),
+            "page_hash": "",
+            "chunk_index": 0,
+            "metadata_json": json.dumps(it.metadata or {}, sort_keys=True),
+        }
+    if not rows:
+        return {"ok": True, "ingested": 0, "unchanged": 0}
 
-    return {"ok": True, "ingested": len(rows)}
+    # Ids are content-derived: only rows not stored yet (or with new metadata) are embedded and written
+    indexer = KBIndexer(LANCEDB_DIR, kb.table_name, _embedder_for(kb.embedder, []))  # type: ignore
+    progress = await indexer.index_rows(list(rows.values()))
+
+    return {"ok": True, "ingested": len(rows) - progress["chunks_unchanged"], "unchanged": progress["chunks_unchanged"]}
 
 
 # ----- Index via extraction pipeline -----
@@ -215,6 +228,7 @@ async def ingest(kb_id: str, req: IngestRequest, x_tenant_id: Optional[str] = He
 try:
     from .extract import (
         fetch_text,
+        fetch_page,
         fixed_chunk,
         _chunk_semantic,
         _chunk_agentic,
@@ -225,11 +239,62 @@ try:
         simple_token_estimate,
         _resolve_urls_from_api,
         _load_api,
+        _build_embedder,
     )
 except Exception:
     fetch_text = None  # type: ignore
+    fetch_page = None  # type: ignore
     _resolve_urls_from_api = None  # type: ignore
     _load_api = None  # type: ignore
+    _build_embedder = None  # type: ignore
+
+def _embedder_for(name: Optional[str], logs: List[str], usage: Optional[Dict[str, int]] = None):
+    """Async batch embedding function for the KB indexer.
+
+    sentence-transformers encodes whole batches with the shared local model;
+    other providers go through their AGNO embedder one text at a time. Both
+    go through the shared embedding cache (services/semantic_chunker.py).
+    """
+    from ..services.semantic_chunker import embed_texts
+
+    choice = (name or "sentence-transformers").lower()
+
+    if choice == "sentence-transformers":
+        from ..services.embedder_cache import get_model_key, get_raw_model
+
+        async def _embed_local(texts: List[str]) -> List[List[float]]:
+            model = await asyncio.to_thread(get_raw_model)
+            if model is None:
+                raise RuntimeError("sentence-transformers model unavailable")
+            # Shared with semantic chunking: texts embedded there (or by an earlier
+            # preview/index run) are not encoded again
+            encode = lambda batch: model.encode(batch, batch_size=len(batch), convert_to_numpy=True)  # noqa: E731
+            vectors = await asyncio.to_thread(embed_texts, texts, encode, get_model_key())
+            return vectors.tolist()
+
+        return _embed_local
+
+    # Built on first use, then shared by every batch of the request
+    built: Dict[str, Any] = {}
+
+    async def _embed_remote(texts: List[str]) -> List[List[float]]:
+        if "embedder" not in built:
+            built["embedder"] = await asyncio.to_thread(_build_embedder, choice, logs) if _build_embedder is not None else None
+        embedder = built["embedder"]
+        if embedder is None:
+            raise RuntimeError(f"embedder '{choice}' unavailable")
+
+        def _encode(batch: List[str]) -> List[List[float]]:
+            # Only texts missing from the embedding cache are sent (and billed)
+            if usage is not None:
+                usage["n"] = usage.get("n", 0) + sum(simple_token_estimate(t) for t in batch)  # type: ignore
+            return [embedder.get_embedding(t) for t in batch]
+
+        vectors = await asyncio.to_thread(embed_texts, texts, _encode, choice)
+        return vectors.tolist()
+
+    return _embed_remote
+
 
 # Prefer URLs discovered and persisted by the admin gallery flow
 try:
@@ -245,16 +310,31 @@ class IndexRequest(BaseModel):
     mode: Literal["fast", "agentic"] = "fast"
     strategy: Literal["fixed", "semantic", "agentic", "recursive", "document"] = "fixed"
     embedder: Optional[str] = "sentence-transformers"
-    chunk_size: int = 1000
-    chunk_overlap: int = 120
+    # Tokens of the shared tokenizer (see services/tokenizers.py)
+    chunk_size: int = 250
+    chunk_overlap: int = 30
     semantic_params: Optional[Dict[str, Any]] = None
+    agentic_params: Optional[Dict[str, Any]] = None
+    recursive_params: Optional[Dict[str, Any]] = None
     budget_cap_usd: float = 5.0
+    # Texts per embedding call (defaults to KIFF_KB_EMBED_BATCH)
+    embed_batch_size: Optional[int] = None
+    # From POST /api/kb/index/progress; poll GET /api/kb/index/progress/{progress_id}
+    # while the request runs
+    progress_id: Optional[str] = None
+    # Skip pages the crawl cache reports unchanged since the previous crawl.
+    # Only safe when this KB already holds the chunks from that crawl.
+    skip_unchanged: bool = False
+    # Drop near-duplicate chunks (MinHash) across this run's pages before embedding;
+    # None follows KIFF_DEDUP. dedup_threshold is the Jaccard similarity (default 0.85)
+    dedup: Optional[bool] = None
+    dedup_threshold: Optional[float] = None
 
 
 @router.post("/index")
 async def index_into_kb(req: IndexRequest, x_tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID")):
     tenant_id = _require_tenant(x_tenant_id)
-    if fetch_text is None:
+    if fetch_page is None:
         raise HTTPException(status_code=500, detail="extract pipeline unavailable")
 
     # Get KB metadata from database
@@ -272,15 +352,17 @@ async def index_into_kb(req: IndexRequest, x_tenant_id: Optional[str] = Header(N
 
     # Resolve URLs
     urls: List[str] = []
+    lastmods: Dict[str, Optional[str]] = {}
     if req.urls:
         urls = req.urls[:50]
     elif req.api_id:
         # 1) Try admin gallery persisted URLs (UUID-based api_service_id)
         if list_doc_urls is not None:
             try:
-                persisted = [d.get("url") for d in list_doc_urls() if d.get("api_service_id") == req.api_id and d.get("url")]
-                if persisted:
-                    urls = persisted[:50]
+                docs = [d for d in list_doc_urls() if d.get("api_service_id") == req.api_id and d.get("url")]
+                if docs:
+                    urls = [d["url"] for d in docs][:50]
+                    lastmods = {d["url"]: d.get("lastmod") for d in docs}
             except Exception:
                 pass
         # 2) Fallback to legacy crawler based on apis.json slugs
@@ -292,67 +374,117 @@ async def index_into_kb(req: IndexRequest, x_tenant_id: Optional[str] = Header(N
     if not urls:
         raise HTTPException(status_code=400, detail="must provide urls or api_id")
 
-    # Open table
     if not _HAS_LANCEDB:
         raise HTTPException(status_code=400, detail="lancedb not installed on server")
-    db: DB = lancedb.connect(LANCEDB_DIR)
-    tbl = db.open_table(kb.table_name)  # type: ignore
 
-    # Chunk + ingest
     logs: List[str] = []
-    total_chunks = 0
     total_tokens = 0
     model_id = _model_for_mode(req.mode)
 
-    for url in urls:
-        try:
-            text = await fetch_text(url)  # type: ignore
-        except Exception as e:
-            logs.append(f"error: fetch failed {url}: {e}")
-            continue
-        pieces: List[str]
+    def _chunk(text: str) -> List[str]:
         if req.strategy == "fixed":
-            pieces = fixed_chunk(text, req.chunk_size, req.chunk_overlap)  # type: ignore
-        elif req.strategy == "semantic":
-            pieces = _chunk_semantic(text, req.chunk_size, req.chunk_overlap, model_id, logs, req.embedder, params=req.semantic_params)  # type: ignore
-        elif req.strategy == "agentic":
-            pieces = _chunk_agentic(text, req.chunk_size, req.chunk_overlap, model_id, logs, req.embedder)  # type: ignore
-        elif req.strategy == "recursive":
-            pieces = _chunk_recursive(text, req.chunk_size, req.chunk_overlap, model_id, logs, req.embedder)  # type: ignore
-        else:
-            pieces = _chunk_document(text, req.chunk_size, req.chunk_overlap, model_id, logs, req.embedder)  # type: ignore
-
-        rows = []
-        for i, p in enumerate(pieces):
-            cid = hashlib.sha1((url + "|" + str(i) + "|" + str(len(p))).encode("utf-8") + p.encode("utf-8")).hexdigest()
-            rows.append({
-                "id": cid,
-                "text": p,
-                "url": url,
-                "metadata": {
-                    "strategy": req.strategy,
-                    "mode": req.mode,
-                    "idx": i,
-                },
-            })
-            total_tokens += simple_token_estimate(p)  # type: ignore
-        total_chunks += len(rows)
-        # upsert
-        for r in rows:
-            try:
-                tbl.delete(f"id == '{r['id']}'")
-            except Exception:
-                pass
-        if rows:
-            tbl.add(rows)
+            return fixed_chunk(text, req.chunk_size, req.chunk_overlap)  # type: ignore
+        if req.strategy == "semantic":
+            return _chunk_semantic(text, req.chunk_size, req.chunk_overlap, model_id, logs, req.embedder, params=req.semantic_params)  # type: ignore
+        if req.strategy == "recursive":
+            return _chunk_recursive(text, req.chunk_size, req.chunk_overlap, logs, params=req.recursive_params)  # type: ignore
+        return _chunk_document(text, logs)  # type: ignore
+
+    async def _chunk_agentic_batch(text: str) -> List[str]:
+        # Bulk indexing makes LLM calls inside agno: queue them behind interactive chat
+        with priority_scope("batch"):
+            async with admission_slot(tenant_id):
+                return await asyncio.to_thread(
+                    _chunk_agentic, text, req.chunk_size, req.chunk_overlap, model_id, logs, req.embedder, params=req.agentic_params,  # type: ignore
+                )
+
+    def _count_tokens(url: str, pieces: List[str]) -> None:
+        nonlocal total_tokens
+        total_tokens += sum(simple_token_estimate(p) for p in pieces)  # type: ignore
+
+    deduper = ChunkDeduper(req.dedup_threshold) if dedup_enabled(req.dedup) else None
+    chunk_params = {
+        "strategy": req.strategy,
+        "mode": req.mode,
+        "embedder": req.embedder,
+        "chunk_size": req.chunk_size,
+        "chunk_overlap": req.chunk_overlap,
+        "params": json.dumps(
+            {"semantic": req.semantic_params, "agentic": req.agentic_params, "recursive": req.recursive_params},
+            sort_keys=True,
+            default=str,
+        ),
+        # Toggling dedup changes which chunks a page keeps, so pages are re-chunked
+        "dedup": deduper.threshold if deduper else None,
+    }
 
-    costs = _estimate_cost(tokens=total_tokens, embed_tokens=0, model_id=model_id)
+    # Streaming pipeline: fetch (crawl cache) -> chunk -> batched embedding -> bulk upsert
+    embed_tokens = {"n": 0}
+    try:
+        run_progress = start_progress(tenant_id, req.progress_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="progress not found")
+    indexer = KBIndexer(
+        LANCEDB_DIR,
+        kb.table_name,  # type: ignore
+        _embedder_for(req.embedder, logs, embed_tokens),
+        progress=run_progress,
+        embed_batch_size=req.embed_batch_size,
+        dedup=deduper,
+    )
+    try:
+        progress = await indexer.index_pages(
+            urls,
+            lambda u: fetch_page(u, lastmods.get(u)),  # type: ignore
+            _chunk_agentic_batch if req.strategy == "agentic" else _chunk,
+            chunk_params,
+            skip_unchanged=req.skip_unchanged,
+            metadata={"strategy": req.strategy, "mode": req.mode},
+            logs=logs,
+            on_chunks=_count_tokens,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"indexing failed: {e}")
+
+    costs = _estimate_cost(tokens=total_tokens, embed_tokens=embed_tokens["n"], model_id=model_id)
     if costs.get("est_usd", 0.0) > req.budget_cap_usd:
         logs.append(f"warning: estimated cost {costs['est_usd']:.4f} exceeded cap {req.budget_cap_usd:.4f}")
 
     return {
         "kb_id": req.kb_id,
-        "indexed": {"urls": len(urls), "chunks": total_chunks, "tokens_est": total_tokens},
+        "indexed": {
+            "urls": len(urls),
+            "not_modified_pages": progress["pages_not_modified"],
+            "unchanged_pages": progress["pages_unchanged"],
+            "skipped_unchanged": req.skip_unchanged,
+            "failed_pages": progress["pages_failed"],
+            "chunks": progress["chunks_total"],
+            "embedded": progress["chunks_embedded"],
+            "reused_vectors": progress["chunks_reused"],
+            "unchanged_chunks": progress["chunks_unchanged"],
+            "duplicate_chunks": progress["chunks_duplicate"],
+            "deleted": progress["rows_deleted"],
+            "tokens_est": total_tokens,
+        },
+        "progress": progress,
         "costs": costs,
         "logs": logs,
     }
+
+
+@router.post("/index/progress")
+async def create_index_progress(x_tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID")):
+    """Reserve a progress id to pass as IndexRequest.progress_id and poll while indexing runs"""
+    tenant_id = _require_tenant(x_tenant_id)
+    return {"progress_id": reserve_progress(tenant_id).progress_id}
+
+
+@router.get("/index/progress/{progress_id}")
+async def index_progress(progress_id: str, x_tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID")):
+    tenant_id = _require_tenant(x_tenant_id)
+    progress = get_progress(progress_id, tenant_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="progress not found")
+    return progress
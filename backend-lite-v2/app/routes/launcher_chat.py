@@ -1,11 +1,13 @@
 from __future__ import annotations
 import os
+import time
 import uuid
 import datetime as dt
 import json
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.background import BackgroundTask
 from starlette.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -13,6 +15,14 @@ from sqlalchemy.orm import Session
 from ..db_core import SessionLocal
 from ..models_kiffs import Kiff, ConversationMessage, KiffChatSession
 from ..services.launcher_agent import get_launcher_agent, AgentRunResult
+from ..services.model_router import route_model
+from ..services.context_assembler import assemble_context
+from ..services.conversation_summary import maybe_schedule_summary, prompt_history
+from ..services.launcher_prompts import STREAM_GUIDANCE, turn_prompt_prefix, turn_prompt_suffix
+from ..services.tokenizers import count_tokens
+from ..services.admission import acquire_ticket, release_after, release_ticket
+from ..services.turn_cancel import cancellable_stream, start_turn, stop_turns
+from ..observability import SessionContext, record_partial_usage
 from ..util.preview_store import PreviewStore
 from ..util.sandbox_e2b import E2BProvider, E2BUnavailable
 
@@ -57,6 +67,8 @@ class SendMessageResponse(BaseModel):
     kiff_update: Optional[Dict[str, Any]] = None
     relevant_context: Optional[List[str]] = None
     session_id: str
+    # Token budget, usage and the history turns/files left out of the prompt
+    context_report: Optional[Dict[str, Any]] = None
 
 
 class LoadSessionRequest(BaseModel):
@@ -196,6 +208,9 @@ async def send_message(req: SendMessageRequest, request: Request, db: Session =
             pass
 
     # Prepare enhanced message and run agent with session context
+    if not effective_model_id:
+        # No explicit choice for this session: latency-aware routing, sticky per session
+        effective_model_id = route_model("chat", session_id, tenant_id=tenant_id)
     agent = get_launcher_agent(session_id=session_id, model_id=effective_model_id)
     # Extract selected packs from agent_state
     selected_packs: List[str] = []
@@ -223,26 +238,21 @@ async def send_message(req: SendMessageRequest, request: Request, db: Session =
     except Exception:
         pass
 
-    # Prepare enhanced message with project files context
-    enhanced_message = req.message
-    if req.project_files and len(req.project_files) > 0:
-        files_context = "\n\n## Current Project Files:\n"
-        for file in req.project_files[:10]:  # Limit to first 10 files to avoid token limit
-            files_context += f"\n**{file.path}** ({file.language or 'text'}):\n```{file.language or ''}\n"
-            # Truncate file content if too long
-            content = file.content[:2000] if len(file.content) > 2000 else file.content
-            files_context += content + ("\n... [truncated]" if len(file.content) > 2000 else "")
-            files_context += "\n```\n"
-        
-        enhanced_message = f"{req.message}{files_context}"
+    # Once the session has a rolling summary, the prompt gets it plus the
+    # turns after its watermark instead of the full client history
+    summary_text, history = prompt_history(session_id, tenant_id, agent_state, [m.dict() for m in req.chat_history])
 
+    # Project files go to the agent's context assembler, which ranks them
+    # with the chat history against the model's token budget
     run: AgentRunResult = await agent.run(
-        message=enhanced_message,
-        chat_history=[m.dict() for m in req.chat_history],
+        message=req.message,
+        chat_history=history,
         tenant_id=tenant_id,
         kiff_id=kiff_id or "",
         selected_packs=req.selected_packs or selected_packs,
         user_id=req.user_id,
+        project_files=[f.dict() for f in (req.project_files or [])],
+        conversation_summary=summary_text,
     )
 
     # Persist conversation messages using a fresh session
@@ -296,6 +306,8 @@ async def send_message(req: SendMessageRequest, request: Request, db: Session =
                     KiffChatSession.updated_at: now,
                 })
             _s2.commit()
+        # Fold older turns into the session summary once history is long enough
+        maybe_schedule_summary(session_id, tenant_id, effective_model_id, user_id=req.user_id)
     except Exception:
         # non-fatal persistence
         pass
@@ -306,6 +318,7 @@ async def send_message(req: SendMessageRequest, request: Request, db: Session =
         kiff_update=run.kiff_update,
         relevant_context=run.relevant_context,
         session_id=session_id or "",
+        context_report=run.context_report,
     )
 
 
@@ -381,6 +394,9 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
             effective_model_id = (state0 or {}).get("model_id")
         except Exception:
             effective_model_id = None
+    if not effective_model_id:
+        # No explicit choice for this session: latency-aware routing, sticky per session
+        effective_model_id = route_model("chat", session_id, tenant_id=tenant_id)
     agent = get_launcher_agent(session_id=session_id, model_id=effective_model_id)
 
     # Extract selected packs from session agent_state
@@ -396,34 +412,19 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
     except Exception:
         selected_packs = []
 
-    # Build prompt similarly to LauncherAgent.run
-    context_lines = []
-    for m in req.chat_history[-10:]:
-        role = getattr(m, "role", None) or (isinstance(m, dict) and m.get("role")) or "user"
-        content = getattr(m, "content", None) or (isinstance(m, dict) and m.get("content")) or ""
-        context_lines.append(f"{role.upper()}: {content}")
-    context_text = "\n".join(context_lines)
-    
-    # Add project files context if available
-    files_context = ""
-    if req.project_files and len(req.project_files) > 0:
-        files_context = "\n\n## Current Project Files:\n"
-        for file in req.project_files[:8]:  # Limit files for streaming to avoid token limit
-            files_context += f"\n**{file.path}** ({file.language or 'text'}):\n```{file.language or ''}\n"
-            # More aggressive truncation for streaming
-            content = file.content[:1500] if len(file.content) > 1500 else file.content
-            files_context += content + ("\n... [truncated]" if len(file.content) > 1500 else "")
-            files_context += "\n```\n"
-        files_context += "\nWhen proposing changes, reference the existing files and provide complete updated file contents.\n"
-    
-    prompt = (
-        f"Tenant: {tenant_id}\nKiff: {kiff_id}\n"
-        f"Selected Packs: {', '.join(selected_packs or [])}\n"
-        "You are assisting the user to define and iteratively build a 'kiff' (project).\n"
-        "Ask clarifying questions when needed and propose concrete file additions or changes.\n"
-        "When knowledge is present, cite patterns; otherwise proceed with best practices.\n\n"
-        f"Chat so far:\n{context_text}\n\nUser: {req.message}{files_context}"
+    # Build prompt similarly to LauncherAgent.run: a stable prefix the provider
+    # can cache across turns, then history turns and project files ranked
+    # against the message and packed under the model's budget
+    summary_text, history = prompt_history(session_id, tenant_id, agent_state, [m.dict() for m in req.chat_history])
+    prefix = turn_prompt_prefix(STREAM_GUIDANCE, tenant_id, kiff_id or "", selected_packs, summary_text)
+    context = assemble_context(
+        req.message,
+        model=effective_model_id,
+        history=history,
+        files=[f.dict() for f in (req.project_files or [])],
+        reserved_tokens=count_tokens(prefix + turn_prompt_suffix(req.message), effective_model_id),
     )
+    prompt = prefix + turn_prompt_suffix(req.message, context.history_text(), context.files_text())
 
     # Set tenant/pack context for tools and knowledge
     try:
@@ -450,6 +451,7 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
 
     async def event_generator():
         """Yield SSE data lines while accumulating final content to persist."""
+        started = time.perf_counter()
         final_content_parts: List[str] = []
         final_tool_calls: List[Dict[str, Any]] = []
         ended = False
@@ -457,6 +459,7 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
         try:
             yield "event: message\n"
             yield f"data: {json.dumps({'type': 'SessionStarted', 'session_id': session_id, 'kiff_id': kiff_id})}\n\n"
+            yield f"data: {json.dumps({'type': 'ContextAssembled', **context.report()})}\n\n"
         except Exception:
             # Non-fatal; continue streaming
             pass
@@ -633,6 +636,29 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
             except Exception:
                 pass
 
+            if turn.cancelled:
+                # The provider never reports usage for an aborted stream: record what it consumed so far
+                try:
+                    record_partial_usage(
+                        session_ctx=SessionContext(
+                            tenant_id=tenant_id,
+                            user_id=req.user_id,
+                            workspace_id=None,
+                            session_id=session_id,
+                            run_id=turn.turn_id,
+                            step_id=f"step_{uuid.uuid4().hex[:12]}",
+                            agent_name="Kiff Launcher",
+                        ),
+                        provider=(effective_model_id.split("/", 1)[0] if "/" in effective_model_id else "groq").lower(),
+                        model=effective_model_id,
+                        messages=[{"role": "system", "content": prefix}, {"role": "user", "content": prompt[len(prefix):]}],
+                        completion_text="".join(final_content_parts),
+                        latency_ms=int((time.perf_counter() - started) * 1000),
+                        reason=turn.reason or "cancelled",
+                    )
+                except Exception as _e:
+                    print(f"[LAUNCHER_CHAT] partial usage not recorded: {_e}")
+
             # Persist messages if we produced any output (use a fresh session to avoid long-held locks)
             try:
                 final_text = "".join(final_content_parts).strip()
@@ -686,6 +712,7 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
                                 KiffChatSession.updated_at: now,
                             })
                         _s2.commit()
+                    maybe_schedule_summary(session_id, tenant_id, effective_model_id, user_id=req.user_id)
             except Exception:
                 # Do not break the stream termination on persistence errors
                 pass
@@ -703,7 +730,39 @@ async def stream_message(req: SendMessageRequest, request: Request, db: Session
             headers["Access-Control-Allow-Credentials"] = "true"
     except Exception:
         pass
-    return StreamingResponse(event_generator(), headers=headers, media_type="text/event-stream")
+    # Admission before the response starts, so backpressure is a 429; the slot
+    # is held for the whole stream (the background task covers a stream that never starts)
+    ticket = await acquire_ticket(tenant_id)
+    # A disconnect or /stop aborts the agent run and kills the session's sandbox execs
+    turn = start_turn("launcher", tenant_id, session_id, hooks=[lambda: _cancel_sandbox_execs(session_id)])
+    return StreamingResponse(
+        release_after(cancellable_stream(event_generator(), request, turn), ticket),
+        headers=headers,
+        media_type="text/event-stream",
+        background=BackgroundTask(release_ticket, ticket),
+    )
+
+
+def _cancel_sandbox_execs(session_id: str) -> None:
+    try:
+        from ..services.sandbox import sandbox_manager
+
+        killed = sandbox_manager.cancel_session(session_id)
+        if killed:
+            print(f"[LAUNCHER_CHAT] session={session_id} killed {killed} sandbox exec(s)")
+    except Exception:
+        pass
+
+
+class StopStreamRequest(BaseModel):
+    session_id: str
+
+
+@router.post("/stop")
+async def stop_stream(req: StopStreamRequest, request: Request):
+    """Stop the session's running streamed turn(s) (stop button)."""
+    tenant_id = _tenant_id_from_request(request)
+    return {"session_id": req.session_id, "cancelled": stop_turns(tenant_id, req.session_id, kind="launcher")}
 
 
 @router.post("/proposals/approve")
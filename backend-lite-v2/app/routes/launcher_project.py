@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import os
 import uuid
 import datetime as dt
@@ -12,6 +13,8 @@ from sqlalchemy.orm import Session
 from ..db_core import SessionLocal
 from ..models_kiffs import Kiff, KiffChatSession, ConversationMessage
 from ..services.launcher_agent import LauncherAgent
+from ..services import llm_cache
+from ..services.model_router import route_model
 
 # Optional imports for AGNO
 try:
@@ -35,6 +38,8 @@ class GenerateRequest(BaseModel):
     user_id: Optional[str] = None
     kiff_id: Optional[str] = None
     model_id: Optional[str] = None
+    # Reuse a previous generation for the same idea/packs/model (None follows KIFF_LLM_CACHE)
+    llm_cache: Optional[bool] = None
 
 
 class FileSpec(BaseModel):
@@ -72,7 +77,7 @@ def _tenant_id_from_request(request: Request) -> str:
 
 # --- Helpers ---
 
-async def _generate_project_files(idea: str, packs: List[str], tenant_id: str, model_id: Optional[str], session_id: str, kiff_id: str, user_id: Optional[str]) -> tuple[List[Dict[str, str]], str]:
+async def _generate_project_files(idea: str, packs: List[str], tenant_id: str, model_id: Optional[str], session_id: str, kiff_id: str, user_id: Optional[str], use_cache: Optional[bool] = None) -> tuple[List[Dict[str, str]], str]:
     """Generate project files using the shared LauncherAgent based on user's idea and selected packs."""
     if not _HAS_AGNO:
         # Fallback to minimal scaffold when AGNO is unavailable (local/dev)
@@ -85,7 +90,7 @@ async def _generate_project_files(idea: str, packs: List[str], tenant_id: str, m
         return files, agent_response
 
     # Use the unified LauncherAgent to ensure the same model/tools/knowledge as chat
-    launcher = LauncherAgent(session_id=session_id, model_id=model_id)
+    launcher = LauncherAgent(session_id=session_id, model_id=model_id or route_model("chat", session_id, tenant_id=tenant_id))
 
     # Prepare context about selected packs
     pack_context = ""
@@ -105,16 +110,30 @@ Generate all necessary files with complete, working code. Respond with a JSON ob
 
 Make sure the project is complete and runnable. Include proper dependencies, configuration files, and documentation."""
 
+    use_cache = llm_cache.llm_cache_enabled(use_cache)
+    cache_args = (
+        "launcher_project.generate",
+        launcher.model_id,
+        [{"role": "user", "content": prompt}],
+        {"packs": sorted(packs)},
+    )
+
     try:
-        result = await launcher.run(
-            message=prompt,
-            chat_history=[],
-            tenant_id=tenant_id,
-            kiff_id=kiff_id,
-            selected_packs=packs,
-            user_id=user_id,
-        )
-        response_text = (result.content if hasattr(result, "content") else str(result) or "").strip()
+        cached = await asyncio.to_thread(
+            llm_cache.lookup, tenant_id, *cache_args, agent_name="launcher_project"
+        ) if use_cache else None
+        if cached is not None:
+            response_text = cached
+        else:
+            result = await launcher.run(
+                message=prompt,
+                chat_history=[],
+                tenant_id=tenant_id,
+                kiff_id=kiff_id,
+                selected_packs=packs,
+                user_id=user_id,
+            )
+            response_text = (result.content if hasattr(result, "content") else str(result) or "").strip()
 
         # Parse JSON response robustly
         def _extract_json_block(text: str) -> Optional[dict]:
@@ -144,6 +163,8 @@ Make sure the project is complete and runnable. Include proper dependencies, con
         parsed = _extract_json_block(response_text)
         if parsed and isinstance(parsed.get('files'), list):
             files = parsed['files']
+            if use_cache and cached is None:
+                await asyncio.to_thread(llm_cache.store, tenant_id, *cache_args[:3], response_text, cache_args[3])
             file_list = [f"- {f['path']}" for f in files[:10]]
             agent_response = (
                 f"I've generated a complete project for your idea: \"{idea}\"\n\n"
@@ -363,6 +384,7 @@ async def generate_project(req: GenerateRequest, request: Request, db: Session =
         session_id=session_id,
         kiff_id=kiff_id,
         user_id=req.user_id,
+        use_cache=req.llm_cache,
     )
 
     # Store the initial conversation in the database
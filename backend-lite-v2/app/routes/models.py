@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, AnyUrl
 from typing import List, Optional, Dict, Any
 from enum import Enum
@@ -10,6 +10,8 @@ from sqlalchemy.orm import Session
 
 from ..db_core import SessionLocal
 from ..models_kiffs import Model as ModelDB
+from ..services.model_router import get_model_router
+from ..util.admin_guard import require_admin
 
 router = APIRouter(prefix="/api/models", tags=["models"]) 
 
@@ -87,6 +89,18 @@ async def list_models():
         db.close()
 
 
+@router.get("/routing/status")
+async def routing_status(request: Request, task: Optional[str] = None, limit: int = 100):
+    """Rolling latency/error stats per task class and the latest routing decisions (admin only:
+    the decision log spans every tenant)"""
+    require_admin(request)
+    router_ = get_model_router()
+    return {
+        "tasks": router_.snapshot(),
+        "decisions": router_.decisions(limit=max(1, min(limit, 500)), task=task),
+    }
+
+
 @router.get("/{model_id}", response_model=ModelItem)
 async def get_model(model_id: str):
     db: Session = SessionLocal()
@@ -6,7 +6,7 @@ API endpoints for managing tenant-wide kiff packs including creation,
 retrieval, rating, and administrative functions.
 """
 
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks, Header
+from fastapi import APIRouter, HTTPException, Query, Header
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_, desc, asc
 from typing import List, Optional, Dict, Any
@@ -16,8 +16,8 @@ import os
 
 from app.db_core import SessionLocal
 from app.models.kiff_packs import KiffPack, PackUsage, PackRating, PackRequest
-from app.services.pack_processor import PackProcessor
-from app.services.vector_storage import VectorStorageService
+from app.services.job_queue import enqueue_job
+from app.services.vector_storage import get_vector_storage_service
 
 router = APIRouter(prefix="/api/packs", tags=["kiff-packs"])
 
@@ -148,7 +148,6 @@ async def get_pack_categories(
 @router.post("/create")
 async def create_kiff_pack(
     pack_data: dict,
-    background_tasks: BackgroundTasks,
     x_tenant_id: str = Header(None)
 ):
     """Create a new kiff pack"""
@@ -195,15 +194,12 @@ async def create_kiff_pack(
         db.commit()
         db.refresh(pack)
         
-        # Process pack content in background
-        background_tasks.add_task(
-            process_pack_content,
-            pack.id,
-            tenant_id
-        )
+        # Process pack content on the job queue
+        job = await enqueue_pack_processing(pack.id, tenant_id)
         
         return {
             "pack_id": pack.id,
+            "job_id": job.id,
             "message": "Pack created successfully. Processing API documentation...",
             "status": "processing"
         }
@@ -221,7 +217,6 @@ async def create_kiff_pack(
 async def add_pack_url(
     pack_id: str,
     payload: dict,
-    background_tasks: BackgroundTasks,
     x_tenant_id: str = Header(None)
 ):
     """Add an API/documentation URL to an existing pack and trigger reprocessing.
@@ -272,10 +267,11 @@ async def add_pack_url(
         db.refresh(pack)
 
         # Trigger background processing
-        background_tasks.add_task(process_pack_content, pack.id, tenant_id)
+        job = await enqueue_pack_processing(pack.id, tenant_id)
 
         return {
             "pack_id": pack.id,
+            "job_id": job.id,
             "message": "URL(s) added. Reprocessing started.",
             "status": pack.processing_status,
             "documentation_urls": pack.documentation_urls,
@@ -292,7 +288,7 @@ async def add_pack_url(
 @router.post("/{pack_id}/reprocess")
 async def reprocess_pack(
     pack_id: str,
-    background_tasks: BackgroundTasks,
+    llm_cache: Optional[bool] = Query(None, description="Reuse cached LLM responses for unchanged prompts (default: KIFF_LLM_CACHE)"),
     x_tenant_id: str = Header(None)
 ):
     """Explicitly trigger reprocessing of a pack's content."""
@@ -310,9 +306,9 @@ async def reprocess_pack(
         db.commit()
         db.refresh(pack)
 
-        background_tasks.add_task(process_pack_content, pack.id, tenant_id)
+        job = await enqueue_pack_processing(pack.id, tenant_id, llm_cache=llm_cache)
 
-        return {"pack_id": pack.id, "status": pack.processing_status, "message": "Reprocessing started"}
+        return {"pack_id": pack.id, "job_id": job.id, "status": pack.processing_status, "message": "Reprocessing started"}
     except HTTPException:
         raise
     except Exception as e:
@@ -405,6 +401,7 @@ async def get_pack_status(
             "display_name": pack.display_name,
             "processing_status": pack.processing_status,
             "processing_error": pack.processing_error,
+            "processing_stats": pack.processing_stats or {},
             "updated_at": pack.updated_at.isoformat() if pack.updated_at else None,
         }
     finally:
@@ -537,7 +534,7 @@ async def suggest_packs(
     try:
         try:
             # Use vector similarity search if available
-            vector_service = VectorStorageService()
+            vector_service = get_vector_storage_service()
             suggested_packs = await vector_service.search_similar_packs(
                 context, 
                 tenant_id, 
@@ -784,7 +781,7 @@ async def delete_pack(
         
         # Remove from vector storage
         try:
-            vector_service = VectorStorageService()
+            vector_service = get_vector_storage_service()
             await vector_service.remove_pack_vectors(pack_id, tenant_id)
         except Exception as e:
             print(f"Error removing pack vectors: {e}")
@@ -801,12 +798,15 @@ def track_pack_access(pack_id: str, user_id: str, tenant_id: str, db: Session):
     pass
 
 
-async def process_pack_content(pack_id: str, tenant_id: str):
-    """Background task to process pack content with Agno"""
-    try:
-        processor = PackProcessor()
-        await processor.process_pack(pack_id, tenant_id)
-    except Exception as e:
-        print(f"Error processing pack {pack_id}: {e}")
-        # Update pack status to failed
-        # This would require database session management in background task
\ No newline at end of file
+async def enqueue_pack_processing(pack_id: str, tenant_id: str, llm_cache: Optional[bool] = None):
+    """Queue the pack.process job (see app.services.job_handlers).
+
+    While a job for this pack with the same options is still waiting to run,
+    that job is returned instead of queueing a second one.
+    """
+    return await enqueue_job(
+        "pack.process",
+        {"pack_id": pack_id, "tenant_id": tenant_id, "llm_cache": llm_cache},
+        tenant_id=tenant_id,
+        dedupe_key=f"pack.process:{pack_id}",
+    )
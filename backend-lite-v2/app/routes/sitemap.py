@@ -2,9 +2,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 import xml.etree.ElementTree as ET
-import httpx
-
 from .providers import SEED_PROVIDERS
+from ..services.doc_fetcher import get_fetcher
 
 router = APIRouter(prefix="/api/sitemap", tags=["sitemap"]) 
 
@@ -24,10 +23,7 @@ class ResolveResponse(BaseModel):
 
 
 async def fetch_text(url: str) -> str:
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        return r.text
+    return await get_fetcher().fetch_text(url, timeout=20)
 
 
 @router.post("/resolve", response_model=ResolveResponse)
@@ -0,0 +1,389 @@
+"""
+LLM Admission Control
+=====================
+
+Admission controller in front of every tracked LLM call (call_llm_and_track)
+and the streaming agent endpoints, so one tenant's bulk work cannot take
+the provider rate limit and the server's capacity away from everyone else:
+
+- per-tenant token bucket (requests per second with a burst) and
+  per-tenant concurrency limit, plus a process-wide concurrency limit
+- priority classes: interactive requests are always dispatched before
+  queued batch work, and batch work may only hold KIFF_ADMIT_BATCH_SHARE of
+  the global slots so interactive calls find a free slot quickly
+- weighted fair queuing across tenants within a class (start-time fair
+  queuing; weights from KIFF_ADMIT_WEIGHTS), so a tenant with a deep queue
+  does not delay a tenant with one request
+- queue-time metrics per class and per tenant (get_stats, span attribute
+  admission.queued_ms on llm.call)
+- backpressure: when a tenant's queue or the global queue is full, or a
+  request waits longer than its class allows, AdmissionRejected is raised;
+  the app turns it into 429 with Retry-After
+
+The priority of a call comes from a context variable: requests default to
+interactive and job handlers run under priority_scope("batch"). Limits are
+per process (API process and each job worker process separately).
+
+Env:
+- KIFF_ADMISSION: "true" (default) | "false"
+- KIFF_ADMIT_TENANT_RPS (default 5), KIFF_ADMIT_TENANT_BURST (default 20)
+- KIFF_ADMIT_TENANT_CONCURRENCY (default 4)
+- KIFF_ADMIT_GLOBAL_CONCURRENCY (default 32)
+- KIFF_ADMIT_BATCH_SHARE: fraction of global slots batch may use (default 0.75)
+- KIFF_ADMIT_TENANT_QUEUE (default 50), KIFF_ADMIT_QUEUE (default 500)
+- KIFF_ADMIT_MAX_WAIT_SEC_INTERACTIVE (default 30)
+- KIFF_ADMIT_MAX_WAIT_SEC_BATCH (default 600)
+- KIFF_ADMIT_WEIGHTS: "tenant_a:3,tenant_b:2" (default weight 1)
+"""
+
+import asyncio
+import contextvars
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("kiff_llm_priority", default="interactive")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def admission_enabled() -> bool:
+    return os.getenv("KIFF_ADMISSION", "true").lower() in ("1", "true", "yes")
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def priority_scope(priority: str) -> Iterator[None]:
+    """Run the enclosed code (and tasks/threads it starts) under a priority class"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class '{priority}'")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; retry after retry_after seconds"""
+
+    def __init__(self, message: str, retry_after: int, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason  # tenant_queue_full | queue_full | wait_timeout
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated: float
+
+    def refill(self, now: float, rate: float, burst: float) -> None:
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+@dataclass
+class _Waiter:
+    tenant_id: str
+    priority: int
+    tag: float  # WFQ start tag
+    seq: int
+    cost: float
+    enqueued_at: float
+    future: "asyncio.Future" = field(repr=False)
+
+
+class Ticket:
+    """An admitted request; release() exactly once when the call is over"""
+
+    def __init__(self, controller: "AdmissionController", tenant_id: str, priority: int, queued_ms: int):
+        self._controller = controller
+        self.tenant_id = tenant_id
+        self.priority = priority
+        self.queued_ms = queued_ms
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class _TenantStats:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_ms_total = 0
+
+
+class AdmissionController:
+    """Per-process scheduler for LLM calls; use from the event loop only"""
+
+    def __init__(self):
+        self.rate = _env_float("KIFF_ADMIT_TENANT_RPS", 5.0)
+        self.burst = max(1.0, _env_float("KIFF_ADMIT_TENANT_BURST", 20.0))
+        self.tenant_concurrency = max(1, _env_int("KIFF_ADMIT_TENANT_CONCURRENCY", 4))
+        self.global_concurrency = max(1, _env_int("KIFF_ADMIT_GLOBAL_CONCURRENCY", 32))
+        self.batch_slots = max(1, int(self.global_concurrency * _env_float("KIFF_ADMIT_BATCH_SHARE", 0.75)))
+        self.tenant_queue = _env_int("KIFF_ADMIT_TENANT_QUEUE", 50)
+        self.global_queue = _env_int("KIFF_ADMIT_QUEUE", 500)
+        self.max_wait = {
+            PRIORITIES["interactive"]: _env_float("KIFF_ADMIT_MAX_WAIT_SEC_INTERACTIVE", 30),
+            PRIORITIES["batch"]: _env_float("KIFF_ADMIT_MAX_WAIT_SEC_BATCH", 600),
+        }
+        self.weights = self._parse_weights(os.getenv("KIFF_ADMIT_WEIGHTS", ""))
+
+        self._waiting: List[_Waiter] = []
+        self._running: Dict[str, int] = {}
+        self._running_by_class: Dict[int, int] = {p: 0 for p in PRIORITIES.values()}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._vtime = 0.0
+        self._last_tag: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._queue_ms: Dict[int, Deque[int]] = {p: deque(maxlen=1000) for p in PRIORITIES.values()}
+        self._rejected: Dict[str, int] = {}
+        self._tenants: Dict[str, _TenantStats] = {}
+
+    @staticmethod
+    def _parse_weights(raw: str) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for part in raw.split(","):
+            tenant, _, weight = part.strip().rpartition(":")
+            try:
+                if tenant:
+                    weights[tenant] = max(0.01, float(weight))
+            except ValueError:
+                continue
+        return weights
+
+    # --- scheduling ---
+
+    def _bucket(self, tenant_id: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(tenant_id)
+        if bucket is None:
+            bucket = self._buckets[tenant_id] = _Bucket(tokens=self.burst, updated=now)
+        bucket.refill(now, self.rate, self.burst)
+        return bucket
+
+    def _running_total(self) -> int:
+        return sum(self._running_by_class.values())
+
+    def _has_slot(self, tenant_id: str, priority: int) -> bool:
+        if self._running_total() >= self.global_concurrency:
+            return False
+        if priority > PRIORITIES["interactive"] and self._running_by_class[priority] >= self.batch_slots:
+            return False
+        return self._running.get(tenant_id, 0) < self.tenant_concurrency
+
+    def _start(self, tenant_id: str, priority: int, cost: float, now: float) -> None:
+        self._bucket(tenant_id, now).tokens -= cost
+        self._running[tenant_id] = self._running.get(tenant_id, 0) + 1
+        self._running_by_class[priority] += 1
+
+    def _dispatch(self) -> None:
+        """Admit every waiter that can run now, best (priority, tag) first"""
+        self._timer = None
+        now = time.monotonic()
+        next_refill: Optional[float] = None
+        self._waiting = [w for w in self._waiting if not w.future.done()]
+        for w in sorted(self._waiting, key=lambda w: (w.priority, w.tag, w.seq)):
+            if self._running_total() >= self.global_concurrency:
+                break
+            if not self._has_slot(w.tenant_id, w.priority):
+                continue
+            bucket = self._bucket(w.tenant_id, now)
+            if bucket.tokens < w.cost:
+                wait = (w.cost - bucket.tokens) / self.rate if self.rate > 0 else 1.0
+                next_refill = wait if next_refill is None else min(next_refill, wait)
+                continue
+            self._start(w.tenant_id, w.priority, w.cost, now)
+            self._vtime = max(self._vtime, w.tag)
+            self._waiting.remove(w)
+            w.future.set_result(int((now - w.enqueued_at) * 1000))
+        if next_refill is not None and self._waiting:
+            self._timer = asyncio.get_running_loop().call_later(max(0.01, next_refill), self._dispatch)
+
+    def _kick(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._dispatch()
+
+    def _release(self, ticket: Ticket) -> None:
+        self._running[ticket.tenant_id] = max(0, self._running.get(ticket.tenant_id, 0) - 1)
+        if not self._running[ticket.tenant_id]:
+            self._running.pop(ticket.tenant_id, None)
+        self._running_by_class[ticket.priority] = max(0, self._running_by_class[ticket.priority] - 1)
+        self._kick()
+
+    def _retry_after(self, tenant_id: str) -> int:
+        queued = sum(1 for w in self._waiting if w.tenant_id == tenant_id)
+        by_rate = (queued + 1) / self.rate if self.rate > 0 else 60
+        by_slots = queued / self.tenant_concurrency
+        return max(1, min(300, math.ceil(max(by_rate, by_slots))))
+
+    def _reject(self, tenant_id: str, reason: str, message: str) -> AdmissionRejected:
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        self._tenants.setdefault(tenant_id, _TenantStats()).rejected += 1
+        return AdmissionRejected(message, self._retry_after(tenant_id), reason)
+
+    async def acquire(self, tenant_id: str, priority: Optional[str] = None, cost: float = 1.0) -> Ticket:
+        """Wait for admission; raises AdmissionRejected on overflow or timeout"""
+        prio = PRIORITIES[priority or current_priority()]
+        cost = min(max(cost, 0.0), self.burst)
+        now = time.monotonic()
+        stats = self._tenants.setdefault(tenant_id, _TenantStats())
+
+        # Fast path: nothing queued ahead and the tenant has capacity
+        if not any(w.priority <= prio for w in self._waiting) and self._has_slot(tenant_id, prio) \
+                and self._bucket(tenant_id, now).tokens >= cost:
+            self._start(tenant_id, prio, cost, now)
+            stats.admitted += 1
+            self._queue_ms[prio].append(0)
+            return Ticket(self, tenant_id, prio, 0)
+
+        if len(self._waiting) >= self.global_queue:
+            raise self._reject(tenant_id, "queue_full", "LLM request queue is full")
+        if sum(1 for w in self._waiting if w.tenant_id == tenant_id) >= self.tenant_queue:
+            raise self._reject(tenant_id, "tenant_queue_full", "Too many queued LLM requests for this tenant")
+
+        weight = self.weights.get(tenant_id, 1.0)
+        tag = max(self._vtime, self._last_tag.get(tenant_id, 0.0))
+        self._last_tag[tenant_id] = tag + cost / weight
+        waiter = _Waiter(
+            tenant_id=tenant_id,
+            priority=prio,
+            tag=tag,
+            seq=next(self._seq),
+            cost=cost,
+            enqueued_at=now,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._waiting.append(waiter)
+        self._kick()
+        try:
+            queued_ms = await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait[prio])
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we gave up: hand the slot back
+                Ticket(self, tenant_id, prio, 0).release()
+            else:
+                waiter.future.cancel()
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(
+                    tenant_id, "wait_timeout", f"LLM request waited more than {self.max_wait[prio]:g}s for admission"
+                ) from None
+            raise
+        stats.admitted += 1
+        stats.queue_ms_total += queued_ms
+        self._queue_ms[prio].append(queued_ms)
+        return Ticket(self, tenant_id, prio, queued_ms)
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str, priority: Optional[str] = None, cost: float = 1.0):
+        ticket = await self.acquire(tenant_id, priority, cost)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    # --- metrics ---
+
+    def get_stats(self) -> Dict[str, Any]:
+        classes = {}
+        for name, prio in PRIORITIES.items():
+            waits = sorted(self._queue_ms[prio])
+            classes[name] = {
+                "running": self._running_by_class[prio],
+                "queued": sum(1 for w in self._waiting if w.priority == prio),
+                "queue_ms_p50": waits[len(waits) // 2] if waits else 0,
+                "queue_ms_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0,
+                "queue_ms_max": waits[-1] if waits else 0,
+            }
+        tenants = {
+            tenant_id: {
+                "running": self._running.get(tenant_id, 0),
+                "queued": sum(1 for w in self._waiting if w.tenant_id == tenant_id),
+                "admitted": s.admitted,
+                "rejected": s.rejected,
+                "avg_queue_ms": round(s.queue_ms_total / s.admitted, 1) if s.admitted else 0,
+            }
+            for tenant_id, s in self._tenants.items()
+        }
+        return {
+            "enabled": admission_enabled(),
+            "global_concurrency": self.global_concurrency,
+            "running": self._running_total(),
+            "classes": classes,
+            "rejected": dict(self._rejected),
+            "tenants": tenants,
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+@asynccontextmanager
+async def admission_slot(tenant_id: str, priority: Optional[str] = None, cost: float = 1.0):
+    """Hold an admission slot for the enclosed call (no-op when disabled)"""
+    if not admission_enabled():
+        yield None
+        return
+    async with get_admission_controller().slot(tenant_id, priority, cost) as ticket:
+        yield ticket
+
+
+async def acquire_ticket(tenant_id: str, priority: Optional[str] = None) -> Optional[Ticket]:
+    """Admission for a streaming endpoint, taken before the response starts so a
+    rejection can still become a 429; None when admission control is off"""
+    if not admission_enabled():
+        return None
+    return await get_admission_controller().acquire(tenant_id, priority)
+
+
+def release_ticket(ticket: Optional[Ticket]) -> None:
+    if ticket is not None:
+        ticket.release()
+
+
+async def release_after(stream: AsyncIterator[Any], ticket: Optional[Ticket]) -> AsyncIterator[Any]:
+    """Pass the stream through and release the ticket when it ends or is closed"""
+    try:
+        async for item in stream:
+            yield item
+    finally:
+        release_ticket(ticket)
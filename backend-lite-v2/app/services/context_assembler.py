@@ -0,0 +1,339 @@
+"""
+Context Assembler
+=================
+
+Token-budgeted prompt context for launcher chat. Instead of "last 10 turns
+plus the first N files cut at a fixed number of characters", candidates are
+scored against the current message and packed under a per-model budget:
+
+- budget: KIFF_CONTEXT_BUDGETS override for the model, else its context
+  window (app/data/models.json) x KIFF_CONTEXT_BUDGET_SHARE, capped at
+  KIFF_CONTEXT_MAX_TOKENS; the fixed part of the prompt (instructions,
+  current message) is reserved out of it by the caller
+- scoring (lexical, no model call on the request path): BM25 of each
+  candidate against the current message, normalized per request, plus
+  - history turns: a recency weight; the last KIFF_CONTEXT_PIN_TURNS turns
+    are pinned and packed first
+  - files: a bonus when the message mentions the file's path or name
+  - retrieved chunks: blended with the retriever's own score
+- packing: pinned items first, then by score; an item larger than
+  KIFF_CONTEXT_MAX_ITEM_SHARE of the budget is cut to that share, and one
+  that does not fit what is left is truncated to it (files, chunks and
+  pinned turns, when at least KIFF_CONTEXT_MIN_PARTIAL_TOKENS remain) or
+  dropped; exact duplicates
+  (after whitespace/case normalization, including a copy of the current
+  message) are dropped
+- report: every dropped or truncated item with its kind, key, tokens and
+  reason (budget | duplicate | truncated | empty)
+
+Token counts use the shared tokenizer registry, so they match the counts
+the observability wrapper records for the same model.
+
+Env:
+- KIFF_CONTEXT_BUDGETS: per-model overrides, "model=tokens,model=tokens"
+- KIFF_CONTEXT_BUDGET_SHARE: share of the context window (default 0.25)
+- KIFF_CONTEXT_MAX_TOKENS: upper bound on any budget (default 8000)
+- KIFF_CONTEXT_PIN_TURNS (default 2)
+- KIFF_CONTEXT_MAX_ITEM_SHARE (default 0.4)
+- KIFF_CONTEXT_MIN_PARTIAL_TOKENS (default 200)
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from .tokenizers import count_tokens, get_tokenizer
+
+_DEFAULT_CONTEXT_WINDOW = 8192
+_TRUNCATED_MARK = "\n... [truncated]"
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_STOPWORDS = frozenset(
+    "the and for are but not you your with this that from have has was were will would can could should "
+    "what when where which who how why all any our out its into about them then than there their they "
+    "please just like make use get let also some".split()
+)
+
+_context_windows: Optional[Dict[str, int]] = None
+_windows_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _load_context_windows() -> Dict[str, int]:
+    global _context_windows
+    if _context_windows is None:
+        with _windows_lock:
+            if _context_windows is None:
+                path = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "models.json"))
+                windows: Dict[str, int] = {}
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        for item in json.load(f):
+                            if item.get("id") and item.get("context_window"):
+                                windows[item["id"]] = int(item["context_window"])
+                except Exception as e:
+                    print(f"[CONTEXT] models.json unreadable ({e}); using {_DEFAULT_CONTEXT_WINDOW}-token windows")
+                _context_windows = windows
+    return _context_windows
+
+
+def context_budget(model: Optional[str]) -> int:
+    """Token budget for the whole prompt context of one call to model"""
+    cap = _env_int("KIFF_CONTEXT_MAX_TOKENS", 8000)
+    for entry in os.getenv("KIFF_CONTEXT_BUDGETS", "").split(","):
+        name, _, tokens = entry.strip().rpartition("=")
+        if name and name == model:
+            try:
+                return int(tokens)
+            except ValueError:
+                break
+    window = _load_context_windows().get(model or "", _DEFAULT_CONTEXT_WINDOW)
+    return max(0, min(cap, int(window * _env_float("KIFF_CONTEXT_BUDGET_SHARE", 0.25))))
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in _WORD.findall((text or "").lower()) if len(t) > 2 and t not in _STOPWORDS]
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(" ".join((text or "").lower().split()).encode("utf-8")).hexdigest()
+
+
+def _bm25(query: List[str], docs: Sequence[List[str]], k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """BM25 of every doc against the query, with IDF over the candidate set"""
+    if not query or not docs:
+        return [0.0] * len(docs)
+    n = len(docs)
+    avg_len = (sum(len(d) for d in docs) / n) or 1.0
+    df = Counter(t for d in docs for t in set(d))
+    q_terms = set(query)
+    scores = []
+    for d in docs:
+        tf = Counter(d)
+        s = 0.0
+        for t in q_terms:
+            f = tf.get(t, 0)
+            if not f:
+                continue
+            idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+            s += idf * f * (k1 + 1) / (f + k1 * (1 - b + b * len(d) / avg_len))
+        scores.append(s)
+    return scores
+
+
+def _normalized(values: List[float]) -> List[float]:
+    top = max(values, default=0.0)
+    return [v / top if top > 0 else 0.0 for v in values]
+
+
+@dataclass
+class ContextItem:
+    kind: str  # history | file | chunk
+    key: str
+    text: str
+    meta: Dict[str, Any] = field(default_factory=dict)
+    score: float = 0.0
+    tokens: int = 0
+    pinned: bool = False
+    truncated: bool = False
+    position: int = 0  # order in the caller's list
+
+    def render(self, text: Optional[str] = None) -> str:
+        body = self.text if text is None else text
+        if self.kind == "history":
+            return f"{self.meta.get('role', 'user').upper()}: {body}"
+        if self.kind == "file":
+            lang = self.meta.get("language") or ""
+            return f"\n**{self.key}** ({lang or 'text'}):\n```{lang}\n{body}\n```\n"
+        source = self.meta.get("source")
+        return f"- {f'[{source}] ' if source else ''}{body}"
+
+
+@dataclass
+class AssembledContext:
+    model: Optional[str]
+    budget_tokens: int
+    used_tokens: int = 0
+    history: List[ContextItem] = field(default_factory=list)
+    files: List[ContextItem] = field(default_factory=list)
+    chunks: List[ContextItem] = field(default_factory=list)
+    dropped: List[Dict[str, Any]] = field(default_factory=list)
+
+    def history_text(self) -> str:
+        return "\n".join(i.render() for i in self.history)
+
+    def files_text(self, heading: str = "## Current Project Files:") -> str:
+        if not self.files:
+            return ""
+        return f"\n\n{heading}\n" + "".join(i.render() for i in self.files)
+
+    def chunks_text(self, heading: str = "## Relevant Knowledge:") -> str:
+        if not self.chunks:
+            return ""
+        return f"\n\n{heading}\n" + "\n".join(i.render() for i in self.chunks)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "budget_tokens": self.budget_tokens,
+            "used_tokens": self.used_tokens,
+            "kept": {"history": len(self.history), "files": len(self.files), "chunks": len(self.chunks)},
+            "dropped": self.dropped,
+        }
+
+
+def _history_items(history: Sequence[Dict[str, Any]]) -> List[ContextItem]:
+    items = []
+    for i, m in enumerate(history):
+        items.append(ContextItem(
+            kind="history", key=f"turn:{i}", text=str(m.get("content") or ""),
+            meta={"role": m.get("role") or "user"}, position=i,
+        ))
+    return items
+
+
+def _file_items(files: Sequence[Dict[str, Any]]) -> List[ContextItem]:
+    items = []
+    for i, f in enumerate(files):
+        items.append(ContextItem(
+            kind="file", key=str(f.get("path") or f"file:{i}"), text=str(f.get("content") or ""),
+            meta={"language": f.get("language")}, position=i,
+        ))
+    return items
+
+
+def _chunk_items(chunks: Sequence[Dict[str, Any]]) -> List[ContextItem]:
+    items = []
+    for i, c in enumerate(chunks):
+        text = c.get("content") or c.get("text") or ""
+        source = c.get("source") or c.get("pack_name") or c.get("url") or ""
+        key = str(c.get("id") or c.get("chunk_id") or source or f"chunk:{i}")
+        items.append(ContextItem(
+            kind="chunk", key=key, text=str(text),
+            meta={"source": source, "retriever_score": float(c.get("score") or 0.0)}, position=i,
+        ))
+    return items
+
+
+def _score(message: str, history: List[ContextItem], files: List[ContextItem], chunks: List[ContextItem], pin_turns: int) -> None:
+    candidates = history + files + chunks
+    lexical = _normalized(_bm25(
+        _terms(message),
+        [_terms(f"{c.key} {c.text}" if c.kind == "file" else c.text) for c in candidates],
+    ))
+    for item, lex in zip(candidates, lexical):
+        item.score = lex
+    lowered = (message or "").lower()
+    for i, item in enumerate(history):
+        recency = (i + 1) / len(history)
+        item.score = 0.6 * item.score + 0.4 * recency
+        item.pinned = i >= len(history) - pin_turns
+    for item in files:
+        name = item.key.rsplit("/", 1)[-1].lower()
+        if item.key.lower() in lowered or (len(name) > 3 and name in lowered):
+            item.score += 0.5
+    retriever = _normalized([c.meta["retriever_score"] for c in chunks])
+    for item, r in zip(chunks, retriever):
+        item.score = 0.5 * item.score + 0.5 * r
+
+
+def _truncate(item: ContextItem, budget: int, model: Optional[str]) -> Optional[str]:
+    """Largest head of item.text whose rendering fits in budget tokens"""
+    overhead = count_tokens(item.render(_TRUNCATED_MARK), model) + 1
+    room = budget - overhead
+    if room <= 0:
+        return None
+    offsets = get_tokenizer(model).offsets(item.text)
+    if room >= len(offsets):
+        return item.text
+    return item.text[:offsets[room]].rstrip() + _TRUNCATED_MARK
+
+
+def assemble_context(
+    message: str,
+    *,
+    model: Optional[str],
+    history: Optional[Sequence[Dict[str, Any]]] = None,
+    files: Optional[Sequence[Dict[str, Any]]] = None,
+    chunks: Optional[Sequence[Dict[str, Any]]] = None,
+    reserved_tokens: int = 0,
+    budget_tokens: Optional[int] = None,
+) -> AssembledContext:
+    """Pick the history turns, files and retrieved chunks most relevant to
+    message that fit the model's budget minus reserved_tokens (the fixed
+    part of the prompt)"""
+    budget = context_budget(model) if budget_tokens is None else budget_tokens
+    out = AssembledContext(model=model, budget_tokens=budget)
+    remaining = max(0, budget - reserved_tokens)
+    min_partial = _env_int("KIFF_CONTEXT_MIN_PARTIAL_TOKENS", 200)
+    item_cap = int(remaining * _env_float("KIFF_CONTEXT_MAX_ITEM_SHARE", 0.4))
+
+    h_items = _history_items(history or [])
+    f_items = _file_items(files or [])
+    c_items = _chunk_items(chunks or [])
+    _score(message, h_items, f_items, c_items, _env_int("KIFF_CONTEXT_PIN_TURNS", 2))
+
+    seen = {_fingerprint(message)}
+    ordered = sorted(h_items + f_items + c_items, key=lambda i: (not i.pinned, -i.score, i.position))
+    kept: List[ContextItem] = []
+    for item in ordered:
+        if not item.text.strip():
+            out.dropped.append({"kind": item.kind, "key": item.key, "tokens": 0, "reason": "empty"})
+            continue
+        fp = _fingerprint(item.text)
+        item.tokens = count_tokens(item.render(), model)
+        if fp in seen:
+            out.dropped.append({"kind": item.kind, "key": item.key, "tokens": item.tokens, "reason": "duplicate"})
+            continue
+        # No single item may take more than its share of the context
+        limit = min(remaining, max(min_partial, item_cap))
+        if item.tokens <= limit:
+            seen.add(fp)
+            kept.append(item)
+            remaining -= item.tokens
+            continue
+        partial = None
+        if limit >= min_partial and (item.kind != "history" or item.pinned or item.tokens > item_cap):
+            partial = _truncate(item, limit, model)
+        if partial is None:
+            out.dropped.append({"kind": item.kind, "key": item.key, "tokens": item.tokens, "reason": "budget"})
+            continue
+        full_tokens = item.tokens
+        item.text, item.truncated = partial, True
+        item.tokens = count_tokens(item.render(), model)
+        seen.add(fp)
+        kept.append(item)
+        remaining -= item.tokens
+        out.dropped.append({"kind": item.kind, "key": item.key, "tokens": full_tokens - item.tokens, "reason": "truncated"})
+
+    # History reads in conversation order; files and chunks most relevant first
+    out.history = sorted((i for i in kept if i.kind == "history"), key=lambda i: i.position)
+    out.files = [i for i in kept if i.kind == "file"]
+    out.chunks = [i for i in kept if i.kind == "chunk"]
+    out.used_tokens = reserved_tokens + sum(i.tokens for i in kept)
+    if out.dropped:
+        reasons = Counter(d["reason"] for d in out.dropped)
+        print(
+            f"[CONTEXT] model={model} budget={budget} used={out.used_tokens} "
+            f"kept={out.report()['kept']} dropped={dict(reasons)}"
+        )
+    return out
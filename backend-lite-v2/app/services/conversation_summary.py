@@ -0,0 +1,283 @@
+"""
+Conversation Summary
+====================
+
+Rolling summary of long launcher chats, kept in KiffChatSession.agent_state
+so the prompt (and with it turn latency and cost) stays flat as a
+conversation grows:
+
+- agent_state["history_summary"] = {text, through_message_id,
+  summarized_count, tokens, model, updated_at}: the running summary of every
+  persisted message up to and including the watermark message
+- after a turn is persisted, maybe_schedule_summary() starts a background
+  pass: when the messages past the watermark exceed
+  KIFF_SUMMARY_TRIGGER_TOKENS, the oldest of them (all but the last
+  KIFF_SUMMARY_KEEP_MESSAGES, at most KIFF_SUMMARY_MAX_INPUT_TOKENS per
+  pass) are folded into the summary by one LLM call (previous summary + new
+  turns -> updated summary) and the watermark moves to the last folded one.
+  The chat turn never waits for it
+- prompt_history() gives the prompt the summary plus the turns after the
+  watermark (from the database); a session without a summary keeps using
+  the history the client sent
+
+One pass per session at a time (in-process). The watermark only moves
+forward: a pass writes its result only if the stored watermark is still the
+one it started from, and leaves every other agent_state key as it is.
+
+The summary call is a tracked usage event (agent "Conversation Summarizer")
+with failover to the other chat models, admitted in the batch priority
+class.
+
+Env:
+- KIFF_SUMMARY: "true" (default) | "false"
+- KIFF_SUMMARY_TRIGGER_TOKENS (default 3000)
+- KIFF_SUMMARY_KEEP_MESSAGES (default 6)
+- KIFF_SUMMARY_MAX_INPUT_TOKENS (default 12000)
+- KIFF_SUMMARY_MAX_TOKENS: target summary length (default 600)
+- KIFF_SUMMARY_MODEL: model for the summary call (default: the chat's model)
+"""
+
+import asyncio
+import datetime as dt
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..db_core import SessionLocal
+from ..models_kiffs import ConversationMessage, KiffChatSession
+from ..observability import SessionContext, call_llm_resilient, usage_from_run
+from .admission import priority_scope
+from .model_router import get_model_router
+from .tokenizers import count_tokens
+
+STATE_KEY = "history_summary"
+
+# Chars of one message passed to the summarizer (pasted files are cut)
+_MAX_MESSAGE_CHARS = 6000
+
+_SUMMARY_INSTRUCTIONS = (
+    "You maintain the running summary of a conversation between a user and an assistant "
+    "that helps them build a software project (a 'kiff'). Merge the new turns into the "
+    "existing summary. Keep decisions, requirements, constraints, chosen packs/APIs, file "
+    "names and open questions; drop greetings and repetition. Write plain prose or short "
+    "bullets, no preamble."
+)
+
+_running: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def summary_enabled() -> bool:
+    return os.getenv("KIFF_SUMMARY", "true").lower() in ("1", "true", "yes")
+
+
+def _state_dict(raw: Any) -> Dict[str, Any]:
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw) if raw else {}
+        except Exception:
+            return {}
+    return dict(raw) if isinstance(raw, dict) else {}
+
+
+def _session_messages(db, session_id: str, tenant_id: str) -> List[ConversationMessage]:
+    rows = (
+        db.query(ConversationMessage)
+        .filter(ConversationMessage.session_id == session_id, ConversationMessage.tenant_id == tenant_id)
+        .all()
+    )
+    # A turn's user and assistant messages share created_at; the user one comes first
+    return sorted(rows, key=lambda m: (m.created_at, 0 if m.role == "user" else 1))
+
+
+def _after_watermark(messages: List[ConversationMessage], summary: Dict[str, Any]) -> Optional[List[ConversationMessage]]:
+    """Messages past the watermark; None when the watermark message is gone"""
+    watermark = summary.get("through_message_id")
+    if not watermark:
+        return messages
+    for i, m in enumerate(messages):
+        if m.id == watermark:
+            return messages[i + 1:]
+    return None
+
+
+def prompt_history(
+    session_id: Optional[str],
+    tenant_id: str,
+    agent_state: Any,
+    client_history: List[Dict[str, Any]],
+) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """(summary text, turns after the watermark) for the prompt, or
+    (None, client_history) when the session has no usable summary"""
+    summary = _state_dict(agent_state).get(STATE_KEY)
+    if not summary_enabled() or not session_id or not isinstance(summary, dict) or not summary.get("text"):
+        return None, client_history
+    try:
+        with SessionLocal() as db:
+            recent = _after_watermark(_session_messages(db, session_id, tenant_id), summary)
+    except Exception as e:
+        print(f"[SUMMARY] session={session_id} history load failed: {e}")
+        return None, client_history
+    if recent is None:
+        return None, client_history
+    return summary["text"], [{"role": m.role, "content": m.content or ""} for m in recent]
+
+
+def _summary_callable(model_id: str):
+    async def _call(*, messages, stream=False):
+        from agno.agent import Agent  # type: ignore
+        from agno.models.groq import Groq  # type: ignore
+
+        agent = Agent(model=Groq(id=model_id), instructions=[messages[0]["content"]], markdown=False)
+        out = await agent.arun(messages[-1]["content"])
+        return {"content": getattr(out, "content", "") or "", "usage": usage_from_run(out)}
+    return _call
+
+
+def _load_pending(session_id: str, tenant_id: str) -> Optional[Tuple[Dict[str, Any], Optional[str], List[Tuple[str, str, str]]]]:
+    """(summary to extend, stored watermark, (id, role, content) of the messages past it)"""
+    with SessionLocal() as db:
+        sess = db.query(KiffChatSession).filter(
+            KiffChatSession.id == session_id,
+            KiffChatSession.tenant_id == tenant_id,
+        ).first()
+        if sess is None:
+            return None
+        summary = _state_dict(sess.agent_state).get(STATE_KEY)
+        summary = summary if isinstance(summary, dict) else {}
+        messages = _session_messages(db, session_id, tenant_id)
+        stored_watermark = summary.get("through_message_id")
+        pending = _after_watermark(messages, summary)
+        if pending is None:
+            # Watermark message deleted: rebuild from the start
+            summary, pending = {}, messages
+        return summary, stored_watermark, [(m.id, m.role, m.content or "") for m in pending]
+
+
+def _store(session_id: str, tenant_id: str, summary: Dict[str, Any], previous_watermark: Optional[str]) -> bool:
+    with SessionLocal() as db:
+        sess = db.query(KiffChatSession).filter(
+            KiffChatSession.id == session_id,
+            KiffChatSession.tenant_id == tenant_id,
+        ).first()
+        if sess is None:
+            return False
+        state = _state_dict(sess.agent_state)
+        current = state.get(STATE_KEY) if isinstance(state.get(STATE_KEY), dict) else {}
+        if current.get("through_message_id") != previous_watermark:
+            return False  # another pass got there first
+        state[STATE_KEY] = summary
+        sess.agent_state = state
+        sess.updated_at = dt.datetime.utcnow()
+        db.commit()
+        return True
+
+
+async def summarize_session(
+    session_id: str,
+    tenant_id: str,
+    model: str,
+    user_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Fold the oldest unsummarized messages into the session's summary when
+    they exceed the trigger; returns the new summary state, or None"""
+    loaded = await asyncio.to_thread(_load_pending, session_id, tenant_id)
+    if loaded is None:
+        return None
+    summary, stored_watermark, pending = loaded
+    keep = max(0, _env_int("KIFF_SUMMARY_KEEP_MESSAGES", 6))
+    sized = [(m, count_tokens(f"{m[1]}: {m[2][:_MAX_MESSAGE_CHARS]}", model)) for m in pending]
+    if sum(t for _, t in sized) < _env_int("KIFF_SUMMARY_TRIGGER_TOKENS", 3000) or len(pending) <= keep:
+        return None
+
+    max_input = _env_int("KIFF_SUMMARY_MAX_INPUT_TOKENS", 12000)
+    fold: List[Tuple[str, str, str]] = []
+    used = 0
+    for m, tokens in sized[: len(sized) - keep]:
+        if fold and used + tokens > max_input:
+            break
+        fold.append(m)
+        used += tokens
+    # Keep a user turn together with its answer
+    if len(fold) > 1 and fold[-1][1] == "user":
+        fold.pop()
+    if not fold:
+        return None
+
+    turns = "\n".join(f"{role.upper()}: {content[:_MAX_MESSAGE_CHARS]}" for _, role, content in fold)
+    max_tokens = _env_int("KIFF_SUMMARY_MAX_TOKENS", 600)
+    prompt = (
+        f"Existing summary:\n{summary.get('text') or '(none)'}\n\n"
+        f"New turns:\n{turns}\n\n"
+        f"Updated summary (at most about {max_tokens} tokens):"
+    )
+    model = os.getenv("KIFF_SUMMARY_MODEL") or model
+    call = await call_llm_resilient(
+        provider=(model.split("/", 1)[0] if "/" in model else "groq").lower(),
+        model=model,
+        messages=[{"role": "system", "content": _SUMMARY_INSTRUCTIONS}, {"role": "user", "content": prompt}],
+        session_ctx=SessionContext(
+            tenant_id=tenant_id,
+            user_id=user_id,
+            workspace_id=None,
+            session_id=session_id,
+            run_id=f"summary_{uuid.uuid4().hex[:12]}",
+            step_id=f"step_{uuid.uuid4().hex[:12]}",
+            agent_name="Conversation Summarizer",
+        ),
+        llm_callable_for=_summary_callable,
+        fallback_models=get_model_router().candidates("chat"),
+        provider_for=lambda m: (m.split("/", 1)[0] if "/" in m else "groq").lower(),
+    )
+    text = (call.result.get("content") if isinstance(call.result, dict) else str(call.result or "")).strip()
+    if not text:
+        return None
+    new_summary = {
+        "text": text,
+        "through_message_id": fold[-1][0],
+        "summarized_count": int(summary.get("summarized_count") or 0) + len(fold),
+        "tokens": count_tokens(text, model),
+        "model": call.model,
+        "updated_at": dt.datetime.utcnow().isoformat(),
+    }
+    stored = await asyncio.to_thread(_store, session_id, tenant_id, new_summary, stored_watermark)
+    if not stored:
+        return None
+    print(
+        f"[SUMMARY] session={session_id} folded {len(fold)} messages ({used} tokens) "
+        f"into {new_summary['tokens']}-token summary; {len(pending) - len(fold)} recent kept"
+    )
+    return new_summary
+
+
+async def _summarize_guarded(session_id: str, tenant_id: str, model: str, user_id: Optional[str]) -> None:
+    try:
+        with priority_scope("batch"):
+            await summarize_session(session_id, tenant_id, model, user_id=user_id)
+    except Exception as e:
+        print(f"[SUMMARY] session={session_id} summarization failed: {e}")
+    finally:
+        _running.discard(session_id)
+
+
+def maybe_schedule_summary(session_id: Optional[str], tenant_id: str, model: str, user_id: Optional[str] = None) -> None:
+    """Start a background summarization pass for the session (no-op when one
+    is already running, summaries are disabled or there is no event loop)"""
+    if not summary_enabled() or not session_id or session_id in _running:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _running.add(session_id)
+    task = loop.create_task(_summarize_guarded(session_id, tenant_id, model, user_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,378 @@
+"""
+Crawl Cache
+===========
+
+Persistent on-disk cache of fetched documentation pages, keyed by normalized
+URL. Each entry keeps the raw body, the extracted text, the validators the
+server sent (ETag / Last-Modified) and the sitemap lastmod we last saw.
+
+Repeat crawls revalidate with conditional GETs (If-None-Match /
+If-Modified-Since) through the shared DocFetcher; a 304 costs no body
+download. When the caller passes a sitemap lastmod equal to the one stored
+for the page, the network is skipped entirely.
+
+Every fetch reports whether the page changed since the previous crawl so
+callers can skip re-chunking and re-embedding unchanged pages.
+
+Env:
+- KIFF_CRAWL_CACHE (default "true"; "false" bypasses the cache)
+- KIFF_CRAWL_CACHE_DIR (default app/data/crawl_cache)
+- KIFF_CRAWL_CACHE_MAX_ENTRIES (default 20000; oldest entries are pruned)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .doc_fetcher import FetchError, get_fetcher
+
+DEFAULT_CACHE_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "crawl_cache"))
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used as the cache key.
+
+    Lowercases scheme and host, drops default ports, fragments and trailing
+    slashes (except the root) and sorts query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _decode(content: bytes, content_type: Optional[str]) -> str:
+    charset = "utf-8"
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset" and value:
+            charset = value.strip('"')
+    try:
+        return content.decode(charset, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+
+@dataclass
+class CachedPage:
+    """Result of a cache-aware fetch"""
+
+    url: str
+    # "new" | "changed" | "unchanged" (200 with identical body) | "not_modified" (304) | "lastmod" (skipped, no request)
+    status: str
+    content: bytes
+    text: str
+    content_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    lastmod: Optional[str] = None
+    extracted: Optional[str] = None
+    truncated: bool = False
+    # URL the body was served from after redirects (relative links resolve against it)
+    final_url: Optional[str] = None
+
+    @property
+    def changed(self) -> bool:
+        return self.status in ("new", "changed")
+
+
+class CrawlCache:
+    """On-disk page cache with conditional revalidation"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv("KIFF_CRAWL_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_entries = max_entries or int(os.getenv("KIFF_CRAWL_CACHE_MAX_ENTRIES", "20000"))
+        self.enabled = os.getenv("KIFF_CRAWL_CACHE", "true").lower() not in ("0", "false", "no")
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.stats = {
+            "new": 0,
+            "changed": 0,
+            "unchanged": 0,
+            "not_modified": 0,
+            "lastmod": 0,
+            "bytes_saved": 0,
+        }
+
+    # ----- storage -----
+
+    def _paths(self, key: str) -> Dict[str, str]:
+        digest = _sha256(key.encode("utf-8"))
+        base = os.path.join(self.cache_dir, digest[:2], digest)
+        return {"meta": base + ".json", "body": base + ".body.gz", "text": base + ".text.gz"}
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get_meta(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._paths(normalize_url(url))["meta"], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _read_gz(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return gzip.decompress(f.read())
+        except (OSError, EOFError, gzip.BadGzipFile):
+            return None
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        meta = self.get_meta(url)
+        if not meta:
+            return None
+        body = self._read_gz(self._paths(meta["key"])["body"])
+        if body is None or _sha256(body) != meta.get("content_hash"):
+            return None
+        meta["content"] = body
+        return meta
+
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        self._write_atomic(self._paths(meta["key"])["meta"], json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def _store(
+        self,
+        url: str,
+        content: bytes,
+        headers: Dict[str, str],
+        lastmod: Optional[str],
+        previous: Optional[Dict[str, Any]],
+        final_url: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        key = normalize_url(url)
+        content_hash = _sha256(content)
+        paths = self._paths(key)
+        if not previous or previous.get("content_hash") != content_hash:
+            self._write_atomic(paths["body"], gzip.compress(content, compresslevel=6))
+        now = time.time()
+        meta = {
+            "key": key,
+            "url": url,
+            "final_url": final_url or url,
+            "content_hash": content_hash,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type"),
+            "lastmod": lastmod,
+            "fetched_at": now,
+            "validated_at": now,
+            "changed_at": now if not previous or previous.get("content_hash") != content_hash else previous.get("changed_at", now),
+            "size": len(content),
+            # Extracted text stays valid only while the body is unchanged
+            "text_key": previous.get("text_key") if previous and previous.get("content_hash") == content_hash else None,
+        }
+        self._save_meta(meta)
+        with self._lock:
+            self._writes_since_prune += 1
+            should_prune = self._writes_since_prune >= 500
+            if should_prune:
+                self._writes_since_prune = 0
+        if should_prune:
+            self.prune()
+        return meta
+
+    def get_extracted(self, url: str, extractor: str, meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Cached extracted text for url if it was produced by extractor from the current body"""
+        meta = meta or self.get_meta(url)
+        if not meta or meta.get("text_key") != f"{extractor}:{meta.get('content_hash')}":
+            return None
+        data = self._read_gz(self._paths(meta["key"])["text"])
+        return data.decode("utf-8") if data is not None else None
+
+    def put_extracted(self, url: str, extractor: str, text: str, content_hash: str) -> None:
+        """Store text extracted from the cached body with the given content hash"""
+        meta = self.get_meta(url)
+        if not meta or meta.get("content_hash") != content_hash:
+            return
+        self._write_atomic(self._paths(meta["key"])["text"], gzip.compress(text.encode("utf-8"), compresslevel=6))
+        meta["text_key"] = f"{extractor}:{meta.get('content_hash')}"
+        self._save_meta(meta)
+
+    def prune(self, max_entries: Optional[int] = None) -> int:
+        """Drop the least recently validated entries beyond max_entries; returns count removed"""
+        limit = max_entries or self.max_entries
+        metas = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        metas.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+        if len(metas) <= limit:
+            return 0
+        metas.sort()
+        removed = 0
+        for _mtime, path in metas[: len(metas) - limit]:
+            base = path[: -len(".json")]
+            for suffix in (".json", ".body.gz", ".text.gz"):
+                try:
+                    os.remove(base + suffix)
+                except OSError:
+                    pass
+            removed += 1
+        return removed
+
+    # ----- fetching -----
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        lastmod: Optional[str] = None,
+        extractor: Optional[str] = None,
+        **fetch_kwargs: Any,
+    ) -> CachedPage:
+        """Fetch url, revalidating any cached copy.
+
+        lastmod is the sitemap <lastmod> for the page; when it matches the stored
+        value the cached body is returned without a request. extractor names the
+        text extractor whose cached output should be attached as page.extracted.
+        Raises FetchError like DocFetcher.fetch.
+        """
+        fetcher = get_fetcher()
+        if not self.enabled:
+            r = await fetcher.fetch(url, **fetch_kwargs)
+            return CachedPage(url=url, status="new", content=r.content, text=r.text, content_hash=_sha256(r.content), lastmod=lastmod, final_url=r.final_url)
+
+        cached = await asyncio.to_thread(self._load, url)
+
+        if cached and lastmod and cached.get("lastmod") == lastmod:
+            self.stats["lastmod"] += 1
+            self.stats["bytes_saved"] += cached.get("size", 0)
+            return await self._from_cache(url, "lastmod", cached, extractor)
+
+        headers = dict(fetch_kwargs.pop("headers", None) or {})
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        r = await fetcher.fetch(url, headers=headers or None, **fetch_kwargs)
+
+        if r.status_code == 304 and cached:
+            cached["validated_at"] = time.time()
+            if lastmod:
+                cached["lastmod"] = lastmod
+            await asyncio.to_thread(self._save_meta, {k: v for k, v in cached.items() if k != "content"})
+            self.stats["not_modified"] += 1
+            self.stats["bytes_saved"] += cached.get("size", 0)
+            return await self._from_cache(url, "not_modified", cached, extractor)
+        if r.status_code == 304:
+            # Validators we did not send (e.g. cache wiped mid-flight): refetch unconditionally
+            r = await fetcher.fetch(url, **fetch_kwargs)
+        if r.status_code >= 400:
+            raise FetchError(url, f"HTTP {r.status_code}", r.status_code)
+        if r.truncated:
+            # Never cache a partial body; it would be served as complete later
+            return CachedPage(url=url, status="new", content=r.content, text=r.text, content_hash=_sha256(r.content), lastmod=lastmod, truncated=True, final_url=r.final_url)
+
+        previous = {k: v for k, v in cached.items() if k != "content"} if cached else None
+        meta = await asyncio.to_thread(self._store, url, r.content, r.headers, lastmod, previous, r.final_url)
+        if not previous:
+            status = "new"
+        elif previous.get("content_hash") == meta["content_hash"]:
+            status = "unchanged"
+        else:
+            status = "changed"
+        self.stats[status] += 1
+        extracted = None
+        if extractor and status == "unchanged":
+            extracted = await asyncio.to_thread(self.get_extracted, url, extractor, meta)
+        return CachedPage(
+            url=url,
+            status=status,
+            content=r.content,
+            text=r.text,
+            content_hash=meta["content_hash"],
+            etag=meta["etag"],
+            last_modified=meta["last_modified"],
+            lastmod=lastmod,
+            extracted=extracted,
+            final_url=meta["final_url"],
+        )
+
+    async def _from_cache(self, url: str, status: str, cached: Dict[str, Any], extractor: Optional[str]) -> CachedPage:
+        extracted = None
+        if extractor:
+            extracted = await asyncio.to_thread(self.get_extracted, url, extractor, cached)
+        return CachedPage(
+            url=url,
+            status=status,
+            content=cached["content"],
+            text=_decode(cached["content"], cached.get("content_type")),
+            content_hash=cached["content_hash"],
+            etag=cached.get("etag"),
+            last_modified=cached.get("last_modified"),
+            lastmod=cached.get("lastmod"),
+            extracted=extracted,
+            final_url=cached.get("final_url") or url,
+        )
+
+    async def fetch_extracted(
+        self,
+        url: str,
+        extract: Callable[[str], Any],
+        extractor: str,
+        *,
+        lastmod: Optional[str] = None,
+        **fetch_kwargs: Any,
+    ) -> CachedPage:
+        """Fetch url and return the page with .extracted filled in.
+
+        The extract callable only runs when the body changed or no cached text
+        exists for this extractor. It may be a coroutine function (e.g. one
+        that offloads to a process pool); plain callables run in a thread.
+        """
+        page = await self.fetch(url, lastmod=lastmod, extractor=extractor, **fetch_kwargs)
+        if page.extracted is None:
+            if asyncio.iscoroutinefunction(extract):
+                page.extracted = await extract(page.text)
+            else:
+                page.extracted = await asyncio.to_thread(extract, page.text)
+            if self.enabled:
+                await asyncio.to_thread(self.put_extracted, url, extractor, page.extracted, page.content_hash)
+        return page
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "cache_dir": self.cache_dir, **self.stats}
+
+
+_crawl_cache: Optional[CrawlCache] = None
+
+
+def get_crawl_cache() -> CrawlCache:
+    """Process-wide crawl cache"""
+    global _crawl_cache
+    if _crawl_cache is None:
+        _crawl_cache = CrawlCache()
+    return _crawl_cache
@@ -0,0 +1,186 @@
+"""
+Chunk Dedup
+===========
+
+Near-duplicate chunk elimination before embedding.
+
+Documentation sites repeat navigation blocks, auth preambles, SDK install
+snippets and whole pages across versions. A ChunkDeduper is scoped to one
+KB index run, one pack or one preview request and drops every chunk that
+is an exact or near duplicate of a chunk it has already kept:
+
+- exact: hash of the whitespace/case-normalized text
+- near: MinHash signatures over word 5-gram shingles, bucketed with LSH
+  banding; candidates are confirmed when the estimated Jaccard similarity
+  reaches the threshold
+
+Chunks shorter than one shingle are only deduplicated exactly.
+
+Env:
+- KIFF_DEDUP: "true" (default) | "false"
+- KIFF_DEDUP_THRESHOLD: Jaccard similarity treated as duplicate (default 0.85)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .incremental_index import text_hash
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+
+
+def dedup_enabled(override: Optional[bool] = None) -> bool:
+    if override is not None:
+        return override
+    return os.getenv("KIFF_DEDUP", "true").lower() in ("1", "true", "yes")
+
+
+def default_threshold() -> float:
+    try:
+        return float(os.getenv("KIFF_DEDUP_THRESHOLD", "0.85"))
+    except ValueError:
+        return 0.85
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+@dataclass
+class DedupResult:
+    kept: List[str] = field(default_factory=list)
+    # (dropped text, source of the chunk it duplicates)
+    dropped: List[Tuple[str, str]] = field(default_factory=list)
+
+
+class ChunkDeduper:
+    """Remembers kept chunks of one scope and rejects near-duplicates of them.
+
+    Thread-safe: KB chunk workers call filter() concurrently.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: int = 128,
+        shingle: int = 5,
+        seed: int = 1,
+    ):
+        self.threshold = default_threshold() if threshold is None else threshold
+        self.num_perm = num_perm
+        self.shingle = shingle
+        # Rows per band: the LSH candidate threshold (1/b)^(1/r) must sit below
+        # self.threshold so true duplicates are rarely missed
+        self.rows = 8 if self.threshold >= 0.75 else 4
+        self.bands = num_perm // self.rows
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE), size=num_perm, dtype=np.uint64)
+        self._exact: Dict[str, str] = {}
+        self._seeded: Dict[str, str] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        # None for chunks whose source was forgotten
+        self._sources: List[Optional[str]] = []
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "kept": 0, "exact": 0, "near": 0}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of the text's word shingles (None when too short)"""
+        words = _WORD.findall(text.lower())
+        if len(words) < self.shingle:
+            return None
+        shingles = {" ".join(words[i:i + self.shingle]) for i in range(len(words) - self.shingle + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * h + b) mod p for every permutation at once, then min over shingles
+        with np.errstate(over="ignore"):
+            perm = (np.outer(hashes, self._a) + self._b) % _MERSENNE
+        return (perm & _MAX_HASH).min(axis=0)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def seed_hashes(self, content_hashes: Iterable[str], source: str = "") -> None:
+        """Register chunks stored by an earlier run (e.g. of pages skipped as
+        unchanged) by their content_hash, for exact matching. A source never
+        matches its own seeds."""
+        with self._lock:
+            for h in content_hashes:
+                if h:
+                    self._seeded.setdefault(h, source)
+
+    def seeded_sources(self, pieces: Sequence[str], source: str = "") -> Set[str]:
+        """Sources whose seeded chunks some of pieces would duplicate (read-only)"""
+        with self._lock:
+            if not self._seeded:
+                return set()
+            hits = {self._seeded.get(text_hash(p)) for p in pieces}
+        return {h for h in hits if h is not None and h != source}
+
+    def forget(self, source: str) -> None:
+        """Drop everything registered for source (seeds and kept chunks), e.g.
+        before the page is chunked again"""
+        with self._lock:
+            self._seeded = {h: s for h, s in self._seeded.items() if s != source}
+            self._exact = {k: s for k, s in self._exact.items() if s != source}
+            for idx, s in enumerate(self._sources):
+                if s == source:
+                    self._sources[idx] = None
+
+    def check(self, text: str, source: str = "") -> Optional[str]:
+        """Source of the kept chunk text duplicates, or None (text is then kept)"""
+        key = hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()
+        sig = self.signature(text)
+        with self._lock:
+            self.stats["checked"] += 1
+            original = self._exact.get(key)
+            if original is None and self._seeded:
+                seeded = self._seeded.get(text_hash(text))
+                if seeded != source:
+                    original = seeded
+            if original is not None:
+                self.stats["exact"] += 1
+                return original
+            bands = self._band_keys(sig) if sig is not None else []
+            if sig is not None:
+                candidates = set()
+                for bucket, band in zip(self._buckets, bands):
+                    candidates.update(bucket.get(band, ()))
+                for idx in candidates:
+                    if self._sources[idx] is None:
+                        continue
+                    if float(np.mean(self._signatures[idx] == sig)) >= self.threshold:
+                        self.stats["near"] += 1
+                        return self._sources[idx]
+            # Keep it
+            self._exact[key] = source
+            self.stats["kept"] += 1
+            if sig is not None:
+                idx = len(self._signatures)
+                self._signatures.append(sig)
+                self._sources.append(source)
+                for bucket, band in zip(self._buckets, bands):
+                    bucket.setdefault(band, []).append(idx)
+            return None
+
+    def filter(self, pieces: Sequence[str], source: str = "") -> DedupResult:
+        result = DedupResult()
+        for p in pieces:
+            original = self.check(p, source)
+            if original is None:
+                result.kept.append(p)
+            else:
+                result.dropped.append((p, original))
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        return {**self.stats, "duplicates": self.stats["exact"] + self.stats["near"], "threshold": self.threshold}
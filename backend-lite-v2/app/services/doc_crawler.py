@@ -0,0 +1,223 @@
+"""
+Documentation Crawler
+=====================
+
+Async breadth-first crawler for documentation sites, replacing agno's
+synchronous WebsiteReader in pack processing (which blocked the event loop
+for the whole crawl):
+
+- bounded frontier: a crawl admits at most max_pages URLs, so the queue and
+  the seen-set never outgrow the page budget; links are followed within the
+  start URL's domain up to max_depth (the start page is depth 1, as in
+  WebsiteReader)
+- fetching through the crawl cache and the shared DocFetcher, which applies
+  the global and per-host concurrency limits, politeness delay and retries
+  across every crawl running in the process
+- HTML parsed off the event loop (html_extractor process pool / thread),
+  content and links from one parse
+- PDFs parsed in memory with pypdf, never through a shared temp file
+- an overall time budget (deadline): when it runs out the crawl stops and
+  returns the pages collected so far
+- pages are returned in (depth, discovery) order, not completion order, so
+  the same site yields the same documentation text on every crawl; links
+  are resolved against the URL a redirect landed on
+
+Env:
+- KIFF_CRAWL_CONCURRENCY: pages in flight per crawl (default 8)
+- KIFF_CRAWL_PAGE_MAX_BYTES: HTML page size cap (default 5 MB)
+"""
+
+import asyncio
+import io
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from urllib.parse import urljoin, urlsplit
+
+from .crawl_cache import get_crawl_cache, normalize_url
+from .html_extractor import extract_page_async
+
+# Link targets that are never documentation pages
+_SKIP_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".mjs", ".map",
+    ".zip", ".gz", ".tgz", ".tar", ".mp4", ".mp3", ".woff", ".woff2", ".ttf", ".xml", ".json",
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _domain(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def is_pdf(url: str, content: bytes = b"") -> bool:
+    return urlsplit(url).path.lower().endswith(".pdf") or content[:5] == b"%PDF-"
+
+
+def pdf_text(content: bytes) -> List[str]:
+    """Text of each PDF page, parsed from memory"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    return [t for t in ((page.extract_text() or "").strip() for page in reader.pages) if t]
+
+
+@dataclass
+class CrawledPage:
+    url: str
+    depth: int
+    text: str
+    kind: str = "html"  # "html" | "pdf"
+    # Admission order within the crawl; with depth it gives a stable page order
+    order: int = 0
+
+
+@dataclass
+class CrawlResult:
+    pages: List[CrawledPage] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    timed_out: bool = False
+    seconds: float = 0.0
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "pages": len(self.pages),
+            "errors": len(self.errors),
+            "timed_out": self.timed_out,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+class DocCrawler:
+    """One breadth-first crawl from a start URL"""
+
+    def __init__(
+        self,
+        *,
+        max_pages: int,
+        max_depth: int,
+        deadline: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        seen: Optional[Set[str]] = None,
+        pdf_max_bytes: int = 50 * 1024 * 1024,
+    ):
+        self.max_pages = max(1, max_pages)
+        self.max_depth = max(1, max_depth)
+        # time.monotonic() value after which no new pages are fetched
+        self.deadline = deadline
+        self.concurrency = max(1, concurrency or _env_int("KIFF_CRAWL_CONCURRENCY", 8))
+        self.page_max_bytes = _env_int("KIFF_CRAWL_PAGE_MAX_BYTES", 5 * 1024 * 1024)
+        self.pdf_max_bytes = pdf_max_bytes
+        # Shared between the crawls of one pack so overlapping sites are fetched once
+        self.seen = seen if seen is not None else set()
+        self._admitted = 0
+        self._order: Dict[str, int] = {}
+
+    def _admit(self, url: str) -> bool:
+        key = normalize_url(url)
+        if key in self.seen or self._admitted >= self.max_pages:
+            return False
+        self.seen.add(key)
+        self._order[url] = self._admitted
+        self._admitted += 1
+        return True
+
+    def _follow(self, page_url: str, href: str, domain: str) -> Optional[str]:
+        if href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            return None
+        url = urljoin(page_url, href).split("#", 1)[0]
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return None
+        host = _domain(url)
+        if host != domain and not host.endswith("." + domain):
+            return None
+        if parts.path.lower().endswith(_SKIP_EXTENSIONS):
+            return None
+        return url
+
+    async def _fetch_one(self, url: str, depth: int, domain: str, result: CrawlResult) -> List[str]:
+        """Fetch and extract one page; returns the URLs to follow from it"""
+        page = await get_crawl_cache().fetch(
+            url,
+            max_bytes=self.pdf_max_bytes if is_pdf(url) else self.page_max_bytes,
+        )
+        if page.truncated and is_pdf(url, page.content):
+            raise ValueError(f"PDF larger than {self.pdf_max_bytes} bytes")
+        if is_pdf(url, page.content):
+            pages = await asyncio.to_thread(pdf_text, page.content)
+            result.pages.append(CrawledPage(url=url, depth=depth, text="\n\n".join(pages), kind="pdf", order=self._order.get(url, 0)))
+            return []
+        text, hrefs = await extract_page_async(page.text)
+        if text:
+            result.pages.append(CrawledPage(url=url, depth=depth, text=text, order=self._order.get(url, 0)))
+        if depth >= self.max_depth:
+            return []
+        # Relative links are relative to where a redirect landed, not the requested URL
+        base = page.final_url or url
+        out = []
+        for href in hrefs:
+            nxt = self._follow(base, href, domain)
+            if nxt is not None:
+                out.append(nxt)
+        return out
+
+    async def crawl(self, start_url: str) -> CrawlResult:
+        result = CrawlResult()
+        t0 = time.monotonic()
+        if not self._admit(start_url):
+            return result
+        domain = _domain(start_url)
+        frontier: "asyncio.Queue" = asyncio.Queue()
+        frontier.put_nowait((start_url, 1))
+
+        async def _worker() -> None:
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    for nxt in await self._fetch_one(url, depth, domain, result):
+                        if self._admit(nxt):
+                            frontier.put_nowait((nxt, depth + 1))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    result.errors[url] = str(e)[:300]
+                finally:
+                    frontier.task_done()
+
+        workers = [asyncio.create_task(_worker()) for _ in range(self.concurrency)]
+        try:
+            timeout = None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+            await asyncio.wait_for(frontier.join(), timeout)
+        except asyncio.TimeoutError:
+            result.timed_out = True
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        # Pages finish in network order; callers join them into prompts, which
+        # must not change from one crawl of the same site to the next
+        result.pages.sort(key=lambda p: (p.depth, p.order))
+        result.seconds = time.monotonic() - t0
+        return result
+
+
+async def crawl_site(
+    url: str,
+    *,
+    max_pages: int,
+    max_depth: int,
+    deadline: Optional[float] = None,
+    seen: Optional[Set[str]] = None,
+    pdf_max_bytes: int = 50 * 1024 * 1024,
+) -> CrawlResult:
+    """Crawl url (a PDF URL yields that single document)"""
+    crawler = DocCrawler(max_pages=max_pages, max_depth=max_depth, deadline=deadline, seen=seen, pdf_max_bytes=pdf_max_bytes)
+    return await crawler.crawl(url)
@@ -0,0 +1,311 @@
+"""
+Documentation Fetcher
+=====================
+
+Shared HTTP fetcher for documentation ingestion (extract, kb, sitemap,
+admin URL extraction). One pooled httpx client per event loop with:
+
+- a global concurrency limit plus a per-host limit
+- per-host politeness delay between request starts
+- retries with exponential backoff (honors Retry-After on 429/503)
+- response size caps with streaming, incremental gunzip and decode
+- transparent gzip handling for *.gz sitemaps
+
+Env:
+- KIFF_FETCH_MAX_CONCURRENCY (default 16)
+- KIFF_FETCH_PER_HOST (default 4)
+- KIFF_FETCH_POLITENESS_MS (default 100)
+- KIFF_FETCH_RETRIES (default 2)
+- KIFF_FETCH_MAX_BYTES (default 5 MB)
+- KIFF_FETCH_TIMEOUT_SEC (default 30)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import os
+import random
+import time
+import weakref
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+import httpx
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+}
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+@dataclass
+class FetchResult:
+    url: str
+    final_url: str
+    status_code: int
+    text: str
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    elapsed_ms: int = 0
+    attempts: int = 1
+    truncated: bool = False
+
+    @property
+    def content_type(self) -> str:
+        return (self.headers.get("content-type") or "").lower()
+
+
+class FetchError(Exception):
+    """Raised when a URL cannot be fetched after all retries"""
+
+    def __init__(self, url: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{message} ({url})")
+        self.url = url
+        self.status_code = status_code
+
+
+class DocFetcher:
+    """Pooled, rate-limited fetcher bound to one event loop"""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        per_host: Optional[int] = None,
+        politeness_ms: Optional[int] = None,
+        retries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or _env_int("KIFF_FETCH_MAX_CONCURRENCY", 16)
+        self.per_host = per_host or _env_int("KIFF_FETCH_PER_HOST", 4)
+        self.politeness = (politeness_ms if politeness_ms is not None else _env_int("KIFF_FETCH_POLITENESS_MS", 100)) / 1000.0
+        self.retries = retries if retries is not None else _env_int("KIFF_FETCH_RETRIES", 2)
+        self.max_bytes = max_bytes or _env_int("KIFF_FETCH_MAX_BYTES", 5 * 1024 * 1024)
+        self.timeout = timeout or float(_env_int("KIFF_FETCH_TIMEOUT_SEC", 30))
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._host_next: Dict[str, float] = {}
+        self._host_lock = asyncio.Lock()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "bytes": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self, host: str):
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with self._global, sem:
+            # Politeness: space out request starts to the same host
+            async with self._host_lock:
+                now = time.monotonic()
+                start_at = max(now, self._host_next.get(host, 0.0))
+                self._host_next[host] = start_at + self.politeness
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            yield
+
+    @staticmethod
+    def _decoder(response: httpx.Response) -> codecs.IncrementalDecoder:
+        try:
+            return codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+        except LookupError:
+            return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async def _read_capped(self, response: httpx.Response, max_bytes: int) -> Tuple[bytes, str, bool]:
+        """Read up to max_bytes, gunzipping and decoding each chunk as it arrives.
+
+        Returns (body, text, truncated); body is the decompressed content. A
+        multibyte char cut by the size cap becomes U+FFFD.
+        """
+        raw: List[bytes] = []
+        body: List[bytes] = []
+        parts: List[str] = []
+        decoder = self._decoder(response)
+        gunzip: Optional[Any] = None
+        size = 0
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            if size + len(chunk) > max_bytes:
+                chunk = chunk[: max_bytes - size]
+                truncated = True
+            if not raw and chunk[:2] == b"\x1f\x8b":
+                # *.gz sitemaps arrive as gzip payloads (no Content-Encoding)
+                gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            raw.append(chunk)
+            size += len(chunk)
+            data = chunk
+            if gunzip is not None:
+                try:
+                    data = gunzip.decompress(chunk)
+                except zlib.error:
+                    # Not gzip after all: fall back to the raw bytes read so far
+                    gunzip = None
+                    decoder = self._decoder(response)
+                    data = b"".join(raw)
+                    body.clear()
+                    parts.clear()
+            body.append(data)
+            parts.append(decoder.decode(data))
+            if truncated:
+                break
+        parts.append(decoder.decode(b"", final=True))
+        return b"".join(body), "".join(parts), truncated
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return min(60.0, max(0.0, float(value)))
+        except ValueError:
+            return None
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        method: str = "GET",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        retries: Optional[int] = None,
+        raise_for_status: bool = True,
+    ) -> FetchResult:
+        """Fetch one URL within the concurrency limits, retrying transient failures."""
+        host = urlparse(url).netloc
+        cap = max_bytes or self.max_bytes
+        attempts_allowed = 1 + (self.retries if retries is None else retries)
+        last_error: Optional[Exception] = None
+
+        for attempt in range(1, attempts_allowed + 1):
+            delay: Optional[float] = None
+            async with self._slot(host):
+                t0 = time.monotonic()
+                self.stats["requests"] += 1
+                try:
+                    async with self.client.stream(method, url, headers=headers, timeout=timeout or self.timeout) as r:
+                        if r.status_code in _RETRY_STATUS and attempt < attempts_allowed:
+                            delay = self._retry_after(r)
+                            last_error = FetchError(url, f"HTTP {r.status_code}", r.status_code)
+                        else:
+                            if raise_for_status and r.status_code >= 400:
+                                raise FetchError(url, f"HTTP {r.status_code}", r.status_code)
+                            body, text, truncated = (b"", "", False) if method == "HEAD" else await self._read_capped(r, cap)
+                            self.stats["bytes"] += len(body)
+                            return FetchResult(
+                                url=url,
+                                final_url=str(r.url),
+                                status_code=r.status_code,
+                                text=text,
+                                content=body,
+                                headers={k.lower(): v for k, v in r.headers.items()},
+                                elapsed_ms=int((time.monotonic() - t0) * 1000),
+                                attempts=attempt,
+                                truncated=truncated,
+                            )
+                except FetchError:
+                    self.stats["errors"] += 1
+                    raise
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    last_error = e
+                    if attempt >= attempts_allowed:
+                        break
+            # Back off outside the slot so other URLs can proceed
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay if delay is not None else (0.5 * 2 ** (attempt - 1)) + random.uniform(0, 0.25))
+
+        self.stats["errors"] += 1
+        if isinstance(last_error, FetchError):
+            raise last_error
+        raise FetchError(url, f"fetch failed: {last_error}")
+
+    async def fetch_text(self, url: str, **kwargs: Any) -> str:
+        return (await self.fetch(url, **kwargs)).text
+
+    async def fetch_all(self, urls: Sequence[str], **kwargs: Any) -> List[Union[FetchResult, Exception]]:
+        """Fetch all URLs concurrently; results (or exceptions) keep input order."""
+        return await asyncio.gather(*(self.fetch(u, **kwargs) for u in urls), return_exceptions=True)
+
+    async def iter_fetch(self, urls: Sequence[str], **kwargs: Any) -> AsyncIterator[Tuple[str, Union[FetchResult, Exception]]]:
+        """Yield (url, result-or-exception) pairs as each fetch completes."""
+
+        async def _one(u: str):
+            try:
+                return u, await self.fetch(u, **kwargs)
+            except Exception as e:
+                return u, e
+
+        tasks = [asyncio.ensure_future(_one(u)) for u in urls]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# One fetcher per event loop: httpx clients and asyncio primitives are loop-bound,
+# and agent tools occasionally run fetches on short-lived loops in worker threads.
+_fetchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, DocFetcher]" = weakref.WeakKeyDictionary()
+
+
+def get_fetcher() -> DocFetcher:
+    """Get the shared fetcher for the running event loop"""
+    loop = asyncio.get_running_loop()
+    fetcher = _fetchers.get(loop)
+    if fetcher is None:
+        fetcher = DocFetcher()
+        _fetchers[loop] = fetcher
+    return fetcher
+
+
+async def close_fetchers(timeout: float = 5.0) -> None:
+    """Close every loop's fetcher (app shutdown); fetchers on loops that are gone are dropped"""
+    current = asyncio.get_running_loop()
+    for loop, fetcher in list(_fetchers.items()):
+        try:
+            if loop is current:
+                await fetcher.aclose()
+            elif loop.is_running():
+                # The client is bound to its own loop; close it there
+                fut = asyncio.run_coroutine_threadsafe(fetcher.aclose(), loop)
+                await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+        except Exception as e:
+            print(f"[FETCH] closing fetcher failed: {e}")
+    _fetchers.clear()
@@ -14,23 +14,26 @@ logger = logging.getLogger(__name__)
 # Local embedder setup using proven caching patterns
 # Allow backend-only override via env while keeping simple default
 EMBEDDING_MODEL_NAME = os.getenv("KIFF_ST_EMBEDDER_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# CPU inference backend: torch (default), onnx, onnx-int8 or int8
+EMBEDDING_BACKEND = os.getenv("KIFF_ST_BACKEND", "torch")
 
 # Global caches - single instance for entire application
 _embed_model_cache: Optional = None
 _raw_model_cache = None
+_raw_model_info: dict = {}
 
 def get_raw_model():
     """Get raw SentenceTransformer model using local cache"""
-    global _raw_model_cache
+    global _raw_model_cache, _raw_model_info
     if _raw_model_cache is None:
         try:
             # Fix tokenizers parallelism warning
             os.environ["TOKENIZERS_PARALLELISM"] = "false"
             
-            from sentence_transformers import SentenceTransformer
-            logger.info(f"[EMBEDDER_CACHE] Loading raw SentenceTransformer: {EMBEDDING_MODEL_NAME}")
-            _raw_model_cache = SentenceTransformer(EMBEDDING_MODEL_NAME)
-            logger.info(f"[EMBEDDER_CACHE] ✅ Raw model loaded successfully (locally cached)")
+            from .embedding_backends import load_sentence_model
+            logger.info(f"[EMBEDDER_CACHE] Loading raw SentenceTransformer: {EMBEDDING_MODEL_NAME} (backend={EMBEDDING_BACKEND})")
+            _raw_model_cache, _raw_model_info = load_sentence_model(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+            logger.info(f"[EMBEDDER_CACHE] ✅ Raw model loaded successfully (locally cached, {_raw_model_info})")
         except Exception as e:
             logger.error(f"[EMBEDDER_CACHE] ❌ Raw model failed: {e}")
             return None
@@ -38,6 +41,10 @@ def get_raw_model():
         logger.info(f"[EMBEDDER_CACHE] ✅ Using cached raw model (no download)")
     return _raw_model_cache
 
+def get_model_key() -> str:
+    """Identifies vectors produced by the raw model (model + inference backend)"""
+    return f"{EMBEDDING_MODEL_NAME}|{EMBEDDING_BACKEND}"
+
 def get_embedder():
     """Get the single global AGNO embedder instance (cached)"""
     global _embed_model_cache
@@ -68,9 +75,10 @@ def get_embedder():
 
 def clear_cache():
     """Clear all embedding caches (for debugging)"""
-    global _embed_model_cache, _raw_model_cache
+    global _embed_model_cache, _raw_model_cache, _raw_model_info
     _embed_model_cache = None
     _raw_model_cache = None
+    _raw_model_info = {}
     logger.info("[EMBEDDER_CACHE] All caches cleared")
 
 def get_cache_stats():
@@ -78,5 +86,6 @@ def get_cache_stats():
     return {
         "embed_model_cached": _embed_model_cache is not None,
         "raw_model_cached": _raw_model_cache is not None,
-        "embedding_model": EMBEDDING_MODEL_NAME
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "backend": _raw_model_info or {"requested_backend": EMBEDDING_BACKEND}
     }
\ No newline at end of file
@@ -0,0 +1,111 @@
+# embedding_backends.py
+"""
+Pluggable CPU inference backends for the local sentence-transformers model.
+Mirrors ml-service/app/services/embedding_backends.py so both services load
+the same export the same way (torch, onnx, onnx-int8 or int8); change both
+together.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8", "int8")
+
+# Pre-quantized ONNX exports published alongside most sentence-transformers models
+_ONNX_INT8_FILE = os.getenv("KIFF_ST_ONNX_INT8_FILE", "onnx/model_qint8_avx512.onnx")
+
+
+def detect_cpu_threads() -> int:
+    """Number of cores actually available to this process (affinity and cgroup quota aware)"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except Exception:
+        cores = os.cpu_count() or 1
+    # Containers often expose all host cores but cap CPU time via cgroup v2
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except Exception:
+        pass
+    return max(1, cores)
+
+
+def configure_threads(num_threads: Optional[int] = None) -> int:
+    """Set intra-op thread counts for torch/ONNX Runtime; returns the count used"""
+    threads = num_threads or int(os.getenv("KIFF_ST_NUM_THREADS", "0") or 0) or detect_cpu_threads()
+    # OpenMP/MKL builds read these; ONNX Runtime sessions get onnx_session_options()
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    return threads
+
+
+def onnx_session_options(threads: int):
+    """ONNX Runtime session options pinned to threads (None without onnxruntime).
+
+    ONNX Runtime sizes its own intra-op pool and ignores OMP_NUM_THREADS, so
+    the count has to be passed explicitly at session creation.
+    """
+    try:
+        import onnxruntime as ort
+    except Exception:
+        return None
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    # Sentence-transformers graphs run sequentially; one inter-op thread is enough
+    opts.inter_op_num_threads = 1
+    return opts
+
+
+def load_sentence_model(model_name: str, backend: Optional[str] = None, num_threads: Optional[int] = None):
+    """Load a SentenceTransformer with the requested inference backend.
+
+    Returns (model, info) where info records the backend actually used. Unsupported
+    backends (old sentence-transformers, missing optimum/onnxruntime) fall back to torch.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    requested = (backend or "torch").lower()
+    if requested not in BACKENDS:
+        logger.warning(f"[EMBEDDER_CACHE] ⚠️ Unknown backend '{requested}', using torch")
+        requested = "torch"
+    threads = configure_threads(num_threads)
+    info: Dict[str, Any] = {"requested_backend": requested, "backend": "torch", "threads": threads}
+
+    if requested in ("onnx", "onnx-int8"):
+        kwargs: Dict[str, Any] = {"backend": "onnx", "model_kwargs": {"provider": "CPUExecutionProvider"}}
+        if requested == "onnx-int8":
+            kwargs["model_kwargs"]["file_name"] = _ONNX_INT8_FILE
+        session_options = onnx_session_options(threads)
+        if session_options is not None:
+            kwargs["model_kwargs"]["session_options"] = session_options
+        try:
+            model = SentenceTransformer(model_name, device="cpu", **kwargs)
+            info["backend"] = requested
+            return model, info
+        except Exception as e:
+            info["fallback_reason"] = str(e)
+            logger.warning(f"[EMBEDDER_CACHE] ⚠️ {requested} backend unavailable ({e}); falling back to torch")
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if requested == "int8":
+        try:
+            import torch
+            # Dynamic int8 quantization of the transformer's Linear layers
+            model[0].auto_model = torch.quantization.quantize_dynamic(
+                model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            info["backend"] = "int8"
+        except Exception as e:
+            info["fallback_reason"] = str(e)
+            logger.warning(f"[EMBEDDER_CACHE] ⚠️ int8 quantization failed ({e}); using torch")
+    return model, info
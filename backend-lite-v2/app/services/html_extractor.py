@@ -0,0 +1,508 @@
+"""
+HTML Extractor
+==============
+
+Main-content extraction for documentation pages.
+
+Replaces `BeautifulSoup(html, "html.parser").get_text()` with:
+
+- a faster parser backend: selectolax (lexbor) or lxml when installed, with
+  BeautifulSoup as the fallback; one extraction algorithm runs on all of them
+- main-content detection: drops scripts, navigation, headers/footers,
+  sidebars and other site chrome, then keeps the <main>/<article>/docs body
+  (or the densest text block)
+- structure-preserving output: headings as Markdown "#" lines, code blocks
+  as fenced blocks with their language, list items and table rows kept
+- a process pool for large pages so CPU-bound parsing does not hold the GIL
+  of the serving process
+
+Env:
+- KIFF_HTML_PARSER: auto (default) | selectolax | lxml | bs4
+- KIFF_HTML_POOL_WORKERS: process pool size (default min(4, cpus); 0 disables)
+- KIFF_HTML_POOL_MIN_BYTES: pages smaller than this are extracted in a thread (default 50000)
+"""
+
+import asyncio
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+# Elements that never hold documentation text
+_DROP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "form", "button", "select", "input", "textarea", "nav", "footer", "aside",
+    "head", "meta", "link",
+}
+# Site chrome outside the main container, but the title block of an article
+# inside it (Docusaurus, MkDocs and Sphinx put the page's <h1> in a <header>)
+_CHROME_TAGS = {"header"}
+_DROP_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "menu", "menubar", "dialog"}
+_BOILERPLATE = re.compile(
+    r"(^|[\s_-])(nav|navbar|sidebar|side-bar|breadcrumbs?|footer|cookie|consent|banner|toc|"
+    r"table-of-contents|menu|skip-link|edit-this-page|pagination|pager|feedback|announcement|"
+    r"social|share|newsletter|ads?|advert)([\s_-]|$)",
+    re.I,
+)
+# Main-content candidates in priority order: (tag, attribute, value-substring)
+_MAIN_SELECTORS: List[Tuple[Optional[str], Optional[str], Optional[str]]] = [
+    ("main", None, None),
+    (None, "role", "main"),
+    ("article", None, None),
+    (None, "class", "markdown"),
+    (None, "class", "docs-content"),
+    (None, "class", "main-content"),
+    (None, "class", "theme-doc-markdown"),
+    (None, "id", "content"),
+    (None, "class", "content"),
+]
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "blockquote", "dl", "dt", "dd", "figure",
+    "figcaption", "details", "summary", "table", "thead", "tbody", "tfoot", "ul", "ol", "br", "hr",
+}
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+_LANG_RE = re.compile(r"(?:language|lang|highlight)-([\w+#.-]+)")
+_TEXT_TAG = "#text"
+
+
+# ----- parser adapters -----
+# Each adapter turns a parsed document into a uniform node view:
+#   tag(node) -> str, attr(node, name) -> str, children(node) -> iterable of nodes or text,
+# with text children yielded as ("#text", str) tuples.
+
+
+def _available_backends() -> List[str]:
+    backends = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+        backends.append("selectolax")
+    except Exception:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        backends.append("lxml")
+    except Exception:
+        pass
+    backends.append("bs4")
+    return backends
+
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    """Backend actually used for `name` (auto picks the fastest installed)"""
+    requested = (name or os.getenv("KIFF_HTML_PARSER", "auto")).lower()
+    available = _available_backends()
+    if requested in available:
+        return requested
+    return available[0]
+
+
+def bs4_parser_name() -> str:
+    """Fastest BeautifulSoup tree builder available (for link discovery code that needs bs4)"""
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except Exception:
+        return "html.parser"
+
+
+class _Selectolax:
+    def __init__(self, html: str):
+        from selectolax.lexbor import LexborHTMLParser
+        self.root = LexborHTMLParser(html).body
+
+    @staticmethod
+    def tag(node) -> str:
+        return node.tag or ""
+
+    @staticmethod
+    def attr(node, name: str) -> str:
+        return (node.attributes or {}).get(name) or ""
+
+    @staticmethod
+    def children(node) -> Iterator[Any]:
+        child = node.child
+        while child is not None:
+            if child.tag == "-text":
+                yield (_TEXT_TAG, child.text_content or "")
+            elif child.tag and not child.tag.startswith("-"):
+                yield child
+            child = child.next
+
+
+class _Lxml:
+    def __init__(self, html: str):
+        import lxml.html
+        doc = lxml.html.document_fromstring(html)
+        body = doc.find("body")
+        self.root = body if body is not None else doc
+
+    @staticmethod
+    def tag(node) -> str:
+        return node.tag if isinstance(node.tag, str) else ""
+
+    @staticmethod
+    def attr(node, name: str) -> str:
+        return node.get(name) or ""
+
+    @staticmethod
+    def children(node) -> Iterator[Any]:
+        if node.text:
+            yield (_TEXT_TAG, node.text)
+        for child in node:
+            if isinstance(child.tag, str):
+                yield child
+            if child.tail:
+                yield (_TEXT_TAG, child.tail)
+
+
+class _Bs4:
+    def __init__(self, html: str):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, bs4_parser_name())
+        self.root = soup.body or soup
+
+    @staticmethod
+    def tag(node) -> str:
+        return node.name or ""
+
+    @staticmethod
+    def attr(node, name: str) -> str:
+        value = node.attrs.get(name) if hasattr(node, "attrs") else None
+        if isinstance(value, list):
+            return " ".join(value)
+        return value or ""
+
+    @staticmethod
+    def children(node) -> Iterator[Any]:
+        from bs4 import Comment, NavigableString
+        for child in node.children:
+            if isinstance(child, Comment):
+                continue
+            if isinstance(child, NavigableString):
+                yield (_TEXT_TAG, str(child))
+            else:
+                yield child
+
+
+_ADAPTERS = {"selectolax": _Selectolax, "lxml": _Lxml, "bs4": _Bs4}
+
+
+# ----- main content detection -----
+
+
+def _is_text(node) -> bool:
+    return isinstance(node, tuple)
+
+
+def _is_boilerplate(a, node, in_main: bool = False) -> bool:
+    tag = a.tag(node)
+    if tag in _DROP_TAGS or (tag in _CHROME_TAGS and not in_main):
+        return True
+    if a.attr(node, "role").lower() in _DROP_ROLES:
+        return True
+    if a.attr(node, "aria-hidden") == "true" or a.attr(node, "hidden") or "display:none" in a.attr(node, "style").replace(" ", ""):
+        return True
+    # Never drop code or headings because of a class name
+    if tag in ("pre", "code") or tag in _HEADINGS:
+        return False
+    marker = f"{a.attr(node, 'class')} {a.attr(node, 'id')}"
+    return bool(marker.strip()) and bool(_BOILERPLATE.search(marker))
+
+
+def _matches(a, node, sel) -> bool:
+    tag, attr, value = sel
+    if tag and a.tag(node) != tag:
+        return False
+    if attr:
+        got = a.attr(node, attr).lower()
+        if attr == "class":
+            return value in got.split()
+        return got == value
+    return True
+
+
+def _find_main(a, root):
+    """First node matching the main-content selectors (in priority order), else None"""
+    found: List[Any] = [None] * len(_MAIN_SELECTORS)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if _is_boilerplate(a, node):
+            continue
+        for i, sel in enumerate(_MAIN_SELECTORS):
+            if found[i] is None and _matches(a, node, sel):
+                found[i] = node
+        if found[0] is not None:
+            break
+        stack.extend(reversed([c for c in a.children(node) if not _is_text(c)]))
+    for node in found:
+        if node is not None:
+            return node
+    return None
+
+
+def _text_len(a, node) -> Tuple[int, int]:
+    """(characters of text, characters inside links) below node, skipping boilerplate"""
+    total = link = 0
+    stack = [(node, False)]
+    while stack:
+        cur, in_link = stack.pop()
+        for child in a.children(cur):
+            if _is_text(child):
+                n = len(child[1].strip())
+                total += n
+                if in_link:
+                    link += n
+            elif not _is_boilerplate(a, child):
+                stack.append((child, in_link or a.tag(child) == "a"))
+    return total, link
+
+
+def _densest_block(a, root):
+    """Fallback when no semantic container exists: the block with the most non-link text"""
+    best, best_score = root, 0.0
+    for child in a.children(root):
+        if _is_text(child) or _is_boilerplate(a, child):
+            continue
+        total, link = _text_len(a, child)
+        score = total - 2 * link
+        if score > best_score:
+            best, best_score = child, score
+    root_total, root_link = _text_len(a, root)
+    # Only narrow down when one block clearly dominates the page
+    if best is not root and best_score >= 0.6 * max(1, root_total - 2 * root_link):
+        return _densest_block(a, best)
+    return root
+
+
+# ----- rendering -----
+
+
+def _code_language(a, node) -> str:
+    for n in (node, *[c for c in a.children(node) if not _is_text(c)][:1]):
+        m = _LANG_RE.search(a.attr(n, "class"))
+        if m:
+            return m.group(1)
+    return ""
+
+
+def _raw_text(a, node) -> str:
+    """Text below node with whitespace kept as-is (code blocks depend on it)"""
+    parts: List[str] = []
+
+    def walk(n):
+        for child in a.children(n):
+            if _is_text(child):
+                parts.append(child[1])
+            elif a.tag(child) == "br":
+                parts.append("\n")
+            elif a.tag(child) not in ("script", "style", "button"):
+                walk(child)
+
+    walk(node)
+    return "".join(parts)
+
+
+def _is_main_container(a, node) -> bool:
+    return any(_matches(a, node, sel) for sel in _MAIN_SELECTORS[:3])
+
+
+def _render(a, node, out: List[str], list_depth: int = 0, in_main: bool = False) -> None:
+    for child in a.children(node):
+        if _is_text(child):
+            text = re.sub(r"\s+", " ", child[1])
+            if text.strip() or (out and not out[-1].endswith((" ", "\n"))):
+                out.append(text)
+            continue
+        if _is_boilerplate(a, child, in_main):
+            continue
+        tag = a.tag(child)
+        child_in_main = in_main or _is_main_container(a, child)
+        if tag in _HEADINGS:
+            heading = re.sub(r"\s+", " ", _raw_text(a, child)).strip().rstrip("#¶").strip()
+            if heading:
+                out.append(f"\n\n{'#' * _HEADINGS[tag]} {heading}\n\n")
+        elif tag == "pre":
+            code = _raw_text(a, child).strip("\n")
+            if code.strip():
+                out.append(f"\n\n```{_code_language(a, child)}\n{code}\n```\n\n")
+        elif tag == "code":
+            code = _raw_text(a, child).strip()
+            if code:
+                out.append(f"`{code}`" if "\n" not in code else f"\n\n```\n{code}\n```\n\n")
+        elif tag == "li":
+            out.append("\n" + "  " * max(0, list_depth - 1) + "- ")
+            _render(a, child, out, list_depth, child_in_main)
+        elif tag in ("ul", "ol"):
+            _render(a, child, out, list_depth + 1, child_in_main)
+            out.append("\n")
+        elif tag == "tr":
+            cells = [re.sub(r"\s+", " ", _raw_text(a, c)).strip() for c in a.children(child) if not _is_text(c) and a.tag(c) in ("td", "th")]
+            if any(cells):
+                out.append("\n| " + " | ".join(cells) + " |")
+        elif tag == "img":
+            alt = a.attr(child, "alt").strip()
+            if alt:
+                out.append(f" {alt} ")
+        elif tag in _BLOCK_TAGS:
+            out.append("\n")
+            _render(a, child, out, list_depth, child_in_main)
+            out.append("\n")
+        else:
+            _render(a, child, out, list_depth, child_in_main)
+
+
+def _tidy(text: str) -> str:
+    lines = [ln.rstrip() for ln in text.split("\n")]
+    out: List[str] = []
+    blank = 0
+    in_code = False
+    for ln in lines:
+        if ln.startswith("```"):
+            in_code = not in_code
+        if not in_code:
+            ln = ln.strip() if not ln.lstrip().startswith("- ") else ln
+        if not ln.strip() and not in_code:
+            blank += 1
+            if blank > 1:
+                continue
+        else:
+            blank = 0
+        out.append(ln)
+    return "\n".join(out).strip()
+
+
+def _parse(html: str, backend: Optional[str]):
+    name = resolve_backend(backend)
+    a = _ADAPTERS[name]
+    try:
+        doc = a(html)
+    except Exception:
+        if name == "bs4":
+            raise
+        a = _ADAPTERS["bs4"]
+        doc = a(html)
+    return a, doc.root
+
+
+def _links(a, root) -> List[str]:
+    """href values of all <a> elements under root, in document order"""
+    hrefs: List[str] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if a.tag(node) == "a":
+            href = a.attr(node, "href").strip()
+            if href:
+                hrefs.append(href)
+        stack.extend(reversed([c for c in a.children(node) if not _is_text(c)]))
+    return hrefs
+
+
+def extract_page(html: str, backend: Optional[str] = None, main_only: bool = True) -> Tuple[str, List[str]]:
+    """Main content plus the raw href values of the page from one parse.
+
+    Links are collected from the whole <body>, navigation included, since that
+    is where documentation sites keep their page tree.
+    """
+    if not html or not html.strip():
+        return "", []
+    a, root = _parse(html, backend)
+    if root is None:
+        return "", []
+    hrefs = _links(a, root)
+    in_main = False
+    if main_only:
+        # An lxml element without child elements is falsy: compare with None
+        main = _find_main(a, root)
+        in_main = main is not None
+        root = main if main is not None else _densest_block(a, root)
+    out: List[str] = []
+    _render(a, root, out, in_main=in_main)
+    return _tidy("".join(out)), hrefs
+
+
+def extract_main_content(html: str, backend: Optional[str] = None, main_only: bool = True) -> str:
+    """Extract the documentation text of one HTML page.
+
+    main_only=False keeps the whole <body> (still without scripts and site chrome).
+    """
+    if not html or not html.strip():
+        return ""
+    a, root = _parse(html, backend)
+    if root is None:
+        return ""
+    in_main = False
+    if main_only:
+        # An lxml element without child elements is falsy: compare with None
+        main = _find_main(a, root)
+        in_main = main is not None
+        root = main if main is not None else _densest_block(a, root)
+    out: List[str] = []
+    _render(a, root, out, in_main=in_main)
+    return _tidy("".join(out))
+
+
+def extractor_key(backend: Optional[str] = None) -> str:
+    """Identifies extractor output for caches; changes when the backend or algorithm does"""
+    return f"main-content-v1:{resolve_backend(backend)}"
+
+
+# ----- process pool -----
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _pool_workers() -> int:
+    default = min(4, os.cpu_count() or 1)
+    try:
+        return int(os.getenv("KIFF_HTML_POOL_WORKERS", str(default)))
+    except ValueError:
+        return default
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    workers = _pool_workers()
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def _off_loop(fn: Callable[..., Any], html: str, *args: Any) -> Any:
+    """Run fn(html, *args) off the event loop: large pages in the process pool, small ones in a thread"""
+    min_bytes = int(os.getenv("KIFF_HTML_POOL_MIN_BYTES", "50000"))
+    pool = _get_pool() if len(html) >= min_bytes else None
+    if pool is not None:
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, fn, html, *args)
+        except Exception as e:  # BrokenProcessPool, pickling errors: degrade to a thread
+            print(f"[HTML_EXTRACTOR] process pool unavailable ({e}); extracting in thread")
+            shutdown_pool()
+    return await asyncio.to_thread(fn, html, *args)
+
+
+async def extract_async(html: str, backend: Optional[str] = None, main_only: bool = True) -> str:
+    """extract_main_content() off the event loop"""
+    return await _off_loop(extract_main_content, html, backend, main_only)
+
+
+async def extract_page_async(html: str, backend: Optional[str] = None, main_only: bool = True) -> Tuple[str, List[str]]:
+    """extract_page() off the event loop"""
+    return await _off_loop(extract_page, html, backend, main_only)
@@ -0,0 +1,162 @@
+"""
+Incremental Index
+=================
+
+Helpers for re-indexing LanceDB tables without rewriting unchanged content.
+
+Rows carry a content_hash of their text and a page_hash of the source
+document they were chunked from. A re-index:
+
+1. scans the existing id / hash columns for the affected scope (one projection scan)
+2. skips documents whose page_hash is unchanged
+3. diffs the new chunks against what is stored: only new or changed chunks
+   are embedded, moved chunks reuse their stored vector
+4. removes stale chunks with one bulk delete and writes the rest with one
+   merge_insert upsert keyed on id
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Columns added to tables created before incremental indexing existed
+HASH_COLUMNS = {
+    "content_hash": "CAST(NULL AS STRING)",
+    "page_hash": "CAST(NULL AS STRING)",
+}
+
+# Keep IN (...) predicates well under DataFusion's expression limits
+_DELETE_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def page_hash(text: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Hash of a page's extracted text plus the chunking parameters used on it"""
+    sig = "|".join(f"{k}={params[k]}" for k in sorted(params or {}))
+    return text_hash(sig + "\n" + text)
+
+
+def chunk_ids(scope: str, pieces: Sequence[str]) -> List[Dict[str, str]]:
+    """Stable ids for the chunks of one document.
+
+    Ids depend on the chunk text (not its position) so inserting a paragraph
+    only adds rows instead of shifting every id after it. Repeated identical
+    chunks within a document get an occurrence suffix.
+    """
+    seen: Dict[str, int] = {}
+    out = []
+    for p in pieces:
+        h = text_hash(p)
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        cid = hashlib.sha1(f"{scope}|{h}|{n}".encode("utf-8")).hexdigest()
+        out.append({"id": cid, "content_hash": h})
+    return out
+
+
+def sql_quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def in_predicate(column: str, values: Iterable[str]) -> str:
+    return f"{column} IN ({', '.join(sql_quote(v) for v in values)})"
+
+
+def ensure_columns(table, columns: Optional[Dict[str, str]] = None):
+    """Add any missing hash columns to an existing table (no-op when present)"""
+    columns = columns or HASH_COLUMNS
+    names = set(table.schema.names)
+    missing = {k: v for k, v in columns.items() if k not in names}
+    if missing:
+        table.add_columns(missing)
+    return table
+
+
+def scan_existing(table, where: Optional[str], columns: Sequence[str], id_column: str = "id") -> Dict[str, Dict[str, Any]]:
+    """Map id -> selected columns for the rows matching where"""
+    names = set(table.schema.names)
+    cols = [c for c in dict.fromkeys([id_column, *columns]) if c in names]
+    if id_column not in cols:
+        return {}
+    query = table.search()
+    if where:
+        query = query.where(where)
+    rows = query.select(cols).limit(None).to_arrow().to_pylist()
+    return {r[id_column]: r for r in rows if r.get(id_column) is not None}
+
+
+@dataclass
+class IndexDiff:
+    """Result of comparing freshly chunked rows against the stored ones"""
+
+    new: List[Dict[str, Any]] = field(default_factory=list)  # need embedding
+    moved: List[Dict[str, Any]] = field(default_factory=list)  # same text, other metadata; reuse vector
+    unchanged: int = 0
+    stale_ids: List[str] = field(default_factory=list)
+
+    @property
+    def upserts(self) -> List[Dict[str, Any]]:
+        return self.new + self.moved
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "new": len(self.new),
+            "moved": len(self.moved),
+            "unchanged": self.unchanged,
+            "stale": len(self.stale_ids),
+        }
+
+
+def diff_rows(
+    rows: Sequence[Dict[str, Any]],
+    existing: Dict[str, Dict[str, Any]],
+    compare: Sequence[str] = (),
+    id_column: str = "id",
+) -> IndexDiff:
+    """Split rows into new / moved / unchanged and find stale stored ids.
+
+    existing must only cover the scope being re-indexed (e.g. the URLs or pack
+    being refreshed); every stored id not present in rows is reported stale.
+    compare lists extra columns whose change should rewrite the row without
+    re-embedding it.
+    """
+    diff = IndexDiff()
+    incoming = set()
+    for row in rows:
+        rid = row[id_column]
+        incoming.add(rid)
+        old = existing.get(rid)
+        if old is None or old.get("content_hash") != row.get("content_hash"):
+            diff.new.append(row)
+        elif any(old.get(c) != row.get(c) for c in compare if c in old):
+            diff.moved.append(row)
+        else:
+            diff.unchanged += 1
+    diff.stale_ids = [rid for rid in existing if rid not in incoming]
+    return diff
+
+
+def bulk_delete(table, ids: Sequence[str], id_column: str = "id") -> int:
+    """Delete rows by id with as few delete calls as possible"""
+    ids = list(ids)
+    for i in range(0, len(ids), _DELETE_BATCH):
+        table.delete(in_predicate(id_column, ids[i:i + _DELETE_BATCH]))
+    return len(ids)
+
+
+def upsert(table, rows: Any, on: str = "id") -> None:
+    """Insert-or-replace rows keyed on `on` in a single merge_insert"""
+    if rows is None or len(rows) == 0:
+        return
+    try:
+        builder = table.merge_insert(on)
+    except AttributeError:
+        # lancedb < 0.6 has no merge_insert: fall back to delete + add
+        keys = rows.column(on).to_pylist() if hasattr(rows, "column") else [r[on] for r in rows]
+        bulk_delete(table, keys, on)
+        table.add(rows)
+        return
+    builder.when_matched_update_all().when_not_matched_insert_all().execute(rows)
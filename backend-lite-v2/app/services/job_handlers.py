@@ -0,0 +1,78 @@
+"""
+Job Handlers
+============
+
+Handlers for the durable job queue (see job_queue.py). Imported by every
+worker process, so module-level imports stay light; heavy services are
+imported inside the handlers.
+
+Kinds:
+- pack.process: PackProcessor pipeline for one kiff pack
+- admin.bulk_index: API gallery bulk indexing
+"""
+
+import asyncio
+from typing import Any, Dict
+
+from app.services.admission import priority_scope
+from app.services.job_queue import JobContext, handler
+
+
+def _mark_pack(pack_id: str, status: str, error: str) -> None:
+    from app.db_core import SessionLocal
+    from app.models.kiff_packs import KiffPack
+
+    db = SessionLocal()
+    try:
+        pack = db.query(KiffPack).filter(KiffPack.id == pack_id).first()
+        if pack:
+            pack.processing_status = status
+            pack.processing_error = error
+            db.commit()
+    finally:
+        db.close()
+
+
+def _pack_error(pack_id: str) -> str:
+    from app.db_core import SessionLocal
+    from app.models.kiff_packs import KiffPack
+
+    db = SessionLocal()
+    try:
+        pack = db.query(KiffPack).filter(KiffPack.id == pack_id).first()
+        return (pack.processing_error if pack else None) or "pack processing failed"
+    finally:
+        db.close()
+
+
+@handler("pack.process")
+async def process_pack_job(payload: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from app.services.pack_processor import PackProcessor
+
+    pack_id, tenant_id = payload["pack_id"], payload["tenant_id"]
+    ctx.progress(_force=True, stage="processing", pack_id=pack_id, attempt=ctx.job.attempts)
+    try:
+        # LLM calls of background jobs queue behind interactive ones (admission.py)
+        with priority_scope("batch"):
+            ok = await PackProcessor(use_llm_cache=payload.get("llm_cache")).process_pack(pack_id, tenant_id)
+    except asyncio.CancelledError:
+        if ctx.cancel_requested:
+            await asyncio.to_thread(_mark_pack, pack_id, "failed", "cancelled")
+        raise
+    if not ok:
+        # process_pack already marked the pack failed; raising lets the queue retry it
+        raise RuntimeError(await asyncio.to_thread(_pack_error, pack_id))
+    ctx.progress(stage="ready")
+    return {"pack_id": pack_id, "status": "ready"}
+
+
+@handler("admin.bulk_index")
+async def bulk_index_job(payload: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from app.routes.admin_bulk_indexer import run_bulk_index
+
+    return await run_bulk_index(
+        payload["apis"],
+        bool(payload.get("force")),
+        int(payload.get("max_concurrent") or 3),
+        ctx,
+    )
@@ -0,0 +1,595 @@
+"""
+KB Indexer
+==========
+
+Streaming ingestion pipeline for knowledge-base LanceDB tables:
+
+    fetch pages -> chunk (worker threads) -> embed in batches -> bulk write
+
+Stages are connected by bounded asyncio queues, so a slow embedder applies
+backpressure to chunking and fetching instead of whole sites piling up in
+memory. Unchanged pages and chunks are skipped using the content hashes from
+incremental_index; moved chunks reuse their stored vectors.
+
+Progress for a run is kept in-process under a progress id and can be polled
+while the indexing request is still running.
+
+Env:
+- KIFF_KB_EMBED_BATCH (default 64 texts per embedding call)
+- KIFF_KB_WRITE_BATCH (default 2048 rows per upsert)
+- KIFF_KB_QUEUE_BATCHES (default 4; embed queue holds this many batches)
+- KIFF_KB_CHUNK_WORKERS (default 2)
+- KIFF_KB_FETCH_WORKERS (default 8)
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from . import lancedb_registry
+from .dedup import ChunkDeduper
+from .incremental_index import (
+    bulk_delete,
+    chunk_ids,
+    diff_rows,
+    ensure_columns,
+    in_predicate,
+    page_hash,
+    scan_existing,
+    text_hash,
+    upsert,
+)
+from .vector_compression import ensure_vector_index, prepare_rows
+
+# Columns every KB row carries besides text/url/vector
+KB_HASH_COLUMNS = {
+    "id": "CAST(NULL AS STRING)",
+    "content_hash": "CAST(NULL AS STRING)",
+    "page_hash": "CAST(NULL AS STRING)",
+    "chunk_index": "CAST(0 AS INT)",
+    "metadata_json": "'{}'",
+}
+
+EmbedBatch = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+_DONE = object()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+@dataclass
+class IndexProgress:
+    progress_id: str
+    status: str = "running"  # pending | running | completed | failed
+    tenant_id: Optional[str] = None
+    pages_total: int = 0
+    pages_done: int = 0
+    pages_unchanged: int = 0
+    pages_not_modified: int = 0  # crawl cache: same body as the previous crawl
+    pages_failed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    chunks_unchanged: int = 0
+    chunks_duplicate: int = 0  # near-duplicates dropped before embedding
+    rows_written: int = 0
+    rows_deleted: int = 0
+    embed_batches: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("tenant_id", None)
+        end = self.finished_at or time.time()
+        data["elapsed_sec"] = round(end - self.started_at, 3)
+        data["chunks_per_sec"] = round(self.chunks_embedded / max(end - self.started_at, 1e-6), 1)
+        return data
+
+
+# Most recent runs only; progress is diagnostic, not durable state
+_PROGRESS: "OrderedDict[str, IndexProgress]" = OrderedDict()
+_PROGRESS_KEEP = 200
+
+
+def _remember(progress: IndexProgress) -> IndexProgress:
+    _PROGRESS[progress.progress_id] = progress
+    while len(_PROGRESS) > _PROGRESS_KEEP:
+        _PROGRESS.popitem(last=False)
+    return progress
+
+
+def reserve_progress(tenant_id: str) -> IndexProgress:
+    """Server-generated progress id a client can poll before its indexing request starts"""
+    return _remember(IndexProgress(progress_id=str(uuid.uuid4()), status="pending", tenant_id=tenant_id))
+
+
+def start_progress(tenant_id: Optional[str] = None, progress_id: Optional[str] = None) -> IndexProgress:
+    """Progress record for a new run. progress_id must be a pending record the
+    same tenant reserved; raises KeyError otherwise."""
+    if progress_id is None:
+        return _remember(IndexProgress(progress_id=str(uuid.uuid4()), tenant_id=tenant_id))
+    progress = _PROGRESS.get(progress_id)
+    if progress is None or progress.tenant_id != tenant_id or progress.status != "pending":
+        raise KeyError(progress_id)
+    progress.status = "running"
+    progress.started_at = time.time()
+    return progress
+
+
+def get_progress(progress_id: str, tenant_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    progress = _PROGRESS.get(progress_id)
+    if progress is None or progress.tenant_id != tenant_id:
+        return None
+    return progress.snapshot()
+
+
+@dataclass
+class _PageRun:
+    """State the fetch and chunk workers of one index_pages call share.
+
+    Every page is decided once fetched: re-chunked (its text changed, or a
+    page it dropped duplicates of changed) or kept (its stored rows stay).
+    """
+    urls: Set[str]
+    chunk: Callable[[str], Any]
+    chunk_params: Dict[str, Any]
+    stored_by_url: Dict[str, Dict[str, Dict[str, Any]]]
+    embed_queue: "asyncio.Queue"
+    skip_unchanged: bool = False
+    metadata: Optional[Dict[str, Any]] = None
+    on_chunks: Optional[Callable[[str, List[str]], None]] = None
+    # url -> pages its stored chunks were dropped as duplicates of
+    deps: Dict[str, Set[str]] = field(default_factory=dict)
+    # url -> whether its own text changed (known once it is fetched)
+    text_changed: Dict[str, bool] = field(default_factory=dict)
+    # url -> True when re-chunked, False when its stored rows stay
+    decided: Dict[str, bool] = field(default_factory=dict)
+    # Unchanged pages waiting for their deps to be fetched: url -> (text, page hash, deps)
+    waiting: Dict[str, Tuple[str, str, Set[str]]] = field(default_factory=dict)
+    # Chunked pages whose chunks match stored chunks of undecided pages:
+    # url -> (page hash, chunks, those pages)
+    held: Dict[str, Tuple[str, List[str], Set[str]]] = field(default_factory=dict)
+    # url -> pages in waiting that wait for it to be fetched
+    fetch_waiters: Dict[str, Set[str]] = field(default_factory=dict)
+    # url -> pages in held that wait for it to be decided
+    decide_waiters: Dict[str, Set[str]] = field(default_factory=dict)
+
+
+class KBIndexer:
+    """Write chunked, embedded rows into one KB table"""
+
+    def __init__(
+        self,
+        uri: str,
+        table_name: str,
+        embed_batch: EmbedBatch,
+        *,
+        progress: Optional[IndexProgress] = None,
+        embed_batch_size: Optional[int] = None,
+        write_batch_size: Optional[int] = None,
+        queue_batches: Optional[int] = None,
+        chunk_workers: Optional[int] = None,
+        fetch_workers: Optional[int] = None,
+        dedup: Optional[ChunkDeduper] = None,
+    ):
+        self.uri = uri
+        self.table_name = table_name
+        self.embed_batch = embed_batch
+        self.progress = progress or start_progress()
+        self.embed_batch_size = max(1, embed_batch_size or _env_int("KIFF_KB_EMBED_BATCH", 64))
+        self.write_batch_size = max(1, write_batch_size or _env_int("KIFF_KB_WRITE_BATCH", 2048))
+        self.queue_batches = max(1, queue_batches or _env_int("KIFF_KB_QUEUE_BATCHES", 4))
+        self.chunk_workers = max(1, chunk_workers or _env_int("KIFF_KB_CHUNK_WORKERS", 2))
+        self.fetch_workers = max(1, fetch_workers or _env_int("KIFF_KB_FETCH_WORKERS", 8))
+        self.dedup = dedup
+        self.table = None
+        self._pending: List[Dict[str, Any]] = []
+        self._moved: List[Dict[str, Any]] = []
+        self._stale: List[str] = []
+        self._legacy_rows: List[Dict[str, Any]] = []
+
+    # ----- table -----
+
+    async def open(self) -> None:
+        """Open the KB table, embedding rows written before KBs stored vectors"""
+        self.table = await asyncio.to_thread(self._open_sync)
+        legacy, self._legacy_rows = self._legacy_rows, []
+        if legacy:
+            # Embed rows from a text-only table up front so they become searchable;
+            # the first write replaces that table with one that has a vector column
+            for i in range(0, len(legacy), self.embed_batch_size):
+                await self._embed_rows(legacy[i:i + self.embed_batch_size])
+            batch, self._pending = self._pending, []
+            await self._write(batch)
+
+    def _open_sync(self):
+        if not lancedb_registry.table_exists(self.uri, self.table_name):
+            return None
+        table = lancedb_registry.open_table(self.uri, self.table_name)
+        if "vector" in table.schema.names:
+            return ensure_columns(table, KB_HASH_COLUMNS)
+        # Text-only table (seeded at creation or written by the old ingest path)
+        legacy = [r for r in table.to_arrow().to_pylist() if r.get("id") != "__init__" and r.get("text")]
+        self._legacy_rows = [self._normalize_legacy(r) for r in legacy]
+        return None
+
+    @staticmethod
+    def _normalize_legacy(row: Dict[str, Any]) -> Dict[str, Any]:
+        text = row.get("text") or ""
+        meta = row.get("metadata_json")
+        if meta is None and row.get("metadata") is not None:
+            meta = json.dumps(row["metadata"], default=str)
+        return {
+            "id": row.get("id") or text_hash(f"{row.get('url') or ''}|{text}"),
+            "text": text,
+            "url": row.get("url") or "",
+            "content_hash": text_hash(text),
+            "page_hash": row.get("page_hash") or "",
+            "chunk_index": int(row.get("chunk_index") or 0),
+            "metadata_json": meta or "{}",
+        }
+
+    def scan(self, where: Optional[str], columns: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        if self.table is None:
+            return {}
+        return scan_existing(self.table, where, columns)
+
+    # ----- writing -----
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+
+        def _sync():
+            if self.table is None:
+                # Replaces a text-only table (if any) now that the vector dimension is known
+                self.table = lancedb_registry.create_table(
+                    self.uri, self.table_name, prepare_rows(rows, self.table_name), mode="overwrite"
+                )
+            else:
+                upsert(self.table, prepare_rows(rows, self.table_name, self.table))
+
+        await asyncio.to_thread(_sync)
+        self.progress.rows_written += len(rows)
+
+    async def _embed_rows(self, rows: List[Dict[str, Any]]) -> None:
+        vectors = await self.embed_batch([r["text"] for r in rows])
+        for row, vec in zip(rows, vectors):
+            row["vector"] = list(vec)
+        self.progress.embed_batches += 1
+        self.progress.chunks_embedded += len(rows)
+        self._pending.extend(rows)
+        if len(self._pending) >= self.write_batch_size:
+            batch, self._pending = self._pending, []
+            await self._write(batch)
+
+    async def _embed_stage(self, queue: "asyncio.Queue") -> None:
+        batch: List[Dict[str, Any]] = []
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            batch.append(item)
+            if len(batch) >= self.embed_batch_size:
+                await self._embed_rows(batch)
+                batch = []
+        if batch:
+            await self._embed_rows(batch)
+
+    async def _finish(self) -> None:
+        """Reuse stored vectors for moved rows, flush, drop stale rows, build the index"""
+        if self._moved and self.table is not None:
+            stored: Dict[str, Dict[str, Any]] = {}
+            ids = [r["id"] for r in self._moved]
+            for i in range(0, len(ids), 500):
+                stored.update(await asyncio.to_thread(self.scan, in_predicate("id", ids[i:i + 500]), ["vector"]))
+            for row in self._moved:
+                vec = (stored.get(row["id"]) or {}).get("vector")
+                if vec is None:
+                    await self._embed_rows([row])
+                else:
+                    row["vector"] = vec
+                    self._pending.append(row)
+                    self.progress.chunks_reused += 1
+            self._moved = []
+        batch, self._pending = self._pending, []
+        await self._write(batch)
+        if self._stale and self.table is not None:
+            self.progress.rows_deleted += await asyncio.to_thread(bulk_delete, self.table, self._stale)
+            self._stale = []
+        if self.table is not None:
+            await asyncio.to_thread(ensure_vector_index, self.table, self.table_name)
+
+    def _collect(self, rows: List[Dict[str, Any]], stored: Dict[str, Dict[str, Any]], compare: Sequence[str]):
+        diff = diff_rows(rows, stored, compare=compare)
+        self._moved.extend(diff.moved)
+        self._stale.extend(diff.stale_ids)
+        self.progress.chunks_total += len(rows)
+        self.progress.chunks_unchanged += diff.unchanged
+        return diff
+
+    # ----- entry points -----
+
+    async def index_rows(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Embed and write already-chunked rows (ids are content-derived)"""
+        await self.open()
+        try:
+            stored: Dict[str, Dict[str, Any]] = {}
+            ids = [r["id"] for r in rows]
+            for i in range(0, len(ids), 500):
+                stored.update(await asyncio.to_thread(self.scan, in_predicate("id", ids[i:i + 500]), ["content_hash", "metadata_json"]))
+            diff = self._collect(rows, stored, ["metadata_json"])
+            self._stale = []  # ingest appends; nothing outside `rows` is stale
+            for i in range(0, len(diff.new), self.embed_batch_size):
+                await self._embed_rows(diff.new[i:i + self.embed_batch_size])
+            await self._finish()
+            self.progress.status = "completed"
+            return self.progress.snapshot()
+        except Exception as e:
+            self.progress.status = "failed"
+            self.progress.error = str(e)
+            raise
+        finally:
+            self.progress.finished_at = time.time()
+
+    async def index_pages(
+        self,
+        urls: Sequence[str],
+        fetch: Callable[[str], Awaitable[Any]],
+        chunk: Callable[[str], Any],
+        chunk_params: Dict[str, Any],
+        *,
+        skip_unchanged: bool = False,
+        metadata: Optional[Dict[str, Any]] = None,
+        logs: Optional[List[str]] = None,
+        on_chunks: Optional[Callable[[str, List[str]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Fetch, chunk, embed and write pages as a streaming pipeline.
+
+        fetch(url) returns a crawl-cache page (extracted text + changed flag);
+        chunk(text) splits one page and runs in a worker thread; a coroutine
+        function is awaited instead (for chunkers that take an admission
+        slot around their thread). on_chunks is
+        called with each chunked page (for token accounting).
+
+        With dedup, rows record the pages their dropped duplicates were kept
+        on; an unchanged page is re-chunked when one of those pages changed,
+        so text it dropped comes back if the kept copy went away.
+        """
+        logs = logs if logs is not None else []
+        self.progress.pages_total = len(urls)
+        await self.open()
+
+        # What is already stored for these URLs, grouped per page (one projection scan)
+        stored_by_url: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        if urls and self.table is not None:
+            existing = await asyncio.to_thread(
+                self.scan, in_predicate("url", urls), ["url", "content_hash", "page_hash", "chunk_index", "metadata_json"]
+            )
+            for rid, row in existing.items():
+                stored_by_url.setdefault(row.get("url") or "", {})[rid] = row
+
+        embed_queue: "asyncio.Queue" = asyncio.Queue(maxsize=self.embed_batch_size * self.queue_batches)
+        run = _PageRun(
+            urls=set(urls),
+            chunk=chunk,
+            chunk_params=chunk_params,
+            stored_by_url=stored_by_url,
+            embed_queue=embed_queue,
+            skip_unchanged=skip_unchanged,
+            metadata=metadata,
+            on_chunks=on_chunks,
+        )
+        if self.dedup is not None:
+            # Seed every stored page before the workers start: chunks of kept
+            # pages stay in the table, and a re-chunked page drops its seeds
+            # once it is decided
+            for url, stored in stored_by_url.items():
+                self._seed_dedup(url, stored)
+                run.deps[url] = self._dedup_sources(stored)
+
+        url_queue: "asyncio.Queue" = asyncio.Queue()
+        for u in urls:
+            url_queue.put_nowait(u)
+        page_queue: "asyncio.Queue" = asyncio.Queue(maxsize=self.chunk_workers * 2)
+
+        async def fetch_worker():
+            while True:
+                try:
+                    url = url_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    page = await fetch(url)
+                except Exception as e:
+                    logs.append(f"error: fetch failed {url}: {e}")
+                    self.progress.pages_failed += 1
+                    self.progress.pages_done += 1
+                    # Its stored rows (if any) stay
+                    items = self._text_known(run, url, False) + self._decide(run, url, False)
+                else:
+                    items = self._plan_page(run, url, page)
+                for item in items:
+                    # Blocks when chunkers fall behind (backpressure on fetching)
+                    await page_queue.put(item)
+
+        async def chunk_worker():
+            while True:
+                item = await page_queue.get()
+                if item is _DONE:
+                    return
+                url = item[0]
+                done = True
+                try:
+                    done = await self._chunk_page(run, *item)
+                except Exception as e:
+                    logs.append(f"error: indexing failed {url}: {e}")
+                    self.progress.pages_failed += 1
+                finally:
+                    if done:
+                        self.progress.pages_done += 1
+
+        try:
+            embedder = asyncio.create_task(self._embed_stage(embed_queue))
+            chunkers = [asyncio.create_task(chunk_worker()) for _ in range(self.chunk_workers)]
+            fetchers = [asyncio.create_task(fetch_worker()) for _ in range(min(self.fetch_workers, max(1, len(urls))))]
+            try:
+                # Every page is decided once all are fetched, so nothing is held any more
+                await asyncio.gather(*fetchers)
+                for _ in chunkers:
+                    await page_queue.put(_DONE)
+                await asyncio.gather(*chunkers)
+                await embed_queue.put(_DONE)
+                await embedder
+            except BaseException:
+                for t in [embedder, *chunkers, *fetchers]:
+                    t.cancel()
+                raise
+            await self._finish()
+            self.progress.status = "completed"
+            return self.progress.snapshot()
+        except Exception as e:
+            self.progress.status = "failed"
+            self.progress.error = str(e)
+            raise
+        finally:
+            self.progress.finished_at = time.time()
+
+    def _seed_dedup(self, url: str, stored: Dict[str, Dict[str, Any]]) -> None:
+        if self.dedup is not None and stored:
+            self.dedup.seed_hashes((r.get("content_hash") for r in stored.values()), url)
+
+    @staticmethod
+    def _dedup_sources(stored: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """Pages the stored chunks of a page were dropped as duplicates of"""
+        sources: Set[str] = set()
+        for row in stored.values():
+            try:
+                sources.update(json.loads(row.get("metadata_json") or "{}").get("dedup_sources") or [])
+            except (ValueError, AttributeError):
+                continue
+        return sources
+
+    def _plan_page(self, run: _PageRun, url: str, page: Any) -> List[tuple]:
+        """Decide a fetched page; returns the page_queue items this releases"""
+        stored = run.stored_by_url.get(url, {})
+        if not page.changed:
+            self.progress.pages_not_modified += 1
+        text = page.extracted or ""
+        ph = page_hash(text, run.chunk_params)
+        # The crawl cache is shared across KBs: only skip a page this KB already indexed;
+        # otherwise skip when the same text is chunked the same way
+        unchanged = bool(stored) and (
+            (run.skip_unchanged and not page.changed) or all(r.get("page_hash") == ph for r in stored.values())
+        )
+        items = self._text_known(run, url, not unchanged)
+        deps = {d for d in run.deps.get(url, set()) if d != url and d in run.urls}
+        if not unchanged or any(run.text_changed.get(d) for d in deps):
+            return items + self._decide(run, url, True, text, ph)
+        deps = {d for d in deps if d not in run.text_changed}
+        if deps:
+            run.waiting[url] = (text, ph, deps)
+            for d in deps:
+                run.fetch_waiters.setdefault(d, set()).add(url)
+            return items
+        return items + self._keep(run, url)
+
+    def _text_known(self, run: _PageRun, url: str, changed: bool) -> List[tuple]:
+        """Record whether url's text changed and decide the unchanged pages waiting on it"""
+        run.text_changed[url] = changed
+        items: List[tuple] = []
+        for other in sorted(run.fetch_waiters.pop(url, ())):
+            entry = run.waiting.get(other)
+            if entry is None:
+                continue
+            text, ph, deps = entry
+            deps.discard(url)
+            if changed:
+                # The text it dropped as a duplicate may have left the KB
+                del run.waiting[other]
+                items += self._decide(run, other, True, text, ph)
+            elif not deps:
+                del run.waiting[other]
+                items += self._keep(run, other)
+        return items
+
+    def _keep(self, run: _PageRun, url: str) -> List[tuple]:
+        self.progress.pages_unchanged += 1
+        self.progress.pages_done += 1
+        return self._decide(run, url, False)
+
+    def _decide(self, run: _PageRun, url: str, rechunk: bool, text: str = "", ph: str = "") -> List[tuple]:
+        """Settle url; returns its page_queue item (when re-chunked) and the held pages it releases"""
+        run.decided[url] = rechunk
+        items: List[tuple] = []
+        if rechunk:
+            if self.dedup is not None:
+                # Its stored chunks are replaced; nothing may be dropped as a duplicate of them
+                self.dedup.forget(url)
+            items.append((url, text, ph, None))
+        for other in sorted(run.decide_waiters.pop(url, ())):
+            entry = run.held.get(other)
+            if entry is None:
+                continue
+            held_ph, pieces, sources = entry
+            sources.discard(url)
+            if not sources:
+                del run.held[other]
+                items.append((other, "", held_ph, pieces))
+        return items
+
+    async def _chunk_page(self, run: _PageRun, url: str, text: str, ph: str, pieces: Optional[List[str]]) -> bool:
+        """Chunk (unless pieces are given) and emit one page; False when it is
+        held until the pages whose stored chunks it matches are decided"""
+        if pieces is None:
+            if asyncio.iscoroutinefunction(run.chunk):
+                pieces = await run.chunk(text)
+            else:
+                pieces = await asyncio.to_thread(run.chunk, text)
+            if self.dedup is not None:
+                sources = {s for s in self.dedup.seeded_sources(pieces, url) if s not in run.decided}
+                if sources:
+                    run.held[url] = (ph, pieces, sources)
+                    for s in sources:
+                        run.decide_waiters.setdefault(s, set()).add(url)
+                    return False
+        await self._emit_page(run, url, pieces, ph)
+        return True
+
+    async def _emit_page(self, run: _PageRun, url: str, pieces: List[str], ph: str) -> None:
+        sources: List[str] = []
+        if self.dedup is not None:
+            result = await asyncio.to_thread(self.dedup.filter, pieces, url)
+            self.progress.chunks_duplicate += len(result.dropped)
+            pieces = result.kept
+            sources = sorted({src for _, src in result.dropped if src and src != url})
+        if run.on_chunks is not None:
+            run.on_chunks(url, pieces)
+        meta = {**(run.metadata or {}), **({"dedup_sources": sources} if sources else {})}
+        rows = []
+        for i, (p, key) in enumerate(zip(pieces, chunk_ids(url, pieces))):
+            rows.append({
+                "id": key["id"],
+                "text": p,
+                "url": url,
+                "content_hash": key["content_hash"],
+                "page_hash": ph,
+                "chunk_index": i,
+                "metadata_json": json.dumps({**meta, "idx": i}),
+            })
+        diff = self._collect(rows, run.stored_by_url.get(url, {}), ["page_hash", "chunk_index", "metadata_json"])
+        for row in diff.new:
+            # Blocks when the embedder falls behind (backpressure on chunking)
+            await run.embed_queue.put(row)
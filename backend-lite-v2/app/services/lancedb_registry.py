@@ -0,0 +1,163 @@
+# lancedb_registry.py
+"""
+Process-wide LanceDB connection and table handle registry.
+One connection per URI and one open handle per (URI, table), so hot paths
+(agent tools, health probes, KB routes) skip repeated connects and manifest reads.
+
+Handles are refreshed lazily: a cached handle is re-checked against the latest
+table version at most once every KIFF_LANCEDB_VERSION_CHECK_SEC seconds.
+Callers that drop or recreate a table must go through drop_table/create_table
+(or call invalidate_table) so stale handles are never served.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lancedb  # type: ignore
+    _HAS_LANCEDB = True
+except Exception:  # pragma: no cover - optional
+    lancedb = None  # type: ignore
+    _HAS_LANCEDB = False
+
+try:
+    _VERSION_CHECK_SEC = float(os.getenv("KIFF_LANCEDB_VERSION_CHECK_SEC", "5"))
+except Exception:
+    _VERSION_CHECK_SEC = 5.0
+
+_lock = threading.RLock()
+_connections: Dict[str, Any] = {}
+# (uri, table_name) -> {"table": handle, "version": int | None, "checked_at": float}
+_tables: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_stats = {"connects": 0, "opens": 0, "hits": 0, "refreshes": 0, "invalidations": 0}
+
+
+def _normalize_uri(uri: str) -> str:
+    # Remote URIs (s3://, db://, gs://) are used verbatim; local paths are made absolute
+    if "://" in uri:
+        return uri
+    return os.path.abspath(uri)
+
+
+def _table_version(table: Any) -> Optional[int]:
+    try:
+        return int(table.version)
+    except Exception:
+        return None
+
+
+def get_db(uri: str):
+    """Return the shared LanceDB connection for uri, connecting on first use."""
+    if not _HAS_LANCEDB:
+        raise RuntimeError("lancedb not installed")
+    key = _normalize_uri(uri)
+    with _lock:
+        db = _connections.get(key)
+        if db is None:
+            if "://" not in key:
+                os.makedirs(key, exist_ok=True)
+            db = lancedb.connect(key)
+            _connections[key] = db
+            _stats["connects"] += 1
+            logger.info(f"[LANCEDB_REGISTRY] Connected to {key}")
+        return db
+
+
+def open_table(uri: str, table_name: str):
+    """Return a cached handle for table_name, opening it on first use.
+
+    Raises whatever LanceDB raises when the table does not exist; misses are
+    never cached so a table created later by another process is picked up.
+    """
+    key = (_normalize_uri(uri), table_name)
+    now = time.monotonic()
+    with _lock:
+        entry = _tables.get(key)
+        if entry is not None:
+            if now - entry["checked_at"] < _VERSION_CHECK_SEC:
+                _stats["hits"] += 1
+                return entry["table"]
+            # Version check: move the handle to the latest manifest if it changed
+            table = entry["table"]
+            try:
+                checkout_latest = getattr(table, "checkout_latest", None)
+                if callable(checkout_latest):
+                    checkout_latest()
+                version = _table_version(table)
+                if version != entry["version"]:
+                    _stats["refreshes"] += 1
+                entry["version"] = version
+                entry["checked_at"] = now
+                _stats["hits"] += 1
+                return table
+            except Exception as e:
+                logger.info(f"[LANCEDB_REGISTRY] Version check failed for {table_name}, reopening: {e}")
+                _tables.pop(key, None)
+
+        table = get_db(key[0]).open_table(table_name)
+        _tables[key] = {"table": table, "version": _table_version(table), "checked_at": now}
+        _stats["opens"] += 1
+        return table
+
+
+def table_exists(uri: str, table_name: str) -> bool:
+    """Check whether table_name exists, answering from the handle cache when possible."""
+    key = (_normalize_uri(uri), table_name)
+    with _lock:
+        if key in _tables:
+            return True
+    try:
+        return table_name in list(get_db(uri).table_names())
+    except Exception:
+        return False
+
+
+def create_table(uri: str, table_name: str, data: Any = None, **kwargs):
+    """Create table_name and cache the new handle, replacing any stale one."""
+    key = (_normalize_uri(uri), table_name)
+    with _lock:
+        _tables.pop(key, None)
+        table = get_db(uri).create_table(table_name, data=data, **kwargs)
+        _tables[key] = {"table": table, "version": _table_version(table), "checked_at": time.monotonic()}
+        return table
+
+
+def drop_table(uri: str, table_name: str) -> None:
+    """Drop table_name and invalidate its cached handle."""
+    with _lock:
+        invalidate_table(uri, table_name)
+        get_db(uri).drop_table(table_name)
+
+
+def invalidate_table(uri: str, table_name: str) -> None:
+    """Forget the cached handle for table_name (e.g. after an external drop)."""
+    key = (_normalize_uri(uri), table_name)
+    with _lock:
+        if _tables.pop(key, None) is not None:
+            _stats["invalidations"] += 1
+
+
+def clear_registry() -> None:
+    """Drop all cached connections and handles (for debugging)."""
+    with _lock:
+        _tables.clear()
+        _connections.clear()
+    logger.info("[LANCEDB_REGISTRY] Registry cleared")
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    """Get registry statistics for health/debugging"""
+    with _lock:
+        return {
+            "connections": len(_connections),
+            "open_tables": len(_tables),
+            "version_check_sec": _VERSION_CHECK_SEC,
+            **_stats,
+        }
@@ -3,6 +3,10 @@ import os
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
+from .context_assembler import assemble_context
+from .launcher_prompts import RUN_GUIDANCE, turn_prompt_prefix, turn_prompt_suffix
+from .tokenizers import count_tokens
+
 # Optional imports for LanceDB & AGNO
 _HAS_LANCEDB = False
 _HAS_AGNO = False
@@ -38,6 +42,13 @@ _CURRENT_TENANT_ID: str = "default"
 _REQUIRE_APPROVAL: bool = False
 _ENABLE_SANDBOX: bool = (os.getenv("LAUNCHER_ENABLE_SANDBOX", "false").lower() in ("1", "true", "yes"))
 
+# Deadline for a whole launcher turn (LLM rounds plus tool calls), well above
+# the single-call KIFF_LLM_DEADLINE_SEC
+try:
+    _LAUNCHER_TURN_DEADLINE_SEC = float(os.getenv("LAUNCHER_TURN_DEADLINE_SEC", "600"))
+except ValueError:
+    _LAUNCHER_TURN_DEADLINE_SEC = 600.0
+
 def _get_current_tenant_id() -> str:
     tid = _CURRENT_TENANT_ID or "default"
     return tid
@@ -70,7 +81,9 @@ def _detect_language_from_extension(file_path: str) -> str:
 
 # Observability & budgeting
 try:
-    from ..observability import SessionContext, call_llm_and_track
+    from ..observability import SessionContext, call_llm_resilient, usage_from_run
+    from ..services.model_router import get_model_router
+    from ..services.admission import AdmissionRejected
     from ..observability.pricing import get_latest_model_price, compute_cost_usd
     from ..services.budget_guard import evaluate_budget, send_budget_alert
     from ..db_core import SessionLocal
@@ -120,6 +133,11 @@ except Exception:
     sandbox_manager = None  # type: ignore
     _HAS_SANDBOX = False
 
+from .turn_cancel import turn_cancelled
+
+# Tool result for a call made after the user stopped the turn (or left)
+_TURN_CANCELLED = "Turn cancelled by the user; do not call more tools."
+
 
 @dataclass
 class AgentRunResult:
@@ -128,6 +146,7 @@ class AgentRunResult:
     kiff_update: Optional[Dict[str, Any]] = None
     relevant_context: Optional[List[str]] = None
     action_json: Optional[str] = None
+    context_report: Optional[Dict[str, Any]] = None
 
 
 # Create project file tools for the agent
@@ -163,6 +182,8 @@ def create_project_tools(session_id: str):
         Returns:
             Success message or error message
         """
+        if turn_cancelled(session_id):
+            return _TURN_CANCELLED
         try:
             import json
             import uuid as _uuid
@@ -398,6 +419,8 @@ class LauncherAgent:
         self.web_on_lowconf = (os.getenv("LAUNCHER_WEBSEARCH_ON_LOWCONF", "true").lower() in ("1", "true", "yes"))
 
         self.agent = None
+        self._tool_calls = 0
+        self._tool_hooks_active = False
         if _HAS_AGNO:
             try:
                 print(f"[LAUNCHER_AGENT] Initializing AGNO agent with model: {self.model_id}")
@@ -463,9 +486,8 @@ class LauncherAgent:
                             print(f"[LAUNCHER_AGENT] ✅ LanceDB vector database configured with cached embedder")
                             # Ensure indexed / non-empty check for visibility
                             try:
-                                import lancedb as _ldb  # type: ignore
-                                _db = _ldb.connect(self.lancedb_dir)
-                                _tbl = _db.open_table(self.kb_table)
+                                from app.services.lancedb_registry import open_table as _open_table
+                                _tbl = _open_table(self.lancedb_dir, self.kb_table)
                                 try:
                                     _n = _tbl.count_rows()
                                 except Exception:
@@ -522,6 +544,8 @@ class LauncherAgent:
                             @tool
                             def sandbox_start(env: str = "default") -> str:  # type: ignore
                                 """Start a sandbox for this session and return sandbox_id."""
+                                if turn_cancelled(self.session_id):
+                                    return _TURN_CANCELLED
                                 try:
                                     if not _ENABLE_SANDBOX or not _HAS_SANDBOX:
                                         return "Sandbox disabled. Set LAUNCHER_ENABLE_SANDBOX=true to enable."
@@ -535,6 +559,8 @@ class LauncherAgent:
                             @tool
                             def sandbox_exec(cmd: str, args: str = "", timeout_s: int = 0) -> str:  # type: ignore
                                 """Execute a whitelisted command in the current sandbox. Args is space-separated."""
+                                if turn_cancelled(self.session_id):
+                                    return _TURN_CANCELLED
                                 try:
                                     if not _ENABLE_SANDBOX or not _HAS_SANDBOX:
                                         return "Sandbox disabled. Set LAUNCHER_ENABLE_SANDBOX=true to enable."
@@ -586,6 +612,8 @@ class LauncherAgent:
                             @tool
                             def sandbox_apply() -> str:  # type: ignore
                                 """Collect sandbox artifacts and return a ProposedFileChanges payload."""
+                                if turn_cancelled(self.session_id):
+                                    return _TURN_CANCELLED
                                 try:
                                     if not _ENABLE_SANDBOX or not _HAS_SANDBOX:
                                         return "Sandbox disabled. Set LAUNCHER_ENABLE_SANDBOX=true to enable."
@@ -737,10 +765,9 @@ class LauncherAgent:
                                 if not pack_ids:
                                     return "No packs selected for knowledge search."
 
-                                # Open LanceDB table and perform filtered search
-                                import lancedb as _ldb  # type: ignore
-                                db = _ldb.connect(self.lancedb_dir)
-                                tbl = db.open_table(self.kb_table)
+                                # Reuse the process-wide table handle and perform filtered search
+                                from app.services.lancedb_registry import open_table as _open_table
+                                tbl = _open_table(self.lancedb_dir, self.kb_table)
                                 # Build filter expression: tenant AND pack_id IN (...)
                                 # Note: simple SQL-like 'IN' filter is supported by LanceDB
                                 ids = ",".join([f"'{p}'" for p in pack_ids])
@@ -897,7 +924,7 @@ class LauncherAgent:
                 except Exception as e:
                     print(f"[LAUNCHER_AGENT] ⚠️ Failed to add KnowledgeTools: {e}")
 
-                self.agent = Agent(
+                agent_kwargs: Dict[str, Any] = dict(
                     model=groq_model,
                     storage=storage,
                     tools=tools if tools else None,
@@ -907,9 +934,19 @@ class LauncherAgent:
                     instructions=get_launcher_instructions(include_web=locals().get("web_tool_added", False)),
                     show_tool_calls=True,
                     markdown=True,
-                    add_datetime_to_instructions=True,
+                    # The date goes in the per-turn suffix; a timestamp here would
+                    # change the system prompt on every call and defeat prefix caching
+                    add_datetime_to_instructions=False,
                     debug_mode=False
                 )
+                try:
+                    # Counts tool calls so a failed turn is only retried on
+                    # another model when none of its tools has run yet
+                    self.agent = Agent(tool_hooks=[self._count_tool_call], **agent_kwargs)
+                    self._tool_hooks_active = True
+                except TypeError:
+                    # Older AGNO without tool_hooks
+                    self.agent = Agent(**agent_kwargs)
                 print(f"[LAUNCHER_AGENT] ✅ AGNO agent initialized successfully")
                 
             except Exception as e:
@@ -920,29 +957,46 @@ class LauncherAgent:
         else:
             print(f"[LAUNCHER_AGENT] ❌ AGNO not available")
 
-    async def run(self, message: str, chat_history: List[Dict[str, Any]], tenant_id: str, kiff_id: str, selected_packs: Optional[List[str]] = None, user_id: Optional[str] = None) -> AgentRunResult:
+    def _count_tool_call(self, function_name: str, function_call: Any, arguments: Dict[str, Any]) -> Any:
+        self._tool_calls += 1
+        return function_call(**arguments)
+
+    def _may_fail_over(self) -> bool:
+        """True while this agent's turn has not run any tool (so another model
+        can take the turn over without repeating file writes or sandbox execs)"""
+        return self._tool_hooks_active and self._tool_calls == 0
+
+    async def run(
+        self,
+        message: str,
+        chat_history: List[Dict[str, Any]],
+        tenant_id: str,
+        kiff_id: str,
+        selected_packs: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+        project_files: Optional[List[Dict[str, Any]]] = None,
+        retrieved_chunks: Optional[List[Dict[str, Any]]] = None,
+        conversation_summary: Optional[str] = None,
+    ) -> AgentRunResult:
         # If AGNO available, use it; otherwise return a simple stub
         if self.agent is not None:
             import time
             _t0 = time.perf_counter()
-            # Format a minimal prompt that embeds prior chat context
-            context_lines = []
-            for m in chat_history[-10:]:  # last 10
-                role = m.get("role", "user")
-                content = m.get("content", "")
-                context_lines.append(f"{role.upper()}: {content}")
-            context_text = "\n".join(context_lines)
-
-            prompt = (
-                f"Tenant: {tenant_id}\nKiff: {kiff_id}\n"
-                f"Selected Packs: {', '.join(selected_packs or [])}\n"
-                "Goal: Help the user iteratively build or modify their Kiff using tools.\n"
-                "Policy: Search packs first; cite sources. Use minimal tool commands. Write full files for changes.\n\n"
-                f"Chat so far:\n{context_text}\n\nUser: {message}\n\n"
-                "Next actions (concise):\n"
-                "- If API/docs context needed: use 'search_pack_knowledge' (or 'search_pack_vectors').\n"
-                "- If complex task: use 'todo_plan'. Otherwise: 'list_files' -> 'read_file' -> 'write_file'.\n"
+            # Stable prefix (guidance, session facts, rolling summary) first so the
+            # provider can reuse its prompt cache across turns; per-turn content last
+            prefix = turn_prompt_prefix(RUN_GUIDANCE, tenant_id, kiff_id, selected_packs, conversation_summary)
+            # Prior turns, project files and retrieved chunks compete for the
+            # model's context budget by relevance to this message
+            context = assemble_context(
+                message,
+                model=self.model_id,
+                history=chat_history,
+                files=project_files,
+                chunks=retrieved_chunks,
+                reserved_tokens=count_tokens(prefix + turn_prompt_suffix(message), self.model_id),
             )
+            suffix = turn_prompt_suffix(message, context.history_text(), context.files_text() + context.chunks_text())
+            prompt = prefix + suffix
 
             # Expose current scoping context for tools (e.g., search_pack_knowledge and file tools)
             try:
@@ -956,12 +1010,12 @@ class LauncherAgent:
 
             # Observability + budget guard
             if _HAS_OBS:
-                # Budget pre-check (estimate: chars/4 + 500)
+                # Budget pre-check (assembled prompt tokens + 500 out)
                 try:
                     _provider = (self.model_id.split("/", 1)[0] if "/" in self.model_id else "groq").lower()
                     with SessionLocal() as _db:
                         price = get_latest_model_price(_db, provider=_provider, model=self.model_id)
-                        est_in = max(1, len(prompt) // 4)
+                        est_in = max(1, context.used_tokens)
                         est_out = 500
                         projected = compute_cost_usd(price, est_in, est_out) if price else None
                         decision = evaluate_budget(_db, tenant_id, projected or 0)  # type: ignore[arg-type]
@@ -988,38 +1042,73 @@ class LauncherAgent:
                     tool_name=None,
                 )
 
-                messages = [{"role": "user", "content": prompt}]
+                # Same text the agent receives, split where the cacheable prefix ends
+                messages = [{"role": "system", "content": prefix}, {"role": "user", "content": suffix}]
 
-                async def _delegate(*, messages, stream=False):  # type: ignore
-                    """Call arun in a version-tolerant way.
-                    Prefer streaming + intermediate steps when supported; otherwise fallback.
-                    """
-                    try:
-                        out = await self.agent.arun(prompt, stream=stream, stream_intermediate_steps=True)  # type: ignore
-                    except TypeError:
-                        # Older AGNO may not support stream_intermediate_steps
+                def _delegate_for(agent):
+                    async def _delegate(*, messages, stream=False):  # type: ignore
+                        """Call arun in a version-tolerant way.
+                        Prefer streaming + intermediate steps when supported; otherwise fallback.
+                        """
                         try:
-                            out = await self.agent.arun(prompt, stream=stream)  # type: ignore
+                            out = await agent.arun(prompt, stream=stream, stream_intermediate_steps=True)  # type: ignore
                         except TypeError:
-                            # Fallback to non-streaming
-                            out = await self.agent.arun(prompt)  # type: ignore
-                    text = getattr(out, "content", "") or str(out)
-                    return {"content": text}
+                            # Older AGNO may not support stream_intermediate_steps
+                            try:
+                                out = await agent.arun(prompt, stream=stream)  # type: ignore
+                            except TypeError:
+                                # Fallback to non-streaming
+                                out = await agent.arun(prompt)  # type: ignore
+                        text = getattr(out, "content", "") or str(out)
+                        return {"content": text, "usage": usage_from_run(out)}
+                    return _delegate
+
+                # Failover targets are the other configured chat models; their
+                # agents are only built when an attempt actually needs one
+                _backups: Dict[str, "LauncherAgent"] = {}
+                self._tool_calls = 0
+
+                def _may_fail_over(model_id: str, _exc: BaseException) -> bool:
+                    agent = self if model_id == self.model_id else _backups.get(model_id)
+                    return agent is not None and agent._may_fail_over()
+
+                def _callable_for(model_id: str):
+                    if model_id == self.model_id:
+                        return _delegate_for(self.agent)
+                    backup = _backups.get(model_id)
+                    if backup is None:
+                        backup = _backups[model_id] = LauncherAgent(session_id=self.session_id, model_id=model_id)
+                        setattr(backup, "_current_tenant_id", tenant_id)
+                        setattr(backup, "_current_pack_ids", selected_packs or [])
+                    if backup.agent is None:
+                        raise RuntimeError(f"agent unavailable for {model_id}")
+                    return _delegate_for(backup.agent)
 
                 try:
-                    wrapped = await call_llm_and_track(
+                    call = await call_llm_resilient(
                         provider=_provider,
                         model=self.model_id,
-                        model_version=None,
                         messages=messages,
                         session_ctx=session_ctx,
-                        tool_name=None,
-                        stream=False,
-                        attempt_n=1,
-                        cache_hit=False,
-                        llm_callable=_delegate,
+                        llm_callable_for=_callable_for,
+                        fallback_models=get_model_router().candidates("chat"),
+                        provider_for=lambda m: (m.split("/", 1)[0] if "/" in m else "groq").lower(),
+                        # The attempt is a whole tool-running agent turn: never run two
+                        # at once, only fail over before any tool ran, and give it a
+                        # turn-sized deadline (a cancelled turn's tool threads keep going)
+                        hedge=False,
+                        should_failover=_may_fail_over,
+                        deadline_s=_LAUNCHER_TURN_DEADLINE_SEC,
                     )
+                    wrapped = call.result
+                    if call.model != self.model_id:
+                        print(f"[LAUNCHER_AGENT] answered by {call.model} (attempts: {call.attempts})")
                     text = wrapped.get("content") if isinstance(wrapped, dict) else str(wrapped)
+                except AdmissionRejected:
+                    # Backpressure goes back to the route as 429 + Retry-After
+                    setattr(self, "_current_tenant_id", None)
+                    setattr(self, "_current_pack_ids", None)
+                    raise
                 except Exception as _e:
                     text = f"[launcher] error: {_e}"
                 resp = type("_R", (), {"content": text, "tool_calls": None})()
@@ -1041,7 +1130,7 @@ class LauncherAgent:
                 print(f"[LAUNCHER_AGENT] run completed model={self.model_id} user={user_id} tenant={tenant_id} duration_sec={_dur:.2f} tool_calls={len(tool_calls) if tool_calls else 0}")
             except Exception:
                 pass
-            return AgentRunResult(content=text, tool_calls=tool_calls)
+            return AgentRunResult(content=text, tool_calls=tool_calls, context_report=context.report())
 
         # Fallback minimal response (no AGNO)
         return AgentRunResult(
@@ -1,4 +1,5 @@
-from typing import List
+import datetime as dt
+from typing import List, Optional
 
 # Modularized instructions for the Kiff Launcher agent
 
@@ -51,3 +52,53 @@ def get_launcher_instructions(include_web: bool = True) -> List[str]:
         else:
             instr.append(TOOLS_WITH_WEB)
     return instr
+
+
+# --- Per-turn prompt layout ---
+# Providers cache the longest prompt prefix they have recently seen, so a turn
+# prompt starts with what never changes (guidance), then what is fixed for the
+# session (tenant, kiff, packs, rolling summary), and only then the per-turn
+# content: recent turns, files/knowledge, the date and the user's message.
+
+RUN_GUIDANCE: str = (
+    "Goal: Help the user iteratively build or modify their Kiff using tools.\n"
+    "Policy: Search packs first; cite sources. Use minimal tool commands. Write full files for changes.\n"
+    "Next actions (concise):\n"
+    "- If API/docs context needed: use 'search_pack_knowledge' (or 'search_pack_vectors').\n"
+    "- If complex task: use 'todo_plan'. Otherwise: 'list_files' -> 'read_file' -> 'write_file'.\n"
+)
+
+STREAM_GUIDANCE: str = (
+    "You are assisting the user to define and iteratively build a 'kiff' (project).\n"
+    "Ask clarifying questions when needed and propose concrete file additions or changes.\n"
+    "When knowledge is present, cite patterns; otherwise proceed with best practices.\n"
+    "When project files are included, reference the existing files and provide complete updated file contents.\n"
+)
+
+
+def turn_prompt_prefix(
+    guidance: str,
+    tenant_id: str,
+    kiff_id: str,
+    selected_packs: Optional[List[str]] = None,
+    summary: Optional[str] = None,
+) -> str:
+    """Stable part of a turn prompt: identical on every turn of a session
+    (the summary only changes when older turns are folded into it)."""
+    prefix = (
+        f"{guidance}\n"
+        f"Tenant: {tenant_id}\nKiff: {kiff_id}\n"
+        f"Selected Packs: {', '.join(selected_packs or [])}\n"
+    )
+    if summary:
+        prefix += f"\nConversation summary (earlier turns):\n{summary}\n"
+    return prefix
+
+
+def turn_prompt_suffix(message: str, history_text: str = "", context_text: str = "") -> str:
+    """Per-turn part of a turn prompt (history and context come from the context assembler)."""
+    return (
+        f"\nChat so far:\n{history_text}\n{context_text}\n\n"
+        f"Today: {dt.date.today().isoformat()}\n"
+        f"User: {message}\n"
+    )
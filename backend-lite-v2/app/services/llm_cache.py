@@ -0,0 +1,259 @@
+"""
+LLM Response Cache
+==================
+
+Opt-in exact-match cache for deterministic generation stages (pack
+processing, agentic chunking previews, launcher project generation), so
+re-processing the same documentation or idea returns at once instead of
+sending an identical prompt to the provider again.
+
+- key: sha256 over (namespace, model, messages, parameters) in canonical JSON
+- scoped by tenant: an entry is only served to the tenant that paid for it
+- TTL per entry, plus entry-count and byte limits with least-recently-used
+  eviction
+- SQLite (WAL) file, shared by the API process and job worker processes
+- hits are recorded as usage events with cache_hit=true and zero cost
+  (llm_wrapper.record_cache_hit); the tokens the hit saved go into
+  token_breakdown
+
+Only successful responses should be stored; callers decide what counts as
+one (e.g. a parseable JSON answer).
+
+Env:
+- KIFF_LLM_CACHE: "false" (default) | "true"
+- KIFF_LLM_CACHE_DB (default app/data/llm_cache.sqlite)
+- KIFF_LLM_CACHE_TTL_SEC (default 604800, 7 days)
+- KIFF_LLM_CACHE_MAX_ENTRIES (default 20000)
+- KIFF_LLM_CACHE_MAX_MB (default 256)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .tokenizers import count_tokens
+
+_DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "llm_cache.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    tenant_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_hit_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant_id, key)
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_lru ON llm_cache (last_hit_at);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_expiry ON llm_cache (expires_at);
+"""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def llm_cache_enabled(override: Optional[bool] = None) -> bool:
+    if override is not None:
+        return override
+    return os.getenv("KIFF_LLM_CACHE", "false").lower() in ("1", "true", "yes")
+
+
+def cache_key(namespace: str, model: str, messages: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps(
+        {"ns": namespace, "model": model, "messages": messages, "params": params or {}},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Tenant-scoped response store; methods are synchronous and process-safe"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("KIFF_LLM_CACHE_DB", _DEFAULT_DB)
+        self.ttl_sec = _env_int("KIFF_LLM_CACHE_TTL_SEC", 7 * 86400)
+        self.max_entries = _env_int("KIFF_LLM_CACHE_MAX_ENTRIES", 20000)
+        self.max_bytes = _env_int("KIFF_LLM_CACHE_MAX_MB", 256) * 1024 * 1024
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, tenant_id: str, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, model, prompt_tokens, completion_tokens FROM llm_cache "
+                "WHERE tenant_id = ? AND key = ? AND expires_at > ?",
+                (tenant_id, key, now),
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            conn.execute(
+                "UPDATE llm_cache SET hits = hits + 1, last_hit_at = ? WHERE tenant_id = ? AND key = ?",
+                (now, tenant_id, key),
+            )
+        self.stats["hits"] += 1
+        return dict(row)
+
+    def put(
+        self,
+        tenant_id: str,
+        key: str,
+        response: str,
+        *,
+        namespace: str,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        ttl_sec: Optional[int] = None,
+    ) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (tenant_id, key, namespace, model, response, prompt_tokens, "
+                "completion_tokens, size_bytes, created_at, expires_at, last_hit_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (tenant_id, key, namespace, model, response, prompt_tokens, completion_tokens, size,
+                 now, now + (self.ttl_sec if ttl_sec is None else ttl_sec), now),
+            )
+            self.stats["stores"] += 1
+            self._enforce_limits(conn, now)
+
+    def _enforce_limits(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Evict least recently used rows until both limits hold again
+        excess_rows, excess_bytes = max(0, count - self.max_entries), max(0, total - self.max_bytes)
+        victims = []
+        freed = 0
+        for row in conn.execute("SELECT tenant_id, key, size_bytes FROM llm_cache ORDER BY last_hit_at"):
+            if len(victims) >= excess_rows and freed >= excess_bytes:
+                break
+            victims.append((row["tenant_id"], row["key"]))
+            freed += row["size_bytes"]
+        conn.executemany("DELETE FROM llm_cache WHERE tenant_id = ? AND key = ?", victims)
+        self.stats["evicted"] += len(victims)
+
+    def purge(self, tenant_id: Optional[str] = None, namespace: Optional[str] = None) -> int:
+        where, args = [], []
+        if tenant_id is not None:
+            where.append("tenant_id = ?")
+            args.append(tenant_id)
+        if namespace is not None:
+            where.append("namespace = ?")
+            args.append(namespace)
+        sql = "DELETE FROM llm_cache" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._connect() as conn:
+            return conn.execute(sql, args).rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()
+        return {**self.stats, "entries": count, "bytes": total}
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide cache handle"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache()
+    return _cache
+
+
+def lookup(
+    tenant_id: str,
+    namespace: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    provider: str = "groq",
+    agent_name: Optional[str] = None,
+) -> Optional[str]:
+    """Cached response or None; a hit is recorded as a zero-cost usage event.
+
+    Synchronous (SQLite); call through asyncio.to_thread from async code.
+    """
+    t0 = time.perf_counter()
+    try:
+        hit = get_llm_cache().get(tenant_id, cache_key(namespace, model, messages, params))
+    except sqlite3.Error as e:
+        print(f"[LLM_CACHE] lookup failed: {e}")
+        return None
+    if hit is None:
+        return None
+    try:
+        from ..observability.llm_wrapper import record_cache_hit
+
+        record_cache_hit(
+            tenant_id=tenant_id,
+            provider=provider,
+            model=model,
+            agent_name=agent_name or namespace,
+            saved_prompt_tokens=hit["prompt_tokens"],
+            saved_completion_tokens=hit["completion_tokens"],
+            latency_ms=int((time.perf_counter() - t0) * 1000),
+        )
+    except Exception as e:  # accounting is best-effort; never fail the hit
+        print(f"[LLM_CACHE] failed to record cache hit: {e}")
+    return hit["response"]
+
+
+def store(
+    tenant_id: str,
+    namespace: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    response: str,
+    params: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Store a successful response (synchronous, like lookup)"""
+    prompt_tokens = count_tokens("\n".join(str(m.get("content") or "") for m in messages), model)
+    try:
+        get_llm_cache().put(
+            tenant_id,
+            cache_key(namespace, model, messages, params),
+            response,
+            namespace=namespace,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=count_tokens(response, model),
+        )
+    except sqlite3.Error as e:
+        print(f"[LLM_CACHE] store failed: {e}")
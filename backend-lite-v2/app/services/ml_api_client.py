@@ -76,6 +76,25 @@ class MLAPIClient:
                 result = await response.json()
                 return result["results"]
     
+    async def search_vectors_batch(
+        self,
+        queries: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Search for several queries in one round-trip.
+        
+        Each query dict takes the same fields as ``search_vectors``
+        (query, tenant_id, pack_ids, limit). Returns one
+        ``{"query", "results"}`` entry per input query, in order.
+        """
+        async with aiohttp.ClientSession(timeout=self.timeout) as session:
+            async with session.post(
+                f"{self.base_url}/search/batch",
+                json={"queries": queries}
+            ) as response:
+                response.raise_for_status()
+                result = await response.json()
+                return result["results"]
+    
     async def index_pack(
         self, 
         pack_id: str, 
@@ -0,0 +1,304 @@
+"""
+Model Router
+============
+
+Latency-aware choice between equivalent models, driven by the usage events
+every tracked LLM call already records (latency_ms, status per model).
+
+- task classes (chat, extraction, chunking) each have an ordered list of
+  interchangeable models; the first one is preferred
+- rolling window per model: p50/p95 latency and error rate over the last
+  KIFF_ROUTE_WINDOW_SEC, loaded from usage_event (so every process sees the
+  same history) and updated in-process by observe() between reloads
+- route() picks the first model in preference order that is healthy (error
+  rate within KIFF_ROUTE_MAX_ERROR_RATE) and meets the task's p95 target;
+  if none does, the healthy model with the lowest p95. Models with fewer
+  than KIFF_ROUTE_MIN_SAMPLES samples count as meeting the target, so a new
+  model receives traffic and gathers data
+- sticky per session: a session keeps its model until the sticky entry
+  expires or the model turns unhealthy (in-process, bounded LRU)
+- every new decision goes to the decision log (in memory, printed and
+  exposed at GET /api/models/routing/status)
+
+route() never touches the database on the request path: a stale window is
+reloaded in a background thread and the current snapshot is used meanwhile.
+An explicit model chosen by the caller always wins over routing.
+
+Env:
+- KIFF_ROUTE_MODELS_<TASK>: comma-separated models in preference order
+  (defaults: chat LAUNCHER_MODEL_ID, extraction openai/gpt-oss-120b,
+  chunking KIFF_MODEL_AGENTIC)
+- KIFF_ROUTE_TARGET_P95_MS_<TASK>: p95 latency target (defaults: chat
+  15000, extraction 90000, chunking 30000)
+- KIFF_ROUTE_MAX_ERROR_RATE (default 0.2)
+- KIFF_ROUTE_MIN_SAMPLES (default 20)
+- KIFF_ROUTE_WINDOW_SEC (default 1800)
+- KIFF_ROUTE_REFRESH_SEC (default 60)
+- KIFF_ROUTE_STICKY_SEC (default 1800)
+"""
+
+import datetime as dt
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+TASK_CLASSES = ("chat", "extraction", "chunking")
+
+_DEFAULT_MODELS = {
+    "chat": lambda: os.getenv("LAUNCHER_MODEL_ID", "moonshotai/kimi-k2-instruct"),
+    "extraction": lambda: "openai/gpt-oss-120b",
+    "chunking": lambda: os.getenv("KIFF_MODEL_AGENTIC", "kimi-k2-1t-128k"),
+}
+_DEFAULT_TARGET_P95_MS = {"chat": 15000, "extraction": 90000, "chunking": 30000}
+
+_MAX_SAMPLES_PER_MODEL = 2000
+_MAX_STICKY_SESSIONS = 10000
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _percentile(sorted_values: List[int], q: float) -> int:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0
+    rank = max(1, int(round(q * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class ModelStats:
+    model: str
+    samples: int = 0
+    p50_ms: int = 0
+    p95_ms: int = 0
+    error_rate: float = 0.0
+
+
+@dataclass
+class RouteDecision:
+    ts: float
+    task: str
+    session_key: Optional[str]
+    tenant_id: Optional[str]
+    model: str
+    reason: str  # single | preferred | latency_target | fastest | all_degraded
+    target_p95_ms: int
+    candidates: List[Dict[str, Any]]
+
+
+class ModelRouter:
+    """Rolling per-model latency/error stats and sticky per-session routing"""
+
+    def __init__(self):
+        self.window_sec = _env_int("KIFF_ROUTE_WINDOW_SEC", 1800)
+        self.refresh_sec = _env_int("KIFF_ROUTE_REFRESH_SEC", 60)
+        self.sticky_sec = _env_int("KIFF_ROUTE_STICKY_SEC", 1800)
+        self.min_samples = _env_int("KIFF_ROUTE_MIN_SAMPLES", 20)
+        self.max_error_rate = _env_float("KIFF_ROUTE_MAX_ERROR_RATE", 0.2)
+        # model -> (unix ts, latency_ms, ok)
+        self._events: Dict[str, Deque[Tuple[float, int, bool]]] = {}
+        self._sticky: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._decisions: Deque[RouteDecision] = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    # --- configuration ---
+
+    def candidates(self, task: str) -> List[str]:
+        raw = os.getenv(f"KIFF_ROUTE_MODELS_{task.upper()}", "")
+        models = [m.strip() for m in raw.split(",") if m.strip()]
+        if not models and task in _DEFAULT_MODELS:
+            models = [_DEFAULT_MODELS[task]()]
+        return models
+
+    def target_p95_ms(self, task: str) -> int:
+        return _env_int(f"KIFF_ROUTE_TARGET_P95_MS_{task.upper()}", _DEFAULT_TARGET_P95_MS.get(task, 30000))
+
+    # --- stats ---
+
+    def observe(self, model: str, latency_ms: int, ok: bool, ts: Optional[float] = None) -> None:
+        """Record one call outcome (called by call_llm_and_track)"""
+        with self._lock:
+            events = self._events.setdefault(model, deque(maxlen=_MAX_SAMPLES_PER_MODEL))
+            events.append((ts or time.time(), int(latency_ms), bool(ok)))
+
+    def stats(self, model: str) -> ModelStats:
+        cutoff = time.time() - self.window_sec
+        with self._lock:
+            events = self._events.get(model)
+            while events and events[0][0] < cutoff:
+                events.popleft()
+            window = list(events or ())
+        if not window:
+            return ModelStats(model=model)
+        latencies = sorted(lat for _, lat, ok in window if ok)
+        errors = sum(1 for _, _, ok in window if not ok)
+        return ModelStats(
+            model=model,
+            samples=len(window),
+            p50_ms=_percentile(latencies, 0.50),
+            p95_ms=_percentile(latencies, 0.95),
+            error_rate=round(errors / len(window), 4),
+        )
+
+    def refresh(self) -> None:
+        """Reload the window of every configured model from usage_event"""
+        from ..db_core import SessionLocal
+        from ..models.observability import UsageEvent
+
+        models = sorted({m for task in TASK_CLASSES for m in self.candidates(task)})
+        since = dt.datetime.utcnow() - dt.timedelta(seconds=self.window_sec)
+        fresh: Dict[str, Deque[Tuple[float, int, bool]]] = {m: deque(maxlen=_MAX_SAMPLES_PER_MODEL) for m in models}
+        with SessionLocal() as db:
+            rows = (
+                db.query(UsageEvent.model, UsageEvent.ts, UsageEvent.latency_ms, UsageEvent.status)
+                .filter(
+                    UsageEvent.model.in_(models),
+                    UsageEvent.ts >= since,
+                    UsageEvent.source != "cache",
+                    UsageEvent.status != "cancelled",
+                )
+                .order_by(UsageEvent.ts.desc())
+                .limit(_MAX_SAMPLES_PER_MODEL * max(1, len(models)))
+                .all()
+            )
+        for model, ts, latency_ms, status in reversed(rows):
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=dt.timezone.utc)
+            fresh[model].append((ts.timestamp(), int(latency_ms or 0), status == "ok"))
+        with self._lock:
+            self._events.update(fresh)
+            self._loaded_at = time.time()
+
+    def _maybe_refresh(self) -> None:
+        with self._lock:
+            if self._refreshing or time.time() - self._loaded_at < self.refresh_sec:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[MODEL_ROUTER] stats refresh failed: {e}")
+                with self._lock:
+                    self._loaded_at = time.time()  # back off until the next interval
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="model-router-refresh", daemon=True).start()
+
+    # --- routing ---
+
+    def _healthy(self, s: ModelStats) -> bool:
+        return s.samples < self.min_samples or s.error_rate <= self.max_error_rate
+
+    def _meets_target(self, s: ModelStats, target_ms: int) -> bool:
+        return self._healthy(s) and (s.samples < self.min_samples or s.p95_ms <= target_ms)
+
+    def _choose(self, models: List[str], stats: Dict[str, ModelStats], target_ms: int) -> Tuple[str, str]:
+        if len(models) == 1:
+            return models[0], "single"
+        for i, m in enumerate(models):
+            if self._meets_target(stats[m], target_ms):
+                return m, "preferred" if i == 0 else "latency_target"
+        healthy = [m for m in models if self._healthy(stats[m])]
+        if healthy:
+            return min(healthy, key=lambda m: stats[m].p95_ms), "fastest"
+        return min(models, key=lambda m: stats[m].error_rate), "all_degraded"
+
+    def route(self, task: str, session_key: Optional[str] = None, *, tenant_id: Optional[str] = None) -> str:
+        """Model for one call of a task class; sticky for session_key"""
+        models = self.candidates(task)
+        if not models:
+            raise ValueError(f"No models configured for task class '{task}'")
+        if len(models) > 1:
+            self._maybe_refresh()
+        now = time.time()
+        sticky_key = (task, session_key) if session_key else None
+
+        if sticky_key is not None:
+            with self._lock:
+                pinned = self._sticky.get(sticky_key)
+                if pinned is not None:
+                    self._sticky.move_to_end(sticky_key)
+            if pinned is not None:
+                model, pinned_at = pinned
+                if model in models and now - pinned_at < self.sticky_sec and self._healthy(self.stats(model)):
+                    return model
+
+        stats = {m: self.stats(m) for m in models}
+        target_ms = self.target_p95_ms(task)
+        model, reason = self._choose(models, stats, target_ms)
+        decision = RouteDecision(
+            ts=now,
+            task=task,
+            session_key=session_key,
+            tenant_id=tenant_id,
+            model=model,
+            reason=reason,
+            target_p95_ms=target_ms,
+            candidates=[asdict(stats[m]) for m in models],
+        )
+        with self._lock:
+            if sticky_key is not None:
+                self._sticky[sticky_key] = (model, now)
+                self._sticky.move_to_end(sticky_key)
+                while len(self._sticky) > _MAX_STICKY_SESSIONS:
+                    self._sticky.popitem(last=False)
+            self._decisions.append(decision)
+        if reason != "single":
+            summary = ", ".join(f"{s['model']} p95={s['p95_ms']}ms err={s['error_rate']} n={s['samples']}" for s in decision.candidates)
+            print(f"[MODEL_ROUTER] task={task} session={session_key} -> {model} ({reason}; target p95 {target_ms}ms; {summary})")
+        return model
+
+    def decisions(self, limit: int = 100, task: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._decisions)
+        if task:
+            items = [d for d in items if d.task == task]
+        return [asdict(d) for d in items[-limit:]][::-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            task: {
+                "target_p95_ms": self.target_p95_ms(task),
+                "models": [asdict(self.stats(m)) for m in self.candidates(task)],
+            }
+            for task in TASK_CLASSES
+        }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
+
+
+def route_model(task: str, session_key: Optional[str] = None, *, tenant_id: Optional[str] = None) -> str:
+    return get_model_router().route(task, session_key, tenant_id=tenant_id)
@@ -8,9 +8,11 @@ to create comprehensive Kiff Packs with code examples and patterns.
 
 import asyncio
 import json
-from typing import Any, List, Optional
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
-import requests
 from urllib.parse import urljoin, urlparse
 import os
 from contextlib import contextmanager
@@ -21,12 +23,14 @@ from agno.knowledge.pdf_url import PDFUrlKnowledgeBase
 from agno.vectordb.lancedb import LanceDb
 from agno.vectordb.search import SearchType
 from agno.tools import tool
-from agno.document.reader.website_reader import WebsiteReader
-from agno.knowledge.pdf import PDFReader
 
 from app.db_core import SessionLocal
 from app.models.kiff_packs import KiffPack
-from app.services.vector_storage import VectorStorageService
+from app.services.vector_storage import get_vector_storage_service
+from app.services.doc_crawler import crawl_site
+from app.services import llm_cache
+from app.services.model_router import get_model_router, route_model
+from app.observability import SessionContext, call_llm_resilient, usage_from_run
 
 # --- Observability: OpenTelemetry tracer (safe import) ---
 try:  # pragma: no cover - optional dependency
@@ -50,12 +54,68 @@ so larger documentation sites are covered.
 
 You can override via environment variables:
   PACK_PRIMARY_MAX_LINKS, PACK_PRIMARY_MAX_DEPTH,
-  PACK_ADDITIONAL_MAX_LINKS, PACK_ADDITIONAL_MAX_DEPTH
+  PACK_ADDITIONAL_MAX_LINKS, PACK_ADDITIONAL_MAX_DEPTH,
+  PACK_CRAWL_TIME_BUDGET_SEC (whole crawl of one pack; pages fetched
+  before the budget runs out are kept)
 """
 PRIMARY_MAX_LINKS = int(os.getenv("PACK_PRIMARY_MAX_LINKS", "100"))
 PRIMARY_MAX_DEPTH = int(os.getenv("PACK_PRIMARY_MAX_DEPTH", "2"))
 ADDITIONAL_MAX_LINKS = int(os.getenv("PACK_ADDITIONAL_MAX_LINKS", "100"))
 ADDITIONAL_MAX_DEPTH = int(os.getenv("PACK_ADDITIONAL_MAX_DEPTH", "1"))
+PDF_MAX_BYTES = int(os.getenv("PACK_PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+CRAWL_TIME_BUDGET_SEC = float(os.getenv("PACK_CRAWL_TIME_BUDGET_SEC", "300"))
+
+"""
+LLM stage concurrency. After structure extraction, the code-example generations
+(one per language) and integration patterns run concurrently; each stage uses
+its own agent instance.
+
+  PACK_LLM_CONCURRENCY: concurrent LLM stages per tenant in this process (default 5,
+  the full fan-out of one pack)
+  PACK_STAGE_TIMEOUT_SEC: per-stage timeout (default 180)
+"""
+PACK_LLM_CONCURRENCY = max(1, int(os.getenv("PACK_LLM_CONCURRENCY", "5")))
+PACK_STAGE_TIMEOUT_SEC = float(os.getenv("PACK_STAGE_TIMEOUT_SEC", "180"))
+
+CODE_EXAMPLE_LANGUAGES = {
+    "javascript": "JavaScript/Node.js",
+    "python": "Python",
+    "curl": "cURL",
+    "typescript": "TypeScript"
+}
+
+PACK_MODEL_ID = "openai/gpt-oss-120b"
+PACK_AGENT_INSTRUCTIONS = [
+    "You are an expert API documentation processor for creating Kiff Packs.",
+    "Extract comprehensive API information: endpoints, parameters, authentication, examples.",
+    "Generate practical, production-ready code examples in multiple languages.",
+    "Create reusable integration patterns and best practices.",
+    "Focus on real-world usage scenarios and common implementations.",
+    "Ensure all generated code follows security best practices.",
+    "Structure output in a clear, searchable format for easy consumption."
+]
+
+_tenant_llm_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _tenant_slots(tenant_id: str) -> asyncio.Semaphore:
+    sem = _tenant_llm_slots.get(tenant_id)
+    if sem is None:
+        sem = _tenant_llm_slots[tenant_id] = asyncio.Semaphore(PACK_LLM_CONCURRENCY)
+    return sem
+
+
+@dataclass
+class _StageRun:
+    """Per-run context for LLM stages: identity plus timing/status per stage"""
+    pack_id: str = ""
+    tenant_id: str = ""
+    model: str = PACK_MODEL_ID
+    run_id: str = field(default_factory=lambda: f"run_{uuid.uuid4().hex[:12]}")
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def failed(self) -> List[str]:
+        return [name for name, rec in self.stages.items() if rec.get("status") != "ok"]
 
 
 # Tool definitions using Agno's @tool decorator
@@ -198,28 +258,21 @@ def analyze_integration_patterns(api_structure: dict) -> List[str]:
 class PackProcessor:
     """Process API documentation to create comprehensive Kiff Packs"""
     
-    def __init__(self):
-        self.agent = self._create_agent()
-        self.vector_service = VectorStorageService()
+    def __init__(self, use_llm_cache: Optional[bool] = None):
+        self.vector_service = get_vector_storage_service()
+        # None follows KIFF_LLM_CACHE (see app/services/llm_cache.py)
+        self.use_llm_cache = use_llm_cache
     
-    def _create_agent(self) -> Agent:
+    def _create_agent(self, model_id: str = PACK_MODEL_ID) -> Agent:
         """Create Agno agent for pack processing"""
         return Agent(
-            model=Groq(id="openai/gpt-oss-120b"),
+            model=Groq(id=model_id),
             tools=[
                 extract_api_endpoints,
                 generate_code_examples, 
                 analyze_integration_patterns
             ],
-            instructions=[
-                "You are an expert API documentation processor for creating Kiff Packs.",
-                "Extract comprehensive API information: endpoints, parameters, authentication, examples.",
-                "Generate practical, production-ready code examples in multiple languages.",
-                "Create reusable integration patterns and best practices.",
-                "Focus on real-world usage scenarios and common implementations.",
-                "Ensure all generated code follows security best practices.",
-                "Structure output in a clear, searchable format for easy consumption."
-            ],
+            instructions=PACK_AGENT_INSTRUCTIONS,
             show_tool_calls=True,
             markdown=True,
             debug_mode=True
@@ -232,6 +285,11 @@ class PackProcessor:
         No synthetic token/cost metrics are added here.
         """
         model_triggered = False
+        t_start = time.perf_counter()
+        # One model per pack run (see model_router.py), so every stage's output
+        # comes from the same model
+        run = _StageRun(pack_id=pack_id, tenant_id=tenant_id, model=route_model("extraction", f"pack:{pack_id}", tenant_id=tenant_id))
+        stats: Dict[str, Any] = {"model": run.model, "stages": run.stages}
         with _maybe_span("pack.process") as span:
             if span is not None:
                 try:
@@ -262,51 +320,34 @@ class PackProcessor:
             
             # Step 1: Crawl API documentation
             print(f"📖 Crawling API documentation for pack {pack_id}")
+            t_crawl = time.perf_counter()
             documentation = await self._crawl_documentation(
                 api_url, 
-                documentation_urls
+                documentation_urls,
+                stats
             )
+            stats["crawl_s"] = round(time.perf_counter() - t_crawl, 3)
             
-            # Step 2: Extract API structure (LLM likely invoked by agent)
+            # Step 2: Extract API structure (LLM); every later stage depends on it
             print(f"🔍 Analyzing API structure for pack {pack_id}")
             # Mark model as triggered before awaiting agent to ensure span captures it
             model_triggered = True
-            with _maybe_span("pack.llm.extract_api_structure") as subspan:
-                if subspan is not None:
-                    try:
-                        subspan.set_attribute("kiff.stage", "extract_api_structure")
-                        subspan.set_attribute("kiff.pack_id", pack_id)
-                        subspan.set_attribute("kiff.tenant_id", tenant_id)
-                    except Exception:
-                        pass
-                api_structure = await self._extract_api_structure(documentation)
-            
-            # Step 3: Generate code examples (LLM)
-            print(f"💻 Generating code examples for pack {pack_id}")
-            with _maybe_span("pack.llm.generate_code_examples") as subspan:
-                if subspan is not None:
-                    try:
-                        subspan.set_attribute("kiff.stage", "generate_code_examples")
-                        subspan.set_attribute("kiff.pack_id", pack_id)
-                        subspan.set_attribute("kiff.tenant_id", tenant_id)
-                    except Exception:
-                        pass
-                code_examples = await self._generate_code_examples(api_structure)
+            t_llm = time.perf_counter()
+            api_structure = await self._extract_api_structure(documentation, run)
             
-            # Step 4: Create integration patterns (LLM)
-            print(f"🔧 Creating integration patterns for pack {pack_id}")
-            with _maybe_span("pack.llm.create_integration_patterns") as subspan:
-                if subspan is not None:
-                    try:
-                        subspan.set_attribute("kiff.stage", "create_integration_patterns")
-                        subspan.set_attribute("kiff.pack_id", pack_id)
-                        subspan.set_attribute("kiff.tenant_id", tenant_id)
-                    except Exception:
-                        pass
-                integration_patterns = await self._create_integration_patterns(
-                    api_structure, 
-                    code_examples
-                )
+            # Steps 3+4: code examples per language and integration patterns only
+            # need the structure, so they run concurrently (capped per tenant)
+            print(f"💻 Generating code examples and integration patterns for pack {pack_id}")
+            code_examples, integration_patterns = await asyncio.gather(
+                self._generate_code_examples(api_structure, run),
+                self._create_integration_patterns(api_structure, list(CODE_EXAMPLE_LANGUAGES), run),
+            )
+            stats["llm_wall_s"] = round(time.perf_counter() - t_llm, 3)
+            stats["llm_sum_s"] = round(sum(r.get("seconds", 0.0) for r in run.stages.values()), 3)
+            stats["failed_stages"] = run.failed()
+            if len(stats["failed_stages"]) == len(run.stages):
+                first = next(iter(run.stages.values()), {})
+                raise RuntimeError(f"All LLM stages failed ({first.get('error', 'unknown error')})")
             
             # Step 5: Update pack in database
             db = SessionLocal()
@@ -317,6 +358,11 @@ class PackProcessor:
                     pack.code_examples = code_examples
                     pack.integration_patterns = integration_patterns
                     pack.processing_status = "ready"
+                    pack.processing_error = (
+                        f"Partial: failed stages {', '.join(stats['failed_stages'])}" if stats["failed_stages"] else None
+                    )
+                    stats["total_s"] = round(time.perf_counter() - t_start, 3)
+                    pack.processing_stats = stats
                     pack.updated_at = datetime.utcnow()
                     db.commit()
                     
@@ -370,6 +416,8 @@ class PackProcessor:
                     if pack:
                         pack.processing_status = "failed"
                         pack.processing_error = str(e)
+                        stats["total_s"] = round(time.perf_counter() - t_start, 3)
+                        pack.processing_stats = stats
                         db.commit()
                 finally:
                     db.close()
@@ -378,50 +426,137 @@ class PackProcessor:
             
             return False
     
-    async def _crawl_documentation(self, primary_url: str, additional_urls: List[str]) -> str:
-        """Crawl API documentation from URLs"""
-        all_content = []
-        
-        # Crawl primary URL
+    def _stage_callable(self, model_id: str, prompt: str):
+        """llm_callable for one stage attempt on model_id (fresh agent per attempt)"""
+        async def _call(*, messages, stream=False):
+            response = await self._create_agent(model_id).arun(prompt)
+            return {"content": response.content, "usage": usage_from_run(response)}
+        return _call
+
+    async def _run_stage(
+        self, run: _StageRun, name: str, prompt: str, accept: Optional[Callable[[str], bool]] = None
+    ) -> str:
+        """One LLM call on a fresh agent (agents keep per-run state, so concurrent
+        stages must not share one), under the tenant's concurrency cap and the
+        stage deadline, failing over to the other extraction models (see
+        app/observability/resilient.py). Each attempt is a usage event.
+        Records timing and status in run.stages; raises on failure.
+
+        With the LLM response cache enabled, an identical earlier prompt for
+        the same tenant is answered from the cache without taking a slot.
+        Responses are cached under the model that answered, and only when
+        accept (the stage's parser check) takes them."""
+        record: Dict[str, Any] = {"status": "ok"}
+        t0 = time.perf_counter()
+        use_cache = bool(run.tenant_id) and llm_cache.llm_cache_enabled(self.use_llm_cache)
+        messages = [{"role": "system", "content": "\n".join(PACK_AGENT_INSTRUCTIONS)}, {"role": "user", "content": prompt}]
         try:
-            scraper = WebsiteReader(max_links=PRIMARY_MAX_LINKS, max_depth=PRIMARY_MAX_DEPTH)
-            primary_docs = scraper.read(primary_url)
-            all_content.extend([doc.content for doc in primary_docs])
+            if use_cache:
+                cached = await asyncio.to_thread(
+                    llm_cache.lookup, run.tenant_id, "pack_processor", run.model, messages, agent_name=f"pack.{name}"
+                )
+                record["cache"] = "hit" if cached is not None else "miss"
+                if cached is not None:
+                    return cached
+            async with _tenant_slots(run.tenant_id):
+                record["queued_s"] = round(time.perf_counter() - t0, 3)
+                with _maybe_span(f"pack.llm.{name}") as subspan:
+                    if subspan is not None:
+                        try:
+                            subspan.set_attribute("kiff.stage", name)
+                            subspan.set_attribute("kiff.pack_id", run.pack_id)
+                            subspan.set_attribute("kiff.tenant_id", run.tenant_id)
+                        except Exception:
+                            pass
+                    call = await call_llm_resilient(
+                        provider="groq",
+                        model=run.model,
+                        messages=messages,
+                        session_ctx=SessionContext(
+                            tenant_id=run.tenant_id or None,
+                            user_id=None,
+                            workspace_id=None,
+                            session_id=f"pack:{run.pack_id}",
+                            run_id=run.run_id,
+                            step_id=f"step_{uuid.uuid4().hex[:12]}",
+                            agent_name=f"pack.{name}",
+                        ),
+                        llm_callable_for=lambda model_id: self._stage_callable(model_id, prompt),
+                        fallback_models=get_model_router().candidates("extraction"),
+                        deadline_s=PACK_STAGE_TIMEOUT_SEC,
+                    )
+            content = call.result["content"]
+            if call.model != run.model:
+                record["model"] = call.model
+            if len(call.attempts) > 1:
+                record["attempts"] = call.attempts
+            if use_cache and content and (accept is None or accept(content)):
+                await asyncio.to_thread(
+                    llm_cache.store, run.tenant_id, "pack_processor", call.model, messages, content
+                )
+            return content
+        except asyncio.TimeoutError:
+            record.update(status="timeout", error=f"timed out after {PACK_STAGE_TIMEOUT_SEC:.0f}s")
+            raise
         except Exception as e:
-            print(f"Error crawling primary URL {primary_url}: {e}")
-        
-        # Crawl additional URLs
+            record.update(status="failed", error=str(e)[:500])
+            raise
+        finally:
+            record["seconds"] = round(time.perf_counter() - t0, 3)
+            run.stages[name] = record
+
+    async def _crawl_documentation(
+        self,
+        primary_url: str,
+        additional_urls: List[str],
+        stats: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Crawl API documentation from URLs.
+
+        The primary site and every additional URL are crawled concurrently
+        under one time budget; PDFs are parsed in memory. Output keeps the
+        primary-then-additional order.
+        """
+        deadline = time.monotonic() + CRAWL_TIME_BUDGET_SEC
+        seen: set = set()
+        targets = [(primary_url, PRIMARY_MAX_LINKS, PRIMARY_MAX_DEPTH)]
         for url in additional_urls:
-            if not url or url == primary_url:
-                continue
-            
-            try:
-                if url.lower().endswith('.pdf'):
-                    # Handle PDF documentation
-                    pdf_reader = PDFReader()
-                    # Download PDF to temp file first
-                    response = requests.get(url, stream=True)
-                    response.raise_for_status()
-                    
-                    with open('/tmp/temp_api_doc.pdf', 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    # Extract text from the downloaded PDF
-                    pdf_docs = pdf_reader.read('/tmp/temp_api_doc.pdf')
-                    all_content.extend([doc.content for doc in pdf_docs])
-                else:
-                    # Handle web documentation
-                    scraper = WebsiteReader(max_links=ADDITIONAL_MAX_LINKS, max_depth=ADDITIONAL_MAX_DEPTH)
-                    web_docs = scraper.read(url)
-                    all_content.extend([doc.content for doc in web_docs])
-                
-            except Exception as e:
-                print(f"Error crawling additional URL {url}: {e}")
+            if url and url != primary_url:
+                targets.append((url, ADDITIONAL_MAX_LINKS, ADDITIONAL_MAX_DEPTH))
+        
+        results = await asyncio.gather(*[
+            crawl_site(
+                url,
+                max_pages=max_pages,
+                max_depth=max_depth,
+                deadline=deadline,
+                seen=seen,
+                pdf_max_bytes=PDF_MAX_BYTES,
+            )
+            for url, max_pages, max_depth in targets
+        ], return_exceptions=True)
+        
+        all_content = []
+        crawl_stats = {"pages": 0, "errors": 0, "timed_out": False}
+        for (url, _, _), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                print(f"Error crawling {url}: {result}")
+                crawl_stats["errors"] += 1
                 continue
+            for page_url, error in list(result.errors.items())[:5]:
+                print(f"Error crawling {page_url}: {error}")
+            all_content.extend(page.text for page in result.pages)
+            crawl_stats["pages"] += len(result.pages)
+            crawl_stats["errors"] += len(result.errors)
+            crawl_stats["timed_out"] = crawl_stats["timed_out"] or result.timed_out
+        if crawl_stats["timed_out"]:
+            print(f"⏱️ Crawl budget of {CRAWL_TIME_BUDGET_SEC:.0f}s reached; using {crawl_stats['pages']} pages")
+        if stats is not None:
+            stats["crawl"] = crawl_stats
         
         return "\n\n".join(all_content)
     
-    async def _extract_api_structure(self, documentation: str) -> dict:
+    async def _extract_api_structure(self, documentation: str, run: Optional[_StageRun] = None) -> dict:
         """Extract structured API information using Agno agent"""
         
         prompt = f"""
@@ -449,12 +584,15 @@ class PackProcessor:
         """
         
         try:
-            response = await self.agent.arun(prompt)
+            content = await self._run_stage(
+                run or _StageRun(), "extract_api_structure", prompt,
+                accept=lambda c: self._api_structure_json(c) is not None,
+            )
             # Parse the response to extract JSON structure
             # This would need proper parsing logic
-            return self._parse_api_structure_response(response.content)
+            return self._parse_api_structure_response(content)
         except Exception as e:
-            print(f"Error extracting API structure: {e}")
+            print(f"Error extracting API structure: {e!r}")
             return {
                 "overview": {"name": "Unknown API", "purpose": "API integration"},
                 "authentication": {},
@@ -464,59 +602,65 @@ class PackProcessor:
                 "pricing": {}
             }
     
-    async def _generate_code_examples(self, api_structure: dict) -> dict:
-        """Generate code examples in multiple languages"""
+    async def _generate_code_examples(self, api_structure: dict, run: Optional[_StageRun] = None) -> dict:
+        """Generate code examples in multiple languages, one concurrent stage per language"""
+        run = run or _StageRun()
+        structure_json = json.dumps(api_structure, indent=2)
+        results = await asyncio.gather(*[
+            self._generate_code_example(lang_name, structure_json, run, f"generate_code_examples.{lang_key}")
+            for lang_key, lang_name in CODE_EXAMPLE_LANGUAGES.items()
+        ])
+        return dict(zip(CODE_EXAMPLE_LANGUAGES, results))
+
+    async def _generate_code_example(self, lang_name: str, structure_json: str, run: _StageRun, stage: str) -> str:
+        # The API structure leads and the language comes last, so the four
+        # concurrent language stages (and integration patterns) share one
+        # cacheable prompt prefix
+        prompt = f"""
+        API Structure:
+        {structure_json}
         
-        languages = {
-            "javascript": "JavaScript/Node.js",
-            "python": "Python",
-            "curl": "cURL",
-            "typescript": "TypeScript"
-        }
+        Generate comprehensive code examples for this API.
         
-        code_examples = {}
+        Create examples for:
+        1. Authentication setup
+        2. Basic API calls for top 5 most common endpoints
+        3. Error handling
+        4. Rate limiting handling
+        5. Complete integration example
         
-        for lang_key, lang_name in languages.items():
-            try:
-                prompt = f"""
-                Generate comprehensive {lang_name} code examples for this API.
-                
-                Create examples for:
-                1. Authentication setup
-                2. Basic API calls for top 5 most common endpoints
-                3. Error handling
-                4. Rate limiting handling
-                5. Complete integration example
-                
-                Make the code production-ready with:
-                - Proper error handling
-                - Environment variable usage for API keys
-                - Comments explaining key concepts
-                - Best practices for the language
-                
-                API Structure:
-                {json.dumps(api_structure, indent=2)}
-                
-                Format as clean, executable code with explanatory comments.
-                """
-                
-                response = await self.agent.arun(prompt)
-                code_examples[lang_key] = response.content
-                
-            except Exception as e:
-                print(f"Error generating {lang_name} examples: {e}")
-                code_examples[lang_key] = f"# {lang_name} example generation failed"
+        Make the code production-ready with:
+        - Proper error handling
+        - Environment variable usage for API keys
+        - Comments explaining key concepts
+        - Best practices for the language
         
-        return code_examples
+        Format as clean, executable code with explanatory comments.
+        Language: {lang_name}
+        """
+        try:
+            return await self._run_stage(run, stage, prompt)
+        except Exception as e:
+            # One language failing keeps the others
+            print(f"Error generating {lang_name} examples: {e!r}")
+            return f"# {lang_name} example generation failed"
     
     async def _create_integration_patterns(
         self, 
         api_structure: dict, 
-        code_examples: dict
+        code_examples: Any,
+        run: Optional[_StageRun] = None
     ) -> List[str]:
-        """Create integration patterns and best practices"""
+        """Create integration patterns and best practices.
+
+        Only the languages of code_examples (a dict or a list of language keys)
+        go into the prompt, so this can run alongside code example generation.
+        """
         
         prompt = f"""
+        API Structure:
+        {json.dumps(api_structure, indent=2)[:5000]}
+        
         Create comprehensive integration patterns and best practices for this API.
         
         Generate patterns for:
@@ -532,20 +676,20 @@ class PackProcessor:
         Make each pattern practical and actionable, with step-by-step guidance.
         Include real-world scenarios and common pitfalls to avoid.
         
-        API Structure:
-        {json.dumps(api_structure, indent=2)[:5000]}
-        
         Code Examples Available:
-        {list(code_examples.keys())}
+        {list(code_examples)}
         """
         
         try:
-            response = await self.agent.arun(prompt)
+            content = await self._run_stage(
+                run or _StageRun(), "create_integration_patterns", prompt,
+                accept=lambda c: bool(self._parse_integration_patterns(c)),
+            )
             # Parse response into list of patterns
-            patterns = self._parse_integration_patterns(response.content)
+            patterns = self._parse_integration_patterns(content)
             return patterns
         except Exception as e:
-            print(f"Error creating integration patterns: {e}")
+            print(f"Error creating integration patterns: {e!r}")
             return [
                 "Setup and Configuration",
                 "Basic API Integration",
@@ -553,8 +697,8 @@ class PackProcessor:
                 "Testing Strategy"
             ]
     
-    def _parse_api_structure_response(self, response: str) -> dict:
-        """Parse agent response to extract structured API information"""
+    def _api_structure_json(self, response: str) -> Optional[dict]:
+        """The JSON object in an agent response, or None when there is none"""
         try:
             # Try to extract JSON from the response
             start_idx = response.find('{')
@@ -562,10 +706,18 @@ class PackProcessor:
             
             if start_idx != -1 and end_idx > start_idx:
                 json_str = response[start_idx:end_idx]
-                return json.loads(json_str)
+                parsed = json.loads(json_str)
+                return parsed if isinstance(parsed, dict) else None
             
         except (json.JSONDecodeError, ValueError) as e:
             print(f"Error parsing API structure JSON: {e}")
+        return None
+
+    def _parse_api_structure_response(self, response: str) -> dict:
+        """Parse agent response to extract structured API information"""
+        parsed = self._api_structure_json(response)
+        if parsed is not None:
+            return parsed
         
         # Fallback to basic structure
         return {
@@ -1,7 +1,9 @@
 import os
 import tempfile
 import shutil
+import signal
 import subprocess
+import threading
 import time
 import uuid
 import json
@@ -36,6 +38,9 @@ class SandboxManager:
 
     def __init__(self) -> None:
         self._sandboxes: Dict[str, Dict[str, Any]] = {}
+        # Running exec processes per sandbox (so a stopped chat turn can kill them)
+        self._running: Dict[str, List[subprocess.Popen]] = {}
+        self._running_lock = threading.Lock()
         # Provider switch: local (default) | e2b
         self._provider: str = os.getenv("SANDBOX_PROVIDER", "local").strip().lower() or "local"
         self._cmd_whitelist: List[str] = [
@@ -115,20 +120,37 @@ class SandboxManager:
         t0 = time.perf_counter()
         try:
             # Note: hard isolation (namespaces/cgroups) is not applied here. Keep commands trusted and short.
-            proc = subprocess.run(
+            # Own process group so a timeout or a cancel also kills what the command spawned
+            proc = subprocess.Popen(
                 [cmd] + list(args),
                 cwd=workdir,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=max(1, int(timeout_s or self._max_wall)),
+                start_new_session=True,
             )
-            exit_code = proc.returncode
-            out = proc.stdout or ""
-            err = proc.stderr or ""
-        except subprocess.TimeoutExpired as e:
-            exit_code = 124
-            out = (e.stdout or "")
-            err = (e.stderr or "") + f"\n[timeout] exceeded {timeout_s or self._max_wall}s"
+            with self._running_lock:
+                self._running.setdefault(sandbox_id, []).append(proc)
+            try:
+                out, err = proc.communicate(timeout=max(1, int(timeout_s or self._max_wall)))
+                exit_code = proc.returncode
+                out = out or ""
+                err = err or ""
+                if getattr(proc, "_kiff_cancelled", False):
+                    err += "\n[cancelled] stopped with its chat turn"
+            except subprocess.TimeoutExpired:
+                self._kill(proc)
+                out, err = proc.communicate()
+                exit_code = 124
+                out = out or ""
+                err = (err or "") + f"\n[timeout] exceeded {timeout_s or self._max_wall}s"
+            finally:
+                with self._running_lock:
+                    running = self._running.get(sandbox_id) or []
+                    if proc in running:
+                        running.remove(proc)
+                    if not running:
+                        self._running.pop(sandbox_id, None)
         except Exception as e:  # pragma: no cover
             exit_code = 1
             out = ""
@@ -166,6 +188,33 @@ class SandboxManager:
             "truncated": bool(trunc_out or trunc_err),
         }
 
+    @staticmethod
+    def _kill(proc: subprocess.Popen) -> None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+    def cancel_session(self, session_id: str) -> int:
+        """Kill the running exec processes of the session's sandboxes; the
+        exec calls return with the process' exit code and a [cancelled] note.
+        Returns the number of processes killed."""
+        with self._running_lock:
+            procs = [
+                proc
+                for sbx_id, running in self._running.items()
+                if (self._sandboxes.get(sbx_id) or {}).get("session_id") == session_id
+                for proc in running
+                if proc.poll() is None
+            ]
+        for proc in procs:
+            proc._kiff_cancelled = True  # type: ignore[attr-defined]
+            self._kill(proc)
+        return len(procs)
+
     def apply(self, sandbox_id: str) -> Dict[str, Any]:
         if sandbox_id not in self._sandboxes:
             return {"error": "sandbox_not_found"}
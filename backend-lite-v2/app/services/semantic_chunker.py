@@ -0,0 +1,243 @@
+"""
+Semantic Chunker
+================
+
+Native semantic chunking on numpy, replacing a per-URL agno SemanticChunking
+instance:
+
+1. split the document into sentences (code fences and headings stay whole)
+2. embed every sentence in one batched call, through a process-wide
+   embedding cache keyed by (model, text hash)
+3. compute adjacent cosine similarities in one vectorized pass and break
+   where similarity drops below the threshold (or below a percentile of the
+   document's similarities), respecting a token budget per chunk
+
+Because sentence embeddings are cached, re-chunking the same documents with
+another threshold or size only costs the numpy pass. The same cache backs
+embed_texts(), which the KB indexer uses, so chunk texts already embedded
+(e.g. single-sentence chunks, or a preview run before indexing) are not
+embedded again.
+
+Env:
+- KIFF_EMBED_CACHE_MAX: cached vectors kept in memory (default 100000)
+- KIFF_EMBED_CACHE_MAX_MB: memory held by cached vectors (default 256)
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .tokenizers import Tokenizer, get_tokenizer
+
+# Batched encoder: list of texts -> array-like of shape (n, dim)
+EncodeFn = Callable[[List[str]], Any]
+
+DEFAULT_THRESHOLD = 0.5  # same default as agno's SemanticChunking
+
+_FENCE = re.compile(r"```.*?(?:```|\Z)", re.S)
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9`#*_-])|\n\s*\n|\n(?=\s*(?:#{1,6}\s|[-*+]\s|\d+[.)]\s|\|))")
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of embeddings keyed by (model, sha1(text))
+
+    Vectors are stored as the model returned them (float32) so cached and
+    freshly encoded vectors are interchangeable in the KB tables.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("KIFF_EMBED_CACHE_MAX", "100000"))
+        self.max_bytes = max_bytes or int(os.getenv("KIFF_EMBED_CACHE_MAX_MB", "256")) * 1024 * 1024
+        self._data: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "encode_calls": 0}
+
+    @staticmethod
+    def _key(model_key: str, text: str) -> Tuple[str, str]:
+        return model_key, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def encode(self, texts: Sequence[str], encode: EncodeFn, model_key: str) -> np.ndarray:
+        """Embeddings for texts; misses are encoded in one batched call"""
+        keys = [self._key(model_key, t) for t in texts]
+        found: Dict[Tuple[str, str], np.ndarray] = {}
+        missing: Dict[Tuple[str, str], str] = {}
+        with self._lock:
+            for k in keys:
+                vec = self._data.get(k)
+                if vec is not None:
+                    self._data.move_to_end(k)
+                    found[k] = vec
+            for k, t in zip(keys, texts):
+                if k not in found and k not in missing:
+                    missing[k] = t
+            self.stats["hits"] += len(texts) - sum(1 for k in keys if k in missing)
+            self.stats["misses"] += len(missing)
+            if missing:
+                self.stats["encode_calls"] += 1
+
+        if missing:
+            vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for k, vec in zip(missing, vectors):
+                    found[k] = vec
+                    if k in self._data:
+                        continue
+                    # Copy the row so an evicted batch is not kept alive by its views
+                    self._data[k] = vec.copy()
+                    self._bytes += vec.nbytes
+                while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                    _, old = self._data.popitem(last=False)
+                    self._bytes -= old.nbytes
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[k] for k in keys])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._data)
+            size = self._bytes
+        total = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "entries": entries,
+            "bytes": size,
+            "hit_rate": round(stats["hits"] / total, 4) if total else 0.0,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def embed_texts(texts: Sequence[str], encode: EncodeFn, model_key: str) -> np.ndarray:
+    """Embed through the shared cache"""
+    return get_embedding_cache().encode(texts, encode, model_key)
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Char spans of sentences; fenced code blocks are kept as single units"""
+    spans: List[Tuple[int, int]] = []
+
+    def _prose(start: int, end: int) -> None:
+        pos = start
+        for m in _SENTENCE_END.finditer(text, start, end):
+            if text[pos:m.start()].strip():
+                spans.append((pos, m.start()))
+            pos = m.end()
+        if text[pos:end].strip():
+            spans.append((pos, end))
+
+    pos = 0
+    for m in _FENCE.finditer(text):
+        _prose(pos, m.start())
+        spans.append((m.start(), m.end()))
+        pos = m.end()
+    _prose(pos, len(text))
+    # Trim surrounding whitespace so chunk boundaries are clean
+    out = []
+    for s, e in spans:
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if e > s:
+            out.append((s, e))
+    return out
+
+
+@dataclass
+class SemanticChunk:
+    text: str
+    start: int
+    end: int
+    tokens: int
+    sentences: int
+
+
+def breakpoints(
+    embeddings: np.ndarray,
+    threshold: Optional[float] = None,
+    percentile: Optional[float] = None,
+) -> np.ndarray:
+    """Indices i where a chunk should end after sentence i.
+
+    similarity(i, i+1) is the cosine similarity of adjacent sentence embeddings.
+    percentile (e.g. 10) breaks at the lowest-similarity tenth of boundaries
+    instead of a fixed threshold.
+    """
+    if len(embeddings) < 2:
+        return np.zeros(0, dtype=np.int64)
+    unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    sims = np.einsum("ij,ij->i", unit[:-1], unit[1:])
+    if percentile is not None:
+        cut = float(np.percentile(sims, percentile))
+    else:
+        cut = DEFAULT_THRESHOLD if threshold is None else float(threshold)
+    return np.flatnonzero(sims < cut)
+
+
+def semantic_chunk(
+    text: str,
+    encode: EncodeFn,
+    model_key: str,
+    *,
+    max_tokens: int,
+    threshold: Optional[float] = None,
+    percentile: Optional[float] = None,
+    min_tokens: int = 0,
+    tokenizer: Optional[Tokenizer] = None,
+) -> List[SemanticChunk]:
+    """Split text at semantic breakpoints, never exceeding max_tokens per chunk
+    (a single sentence longer than max_tokens becomes its own chunk)."""
+    spans = split_sentences(text)
+    if not spans:
+        return []
+    tok = tokenizer or get_tokenizer()
+    sentences = [text[s:e] for s, e in spans]
+    vectors = embed_texts(sentences, encode, model_key)
+    is_break = np.zeros(len(spans), dtype=bool)
+    is_break[breakpoints(vectors, threshold, percentile)] = True
+    counts = [tok.count(s) for s in sentences]
+
+    chunks: List[SemanticChunk] = []
+    first, tokens = 0, 0
+
+    def _close(last: int) -> None:
+        start, end = spans[first][0], spans[last][1]
+        chunks.append(SemanticChunk(text=text[start:end], start=start, end=end, tokens=tokens, sentences=last - first + 1))
+
+    for i, n in enumerate(counts):
+        if i > first and max_tokens > 0 and tokens + n > max_tokens:
+            _close(i - 1)
+            first, tokens = i, 0
+        tokens += n
+        if is_break[i] and tokens >= min_tokens and i < len(spans) - 1:
+            _close(i)
+            first, tokens = i + 1, 0
+    if first < len(spans):
+        _close(len(spans) - 1)
+    return chunks
@@ -0,0 +1,236 @@
+"""
+Tokenizers
+==========
+
+Process-wide tokenizer registry and a token-space streaming chunker.
+
+Each tokenizer family (a tiktoken encoding, a Hugging Face tokenizer, or the
+char heuristic) is loaded once and shared by extract, kb and the
+observability wrapper, instead of calling tiktoken.get_encoding per request.
+
+Model names resolve to families:
+- gpt-4o / gpt-4.1 / gpt-5 / o1 / o3 / o4 -> tiktoken o200k_base
+- other gpt-* and text-embedding-* -> tiktoken cl100k_base
+- "hf:<repo>" or "sentence-transformers/<model>" -> that model's HF tokenizer
+- tiktoken encoding names (cl100k_base, o200k_base, ...) -> that encoding
+- anything else (llama, kimi, gemma, ...) -> KIFF_TOKENIZER (default cl100k_base)
+
+tiktoken is a dependency; when it (or the HF tokenizer) cannot be loaded the
+family falls back to a regex heuristic of roughly 4 characters per token and
+Tokenizer.exact tells callers which one they got.
+
+Env:
+- KIFF_TOKENIZER: default family (default cl100k_base)
+"""
+
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import tiktoken  # type: ignore
+except Exception:
+    tiktoken = None  # heuristic fallback only
+
+_O200K_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4", "chatgpt-4o")
+_CL100K_PREFIXES = ("gpt-4", "gpt-3.5", "text-embedding-")
+_TIKTOKEN_ENCODINGS = ("o200k_base", "cl100k_base", "p50k_base", "r50k_base")
+
+# Text is tokenized in segments of about this many chars so chunking a large
+# document never materializes all of its tokens at once
+_SEGMENT_CHARS = 32768
+
+
+class Tokenizer(ABC):
+    """Common interface: exact token counts and token start offsets"""
+
+    name = "base"
+    exact = False
+
+    def count(self, text: str) -> int:
+        return len(self.offsets(text))
+
+    @abstractmethod
+    def offsets(self, text: str) -> List[int]:
+        """Character offset at which each token of text starts"""
+
+
+class _TiktokenTokenizer(Tokenizer):
+    exact = True
+
+    def __init__(self, encoding_name: str):
+        self.name = f"tiktoken:{encoding_name}"
+        self._enc = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode_ordinary(text))
+
+    def offsets(self, text: str) -> List[int]:
+        tokens = self._enc.encode_ordinary(text)
+        # A token that ends mid-character maps to that character's offset
+        return list(self._enc.decode_with_offsets(tokens)[1])
+
+
+class _HFTokenizer(Tokenizer):
+    exact = True
+
+    def __init__(self, repo: str):
+        from transformers import AutoTokenizer  # type: ignore
+
+        self.name = f"hf:{repo}"
+        self._tok = AutoTokenizer.from_pretrained(repo, use_fast=True)
+        # Chunking long documents is the point; silence "sequence too long" warnings
+        self._tok.model_max_length = 10 ** 9
+
+    def count(self, text: str) -> int:
+        return len(self._tok.encode(text, add_special_tokens=False))
+
+    def offsets(self, text: str) -> List[int]:
+        enc = self._tok(text, add_special_tokens=False, return_offsets_mapping=True)
+        return [start for start, _ in enc["offset_mapping"]]
+
+
+class _HeuristicTokenizer(Tokenizer):
+    """~4 chars per token: words split into 4-char pieces, punctuation separate"""
+
+    name = "heuristic"
+    exact = False
+    _PIECE = re.compile(r"\s*(?:\w{1,4}|[^\w\s])")
+
+    def count(self, text: str) -> int:
+        return sum(1 for _ in self._PIECE.finditer(text))
+
+    def offsets(self, text: str) -> List[int]:
+        return [m.start() for m in self._PIECE.finditer(text)]
+
+
+_HEURISTIC = _HeuristicTokenizer()
+_registry: Dict[str, Tokenizer] = {}
+_lock = threading.Lock()
+
+
+def resolve_family(model: Optional[str] = None) -> str:
+    """Registry key of the tokenizer used for a model name"""
+    name = (model or "").strip()
+    lowered = name.lower()
+    if lowered.startswith("hf:"):
+        return name
+    if lowered.startswith("sentence-transformers/"):
+        return f"hf:{name}"
+    if lowered in _TIKTOKEN_ENCODINGS:
+        return f"tiktoken:{lowered}"
+    # Provider-prefixed names, e.g. "openai/gpt-4o-mini"
+    base = lowered.rsplit("/", 1)[-1]
+    if base.startswith(_O200K_PREFIXES):
+        return "tiktoken:o200k_base"
+    if base.startswith(_CL100K_PREFIXES):
+        return "tiktoken:cl100k_base"
+    default = os.getenv("KIFF_TOKENIZER", "cl100k_base").strip()
+    if default.lower() == lowered:
+        # Unknown default (e.g. "heuristic") would otherwise recurse
+        return "heuristic"
+    return resolve_family(default)
+
+
+def _load(family: str) -> Tokenizer:
+    kind, _, arg = family.partition(":")
+    try:
+        if kind == "tiktoken" and tiktoken is not None:
+            return _TiktokenTokenizer(arg)
+        if kind == "hf":
+            return _HFTokenizer(arg)
+    except Exception as e:
+        print(f"[TOKENIZERS] {family} unavailable ({e}); using ~4 chars/token heuristic")
+    return _HEURISTIC
+
+
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """Shared tokenizer for a model name (loaded once per family per process)"""
+    family = resolve_family(model)
+    tok = _registry.get(family)
+    if tok is None:
+        with _lock:
+            tok = _registry.get(family)
+            if tok is None:
+                # A failed load is cached as the heuristic too, so it is not retried per call
+                tok = _registry[family] = _load(family)
+    return tok
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    return get_tokenizer(model).count(text)
+
+
+@dataclass
+class TokenChunk:
+    text: str
+    start: int  # char offsets into the source text
+    end: int
+    tokens: int
+    index: int
+
+
+def _segments(text: str, size: int) -> Iterator[Tuple[int, str]]:
+    """Split text before a newline (or space) near every `size` chars.
+
+    Cutting in front of whitespace keeps BPE pre-tokenization (and therefore
+    token counts) the same as tokenizing the text in one piece.
+    """
+    pos = 0
+    n = len(text)
+    while pos < n:
+        end = min(n, pos + size)
+        if end < n:
+            cut = text.rfind("\n", pos + size // 2, end)
+            if cut <= pos:
+                cut = text.rfind(" ", pos + size // 2, end)
+            if cut > pos:
+                end = cut
+        yield pos, text[pos:end]
+        pos = end
+
+
+def iter_token_chunks(
+    text: str,
+    size: int,
+    overlap: int = 0,
+    tokenizer: Optional[Tokenizer] = None,
+    segment_chars: int = _SEGMENT_CHARS,
+) -> Iterator[TokenChunk]:
+    """Yield chunks of exactly `size` tokens (the last may be shorter) lazily.
+
+    Consecutive chunks share `overlap` tokens. Each chunk carries its char
+    offsets and token count, so callers get exact counts without re-encoding.
+    """
+    if not text:
+        return
+    tok = tokenizer or get_tokenizer()
+    if size <= 0:
+        yield TokenChunk(text=text, start=0, end=len(text), tokens=tok.count(text), index=0)
+        return
+    step = max(1, size - max(0, overlap))
+    window: List[int] = []  # start offsets of buffered tokens
+    index = 0
+
+    for seg_start, seg in _segments(text, segment_chars):
+        window.extend(seg_start + o for o in tok.offsets(seg))
+        # Need one token past the window to know where the chunk ends
+        while len(window) > size:
+            start, end = window[0], window[size]
+            yield TokenChunk(text=text[start:end], start=start, end=end, tokens=size, index=index)
+            index += 1
+            del window[:step]
+
+    # Remainder; skip it when it is only the overlap of the previous chunk
+    if window and (index == 0 or len(window) > size - step):
+        start = window[0]
+        yield TokenChunk(text=text[start:], start=start, end=len(text), tokens=len(window), index=index)
+
+
+def token_chunks(text: str, size: int, overlap: int = 0, model: Optional[str] = None) -> List[TokenChunk]:
+    return list(iter_token_chunks(text, size, overlap, get_tokenizer(model)))
@@ -0,0 +1,195 @@
+"""
+Turn Cancellation
+=================
+
+Stops streamed agent turns nobody is waiting for any more, so a closed tab
+or a stop button frees model, tool and sandbox capacity right away instead
+of when the model finishes:
+
+- every streaming turn (launcher /api/chat/stream-message, /api/compose/stream)
+  is registered as an ActiveTurn for its tenant and session
+- a turn is cancelled when the client disconnects (request.is_disconnected()
+  polled every KIFF_STREAM_DISCONNECT_POLL_MS, or Starlette cancelling the
+  response) or when the stop endpoint of its route is called
+- cancellable_stream() runs the turn's generator in its own task and
+  cancels that task on cancel: the LLM stream is aborted at its current
+  await, the generator's cleanup runs (persistence, partial usage event)
+  and the admission ticket is released
+- cancel hooks run at cancel time (launcher turns kill the session's
+  running sandbox execs); tools that cannot be interrupted check
+  turn_cancelled() before doing any work
+
+Turns are per process, like the admission limits: a stop request has to
+reach the process that runs the stream.
+
+Env:
+- KIFF_STREAM_DISCONNECT_POLL_MS (default 500)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+_turns: Dict[str, "ActiveTurn"] = {}
+_lock = threading.Lock()
+
+_END = object()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+@dataclass
+class ActiveTurn:
+    turn_id: str
+    kind: str
+    tenant_id: str
+    session_id: str
+    started_at: float = field(default_factory=time.monotonic)
+    reason: Optional[str] = None
+    hooks: List[Callable[[], Any]] = field(default_factory=list)
+    stopped: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started_at) * 1000)
+
+    def cancel(self, reason: str) -> bool:
+        """Mark the turn cancelled and run its hooks (once); call from the event loop"""
+        if self.reason is not None:
+            return False
+        self.reason = reason
+        self.stopped.set()
+        for hook in self.hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"[TURN] {self.kind} session={self.session_id} cancel hook failed: {e}")
+        print(f"[TURN] {self.kind} session={self.session_id} cancelled ({reason}) after {self.elapsed_ms()}ms")
+        return True
+
+
+@dataclass
+class _Failure:
+    exc: BaseException
+
+
+def start_turn(kind: str, tenant_id: str, session_id: str, hooks: Optional[List[Callable[[], Any]]] = None) -> ActiveTurn:
+    turn = ActiveTurn(turn_id=uuid.uuid4().hex, kind=kind, tenant_id=tenant_id, session_id=session_id, hooks=list(hooks or []))
+    with _lock:
+        _turns[turn.turn_id] = turn
+    return turn
+
+
+def end_turn(turn: ActiveTurn) -> None:
+    with _lock:
+        _turns.pop(turn.turn_id, None)
+
+
+def stop_turns(tenant_id: str, session_id: str, kind: Optional[str] = None, reason: str = "stop_requested") -> int:
+    """Cancel the tenant's running turns for the session; returns how many were cancelled"""
+    with _lock:
+        turns = [
+            t for t in _turns.values()
+            if t.tenant_id == tenant_id and t.session_id == session_id and (kind is None or t.kind == kind)
+        ]
+    return sum(1 for t in turns if t.cancel(reason))
+
+
+def turn_cancelled(session_id: Optional[str]) -> bool:
+    """True when the session's latest running turn was cancelled (safe from tool threads)"""
+    if not session_id:
+        return False
+    with _lock:
+        turns = [t for t in _turns.values() if t.session_id == session_id]
+    if not turns:
+        return False
+    return max(turns, key=lambda t: t.started_at).cancelled
+
+
+async def _watch_disconnect(request: Any, turn: ActiveTurn, poll_s: float) -> None:
+    while not turn.cancelled:
+        try:
+            if await request.is_disconnected():
+                turn.cancel("client_disconnected")
+                return
+        except Exception:
+            return
+        try:
+            await asyncio.wait_for(turn.stopped.wait(), timeout=poll_s)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _cancelled_event(reason: str) -> str:
+    return f"data: {json.dumps({'type': 'Cancelled', 'reason': reason})}\n\n"
+
+
+async def cancellable_stream(
+    stream: AsyncIterator[str],
+    request: Any,
+    turn: ActiveTurn,
+    cancelled_event: Callable[[str], str] = _cancelled_event,
+) -> AsyncIterator[str]:
+    """Pass the SSE lines of stream through until it ends, the client
+    disconnects or the turn is stopped. On a stop request a final
+    cancelled_event(reason) line is sent. The turn is unregistered once the
+    stream's cleanup has run."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def _produce() -> None:
+        try:
+            async for item in stream:
+                await queue.put(item)
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await queue.put(_Failure(e))
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    # One task for the whole generator keeps its context variables and
+    # lets a cancel interrupt whatever it is awaiting
+    producer = asyncio.create_task(_produce())
+    producer.add_done_callback(lambda _t: end_turn(turn))
+    watcher = asyncio.create_task(_watch_disconnect(request, turn, _env_int("KIFF_STREAM_DISCONNECT_POLL_MS", 500) / 1000.0))
+    stopped = asyncio.create_task(turn.stopped.wait())
+    getter: Optional[asyncio.Task] = None
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                break
+            item = getter.result()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+        if turn.cancelled and turn.reason != "client_disconnected":
+            yield cancelled_event(turn.reason or "cancelled")
+    finally:
+        # No awaits here: when Starlette cancels the response this runs
+        # inside a cancelled scope
+        if not producer.done():
+            turn.cancel(turn.reason or "client_disconnected")
+            producer.cancel()
+        for task in (getter, watcher, stopped):
+            if task is not None and not task.done():
+                task.cancel()
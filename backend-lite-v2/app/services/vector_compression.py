@@ -0,0 +1,226 @@
+# vector_compression.py
+"""
+Compact vector storage options for LanceDB tables.
+
+Two independent knobs, configured globally via env and overridable per table:
+- precision: store vectors as float32 (default) or float16 (half the bytes)
+- index: "none" (exact scan) or "ivf_pq" (product-quantized ANN index)
+
+Env:
+- KIFF_VECTOR_PRECISION: float32 | float16
+- KIFF_VECTOR_INDEX: none | ivf_pq
+- KIFF_PQ_NUM_SUB_VECTORS: PQ sub-vectors (default 48, i.e. 8 dims each for 384-d)
+- KIFF_PQ_NUM_PARTITIONS: IVF partitions (default: sqrt(rows), clamped)
+- KIFF_VECTOR_INDEX_MIN_ROWS: skip index creation below this row count (default 5000)
+- KIFF_VECTOR_REFINE_FACTOR: re-rank factor applied to ANN queries (default 10)
+- KIFF_VECTOR_TABLE_OVERRIDES: JSON {"<table glob>": {"precision": ..., "index": ...}}
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np  # type: ignore
+    import pyarrow as pa  # type: ignore
+    _HAS_ARROW = True
+except Exception:  # pragma: no cover - optional
+    np = None  # type: ignore
+    pa = None  # type: ignore
+    _HAS_ARROW = False
+
+VECTOR_COLUMN = "vector"
+_PRECISIONS = ("float32", "float16")
+_INDEX_TYPES = ("none", "ivf_pq")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+@dataclass(frozen=True)
+class VectorStorageConfig:
+    precision: str = "float32"
+    index: str = "none"
+    num_sub_vectors: int = 48
+    num_partitions: Optional[int] = None
+    min_rows_for_index: int = 5000
+    refine_factor: int = 10
+    metric: str = "cosine"
+
+
+def _base_config() -> VectorStorageConfig:
+    precision = os.getenv("KIFF_VECTOR_PRECISION", "float32").lower()
+    index = os.getenv("KIFF_VECTOR_INDEX", "none").lower()
+    partitions = os.getenv("KIFF_PQ_NUM_PARTITIONS")
+    return VectorStorageConfig(
+        precision=precision if precision in _PRECISIONS else "float32",
+        index=index if index in _INDEX_TYPES else "none",
+        num_sub_vectors=_env_int("KIFF_PQ_NUM_SUB_VECTORS", 48),
+        num_partitions=int(partitions) if partitions and partitions.isdigit() else None,
+        min_rows_for_index=_env_int("KIFF_VECTOR_INDEX_MIN_ROWS", 5000),
+        refine_factor=_env_int("KIFF_VECTOR_REFINE_FACTOR", 10),
+    )
+
+
+def get_storage_config(table_name: Optional[str] = None) -> VectorStorageConfig:
+    """Resolve the storage config for table_name (env defaults + per-table overrides)."""
+    config = _base_config()
+    raw = os.getenv("KIFF_VECTOR_TABLE_OVERRIDES")
+    if not raw or not table_name:
+        return config
+    try:
+        overrides: Dict[str, Dict[str, Any]] = json.loads(raw)
+    except Exception as e:
+        logger.warning(f"[VECTOR_COMPRESSION] Ignoring invalid KIFF_VECTOR_TABLE_OVERRIDES: {e}")
+        return config
+    for pattern, values in overrides.items():
+        if fnmatch(table_name, pattern):
+            allowed = {k: v for k, v in (values or {}).items() if k in VectorStorageConfig.__dataclass_fields__}
+            config = replace(config, **allowed)
+    return config
+
+
+def table_vector_dtype(table: Any) -> Optional[str]:
+    """Return the stored vector value type of an existing table ('float32'/'float16'), if known."""
+    try:
+        value_type = table.schema.field(VECTOR_COLUMN).type.value_type
+        if pa.types.is_float16(value_type):
+            return "float16"
+        if pa.types.is_float32(value_type):
+            return "float32"
+        return str(value_type)
+    except Exception:
+        return None
+
+
+def to_arrow_rows(rows: List[Dict[str, Any]], precision: str = "float32"):
+    """Convert row dicts into an Arrow table whose vector column uses precision.
+
+    Falls back to the plain row list when pyarrow/numpy are unavailable.
+    """
+    if not rows or not _HAS_ARROW or VECTOR_COLUMN not in rows[0]:
+        return rows
+    dtype = np.float16 if precision == "float16" else np.float32
+    vectors = np.asarray([r[VECTOR_COLUMN] for r in rows], dtype=dtype)
+    dim = vectors.shape[1]
+    arrow_rows = pa.Table.from_pylist([{k: v for k, v in r.items() if k != VECTOR_COLUMN} for r in rows])
+    vector_array = pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), dim)
+    return arrow_rows.append_column(VECTOR_COLUMN, vector_array)
+
+
+def prepare_rows(rows: List[Dict[str, Any]], table_name: str, table: Any = None):
+    """Shape rows for writing: match an existing table's vector type, else the configured precision."""
+    precision = (table_vector_dtype(table) if table is not None else None) or get_storage_config(table_name).precision
+    if precision == "float32" and table is not None:
+        # Existing float32 tables accept plain rows unchanged
+        return rows
+    return to_arrow_rows(rows, precision)
+
+
+def _has_vector_index(table: Any) -> bool:
+    try:
+        for idx in table.list_indices():
+            columns = getattr(idx, "columns", None)
+            if columns is None and isinstance(idx, dict):
+                columns = idx.get("columns")
+            if VECTOR_COLUMN in (columns or []):
+                return True
+    except Exception:
+        pass
+    return False
+
+
+def ensure_vector_index(table: Any, table_name: str, force: bool = False, config: Optional[VectorStorageConfig] = None) -> bool:
+    """Create or refresh the configured ANN index on table. Returns True if an index was built."""
+    config = config or get_storage_config(table_name)
+    if config.index != "ivf_pq":
+        return False
+    try:
+        rows = table.count_rows()
+    except Exception:
+        rows = 0
+    if not force and (rows < config.min_rows_for_index or _has_vector_index(table)):
+        return False
+    # PQ training needs enough rows per partition; keep partitions near sqrt(rows)
+    partitions = config.num_partitions or max(1, min(1024, int(math.sqrt(max(rows, 1)))))
+    try:
+        table.create_index(
+            metric=config.metric,
+            num_partitions=partitions,
+            num_sub_vectors=config.num_sub_vectors,
+            vector_column_name=VECTOR_COLUMN,
+            replace=True,
+        )
+        logger.info(f"[VECTOR_COMPRESSION] Built IVF_PQ index on {table_name} (rows={rows}, partitions={partitions}, sub_vectors={config.num_sub_vectors})")
+        return True
+    except Exception as e:
+        logger.warning(f"[VECTOR_COMPRESSION] Index build failed on {table_name}: {e}")
+        return False
+
+
+def apply_search_params(query: Any, table_name: str):
+    """Apply ANN tuning (refine factor) to a LanceDB query when the table is PQ-indexed."""
+    config = get_storage_config(table_name)
+    if config.index == "ivf_pq" and config.refine_factor > 0:
+        try:
+            return query.refine_factor(config.refine_factor)
+        except Exception:
+            return query
+    return query
+
+
+def migrate_table(uri: str, table_name: str, precision: Optional[str] = None, index: Optional[str] = None, keep_backup: bool = False) -> Dict[str, Any]:
+    """Rewrite an existing table with a new vector precision and (re)build its index.
+
+    The table is read fully into memory and overwritten in place under the same name.
+    """
+    from app.services import lancedb_registry
+
+    if not _HAS_ARROW:
+        raise RuntimeError("pyarrow and numpy are required for migration")
+    config = get_storage_config(table_name)
+    target_precision = precision or config.precision
+    if target_precision not in _PRECISIONS:
+        raise ValueError(f"unsupported precision: {target_precision}")
+
+    table = lancedb_registry.open_table(uri, table_name)
+    source_precision = table_vector_dtype(table)
+    data = table.to_arrow()
+    rows = data.num_rows
+    if keep_backup:
+        lancedb_registry.create_table(uri, f"{table_name}__backup", data=data, mode="overwrite")
+
+    if source_precision != target_precision and rows > 0:
+        idx = data.schema.get_field_index(VECTOR_COLUMN)
+        dim = data.schema.field(VECTOR_COLUMN).type.list_size
+        flat = data.column(VECTOR_COLUMN).combine_chunks().flatten().to_numpy(zero_copy_only=False)
+        dtype = np.float16 if target_precision == "float16" else np.float32
+        vector_array = pa.FixedSizeListArray.from_arrays(pa.array(flat.astype(dtype)), dim)
+        data = data.set_column(idx, VECTOR_COLUMN, vector_array)
+        table = lancedb_registry.create_table(uri, table_name, data=data, mode="overwrite")
+
+    if index is not None:
+        indexed = ensure_vector_index(table, table_name, force=True, config=replace(config, index=index))
+    else:
+        indexed = ensure_vector_index(table, table_name)
+
+    return {
+        "table": table_name,
+        "rows": rows,
+        "from_precision": source_precision,
+        "to_precision": target_precision,
+        "indexed": indexed,
+    }
+
@@ -6,7 +6,6 @@ Service for managing vector embeddings of Kiff Packs in LanceDB
 for efficient similarity search and recommendations.
 """
 
-import lancedb
 import asyncio
 from typing import List, Dict, Any, Optional
 import json
@@ -14,14 +13,31 @@ from datetime import datetime
 import uuid
 
 from app.services.ml_api_client import ml_client
+from app.services import lancedb_registry
+from app.services.vector_compression import prepare_rows, ensure_vector_index, apply_search_params
+from app.services.dedup import ChunkDeduper, dedup_enabled
+from app.services.incremental_index import (
+    HASH_COLUMNS, bulk_delete, chunk_ids, diff_rows, ensure_columns, in_predicate, scan_existing, sql_quote, text_hash, upsert,
+)
 from app.observability.llm_wrapper import embed_and_track, SessionContext
 
+# Scalar columns needed for pack listings; avoids materializing vectors
+_PACK_LISTING_COLUMNS = [
+    "pack_id", "pack_name", "display_name", "description", "category",
+    "usage_count", "avg_rating", "is_verified", "api_url", "created_by",
+]
+# Row columns that, when changed without a text change, rewrite the row but reuse its vector
+_PACK_ROW_COMPARE = [c for c in _PACK_LISTING_COLUMNS if c != "pack_id"] + ["tenant_id", "document_type", "metadata_json"]
+_PACK_HASH_COLUMNS = {"id": "CAST(NULL AS STRING)", **HASH_COLUMNS}
+
+
 class VectorStorageService:
     """Manage vector storage for Kiff Packs"""
     
     def __init__(self, db_path: str = "./kiff_vectors"):
         self.db_path = db_path
-        self.db = lancedb.connect(db_path)
+        # Shared process-wide connection; table handles come from the registry
+        self.db = lancedb_registry.get_db(db_path)
     
     async def _embed_text(self, text: str) -> List[float]:
         """Generate embeddings for text using ML service."""
@@ -72,6 +88,16 @@ class VectorStorageService:
         )
         return result.get("embedding") if isinstance(result, dict) else result
     
+    def _scan_columns(self, table, columns: List[str]):
+        """Read only the given columns into pandas (skips the vector column)"""
+        try:
+            return table.search().select(columns).limit(None).to_pandas()
+        except Exception:
+            try:
+                return table.to_lance().to_table(columns=columns).to_pandas()
+            except Exception:
+                return table.to_arrow().select(columns).to_pandas()
+    
     def _combine_pack_content_for_embedding(self, pack) -> str:
         """Combine pack content into searchable text"""
         content_parts = [
@@ -130,32 +156,46 @@ class VectorStorageService:
         return documents
     
     async def store_pack_vectors(self, pack, tenant_id: str) -> bool:
-        """Store pack content as vectors in LanceDB for retrieval"""
+        """Store pack content as vectors in LanceDB for retrieval.
+
+        Re-processing a pack only embeds documents whose text changed; stale
+        documents are removed in one delete and the rest written in one upsert.
+        """
         try:
             table_name = f"tenant_{tenant_id}_kiff_packs"
             
             # Create chunked documents from pack content
             documents = self._create_pack_documents(pack, tenant_id)
             
+            # Repeated snippets/patterns within a pack are embedded and stored once
+            duplicates = 0
+            if documents and dedup_enabled():
+                deduper = ChunkDeduper()
+                unique = [doc for doc in documents if deduper.check(doc["content"], doc["type"]) is None]
+                duplicates = len(documents) - len(unique)
+                documents = unique
+            
             if not documents:
                 print(f"⚠️ No documents to store for pack {pack.id}")
                 return True
-                
-            # Prepare data for LanceDB
-            vectors_data = []
-            for doc in documents:
-                embedding = await self._embed_text_tracked(doc["content"], tenant_id, tool_name="store_pack_vectors")
+            
+            # Prepare rows for LanceDB (vectors are filled in after diffing)
+            keys = chunk_ids(f"pack:{pack.id}", [doc["content"] for doc in documents])
+            pack_hash = text_hash(self._combine_pack_content_for_embedding(pack))
+            rows = []
+            for doc, key in zip(documents, keys):
                 # Prepare metadata as JSON string to avoid schema conflicts
                 metadata_str = ""
                 if doc.get("metadata"):
                     try:
-                        import json
                         metadata_str = json.dumps(doc["metadata"])
                     except Exception:
                         metadata_str = str(doc["metadata"])
                 
-                vectors_data.append({
-                    "vector": embedding,
+                rows.append({
+                    "id": key["id"],
+                    "content_hash": key["content_hash"],
+                    "page_hash": pack_hash,
                     "content": doc["content"],
                     "pack_id": pack.id,
                     "tenant_id": tenant_id,
@@ -172,43 +212,56 @@ class VectorStorageService:
                     "metadata_json": metadata_str
                 })
             
-            # Create or get table - handle schema changes by recreating table
-            try:
-                table = self.db.open_table(table_name)
-                # Delete existing vectors for this pack to avoid duplicates
+            # Diff against what is already stored for this pack
+            table = None
+            existing: Dict[str, Dict[str, Any]] = {}
+            legacy_rows = False
+            pack_filter = f"pack_id = {sql_quote(pack.id)}"
+            if lancedb_registry.table_exists(self.db_path, table_name):
+                table = lancedb_registry.open_table(self.db_path, table_name)
+                # Tables written before incremental indexing have no id/hash columns
+                legacy_rows = "id" not in table.schema.names
+                ensure_columns(table, _PACK_HASH_COLUMNS)
+                existing = scan_existing(table, pack_filter, ["content_hash", *_PACK_ROW_COMPARE])
+            diff = diff_rows(rows, existing, compare=_PACK_ROW_COMPARE)
+            
+            # Embed only new or changed documents; moved ones keep their stored vector
+            for row in diff.new:
+                row["vector"] = await self._embed_text_tracked(row["content"], tenant_id, tool_name="store_pack_vectors")
+            if diff.moved:
+                stored = scan_existing(table, in_predicate("id", [r["id"] for r in diff.moved]), ["vector"])
+                for row in diff.moved:
+                    row["vector"] = stored[row["id"]]["vector"]
+            
+            if table is None:
+                table = lancedb_registry.create_table(self.db_path, table_name, prepare_rows(diff.upserts, table_name))
+            else:
+                if diff.stale_ids:
+                    bulk_delete(table, diff.stale_ids)
+                if legacy_rows:
+                    table.delete(f"{pack_filter} AND id IS NULL")
                 try:
-                    table.delete(f"pack_id = '{pack.id}'")
-                except Exception:
-                    pass  # Table might not exist yet
-                
-                # Try adding a test record to check schema compatibility
-                if vectors_data:
-                    try:
-                        # Test with a single record first
-                        table.add(vectors_data[:1])
-                        vectors_data = vectors_data[1:]  # Skip first record since it's already added
-                    except ValueError as schema_error:
-                        if "not found in target schema" in str(schema_error):
-                            print(f"⚠️ Schema mismatch detected, recreating table: {schema_error}")
-                            # Drop and recreate table with new schema
-                            self.db.drop_table(table_name)
-                            table = self.db.create_table(table_name, vectors_data[:1])
-                            vectors_data = vectors_data[1:]  # Skip first record as it's used for schema
-                        else:
-                            raise
-            except Exception:
-                # Create new table if it doesn't exist
-                if vectors_data:
-                    table = self.db.create_table(table_name, vectors_data[:1])
-                    vectors_data = vectors_data[1:]  # Skip first record as it's used for schema
-                else:
-                    return True
+                    upsert(table, prepare_rows(diff.upserts, table_name, table))
+                except ValueError as schema_error:
+                    if "not found in target schema" not in str(schema_error):
+                        raise
+                    print(f"⚠️ Schema mismatch detected, recreating table: {schema_error}")
+                    # Drop and recreate table with new schema; every row needs a vector again
+                    for row in rows:
+                        if "vector" not in row:
+                            row["vector"] = await self._embed_text_tracked(row["content"], tenant_id, tool_name="store_pack_vectors")
+                    lancedb_registry.drop_table(self.db_path, table_name)
+                    table = lancedb_registry.create_table(self.db_path, table_name, prepare_rows(rows, table_name))
             
-            # Add vectors to table
-            if vectors_data:
-                table.add(vectors_data)
+            # Build the configured PQ index once the table is large enough
+            ensure_vector_index(table, table_name)
             
-            print(f"✅ Stored {len(vectors_data) + 1} vector documents for pack {pack.id}")
+            summary = diff.summary()
+            print(
+                f"✅ Stored {len(rows)} vector documents for pack {pack.id} "
+                f"(embedded {summary['new']}, moved {summary['moved']}, unchanged {summary['unchanged']}, "
+                f"removed {summary['stale']}, duplicates dropped {duplicates})"
+            )
             return True
             
         except Exception as e:
@@ -231,15 +284,16 @@ class VectorStorageService:
             query_embedding = await self._embed_text_tracked(query, tenant_id, tool_name="search_similar_packs")
             
             # Search in LanceDB
-            table = self.db.open_table(table_name)
-            results = table.search(query_embedding).limit(limit).to_list()
+            table = lancedb_registry.open_table(self.db_path, table_name)
+            search_query = table.search(query_embedding).select(_PACK_LISTING_COLUMNS)
+            results = apply_search_params(search_query, table_name).limit(limit).to_list()
             
             # Format results
             similar_packs = []
             for result in results:
                 pack_data = {
                     "id": result["pack_id"],
-                    "name": result["name"],
+                    "name": result.get("pack_name"),
                     "display_name": result["display_name"],
                     "description": result["description"],
                     "category": result["category"],
@@ -262,7 +316,7 @@ class VectorStorageService:
         """Remove pack vectors from LanceDB"""
         try:
             table_name = f"tenant_{tenant_id}_kiff_packs"
-            table = self.db.open_table(table_name)
+            table = lancedb_registry.open_table(self.db_path, table_name)
             table.delete(f"pack_id = '{pack_id}'")
             
             print(f"✅ Removed vectors for pack {pack_id}")
@@ -281,11 +335,11 @@ class VectorStorageService:
         """Get pack recommendations based on user's usage history"""
         try:
             table_name = f"tenant_{tenant_id}_kiff_packs"
-            table = self.db.open_table(table_name)
+            table = lancedb_registry.open_table(self.db_path, table_name)
             
             # For now, return most popular packs
             # In the future, this could use collaborative filtering
-            all_packs = table.to_pandas()
+            all_packs = self._scan_columns(table, _PACK_LISTING_COLUMNS).drop_duplicates("pack_id")
             
             if len(all_packs) == 0:
                 return []
@@ -297,7 +351,7 @@ class VectorStorageService:
             for _, pack in recommended.iterrows():
                 pack_data = {
                     "id": pack["pack_id"],
-                    "name": pack["name"],
+                    "name": pack["pack_name"],
                     "display_name": pack["display_name"],
                     "description": pack["description"],
                     "category": pack["category"],
@@ -318,8 +372,8 @@ class VectorStorageService:
         """Get statistics about tenant's pack collection"""
         try:
             table_name = f"tenant_{tenant_id}_kiff_packs"
-            table = self.db.open_table(table_name)
-            all_packs = table.to_pandas()
+            table = lancedb_registry.open_table(self.db_path, table_name)
+            all_packs = self._scan_columns(table, _PACK_LISTING_COLUMNS).drop_duplicates("pack_id")
             
             if len(all_packs) == 0:
                 return {
@@ -356,7 +410,6 @@ class VectorStorageService:
             
             # Test ML service connection (simplified check)
             from .ml_api_client import ml_client
-            import asyncio
             
             try:
                 # Try to run health check on ML service
@@ -391,4 +444,15 @@ class VectorStorageService:
 # Factory function
 def create_vector_storage_service() -> VectorStorageService:
     """Create a new vector storage service instance"""
-    return VectorStorageService()
\ No newline at end of file
+    return VectorStorageService()
+
+
+_shared_service: Optional[VectorStorageService] = None
+
+
+def get_vector_storage_service() -> VectorStorageService:
+    """Get the shared vector storage service (created on first use)"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = VectorStorageService()
+    return _shared_service
\ No newline at end of file
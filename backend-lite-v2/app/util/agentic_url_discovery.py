@@ -4,13 +4,15 @@ Uses AGNO agents to discover documentation URLs when sitemaps are insufficient o
 """
 
 import asyncio
-import httpx
 from typing import List, Dict, Any, Optional, Set
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin, urlparse
 import json
 
+from ..services.doc_fetcher import get_fetcher
+from ..services.html_extractor import bs4_parser_name
+
 # Optional AGNO import
 try:
     from agno.models.groq import Groq as GroqLLM  # type: ignore
@@ -153,21 +155,17 @@ class AgenticURLDiscoverer:
         ]
         
         found_urls = []
-        tried_paths = []
+        tried_paths = list(common_urls)
         
-        async with httpx.AsyncClient(timeout=10) as client:
-            for url in common_urls:
-                try:
-                    tried_paths.append(url)
-                    response = await client.get(url)
-                    if response.status_code == 200:
-                        # Extract more URLs from this documentation page
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        page_urls = self._extract_doc_urls_from_page(soup, url)
-                        found_urls.extend(page_urls)
-                        
-                except Exception:
-                    continue
+        # Probe all candidate paths concurrently through the shared fetcher
+        responses = await get_fetcher().fetch_all(common_urls, timeout=10, retries=0, raise_for_status=False)
+        for url, response in zip(common_urls, responses):
+            if isinstance(response, BaseException) or response.status_code != 200:
+                continue
+            # Extract more URLs from this documentation page
+            soup = BeautifulSoup(response.text, bs4_parser_name())
+            page_urls = self._extract_doc_urls_from_page(soup, url)
+            found_urls.extend(page_urls)
         
         return {
             "found_urls": list(set(found_urls)),
@@ -187,27 +185,26 @@ class AgenticURLDiscoverer:
         new_urls = []
         
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(start_url)
-                if response.status_code != 200:
-                    return {"new_urls": [], "visited": [start_url]}
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract documentation URLs from this page
-                page_doc_urls = self._extract_doc_urls_from_page(soup, start_url)
-                new_urls.extend(page_doc_urls)
-                
-                # Find navigation and high-value links to crawl further
-                nav_links = self._find_navigation_links(soup, start_url)
-                
-                # Recursively crawl promising navigation links
-                for nav_url in nav_links[:3]:  # Limit to avoid explosion
-                    if nav_url not in visited_urls and len(discovered_urls) + len(new_urls) < self.max_urls:
-                        sub_results = await self._crawl_with_heuristics(
-                            nav_url, max_depth - 1, discovered_urls, visited_urls
-                        )
-                        new_urls.extend(sub_results['new_urls'])
+            response = await get_fetcher().fetch(start_url, timeout=10, retries=0, raise_for_status=False)
+            if response.status_code != 200:
+                return {"new_urls": [], "visited": [start_url]}
+            
+            soup = BeautifulSoup(response.text, bs4_parser_name())
+            
+            # Extract documentation URLs from this page
+            page_doc_urls = self._extract_doc_urls_from_page(soup, start_url)
+            new_urls.extend(page_doc_urls)
+            
+            # Find navigation and high-value links to crawl further
+            nav_links = self._find_navigation_links(soup, start_url)
+            
+            # Recursively crawl promising navigation links
+            for nav_url in nav_links[:3]:  # Limit to avoid explosion
+                if nav_url not in visited_urls and len(discovered_urls) + len(new_urls) < self.max_urls:
+                    sub_results = await self._crawl_with_heuristics(
+                        nav_url, max_depth - 1, discovered_urls, visited_urls
+                    )
+                    new_urls.extend(sub_results['new_urls'])
                         
         except Exception as e:
             print(f"Error crawling {start_url}: {e}")
@@ -319,24 +316,24 @@ Return only a JSON array of URLs, no additional text.
 
     async def _verify_urls(self, urls: List[str]) -> List[str]:
         """Verify that suggested URLs actually exist and contain content."""
-        verified = []
+        fetcher = get_fetcher()
         
-        async with httpx.AsyncClient(timeout=5) as client:
-            for url in urls:
-                try:
-                    response = await client.head(url)  # Use HEAD for efficiency
-                    if response.status_code == 200:
-                        verified.append(url)
-                except Exception:
-                    # Try GET as fallback
-                    try:
-                        response = await client.get(url, timeout=3)
-                        if response.status_code == 200 and len(response.text) > 100:
-                            verified.append(url)
-                    except Exception:
-                        continue
+        async def _verify(url: str) -> bool:
+            try:
+                response = await fetcher.fetch(url, method="HEAD", timeout=5, retries=0, raise_for_status=False)  # Use HEAD for efficiency
+                if response.status_code == 200:
+                    return True
+            except Exception:
+                pass
+            # Try GET as fallback
+            try:
+                response = await fetcher.fetch(url, timeout=3, retries=0, raise_for_status=False)
+                return response.status_code == 200 and len(response.text) > 100
+            except Exception:
+                return False
         
-        return verified
+        checks = await asyncio.gather(*(_verify(u) for u in urls))
+        return [u for u, ok in zip(urls, checks) if ok]
 
 
 async def discover_api_urls(base_url: str, max_depth: int = 3, max_urls: int = 200) -> Dict[str, Any]:
@@ -181,7 +181,8 @@ def bulk_upsert_doc_urls(api_service_id: str, urls: List[Tuple[str, Optional[str
         key = (api_service_id, url)
         if key in by_key:
             i = by_key[key]
-            items[i] = {**items[i], "lastmod": lastmod, "section": section, "updated_at": now}
+            # Keep a previously captured sitemap lastmod when the caller has none
+            items[i] = {**items[i], "lastmod": lastmod or items[i].get("lastmod"), "section": section, "updated_at": now}
         else:
             items.append({
                 "id": str(uuid.uuid4()),
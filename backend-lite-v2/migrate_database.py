@@ -132,6 +132,15 @@ def migrate_postgres():
                 else:
                     print("✓ session_id column already exists in kiff_messages")
             
+            # Add processing_stats column if missing
+            if 'kiff_packs' in existing_tables:
+                columns = [col['name'] for col in inspector.get_columns('kiff_packs')]
+                if 'processing_stats' not in columns:
+                    print("➕ Adding processing_stats column to kiff_packs...")
+                    conn.execute(text("ALTER TABLE kiff_packs ADD COLUMN processing_stats JSON;"))
+                else:
+                    print("✓ processing_stats column already exists in kiff_packs")
+            
             # Create all missing tables using SQLAlchemy
             print("➕ Creating missing tables...")
             KiffBase.metadata.create_all(engine)
@@ -175,6 +184,7 @@ def create_kiff_packs_tables(cursor, existing_tables):
                 tags TEXT DEFAULT '[]',
                 processing_status TEXT DEFAULT 'pending',
                 processing_error TEXT,
+                processing_stats TEXT DEFAULT '{}',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_used_at TIMESTAMP
@@ -188,6 +198,11 @@ def create_kiff_packs_tables(cursor, existing_tables):
         cursor.execute("CREATE INDEX idx_kiff_packs_avg_rating ON kiff_packs(avg_rating);")
     else:
         print("✓ kiff_packs table already exists")
+        cursor.execute("PRAGMA table_info(kiff_packs);")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'processing_stats' not in columns:
+            print("➕ Adding processing_stats column to kiff_packs...")
+            cursor.execute("ALTER TABLE kiff_packs ADD COLUMN processing_stats TEXT DEFAULT '{}';")
     
     # 2. Pack Usage table
     if 'pack_usage' not in existing_tables:
@@ -24,6 +24,11 @@ try:
 except ImportError:
     BeautifulSoup = None
 
+try:
+    from app.services.html_extractor import extract_main_content as _extract_main_content
+except ImportError:
+    _extract_main_content = None
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -254,6 +259,9 @@ class AgenticAPIProcessor:
             return ""
         
         try:
+            if _extract_main_content:
+                return _extract_main_content(html)
+
             if not BeautifulSoup:
                 # Fallback without BeautifulSoup - basic HTML stripping
                 import re
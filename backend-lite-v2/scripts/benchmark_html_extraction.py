@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTML main-content extraction.
+
+Compares the previous extraction (BeautifulSoup html.parser + get_text) with
+app.services.html_extractor on every installed parser backend, single-process
+and through the process pool. Reports pages/s, MB/s, extracted characters,
+estimated tokens (~4 chars/token) and the number of fixed-size chunks the
+text would produce, i.e. how much boilerplate no longer reaches the embedder.
+
+Pages come from a corpus directory of *.html files (--corpus), optionally
+captured first from live URLs (--save URL ...), or from a synthetic docs page
+with navigation, sidebar, footer, scripts and code blocks.
+
+Examples:
+  python scripts/benchmark_html_extraction.py
+  python scripts/benchmark_html_extraction.py --save https://docs.stripe.com/api --corpus /tmp/html_corpus
+  python scripts/benchmark_html_extraction.py --corpus /tmp/html_corpus --repeat 5 --json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import html_extractor  # noqa: E402
+
+
+def _synthetic_page(sections: int = 40) -> str:
+    nav = "".join(f'<li><a href="/docs/page-{i}">Navigation link {i}</a></li>' for i in range(150))
+    body = []
+    for i in range(sections):
+        body.append(
+            f"<h2 id='s{i}'>Section {i}<a class='anchor' href='#s{i}'>#</a></h2>"
+            f"<p>The <code>client.resource_{i}</code> endpoint returns a paginated list. "
+            "Pass <code>limit</code> and <code>starting_after</code> to page through results; "
+            "requests are authenticated with a bearer token.</p>"
+            f"<pre><code class='language-python'>resp = client.resource_{i}.list(limit=10)\n"
+            "for item in resp.data:\n    print(item.id)</code></pre>"
+            "<table><tr><th>Field</th><th>Type</th></tr>"
+            f"<tr><td>id_{i}</td><td>string</td></tr><tr><td>created</td><td>integer</td></tr></table>"
+        )
+    return (
+        "<!doctype html><html><head><title>Docs</title>"
+        f"<style>{'.x{color:red}' * 300}</style><script>{'window.__STATE__={};' * 300}</script></head><body>"
+        f"<header class='site-header'><a href='/'>Home</a> Pricing Blog Sign in</header>"
+        f"<nav class='sidebar'><ul>{nav}</ul></nav>"
+        f"<div class='layout'><main><article class='markdown'><h1>API Reference</h1>{''.join(body)}</article></main>"
+        f"<aside class='toc'><ul>{nav[:4000]}</ul></aside></div>"
+        "<div class='cookie-banner'>We use cookies to improve your experience. Accept all</div>"
+        f"<footer class='footer'>{'Company About Careers Legal Privacy ' * 40}</footer>"
+        "</body></html>"
+    )
+
+
+async def _save_corpus(urls: List[str], corpus: Path) -> None:
+    from app.services.doc_fetcher import get_fetcher
+
+    corpus.mkdir(parents=True, exist_ok=True)
+    results = await get_fetcher().fetch_all(urls)
+    for url, res in zip(urls, results):
+        if isinstance(res, Exception):
+            print(f"skip {url}: {res}")
+            continue
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".html"
+        (corpus / name).write_text(res.text, encoding="utf-8")
+        print(f"saved {url} -> {corpus / name} ({len(res.text)} chars)")
+
+
+def _baseline(html: str) -> str:
+    # The extraction used before html_extractor (extract.html_to_text)
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    return soup.get_text("\n", strip=True)
+
+
+def _chunk_count(text: str, size: int, overlap: int) -> int:
+    if not text:
+        return 0
+    step = max(1, size - overlap)
+    return max(1, math.ceil(max(0, len(text) - overlap) / step))
+
+
+def _measure(name: str, pages: List[str], fn: Callable[[List[str]], List[str]], repeat: int, size: int, overlap: int) -> Dict:
+    texts = fn(pages)  # warm-up (imports, pool start)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        texts = fn(pages)
+    elapsed = (time.perf_counter() - t0) / repeat
+    mb = sum(len(p.encode("utf-8")) for p in pages) / 1e6
+    chars = sum(len(t) for t in texts)
+    return {
+        "extractor": name,
+        "pages_s": round(len(pages) / elapsed, 1) if elapsed else 0.0,
+        "mb_s": round(mb / elapsed, 2) if elapsed else 0.0,
+        "chars": chars,
+        "est_tokens": math.ceil(chars / 4),
+        "chunks": sum(_chunk_count(t, size, overlap) for t in texts),
+    }
+
+
+def _pool_runner(backend: str) -> Callable[[List[str]], List[str]]:
+    async def _run(pages: List[str]) -> List[str]:
+        return await asyncio.gather(*(html_extractor.extract_async(p, backend) for p in pages))
+
+    return lambda pages: asyncio.run(_run(pages))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=None, help="Directory of .html files")
+    parser.add_argument("--save", nargs="*", default=None, help="Fetch these URLs into --corpus first")
+    parser.add_argument("--pages", type=int, default=50, help="Synthetic page count when no corpus is given")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--overlap", type=int, default=120)
+    parser.add_argument("--no-pool", action="store_true", help="Skip the process-pool runs")
+    parser.add_argument("--show", action="store_true", help="Print the first page's extracted text per extractor")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON")
+    args = parser.parse_args()
+
+    if args.save:
+        if not args.corpus:
+            parser.error("--save needs --corpus")
+        asyncio.run(_save_corpus(args.save, Path(args.corpus)))
+
+    if args.corpus:
+        pages = [p.read_text(encoding="utf-8", errors="replace") for p in sorted(Path(args.corpus).glob("*.html"))]
+        if not pages:
+            parser.error(f"no .html files in {args.corpus}")
+    else:
+        pages = [_synthetic_page() for _ in range(args.pages)]
+
+    runs: Dict[str, Callable[[List[str]], List[str]]] = {"bs4-get_text (baseline)": lambda ps: [_baseline(p) for p in ps]}
+    for backend in html_extractor._available_backends():
+        runs[f"{backend}-main"] = lambda ps, b=backend: [html_extractor.extract_main_content(p, b) for p in ps]
+    if not args.no_pool:
+        # Force every page through the pool regardless of size
+        os.environ["KIFF_HTML_POOL_MIN_BYTES"] = "0"
+        best = html_extractor.resolve_backend("auto")
+        runs[f"{best}-main-pool"] = _pool_runner(best)
+
+    results = []
+    try:
+        for name, fn in runs.items():
+            results.append(_measure(name, pages, fn, args.repeat, args.chunk_size, args.overlap))
+            if args.show:
+                print(f"===== {name} =====\n{fn(pages[:1])[0][:2000]}\n")
+    finally:
+        html_extractor.shutdown_pool()
+
+    summary = {"pages": len(pages), "mb": round(sum(len(p.encode('utf-8')) for p in pages) / 1e6, 2), "results": results}
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    print(f"pages={summary['pages']} size={summary['mb']}MB repeat={args.repeat} chunk_size={args.chunk_size}")
+    header = list(results[0].keys())
+    widths = [max(len(h), *(len(str(r[h])) for r in results)) for h in header]
+    print("  ".join(h.rjust(w) for h, w in zip(header, widths)))
+    for r in results:
+        print("  ".join(str(r[h]).rjust(w) for h, w in zip(header, widths)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmark semantic chunking.
+
+Compares, on the same documents:
+- agno-semantic: the previous path (agno SemanticChunking built per document,
+  embedding through the agno SentenceTransformerEmbedder); needs agno
+- unbatched: the native chunker with one encode call per sentence, i.e. what
+  per-text embedder wrappers cost
+- native-cold: the native chunker with an empty embedding cache (one batched
+  encode call per document)
+- native-rechunk: re-chunking the same documents with other thresholds,
+  served from the sentence-embedding cache
+
+Documents come from a directory of .txt/.md/.html files (--corpus; HTML goes
+through the main-content extractor) or are generated. --encoder hash uses a
+deterministic hashing encoder so the pipeline can be measured without a
+model download.
+
+Examples:
+  python scripts/benchmark_semantic_chunking.py --encoder hash
+  python scripts/benchmark_semantic_chunking.py --corpus /tmp/html_corpus --json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import semantic_chunker  # noqa: E402
+from app.services.semantic_chunker import semantic_chunk  # noqa: E402
+
+_TOPICS = {
+    "auth": "token bearer header api key secret rotate scope oauth login credential",
+    "pagination": "cursor page limit offset next results list starting after iterate",
+    "errors": "status code retry exception rate limit backoff timeout failure response",
+    "webhooks": "event payload signature endpoint deliver subscribe verify callback",
+}
+
+
+def _synthetic_docs(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        parts = []
+        for topic in rng.sample(list(_TOPICS), k=len(_TOPICS)):
+            words = _TOPICS[topic].split()
+            parts.append(f"## {topic.title()}\n")
+            for _ in range(rng.randint(8, 16)):
+                parts.append(" ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + ". ")
+            parts.append("\n\n")
+        docs.append("".join(parts))
+    return docs
+
+
+def _load_corpus(path: str) -> List[str]:
+    from app.services.html_extractor import extract_main_content
+
+    docs = []
+    for p in sorted(Path(path).iterdir()):
+        if p.suffix in (".html", ".htm"):
+            docs.append(extract_main_content(p.read_text(encoding="utf-8", errors="replace")))
+        elif p.suffix in (".txt", ".md"):
+            docs.append(p.read_text(encoding="utf-8", errors="replace"))
+    return [d for d in docs if d.strip()]
+
+
+def _hash_encoder(dim: int = 384) -> Callable[[List[str]], np.ndarray]:
+    def encode(texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in re.findall(r"\w+", t.lower()):
+                rng = np.random.default_rng(abs(hash(w)) % (2 ** 32))
+                out[i] += rng.standard_normal(dim).astype(np.float32)
+        return out
+
+    return encode
+
+
+def _st_encoder(model_name: str) -> Callable[[List[str]], np.ndarray]:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(texts, batch_size=64, convert_to_numpy=True)
+
+
+class _Counting:
+    def __init__(self, encode: Callable[[List[str]], np.ndarray]):
+        self.encode, self.calls, self.texts = encode, 0, 0
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        self.texts += len(texts)
+        return self.encode(texts)
+
+
+def _run(name: str, fn: Callable[[], List[List[str]]], counter: _Counting) -> Dict:
+    calls, texts = counter.calls, counter.texts
+    t0 = time.perf_counter()
+    chunks = fn()
+    elapsed = time.perf_counter() - t0
+    n = sum(len(c) for c in chunks)
+    return {
+        "run": name,
+        "seconds": round(elapsed, 3),
+        "docs_s": round(len(chunks) / elapsed, 1) if elapsed else 0.0,
+        "chunks": n,
+        "encode_calls": counter.calls - calls,
+        "texts_encoded": counter.texts - texts,
+    }
+
+
+def _agno_run(docs: List[str], size: int, threshold: float, model_name: str) -> List[List[str]]:
+    from agno.document import Document
+    from agno.document.chunking.semantic import SemanticChunking
+    from agno.embedder.sentence_transformer import SentenceTransformerEmbedder
+
+    embedder = SentenceTransformerEmbedder(id=model_name)
+    out = []
+    for d in docs:
+        chunker = SemanticChunking(embedder=embedder, chunk_size=size, similarity_threshold=threshold)
+        out.append([c.content for c in chunker.chunk(Document(content=d))])
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=None)
+    parser.add_argument("--docs", type=int, default=50, help="Synthetic document count")
+    parser.add_argument("--encoder", choices=["st", "hash"], default="st")
+    parser.add_argument("--model", default=os.getenv("KIFF_ST_EMBEDDER_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Max tokens per chunk")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--rechunk-thresholds", default="0.3,0.4,0.6")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    docs = _load_corpus(args.corpus) if args.corpus else _synthetic_docs(args.docs, args.seed)
+    if not docs:
+        parser.error("no documents")
+    counter = _Counting(_hash_encoder() if args.encoder == "hash" else _st_encoder(args.model))
+    key = f"bench:{args.encoder}:{args.model}"
+
+    def native(threshold: float) -> List[List[str]]:
+        return [[c.text for c in semantic_chunk(d, counter, key, max_tokens=args.chunk_size, threshold=threshold)] for d in docs]
+
+    def unbatched() -> List[List[str]]:
+        one_by_one = lambda texts: np.concatenate([counter([t]) for t in texts])  # noqa: E731
+        out = []
+        for d in docs:
+            semantic_chunker.get_embedding_cache().clear()
+            out.append([c.text for c in semantic_chunk(d, one_by_one, key, max_tokens=args.chunk_size, threshold=args.threshold)])
+        return out
+
+    results = []
+    if args.encoder == "st":
+        try:
+            t0 = time.perf_counter()
+            agno_chunks = _agno_run(docs, args.chunk_size, args.threshold, args.model)
+            elapsed = time.perf_counter() - t0
+            results.append({"run": "agno-semantic", "seconds": round(elapsed, 3), "docs_s": round(len(docs) / elapsed, 1),
+                            "chunks": sum(len(c) for c in agno_chunks), "encode_calls": None, "texts_encoded": None})
+        except Exception as e:
+            print(f"agno-semantic skipped: {e}", file=sys.stderr)
+
+    results.append(_run("unbatched", unbatched, counter))
+    semantic_chunker.get_embedding_cache().clear()
+    results.append(_run("native-cold", lambda: native(args.threshold), counter))
+    for thr in [float(t) for t in args.rechunk_thresholds.split(",") if t]:
+        results.append(_run(f"native-rechunk@{thr}", lambda thr=thr: native(thr), counter))
+
+    summary = {"docs": len(docs), "encoder": args.encoder, "cache": semantic_chunker.get_embedding_cache().get_stats(), "results": results}
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(f"docs={len(docs)} encoder={args.encoder} chunk_size={args.chunk_size} threshold={args.threshold}")
+    header = list(results[-1].keys())
+    widths = [max(len(h), *(len(str(r[h])) for r in results)) for h in header]
+    print("  ".join(h.rjust(w) for h, w in zip(header, widths)))
+    for r in results:
+        print("  ".join(str(r[h]).rjust(w) for h, w in zip(header, widths)))
+    print(f"cache: {summary['cache']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
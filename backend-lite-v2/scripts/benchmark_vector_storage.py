@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark compact vector storage options for LanceDB.
+
+Compares float32/float16 storage with and without an IVF_PQ index on the
+same vectors and reports recall@k (against exact float32 cosine search),
+on-disk table size and query latency (p50/p95).
+
+Vectors come from an existing table (--source-uri/--source-table) or are
+generated synthetically (clustered, unit-normalized, 384-d like MiniLM).
+
+Examples:
+  python scripts/benchmark_vector_storage.py --rows 50000
+  python scripts/benchmark_vector_storage.py --source-uri ./kiff_vectors --source-table tenant_x_kiff_packs
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import lancedb  # noqa: E402
+from app.services.vector_compression import VectorStorageConfig, ensure_vector_index, to_arrow_rows  # noqa: E402
+
+
+def _synthetic_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    assign = rng.integers(0, clusters, size=rows)
+    data = centers[assign] + 0.35 * rng.normal(size=(rows, dim))
+    return (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _load_vectors(uri: str, table_name: str) -> np.ndarray:
+    table = lancedb.connect(uri).open_table(table_name)
+    column = table.to_arrow().column("vector").combine_chunks()
+    dim = column.type.list_size
+    return column.flatten().to_numpy(zero_copy_only=False).astype(np.float32).reshape(-1, dim)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
+
+def _exact_topk(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = q @ normed.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def _run_config(workdir: str, name: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, config: VectorStorageConfig) -> dict:
+    db = lancedb.connect(os.path.join(workdir, name))
+    rows = [{"id": i, "vector": v} for i, v in enumerate(vectors)]
+    t0 = time.perf_counter()
+    table = db.create_table("bench", data=to_arrow_rows(rows, config.precision))
+    indexed = ensure_vector_index(table, "bench", force=config.index != "none", config=config)
+    build_s = time.perf_counter() - t0
+
+    latencies = []
+    hits = 0
+    for qi, q in enumerate(queries):
+        search = table.search(q).metric("cosine").select(["id"]).limit(k)
+        if indexed and config.refine_factor > 0:
+            search = search.refine_factor(config.refine_factor)
+        t = time.perf_counter()
+        res = search.to_list()
+        latencies.append((time.perf_counter() - t) * 1000)
+        hits += len(set(r["id"] for r in res) & set(truth[qi].tolist()))
+
+    lat = np.array(latencies)
+    return {
+        "config": name,
+        "precision": config.precision,
+        "index": config.index if indexed else "none",
+        "disk_mb": round(_dir_size(os.path.join(workdir, name)) / 1e6, 2),
+        "build_s": round(build_s, 2),
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source-uri", default=None)
+    parser.add_argument("--source-table", default=None)
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic row count")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sub-vectors", type=int, default=48)
+    parser.add_argument("--refine-factor", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON")
+    args = parser.parse_args()
+
+    if args.source_uri and args.source_table:
+        vectors = _load_vectors(args.source_uri, args.source_table)
+    else:
+        vectors = _synthetic_vectors(args.rows, args.dim, args.clusters, args.seed)
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(len(picks), vectors.shape[1])).astype(np.float32)
+    truth = _exact_topk(vectors, queries, args.k)
+
+    configs = {
+        "f32-flat": VectorStorageConfig(precision="float32", index="none"),
+        "f16-flat": VectorStorageConfig(precision="float16", index="none"),
+        "f32-ivfpq": VectorStorageConfig(precision="float32", index="ivf_pq", num_sub_vectors=args.sub_vectors, refine_factor=args.refine_factor),
+        "f16-ivfpq": VectorStorageConfig(precision="float16", index="ivf_pq", num_sub_vectors=args.sub_vectors, refine_factor=args.refine_factor),
+    }
+
+    workdir = tempfile.mkdtemp(prefix="kiff_vec_bench_")
+    try:
+        results = [_run_config(workdir, name, vectors, queries, truth, args.k, cfg) for name, cfg in configs.items()]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"rows": len(vectors), "dim": int(vectors.shape[1]), "results": results}, indent=2))
+        return 0
+
+    print(f"rows={len(vectors)} dim={vectors.shape[1]} queries={len(queries)} k={args.k}")
+    header = list(results[0].keys())
+    print("  ".join(f"{h:>12}" for h in header))
+    for r in results:
+        print("  ".join(f"{str(r[h]):>12}" for h in header))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Check that re-indexing a KB with chunk dedup never loses text.
+
+Indexes pages that share a navigation block into a temporary LanceDB table
+(fake fetcher and embedder, no network), then re-indexes them and verifies
+after every pass that each page still has rows and that every chunk of the
+current pages is stored somewhere in the KB:
+
+- unchanged: a second pass over the same pages keeps every page's rows
+- kept copy changed: the page that kept the shared block drops it; the
+  unchanged pages that dropped it as a duplicate are re-chunked and the
+  block comes back
+- all changed: every page changes at once and the shared block moves
+- cycle: two pages each dropped a chunk kept on the other, then both change
+
+Example:
+  python scripts/check_kb_dedup_reindex.py
+"""
+import asyncio
+import hashlib
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import lancedb_registry  # noqa: E402
+from app.services.dedup import ChunkDeduper  # noqa: E402
+from app.services.kb_indexer import KBIndexer  # noqa: E402
+
+NAV = "Docs home. Guides, API reference, SDKs, changelog and support for every product in the platform."
+PREAMBLE = "Authenticate every request with a bearer token from the dashboard settings page before calling the API."
+CHUNK_PARAMS = {"strategy": "paragraphs"}
+
+
+def _chunk(text: str) -> List[str]:
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+
+async def _embed(texts: List[str]) -> List[List[float]]:
+    return [[b / 255.0 for b in hashlib.sha1(t.encode("utf-8")).digest()[:8]] for t in texts]
+
+
+def _body(url: str, version: int) -> str:
+    return f"{url} reference, revision {version}: parameters, responses and examples specific to this page."
+
+
+async def _index(uri: str, table: str, pages: Dict[str, str], changed: Dict[str, bool]) -> Dict[str, Any]:
+    async def _fetch(url: str):
+        return SimpleNamespace(extracted=pages[url], changed=changed[url])
+
+    indexer = KBIndexer(uri, table, _embed, dedup=ChunkDeduper(), chunk_workers=2, fetch_workers=4)
+    logs: List[str] = []
+    snapshot = await indexer.index_pages(list(pages), _fetch, _chunk, CHUNK_PARAMS, skip_unchanged=True, logs=logs)
+    snapshot["logs"] = logs
+    return snapshot
+
+
+def _stored(uri: str, table: str) -> List[Dict[str, Any]]:
+    lancedb_registry.invalidate_table(uri, table)
+    return lancedb_registry.open_table(uri, table).to_arrow().select(["url", "text"]).to_pylist()
+
+
+def _verify(name: str, uri: str, table: str, pages: Dict[str, str], snapshot: Dict[str, Any]) -> bool:
+    rows = _stored(uri, table)
+    texts = {r["text"] for r in rows}
+    empty = sorted(u for u in pages if not any(r["url"] == u for r in rows))
+    missing = sorted({c for text in pages.values() for c in _chunk(text)} - texts)
+    ok = not empty and not missing and not snapshot["logs"]
+    detail = {
+        "pages_without_rows": empty,
+        "missing_chunks": [m[:40] for m in missing],
+        "pages_unchanged": snapshot["pages_unchanged"],
+        "chunks_duplicate": snapshot["chunks_duplicate"],
+        "rows": len(rows),
+        "logs": snapshot["logs"],
+    }
+    print(f"{'PASS' if ok else 'FAIL'} {name}: {detail}")
+    return ok
+
+
+async def _scenario(name: str, passes: List[Dict[str, str]]) -> bool:
+    """Index each pass in turn (pages whose text did not change report changed=False)"""
+    uri = tempfile.mkdtemp(prefix="kb-dedup-check-")
+    table = "kb_check"
+    try:
+        ok = True
+        previous: Dict[str, str] = {}
+        for i, pages in enumerate(passes, 1):
+            changed = {u: previous.get(u) != t for u, t in pages.items()}
+            snapshot = await _index(uri, table, pages, changed)
+            ok = _verify(f"{name} (pass {i})", uri, table, pages, snapshot) and ok
+            previous = pages
+        return ok
+    finally:
+        lancedb_registry.invalidate_table(uri, table)
+        shutil.rmtree(uri, ignore_errors=True)
+
+
+async def main() -> int:
+    urls = [f"https://docs.example.com/page-{i}" for i in range(8)]
+    first = {u: f"{NAV}\n\n{PREAMBLE}\n\n{_body(u, 1)}" for u in urls}
+    results = [
+        await _scenario("unchanged", [first, first]),
+        # The page that kept NAV and PREAMBLE on the first pass loses both
+        await _scenario("kept copy changed", [first, {**first, urls[0]: _body(urls[0], 2)}]),
+        await _scenario("all changed", [first, {u: f"{_body(u, 2)}\n\n{NAV}" for u in reversed(urls)}]),
+    ]
+    a, b = urls[0], urls[1]
+    cycle_1 = {a: f"{NAV}\n\n{_body(a, 1)}", b: f"{PREAMBLE}\n\n{_body(b, 1)}"}
+    cycle_2 = {a: f"{PREAMBLE}\n\n{_body(a, 1)}\n\n{NAV}", b: f"{NAV}\n\n{_body(b, 1)}\n\n{PREAMBLE}"}
+    cycle_3 = {a: _body(a, 2), b: _body(b, 2)}
+    results.append(await _scenario("cycle", [cycle_1, cycle_2, cycle_3]))
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
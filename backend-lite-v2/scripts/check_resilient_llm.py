@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Check call_llm_resilient against a local fake provider.
+
+Runs four scenarios without any network access and verifies both the call
+result and the usage_event rows each attempt wrote to the configured
+database (DATABASE_URL, the dev SQLite file by default):
+
+- failover: the primary answers 429, the fallback model answers
+- no failover: should_failover declines the primary's error (as the
+  launcher does once a tool ran), so it is raised and no fallback is tried
+- hedge: the primary is slow, the hedged request to the fallback wins and
+  the primary is cancelled (usage_event status "cancelled")
+- deadline: every model is slower than the deadline; asyncio.TimeoutError is
+  raised and the attempts are recorded with status "timeout" (so they count
+  in the model router's error statistics)
+
+Every run uses fresh fake model names, so circuit breakers and latency stats
+from earlier runs do not interfere.
+
+Example:
+  python scripts/check_resilient_llm.py
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Hedge quickly; the fake models have no latency history
+os.environ.setdefault("KIFF_LLM_HEDGE_DELAY_MS", "100")
+os.environ.setdefault("KIFF_LLM_HEDGE_MIN_DELAY_MS", "50")
+
+from app.db_core import SessionLocal  # noqa: E402
+from app.models.observability import UsageEvent  # noqa: E402
+from app.observability import SessionContext, call_llm_resilient  # noqa: E402
+
+
+class FakeRateLimit(Exception):
+    status_code = 429
+
+
+class FakeProvider:
+    """behaviors: model -> ("ok", latency_s) | ("429", latency_s)"""
+
+    def __init__(self, behaviors: Dict[str, Any]):
+        self.behaviors = behaviors
+        self.calls: List[str] = []
+
+    def callable_for(self, model: str):
+        async def _call(*, messages, stream=False):
+            self.calls.append(model)
+            kind, latency = self.behaviors[model]
+            await asyncio.sleep(latency)
+            if kind == "429":
+                raise FakeRateLimit("429 Too Many Requests (fake)")
+            return {"content": f"answer from {model}", "usage": {"prompt_tokens": 12, "completion_tokens": 4}}
+        return _call
+
+
+def _ctx(name: str) -> SessionContext:
+    return SessionContext(
+        tenant_id=None,
+        user_id=None,
+        workspace_id=None,
+        session_id=f"check-resilient-{name}",
+        run_id=f"run_{uuid.uuid4().hex[:12]}",
+        step_id=f"step_{uuid.uuid4().hex[:12]}",
+        agent_name="Resilient Check",
+    )
+
+
+def _statuses(run_id: str) -> Dict[str, str]:
+    with SessionLocal() as db:
+        rows = db.query(UsageEvent.model, UsageEvent.status).filter(UsageEvent.run_id == run_id).all()
+    return {model: status for model, status in rows}
+
+
+async def _run(name: str, behaviors: Dict[str, Any], **kwargs: Any):
+    models = list(behaviors)
+    provider = FakeProvider(behaviors)
+    ctx = _ctx(name)
+    try:
+        call = await call_llm_resilient(
+            provider="fake",
+            model=models[0],
+            messages=[{"role": "user", "content": f"scenario {name}"}],
+            session_ctx=ctx,
+            llm_callable_for=provider.callable_for,
+            fallback_models=models[1:],
+            **kwargs,
+        )
+        outcome: Any = call
+    except Exception as e:
+        outcome = e
+    return outcome, _statuses(ctx.run_id)
+
+
+def _check(name: str, ok: bool, detail: Any) -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name}: {detail}")
+    return ok
+
+
+async def main() -> int:
+    tag = uuid.uuid4().hex[:6]
+    primary, backup = f"fake/primary-{tag}", f"fake/backup-{tag}"
+    results = []
+
+    call, rows = await _run("failover", {primary + "-a": ("429", 0.01), backup + "-a": ("ok", 0.01)}, hedge=False)
+    results.append(_check(
+        "failover",
+        getattr(call, "model", None) == backup + "-a"
+        and rows == {primary + "-a": "error", backup + "-a": "ok"},
+        {"model": getattr(call, "model", call), "usage_events": rows},
+    ))
+
+    outcome, rows = await _run(
+        "no-failover", {primary + "-n": ("429", 0.01), backup + "-n": ("ok", 0.01)},
+        hedge=False, should_failover=lambda model, exc: False,
+    )
+    results.append(_check(
+        "no-failover",
+        isinstance(outcome, FakeRateLimit) and rows == {primary + "-n": "error"},
+        {"outcome": type(outcome).__name__, "usage_events": rows},
+    ))
+
+    call, rows = await _run("hedge", {primary + "-h": ("ok", 2.0), backup + "-h": ("ok", 0.05)}, hedge=True)
+    results.append(_check(
+        "hedge",
+        getattr(call, "model", None) == backup + "-h"
+        and rows == {primary + "-h": "cancelled", backup + "-h": "ok"},
+        {"model": getattr(call, "model", call), "usage_events": rows},
+    ))
+
+    outcome, rows = await _run("deadline", {primary + "-d": ("ok", 2.0), backup + "-d": ("ok", 2.0)}, hedge=True, deadline_s=0.5)
+    results.append(_check(
+        "deadline",
+        isinstance(outcome, asyncio.TimeoutError) and rows and all(s == "timeout" for s in rows.values()),
+        {"outcome": type(outcome).__name__, "usage_events": rows},
+    ))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Migrate existing LanceDB tables to compact vector storage.
+
+Rewrites each matching table with the requested vector precision and
+(optionally) builds an IVF_PQ index. Run from backend-lite-v2/.
+
+Examples:
+  python scripts/migrate_vector_storage.py --uri ./kiff_vectors --precision float16
+  python scripts/migrate_vector_storage.py --uri ./kiff_vectors --tables 'tenant_*' --index ivf_pq --keep-backup
+  python scripts/migrate_vector_storage.py --uri ./kiff_vectors --dry-run
+"""
+import argparse
+import os
+import sys
+from fnmatch import fnmatch
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import lancedb_registry  # noqa: E402
+from app.services.vector_compression import migrate_table, table_vector_dtype  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("LANCEDB_DIR", "./kiff_vectors"), help="LanceDB directory or URI")
+    parser.add_argument("--tables", default="*", help="Glob of table names to migrate (default: all)")
+    parser.add_argument("--precision", choices=["float32", "float16"], default=None, help="Target vector precision (default: KIFF_VECTOR_PRECISION)")
+    parser.add_argument("--index", choices=["none", "ivf_pq"], default=None, help="Force an index type (default: configured index, if table is large enough)")
+    parser.add_argument("--keep-backup", action="store_true", help="Copy each table to <name>__backup before rewriting")
+    parser.add_argument("--dry-run", action="store_true", help="List matching tables and their current precision only")
+    args = parser.parse_args()
+
+    db = lancedb_registry.get_db(args.uri)
+    names = [n for n in db.table_names() if fnmatch(n, args.tables) and not n.endswith("__backup")]
+    if not names:
+        print(f"No tables matching '{args.tables}' in {args.uri}")
+        return 0
+
+    failures = 0
+    for name in names:
+        if args.dry_run:
+            table = lancedb_registry.open_table(args.uri, name)
+            print(f"  {name}: rows={table.count_rows()} precision={table_vector_dtype(table)}")
+            continue
+        try:
+            result = migrate_table(args.uri, name, precision=args.precision, index=args.index, keep_backup=args.keep_backup)
+            print(f"✅ {name}: {result['rows']} rows {result['from_precision']} -> {result['to_precision']} indexed={result['indexed']}")
+        except Exception as e:
+            failures += 1
+            print(f"❌ {name}: {e}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
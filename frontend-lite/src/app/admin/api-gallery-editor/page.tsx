@@ -229,8 +229,8 @@ function AdminApiGalleryEditorPageContent() {
         strategy: "semantic",
         mode: "fast",
         embedder: "sentence-transformers",
-        chunk_size: 4400,
-        chunk_overlap: 300,
+        chunk_size: 1100,
+        chunk_overlap: 75,
         create_kb_if_missing: true,
       };
       const res = await apiJson(`/backend/admin/api_gallery_editor/api/${id}/index_full`, {
@@ -61,8 +61,8 @@ function AdminExtractorPageContent() {
   const [strategy, setStrategy] = React.useState<string>("fixed");
   const [embedder, setEmbedder] = React.useState<string>("sentence-transformers");
   const [semanticThreshold, setSemanticThreshold] = React.useState<number>(0.55);
-  const [chunkSize, setChunkSize] = React.useState<number>(5000);
-  const [overlap, setOverlap] = React.useState<number>(300);
+  const [chunkSize, setChunkSize] = React.useState<number>(1250);
+  const [overlap, setOverlap] = React.useState<number>(75);
   const [includeMeta, setIncludeMeta] = React.useState<boolean>(true);
 
   const [extracting, setExtracting] = React.useState(false);
@@ -260,8 +260,8 @@ function AdminExtractorPageContent() {
             mode,
             strategy,
             embedder,
-            chunk_size: Math.min(Math.max(chunkSize || 1, 1), 12000),
-            chunk_overlap: Math.min(Math.max(overlap || 0, 0), 500),
+            chunk_size: Math.min(Math.max(chunkSize || 1, 1), 3000),
+            chunk_overlap: Math.min(Math.max(overlap || 0, 0), 125),
             include_metadata: includeMeta,
             ...(strategy === "semantic" ? { semantic_params: { threshold: semanticThreshold } } : {}),
           },
@@ -412,12 +412,12 @@ function AdminExtractorPageContent() {
                 <div className="row" style={{ gap: 8 }}>
                   <div style={{ flex: 1 }}>
                     <label className="label">Chunk Size (tokens)</label>
-                    <input className="input" type="range" min={256} max={12000} step={64} value={chunkSize} onChange={(e) => setChunkSize(parseInt(e.target.value || "5000", 10))} />
+                    <input className="input" type="range" min={64} max={3000} step={16} value={chunkSize} onChange={(e) => setChunkSize(parseInt(e.target.value || "1250", 10))} />
                     <div className="muted" style={{ fontSize: 12 }}>{chunkSize}</div>
                   </div>
                   <div style={{ flex: 1 }}>
                     <label className="label">Overlap</label>
-                    <input className="input" type="range" min={0} max={500} step={10} value={overlap} onChange={(e) => setOverlap(parseInt(e.target.value || "300", 10))} />
+                    <input className="input" type="range" min={0} max={125} step={5} value={overlap} onChange={(e) => setOverlap(parseInt(e.target.value || "75", 10))} />
                     <div className="muted" style={{ fontSize: 12 }}>{overlap}</div>
                   </div>
                 </div>
@@ -39,7 +39,8 @@ ml_bridge = MLServiceBridge(
     ml_service_url=os.getenv("ML_SERVICE_URL", "http://localhost:8001")
 )
 vector_bridge = VectorStoreBridge(
-    vector_service_url=os.getenv("VECTOR_SERVICE_URL", "http://localhost:8003")
+    vector_service_url=os.getenv("VECTOR_SERVICE_URL", "http://localhost:8003"),
+    batch_search_url=os.getenv("VECTOR_BATCH_SEARCH_URL", os.getenv("ML_SERVICE_URL", "http://localhost:8001"))
 )
 
 @app.on_event("startup")
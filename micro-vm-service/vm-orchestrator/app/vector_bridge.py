@@ -16,8 +16,11 @@ logger = logging.getLogger(__name__)
 class VectorStoreBridge:
     """Bridge to connect VMs with external vector store"""
     
-    def __init__(self, vector_service_url: str):
+    def __init__(self, vector_service_url: str, batch_search_url: Optional[str] = None):
         self.vector_service_url = vector_service_url.rstrip('/')
+        # Batch search is served by the ML service (one embedding pass per batch),
+        # not by the vector database behind vector_service_url
+        self.batch_search_url = (batch_search_url or "").rstrip('/') or None
         self.client = None
         self.vm_connections: Dict[str, dict] = {}
         self.connection_pool_size = 5
@@ -218,16 +221,17 @@ class VectorStoreBridge:
             return {"error": str(e)}
     
     async def batch_search(self, vm_id: str, queries: List[dict]) -> dict:
-        """Perform multiple searches in batch"""
+        """Perform multiple searches in batch on the ML service's /search/batch.
+
+        Each query is {"query", "tenant_id", "pack_ids"?, "limit"?}.
+        """
+        if not self.batch_search_url:
+            return {"error": "Batch search is not configured (no batch_search_url)"}
         try:
-            data = {
-                "type": "batch",
-                "queries": queries,
-                "vm_id": vm_id
-            }
+            data = {"queries": queries}
             
             response = await self.client.post(
-                f"{self.vector_service_url}/batch_search",
+                f"{self.batch_search_url}/search/batch",
                 json=data,
                 headers={"X-VM-ID": vm_id},
                 timeout=60.0  # Longer timeout for batch operations
@@ -294,6 +298,7 @@ class VectorStoreBridge:
         
         return {
             "vector_service_url": self.vector_service_url,
+            "batch_search_url": self.batch_search_url,
             "vector_service_healthy": await self.health_check(),
             "active_vm_connections": active_connections,
             "healthy_connections": healthy_connections,
@@ -6,7 +6,7 @@ Handles all the heavy ML operations separated from the core API
 import os
 import asyncio
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import uvicorn
 
@@ -14,6 +14,8 @@ import uvicorn
 from .services.embedder_service import EmbedderService
 from .services.vector_service import VectorService
 from .services.agent_service import AgentService
+from .services.model_registry import model_registry
+from .services.job_queue import JobContext, enqueue_job, get_job_queue, handler, start_job_workers, stop_job_workers, ACTIVE_STATUSES
 
 app = FastAPI(
     title="Kiff ML Service",
@@ -21,10 +23,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Initialize services
+# Initialize services (one embedder shared by all components)
 embedder_service = EmbedderService()
-vector_service = VectorService()
-agent_service = AgentService()
+vector_service = VectorService(embedder=embedder_service)
+agent_service = AgentService(vector_service=vector_service)
 
 # Request/Response Models
 class EmbedRequest(BaseModel):
@@ -43,6 +45,16 @@ class SearchRequest(BaseModel):
 class SearchResponse(BaseModel):
     results: List[Dict[str, Any]]
     
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchRequest]
+    
+class BatchSearchResult(BaseModel):
+    query: str
+    results: List[Dict[str, Any]]
+    
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]
+    
 class IndexPackRequest(BaseModel):
     pack_id: str
     tenant_id: str
@@ -53,11 +65,39 @@ class IndexPackRequest(BaseModel):
 class IndexPackResponse(BaseModel):
     status: str
     message: str
+    job_id: Optional[str] = None
+
+
+@handler("pack.index")
+async def _index_pack_job(payload: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    await vector_service.index_pack(
+        payload["pack_id"],
+        payload["tenant_id"],
+        payload["display_name"],
+        payload["api_url"],
+        payload["description"],
+    )
+    return {"pack_id": payload["pack_id"]}
+
+
+@app.on_event("startup")
+async def _start_job_worker():
+    # In-process worker: indexing needs the embedder already loaded in this process
+    start_job_workers(processes=0, concurrency=int(os.getenv("KIFF_JOB_CONCURRENCY", "1")))
+
+
+@app.on_event("shutdown")
+async def _stop_job_worker():
+    await stop_job_workers()
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "ml-service"}
+    return {
+        "status": "healthy",
+        "service": "ml-service",
+        "models": model_registry.stats()
+    }
 
 @app.post("/embed", response_model=EmbedResponse)
 async def embed_text(request: EmbedRequest):
@@ -85,27 +125,55 @@ async def search_knowledge(request: SearchRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_search_knowledge(request: BatchSearchRequest):
+    """Run several searches with one embedding pass and concurrent scans"""
+    try:
+        results = await vector_service.batch_search(
+            [q.model_dump() for q in request.queries]
+        )
+        return BatchSearchResponse(results=results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
 @app.post("/index-pack", response_model=IndexPackResponse)
-async def index_pack(request: IndexPackRequest, background_tasks: BackgroundTasks):
-    """Start indexing a pack in the background"""
+async def index_pack(request: IndexPackRequest):
+    """Queue indexing of a pack on the durable job queue"""
     try:
-        # Start background indexing
-        background_tasks.add_task(
-            vector_service.index_pack,
-            request.pack_id,
-            request.tenant_id,
-            request.display_name,
-            request.api_url,
-            request.description
+        job = await enqueue_job(
+            "pack.index",
+            request.model_dump(),
+            tenant_id=request.tenant_id,
+            dedupe_key=f"pack.index:{request.pack_id}",
         )
         
         return IndexPackResponse(
             status="processing",
-            message=f"Started indexing pack {request.pack_id}"
+            message=f"Started indexing pack {request.pack_id}",
+            job_id=job.id
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}")
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a queued indexing job"""
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running indexing job"""
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    job = await asyncio.to_thread(get_job_queue().cancel, job_id)
+    return job.to_dict()
+
 @app.post("/agent/run")
 async def run_agent(request: dict):
     """Run AGNO agent with knowledge search capabilities"""
@@ -4,7 +4,7 @@ Handles AI agent operations and reasoning
 """
 
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .vector_service import VectorService
 
 # Optional AGNO imports
@@ -18,8 +18,8 @@ except ImportError:
 class AgentService:
     """Service for running AGNO agents with knowledge integration"""
     
-    def __init__(self):
-        self.vector_service = VectorService()
+    def __init__(self, vector_service: Optional[VectorService] = None):
+        self.vector_service = vector_service or VectorService()
         self.agent = None
         
         if _HAS_AGNO:
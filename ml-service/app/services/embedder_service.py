@@ -6,36 +6,55 @@ Extracted from the main backend for faster builds
 import os
 import asyncio
 from typing import List
-from sentence_transformers import SentenceTransformer
+from .model_registry import model_registry
 
 class EmbedderService:
     """Service for generating text embeddings using sentence-transformers"""
     
-    def __init__(self):
+    def __init__(self, lazy: bool = None):
         # Use the same model as the original backend
         self.model_name = "all-MiniLM-L6-v2"
-        self.model = None
-        self._load_model()
+        # Inference backend: torch (default), onnx, onnx-int8 or int8
+        self.backend = os.getenv("EMBEDDER_BACKEND", "torch")
+        if lazy is None:
+            lazy = os.getenv("EMBEDDER_LAZY_LOAD", "false").lower() in ("1", "true", "yes")
+        if not lazy:
+            self._load_model()
+    
+    @property
+    def registry_key(self) -> str:
+        return f"sentence-transformers:{self.model_name}:{self.backend}"
+    
+    @property
+    def model(self):
+        """Shared model instance from the process-wide registry (loaded on first use)"""
+        return model_registry.get_sentence_model(self.model_name, self.backend)
+    
+    @property
+    def backend_info(self):
+        return model_registry.info(self.registry_key)
     
     def _load_model(self):
         """Load the sentence transformer model"""
         try:
-            print(f"[EMBEDDER] Loading model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            print(f"[EMBEDDER] ✅ Model loaded successfully")
+            print(f"[EMBEDDER] Loading model: {self.model_name} (backend={self.backend})")
+            model_registry.get_sentence_model(self.model_name, self.backend)
+            print(f"[EMBEDDER] ✅ Model loaded successfully ({self.backend_info})")
         except Exception as e:
             print(f"[EMBEDDER] ❌ Failed to load model: {e}")
             raise
     
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding for text"""
-        if not self.model:
+        # Resolve off the event loop: first use may load the model
+        model = await asyncio.to_thread(lambda: self.model)
+        if not model:
             raise RuntimeError("Embedder model not loaded")
         
         try:
             # Run in thread to avoid blocking
             embedding = await asyncio.to_thread(
-                self.model.encode, 
+                model.encode, 
                 text, 
                 convert_to_numpy=True
             )
@@ -46,13 +65,15 @@ class EmbedderService:
     
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts"""
-        if not self.model:
+        # Resolve off the event loop: first use may load the model
+        model = await asyncio.to_thread(lambda: self.model)
+        if not model:
             raise RuntimeError("Embedder model not loaded")
         
         try:
             # Batch processing for efficiency
             embeddings = await asyncio.to_thread(
-                self.model.encode,
+                model.encode,
                 texts,
                 convert_to_numpy=True,
                 batch_size=32
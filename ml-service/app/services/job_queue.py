@@ -0,0 +1,605 @@
+"""
+Job Queue
+=========
+
+Durable local job queue for long-running ingestion (pack processing, bulk
+indexing), replacing FastAPI BackgroundTasks. Jobs live in a SQLite (WAL)
+table, so a restart does not lose them, and they run in worker processes
+instead of competing with request handling on the API event loop.
+
+- enqueue(kind, payload, tenant_id=...) stores a job; handlers registered
+  with @handler(kind) run it as `async def fn(payload, ctx) -> result`
+- workers claim jobs atomically (BEGIN IMMEDIATE), honoring a per-tenant
+  running-job limit across all workers and processes
+- failures retry with exponential backoff up to max_attempts
+- handlers report progress with ctx.progress(...); status, progress, result
+  and error are kept on the job record
+- cancel() drops queued jobs and cancels running ones (the handler task gets
+  CancelledError within one heartbeat)
+- jobs whose worker died (no heartbeat within the lease) are requeued
+
+Mirrored from backend-lite-v2/app/services/job_queue.py; keep the two in sync.
+
+Env:
+- KIFF_JOB_DB (default app/data/jobs.sqlite)
+- KIFF_JOB_WORKER_PROCESSES (default 1; 0 runs the worker on the app's event loop)
+- KIFF_JOB_CONCURRENCY: concurrent jobs per worker process (default 2)
+- KIFF_JOB_TENANT_CONCURRENCY: running jobs per tenant (default 1)
+- KIFF_JOB_MAX_ATTEMPTS (default 3)
+- KIFF_JOB_BACKOFF_SEC: first retry delay, doubled per attempt (default 30)
+- KIFF_JOB_LEASE_SEC (default 300)
+- KIFF_JOB_POLL_SEC (default 1.0)
+- KIFF_JOB_RETENTION_DAYS: finished jobs kept (default 7)
+"""
+
+import asyncio
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "jobs.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    tenant_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    dedupe_key TEXT,
+    worker_id TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, run_after, priority);
+CREATE INDEX IF NOT EXISTS idx_jobs_tenant ON jobs (tenant_id, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (dedupe_key, status);
+"""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class JobCancelled(Exception):
+    """Raised by JobContext.check_cancelled() once cancellation was requested"""
+
+
+class NonRetryableJobError(Exception):
+    """Fail the job immediately without further attempts"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    tenant_id: Optional[str]
+    payload: Dict[str, Any]
+    status: str
+    priority: int = 0
+    attempts: int = 0
+    max_attempts: int = 1
+    run_after: float = 0.0
+    dedupe_key: Optional[str] = None
+    worker_id: Optional[str] = None
+    cancel_requested: bool = False
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    heartbeat_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        data = dict(row)
+        data["payload"] = json.loads(data["payload"] or "{}")
+        data["progress"] = json.loads(data["progress"] or "{}")
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        data["cancel_requested"] = bool(data["cancel_requested"])
+        return cls(**data)
+
+    def to_dict(self, include_payload: bool = False) -> Dict[str, Any]:
+        data = asdict(self)
+        if not include_payload:
+            data.pop("payload", None)
+        return data
+
+
+class JobQueue:
+    """SQLite-backed job store; every method is synchronous and process-safe"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("KIFF_JOB_DB", _DEFAULT_DB)
+        self.tenant_concurrency = max(1, _env_int("KIFF_JOB_TENANT_CONCURRENCY", 1))
+        self.max_attempts = max(1, _env_int("KIFF_JOB_MAX_ATTEMPTS", 3))
+        self.backoff_sec = _env_float("KIFF_JOB_BACKOFF_SEC", 30.0)
+        self.lease_sec = _env_float("KIFF_JOB_LEASE_SEC", 300.0)
+        self.retention_sec = _env_float("KIFF_JOB_RETENTION_DAYS", 7.0) * 86400
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ----- producers -----
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        *,
+        tenant_id: Optional[str] = None,
+        priority: int = 0,
+        max_attempts: Optional[int] = None,
+        dedupe_key: Optional[str] = None,
+        delay_sec: float = 0.0,
+    ) -> Job:
+        """Store a job. With dedupe_key, a still-queued job with the same key and
+        the same payload is returned instead (a running one may have read stale
+        inputs, so it does not count; one with other flags would ignore them)."""
+        now = time.time()
+        payload_json = json.dumps(payload, default=str)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedupe_key:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE dedupe_key = ? AND status = ? ORDER BY created_at",
+                    (dedupe_key, QUEUED),
+                ).fetchall()
+                wanted = json.loads(payload_json)
+                for row in rows:
+                    if json.loads(row["payload"] or "{}") == wanted:
+                        conn.execute("COMMIT")
+                        return Job.from_row(row)
+            job_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO jobs (id, kind, tenant_id, payload, status, priority, max_attempts, run_after, dedupe_key, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, tenant_id, payload_json, QUEUED, priority,
+                 max_attempts or self.max_attempts, now + delay_sec, dedupe_key, now),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+            return Job.from_row(row)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list(
+        self,
+        *,
+        tenant_id: Optional[str] = None,
+        kind: Optional[str] = None,
+        statuses: Optional[Sequence[str]] = None,
+        limit: int = 50,
+    ) -> List[Job]:
+        where, args = [], []
+        if tenant_id is not None:
+            where.append("tenant_id = ?")
+            args.append(tenant_id)
+        if kind is not None:
+            where.append("kind = ?")
+            args.append(kind)
+        if statuses:
+            where.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            args.extend(statuses)
+        sql = "SELECT * FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(sql, (*args, max(1, limit))).fetchall()
+        return [Job.from_row(r) for r in rows]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job now; flag a running one for its worker to stop"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, cancel_requested = 1 WHERE id = ? AND status = ?",
+                (CANCELLED, now, job_id, QUEUED),
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        return self.get(job_id)
+
+    # ----- workers -----
+
+    def claim(self, worker_id: str, kinds: Optional[Sequence[str]] = None) -> Optional[Job]:
+        """Atomically move the next runnable job to running (None when nothing is runnable)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_expired(conn, now)
+            kind_sql = f" AND j.kind IN ({', '.join('?' for _ in kinds)})" if kinds else ""
+            row = conn.execute(
+                "SELECT j.* FROM jobs j WHERE j.status = ? AND j.run_after <= ?" + kind_sql +
+                " AND (j.tenant_id IS NULL OR (SELECT COUNT(*) FROM jobs r WHERE r.status = ? AND r.tenant_id = j.tenant_id) < ?)"
+                " ORDER BY j.priority DESC, j.created_at LIMIT 1",
+                (QUEUED, now, *(kinds or ()), RUNNING, self.tenant_concurrency),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker_id = ?, started_at = ?, heartbeat_at = ?, error = NULL "
+                "WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"]),
+            )
+            claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return Job.from_row(claimed)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        # Worker crashed or was killed mid-job: retry (or fail when out of attempts)
+        expired = conn.execute(
+            "SELECT id, attempts, max_attempts FROM jobs WHERE status = ? AND heartbeat_at < ?",
+            (RUNNING, now - self.lease_sec),
+        ).fetchall()
+        for row in expired:
+            if row["attempts"] >= row["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                    (FAILED, now, "worker lost (lease expired)", row["id"]),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, run_after = ?, worker_id = NULL, error = ? WHERE id = ?",
+                    (QUEUED, now, "worker lost (lease expired); requeued", row["id"]),
+                )
+
+    def heartbeat(self, job_ids: Sequence[str]) -> List[str]:
+        """Extend the lease of running jobs; returns the ids flagged for cancellation"""
+        if not job_ids:
+            return []
+        marks = ", ".join("?" for _ in job_ids)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({marks})", (time.time(), *job_ids))
+            rows = conn.execute(f"SELECT id FROM jobs WHERE id IN ({marks}) AND cancel_requested = 1", tuple(job_ids)).fetchall()
+        return [r["id"] for r in rows]
+
+    def set_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?",
+                (json.dumps(progress, default=str), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, status: str, *, result: Any = None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def retry_or_fail(self, job: Job, error: str, retryable: bool = True) -> str:
+        """Schedule another attempt with exponential backoff, or fail the job"""
+        if retryable and job.attempts < job.max_attempts:
+            delay = self.backoff_sec * (2 ** max(0, job.attempts - 1)) * random.uniform(0.8, 1.2)
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, run_after = ?, worker_id = NULL, error = ? WHERE id = ?",
+                    (QUEUED, time.time() + delay, error, job.id),
+                )
+            return QUEUED
+        self.finish(job.id, FAILED, error=error)
+        return FAILED
+
+    def release(self, job: Job) -> None:
+        """Give a job back without using up an attempt (worker shutting down)"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(0, attempts - 1), worker_id = NULL, run_after = ? "
+                "WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job.id, RUNNING),
+            )
+
+    def prune(self) -> int:
+        cutoff = time.time() - self.retention_sec
+        with self._connect() as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, CANCELLED, cutoff),
+            )
+            return cur.rowcount
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+
+# ----- handlers -----
+
+JobHandler = Callable[[Dict[str, Any], "JobContext"], Awaitable[Any]]
+_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register an async handler for a job kind"""
+
+    def _register(fn: JobHandler) -> JobHandler:
+        _HANDLERS[kind] = fn
+        return fn
+
+    return _register
+
+
+class JobContext:
+    """Passed to handlers: job identity, progress reporting and cancellation"""
+
+    _PROGRESS_INTERVAL = 1.0
+
+    def __init__(self, job: Job, queue: JobQueue):
+        self.job = job
+        self.queue = queue
+        self.cancel_requested = False
+        self._progress: Dict[str, Any] = dict(job.progress or {})
+        self._last_write = 0.0
+
+    @property
+    def job_id(self) -> str:
+        return self.job.id
+
+    @property
+    def tenant_id(self) -> Optional[str]:
+        return self.job.tenant_id
+
+    def progress(self, _force: bool = False, **fields: Any) -> None:
+        """Merge fields into the job's progress record (writes are throttled)"""
+        self._progress.update(fields)
+        now = time.monotonic()
+        if _force or now - self._last_write >= self._PROGRESS_INTERVAL:
+            self._last_write = now
+            try:
+                self.queue.set_progress(self.job.id, self._progress)
+            except sqlite3.Error as e:
+                print(f"[JOBS] progress write failed for {self.job.id}: {e}")
+
+    def flush(self) -> None:
+        self.progress(_force=True)
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested:
+            raise JobCancelled(self.job.id)
+
+
+class JobWorker:
+    """Claims and runs jobs on the current event loop"""
+
+    def __init__(self, queue: JobQueue, concurrency: Optional[int] = None, kinds: Optional[Sequence[str]] = None):
+        self.queue = queue
+        self.concurrency = max(1, concurrency or _env_int("KIFF_JOB_CONCURRENCY", 2))
+        self.kinds = list(kinds) if kinds else None
+        self.poll_sec = _env_float("KIFF_JOB_POLL_SEC", 1.0)
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, "asyncio.Task"] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._stopping = False
+
+    async def run(self) -> None:
+        print(f"[JOBS] worker {self.worker_id} started (concurrency={self.concurrency}, db={self.queue.db_path})")
+        beat = asyncio.create_task(self._heartbeat_loop())
+        last_prune = 0.0
+        try:
+            while not self._stopping:
+                claimed = False
+                if len(self._running) < self.concurrency:
+                    job = await asyncio.to_thread(self.queue.claim, self.worker_id, self.kinds or list(_HANDLERS) or None)
+                    if job is not None:
+                        claimed = True
+                        self._start(job)
+                if time.time() - last_prune > 3600:
+                    last_prune = time.time()
+                    await asyncio.to_thread(self.queue.prune)
+                if not claimed:
+                    await asyncio.sleep(self.poll_sec)
+        finally:
+            beat.cancel()
+            await self._shutdown()
+
+    def stop(self) -> None:
+        self._stopping = True
+
+    def _start(self, job: Job) -> None:
+        ctx = JobContext(job, self.queue)
+        self._contexts[job.id] = ctx
+        task = asyncio.create_task(self._execute(job, ctx))
+        self._running[job.id] = task
+        task.add_done_callback(lambda _t, jid=job.id: (self._running.pop(jid, None), self._contexts.pop(jid, None)))
+
+    async def _execute(self, job: Job, ctx: JobContext) -> None:
+        fn = _HANDLERS.get(job.kind)
+        if fn is None:
+            await asyncio.to_thread(self.queue.finish, job.id, FAILED, error=f"no handler for job kind '{job.kind}'")
+            return
+        t0 = time.monotonic()
+        try:
+            result = await fn(job.payload, ctx)
+            ctx.flush()
+            await asyncio.to_thread(self.queue.finish, job.id, SUCCEEDED, result=result)
+            print(f"[JOBS] {job.kind} {job.id} succeeded in {time.monotonic() - t0:.1f}s")
+        except (asyncio.CancelledError, JobCancelled):
+            if ctx.cancel_requested:
+                await asyncio.to_thread(self.queue.finish, job.id, CANCELLED, error="cancelled")
+                print(f"[JOBS] {job.kind} {job.id} cancelled")
+                return
+            # Worker shutdown: hand the job to another worker
+            await asyncio.to_thread(self.queue.release, job)
+            raise
+        except Exception as e:
+            status = await asyncio.to_thread(
+                self.queue.retry_or_fail, job, f"{type(e).__name__}: {e}", not isinstance(e, NonRetryableJobError)
+            )
+            print(f"[JOBS] {job.kind} {job.id} attempt {job.attempts}/{job.max_attempts} failed ({e}); {status}")
+
+    async def _heartbeat_loop(self) -> None:
+        interval = max(1.0, min(30.0, self.queue.lease_sec / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                flagged = await asyncio.to_thread(self.queue.heartbeat, list(self._running))
+            except sqlite3.Error as e:
+                print(f"[JOBS] heartbeat failed: {e}")
+                continue
+            for job_id in flagged:
+                ctx = self._contexts.get(job_id)
+                task = self._running.get(job_id)
+                if ctx is not None and task is not None and not ctx.cancel_requested:
+                    ctx.cancel_requested = True
+                    task.cancel()
+
+    async def _shutdown(self) -> None:
+        tasks = list(self._running.values())
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ----- process management -----
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+_processes: List[multiprocessing.Process] = []
+_inline_worker: Optional[JobWorker] = None
+_inline_task: Optional["asyncio.Task"] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue handle"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+async def enqueue_job(kind: str, payload: Dict[str, Any], **kwargs: Any) -> Job:
+    return await asyncio.to_thread(get_job_queue().enqueue, kind, payload, **kwargs)
+
+
+def _import_handlers(handlers_module: Optional[str]) -> None:
+    if handlers_module:
+        importlib.import_module(handlers_module)
+
+
+def _worker_process_main(db_path: str, handlers_module: Optional[str], concurrency: Optional[int]) -> None:
+    _import_handlers(handlers_module)
+    worker = JobWorker(JobQueue(db_path), concurrency)
+
+    async def _main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, worker.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await worker.run()
+
+    asyncio.run(_main())
+
+
+def start_job_workers(
+    handlers_module: Optional[str] = None,
+    processes: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> None:
+    """Start worker processes (or, with processes=0, a worker on the running loop)"""
+    global _inline_worker, _inline_task
+    count = _env_int("KIFF_JOB_WORKER_PROCESSES", 1) if processes is None else processes
+    queue = get_job_queue()
+    if count <= 0:
+        _import_handlers(handlers_module)
+        _inline_worker = JobWorker(queue, concurrency)
+        _inline_task = asyncio.get_running_loop().create_task(_inline_worker.run())
+        return
+    # spawn: the parent runs an event loop and threads, which fork would copy mid-flight
+    ctx = multiprocessing.get_context("spawn")
+    for _ in range(count):
+        p = ctx.Process(
+            target=_worker_process_main,
+            args=(queue.db_path, handlers_module, concurrency),
+            name="kiff-job-worker",
+            daemon=True,
+        )
+        p.start()
+        _processes.append(p)
+    print(f"[JOBS] started {count} worker process(es)")
+
+
+async def stop_job_workers(timeout: float = 10.0) -> None:
+    global _inline_worker, _inline_task
+    if _inline_worker is not None and _inline_task is not None:
+        _inline_worker.stop()
+        _inline_task.cancel()
+        await asyncio.gather(_inline_task, return_exceptions=True)
+        _inline_worker = _inline_task = None
+    for p in _processes:
+        if p.is_alive():
+            p.terminate()  # SIGTERM: the worker releases its running jobs
+    deadline = time.monotonic() + timeout
+    for p in _processes:
+        await asyncio.to_thread(p.join, max(0.0, deadline - time.monotonic()))
+        if p.is_alive():
+            p.kill()
+    _processes.clear()
@@ -0,0 +1,142 @@
+"""
+Model Registry - One copy of each model per process
+Lazily loads models on first use, hands out shared references and
+unloads the least recently used model when over capacity
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .embedding_backends import load_sentence_model
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (Linux), 0 when unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def _param_bytes(model: Any) -> int:
+    """Bytes held by torch parameters and buffers (0 for non-torch models)"""
+    total = 0
+    try:
+        for t in list(model.parameters()) + list(model.buffers()):
+            total += t.numel() * t.element_size()
+    except Exception:
+        return 0
+    return total
+
+
+class ModelRegistry:
+    """Process-wide registry of loaded models with LRU unloading"""
+
+    def __init__(self, max_models: Optional[int] = None):
+        self.max_models = max_models or int(os.getenv("MODEL_REGISTRY_MAX_MODELS", "3"))
+        self._models: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # One lock per key so two callers never load the same model twice
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, key: str, loader: Callable[[], Tuple[Any, Dict[str, Any]]]) -> Any:
+        """Return the shared model for key, loading it with loader() on first use.
+
+        loader returns (model, info). The returned reference stays valid even if
+        the registry later unloads the model; it is only dropped from the cache.
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                entry["hits"] += 1
+                entry["last_used"] = time.time()
+                return entry["model"]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry["hits"] += 1
+                    entry["last_used"] = time.time()
+                    return entry["model"]
+
+            print(f"[MODEL_REGISTRY] Loading {key}")
+            rss_before = _rss_bytes()
+            t0 = time.perf_counter()
+            model, info = loader()
+            load_seconds = time.perf_counter() - t0
+            entry = {
+                "model": model,
+                "info": info or {},
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+                "load_seconds": round(load_seconds, 3),
+                "hits": 0,
+                "param_bytes": _param_bytes(model),
+                "rss_delta_bytes": max(0, _rss_bytes() - rss_before),
+            }
+            with self._lock:
+                self._models[key] = entry
+                self._evict_over_capacity(keep=key)
+            print(f"[MODEL_REGISTRY] ✅ Loaded {key} in {load_seconds:.2f}s")
+            return model
+
+    def get_sentence_model(self, model_name: str, backend: str = "torch") -> Any:
+        """Shared SentenceTransformer for (model_name, backend)"""
+        key = f"sentence-transformers:{model_name}:{backend}"
+        return self.get(key, lambda: load_sentence_model(model_name, backend))
+
+    def info(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._models.get(key)
+            return dict(entry["info"]) if entry else {}
+
+    def unload(self, key: str) -> bool:
+        """Drop a model from the registry; returns False if it was not loaded"""
+        with self._lock:
+            entry = self._models.pop(key, None)
+        if entry is None:
+            return False
+        del entry
+        gc.collect()
+        print(f"[MODEL_REGISTRY] Unloaded {key}")
+        return True
+
+    def _evict_over_capacity(self, keep: str) -> None:
+        while len(self._models) > self.max_models:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self._models.pop(oldest)
+            print(f"[MODEL_REGISTRY] Evicted least recently used model {oldest}")
+        gc.collect()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model memory and usage stats for /health"""
+        with self._lock:
+            models = {
+                key: {
+                    **{k: v for k, v in entry.items() if k != "model"},
+                    "memory_mb": round(max(entry["param_bytes"], entry["rss_delta_bytes"]) / 1e6, 1),
+                }
+                for key, entry in self._models.items()
+            }
+        return {
+            "max_models": self.max_models,
+            "loaded": len(models),
+            "process_rss_mb": round(_rss_bytes() / 1e6, 1),
+            "models": models,
+        }
+
+
+# Singleton instance
+model_registry = ModelRegistry()
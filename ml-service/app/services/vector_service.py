@@ -13,13 +13,34 @@ from .embedder_service import EmbedderService
 class VectorService:
     """Service for vector operations using LanceDB"""
     
-    def __init__(self):
+    def __init__(self, embedder: Optional[EmbedderService] = None):
         self.db_path = os.getenv("LANCEDB_DIR", "./kiff_vectors")
         self.db = lancedb.connect(self.db_path)
-        self.embedder = EmbedderService()
+        # Share the caller's embedder; the model itself comes from the registry either way
+        self.embedder = embedder or EmbedderService()
         
         print(f"[VECTOR] Initialized with LanceDB at: {self.db_path}")
     
+    def _build_where(self, tenant_id: str, pack_ids: Optional[List[str]] = None) -> str:
+        """Build the SQL-style tenant/pack filter used by LanceDB searches"""
+        if pack_ids:
+            pack_filter = " OR ".join([f"pack_id = '{pid}'" for pid in pack_ids])
+            return f"tenant_id = '{tenant_id}' AND ({pack_filter})"
+        return f"tenant_id = '{tenant_id}'"
+    
+    def _format_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Shape raw LanceDB rows into the public search result format"""
+        formatted_results = []
+        for r in results:
+            formatted_results.append({
+                "content": r.get("content", ""),
+                "pack_id": r.get("pack_id", ""),
+                "pack_name": r.get("display_name", ""),
+                "document_type": r.get("document_type", ""),
+                "metadata": r.get("metadata_json", "")
+            })
+        return formatted_results
+    
     async def search(self, query: str, tenant_id: str, pack_ids: Optional[List[str]] = None, limit: int = 4) -> List[Dict[str, Any]]:
         """Search vectors with tenant and pack filtering"""
         try:
@@ -34,37 +55,89 @@ class VectorService:
             # Generate query embedding
             query_embedding = await self.embedder.embed_text(query)
             
-            # Build filters
-            search_query = table.search(query_embedding)
-            
-            if pack_ids:
-                # Build SQL-style filter for LanceDB
-                pack_filter = " OR ".join([f"pack_id = '{pid}'" for pid in pack_ids])
-                where_clause = f"tenant_id = '{tenant_id}' AND ({pack_filter})"
-                search_query = search_query.where(where_clause)
-            else:
-                search_query = search_query.where(f"tenant_id = '{tenant_id}'")
-            
-            # Execute search
+            # Build filters and execute search
+            search_query = table.search(query_embedding).where(self._build_where(tenant_id, pack_ids))
             results = search_query.limit(limit).to_list()
             
-            # Format results
-            formatted_results = []
-            for r in results:
-                formatted_results.append({
-                    "content": r.get("content", ""),
-                    "pack_id": r.get("pack_id", ""),
-                    "pack_name": r.get("display_name", ""),
-                    "document_type": r.get("document_type", ""),
-                    "metadata": r.get("metadata_json", "")
-                })
-            
-            return formatted_results
+            return self._format_results(results)
             
         except Exception as e:
             print(f"[VECTOR] Search error: {e}")
             return []
     
+    async def batch_search(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run several searches with a single embedding pass.
+        
+        Each query is a dict with ``query``, ``tenant_id`` and optional
+        ``pack_ids``/``limit``. Identical query texts are embedded once and
+        identical (query, tenant, packs, limit) combinations are scanned once.
+        Results are returned in input order as ``{"query", "results"}`` dicts.
+        """
+        if not queries:
+            return []
+        
+        # Deduplicate query texts for the embedding pass
+        texts: List[str] = []
+        text_index: Dict[str, int] = {}
+        for q in queries:
+            text = q.get("query", "")
+            if text not in text_index:
+                text_index[text] = len(texts)
+                texts.append(text)
+        
+        # Open each tenant table once and share the handle across scans
+        tables: Dict[str, Any] = {}
+        for q in queries:
+            tenant_id = q.get("tenant_id", "")
+            if tenant_id in tables:
+                continue
+            try:
+                tables[tenant_id] = self.db.open_table(f"tenant_{tenant_id}_kiff_packs")
+            except Exception:
+                tables[tenant_id] = None  # Table doesn't exist yet
+        
+        if not any(t is not None for t in tables.values()):
+            return [{"query": q.get("query", ""), "results": []} for q in queries]
+        
+        embeddings = await self.embedder.embed_batch(texts)
+        
+        def _scan(table, embedding: List[float], where: str, limit: int) -> List[Dict[str, Any]]:
+            return table.search(embedding).where(where).limit(limit).to_list()
+        
+        # Deduplicate identical scans and run the rest concurrently
+        scan_keys: List[tuple] = []
+        scans: Dict[tuple, Any] = {}
+        for q in queries:
+            tenant_id = q.get("tenant_id", "")
+            pack_ids = q.get("pack_ids") or None
+            limit = int(q.get("limit") or 4)
+            key = (q.get("query", ""), tenant_id, tuple(sorted(pack_ids)) if pack_ids else None, limit)
+            scan_keys.append(key)
+            if key in scans or tables.get(tenant_id) is None:
+                continue
+            scans[key] = asyncio.to_thread(
+                _scan,
+                tables[tenant_id],
+                embeddings[text_index[key[0]]],
+                self._build_where(tenant_id, pack_ids),
+                limit,
+            )
+        
+        keys = list(scans.keys())
+        outcomes = await asyncio.gather(*scans.values(), return_exceptions=True)
+        results_by_key: Dict[tuple, List[Dict[str, Any]]] = {}
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"[VECTOR] Batch search error for '{key[0]}': {outcome}")
+                results_by_key[key] = []
+            else:
+                results_by_key[key] = self._format_results(outcome)
+        
+        return [
+            {"query": key[0], "results": results_by_key.get(key, [])}
+            for key in scan_keys
+        ]
+    
     async def index_pack(self, pack_id: str, tenant_id: str, display_name: str, api_url: str, description: str):
         """Index a pack's documentation into vectors"""
         try:
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark CPU embedding backends and check parity against PyTorch.
+
+Encodes the same corpus with each backend (torch, onnx, onnx-int8, int8),
+reports throughput (sentences/sec) per batch size, and compares every
+backend's embeddings to the plain PyTorch output by cosine similarity.
+Exits non-zero if any backend falls below --min-cosine.
+
+Examples:
+  python scripts/benchmark_embedder_backends.py
+  python scripts/benchmark_embedder_backends.py --backends torch int8 --corpus docs.txt --threads 4
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.embedding_backends import BACKENDS, load_sentence_model  # noqa: E402
+
+_SAMPLE = [
+    "Create a payment intent with the amount and currency, then confirm it client-side.",
+    "Use the Authorization header with a Bearer token to authenticate API requests.",
+    "Rate limits are applied per API key; retry with exponential backoff on HTTP 429.",
+    "The embeddings endpoint returns a list of vectors, one per input string.",
+    "Webhooks are signed; verify the signature header before trusting the payload.",
+    "Pagination uses a cursor returned in the response metadata.",
+    "Install the SDK with pip install and set the API key as an environment variable.",
+    "Streaming responses are delivered as server-sent events terminated by [DONE].",
+]
+
+
+def _load_corpus(path: str, size: int) -> list:
+    if path:
+        lines = [ln.strip() for ln in Path(path).read_text(encoding="utf-8").splitlines() if ln.strip()]
+    else:
+        lines = list(_SAMPLE)
+    # Repeat to reach the requested size with slight variation to defeat any caching
+    return [f"{lines[i % len(lines)]} ({i})" for i in range(size)]
+
+
+def _throughput(model, texts: list, batch_size: int, repeats: int) -> float:
+    model.encode(texts[: batch_size * 2], batch_size=batch_size)  # warm-up
+    best = 0.0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        best = max(best, len(texts) / (time.perf_counter() - t0))
+    return best
+
+
+def _cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--corpus", default=None, help="Text file, one passage per line")
+    parser.add_argument("--size", type=int, default=512, help="Number of passages to encode")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Parity threshold vs torch (min per-sentence cosine)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    texts = _load_corpus(args.corpus, args.size)
+    parity_texts = texts[:128]
+
+    reference, _ = load_sentence_model(args.model, "torch", args.threads)
+    ref_vecs = reference.encode(parity_texts, convert_to_numpy=True)
+
+    results = []
+    failed = False
+    for backend in args.backends:
+        model, info = load_sentence_model(args.model, backend, args.threads)
+        row = {"requested": backend, "backend": info["backend"], "threads": info["threads"]}
+        for bs in args.batch_sizes:
+            row[f"sent/s@bs{bs}"] = round(_throughput(model, texts, bs, args.repeats), 1)
+        cos = _cosines(ref_vecs, model.encode(parity_texts, convert_to_numpy=True))
+        row["cos_min"] = round(float(cos.min()), 5)
+        row["cos_mean"] = round(float(cos.mean()), 5)
+        row["parity_ok"] = bool(cos.min() >= args.min_cosine)
+        failed = failed or not row["parity_ok"]
+        results.append(row)
+
+    if args.json:
+        print(json.dumps({"model": args.model, "size": len(texts), "results": results}, indent=2))
+    else:
+        print(f"model={args.model} passages={len(texts)} min_cosine={args.min_cosine}")
+        header = list(results[0].keys())
+        print("  ".join(f"{h:>14}" for h in header))
+        for r in results:
+            print("  ".join(f"{str(r[h]):>14}" for h in header))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())